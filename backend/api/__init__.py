@@ -4,5 +4,6 @@ from .users import users_bp
 from .posts import posts_bp
 from .ratings import ratings_bp
 from .stream import stream_bp
+from .admin import admin_bp
 
-__all__ = ['users_bp', 'posts_bp', 'ratings_bp', 'stream_bp']
\ No newline at end of file
+__all__ = ['users_bp', 'posts_bp', 'ratings_bp', 'stream_bp', 'admin_bp']
\ No newline at end of file
@@ -0,0 +1,216 @@
+"""Admin-only diagnostics endpoints for Radio Calico.
+
+Every route requires ``Authorization: Bearer <ADMIN_TOKEN>``. When
+``ADMIN_TOKEN`` is not configured the endpoints answer 404, as if they
+did not exist.
+"""
+
+import functools
+import hmac
+import logging
+from flask import Blueprint, Response, current_app, request
+from ..config import config
+from ..server import worker_pids
+from ..utils.capture import traffic_capture
+from ..utils.memory import (
+    GROUP_BY, SnapshotNotFound, gc_stats, memory_profiler, object_histogram, process_memory, worker_memory
+)
+from ..utils.pagination import get_limit_arg
+from ..utils.profiler import APP_ROUTES, profiler
+from ..utils.responses import success_response, error_response
+
+logger = logging.getLogger(__name__)
+admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+MAX_PROFILER_HZ = 1000
+MAX_TRACE_FRAMES = 100
+
+
+def require_admin(view):
+    """Reject requests without the configured admin bearer token."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not config.ADMIN_TOKEN:
+            return error_response('Resource not found', 404)
+
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not hmac.compare_digest(token.encode(), config.ADMIN_TOKEN.encode()):
+            logger.warning("Rejected admin request to %s from %s", request.path, request.remote_addr)
+            return error_response('Unauthorized', 401)
+
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@admin_bp.route('/profiler', methods=['GET'])
+@require_admin
+def profiler_status():
+    """Report whether the sampling profiler is running and what it has collected."""
+    return success_response(profiler.stats())
+
+
+@admin_bp.route('/profiler/start', methods=['POST'])
+@require_admin
+def start_profiler():
+    """Start (or reconfigure) the sampling profiler.
+
+    Takes an optional JSON body with ``hz`` and ``blueprints``, a list of
+    blueprint names such as ``ratings`` or ``stream`` (``app`` for the
+    routes registered on the application itself).
+    """
+    data = request.get_json(silent=True) or {}
+
+    hz = data.get('hz', profiler.hz)
+    if not isinstance(hz, int) or isinstance(hz, bool) or not 1 <= hz <= MAX_PROFILER_HZ:
+        return error_response(f'hz must be an integer between 1 and {MAX_PROFILER_HZ}', 400)
+
+    blueprints = data.get('blueprints')
+    if blueprints is not None:
+        known = set(current_app.blueprints) | {APP_ROUTES}
+        if not isinstance(blueprints, list) or not all(isinstance(name, str) for name in blueprints):
+            return error_response('blueprints must be a list of blueprint names', 400)
+        unknown = sorted(set(blueprints) - known)
+        if unknown:
+            return error_response(f"Unknown blueprints: {', '.join(unknown)}", 400)
+
+    profiler.start(hz=hz, blueprints=blueprints)
+    return success_response(profiler.stats(), message='Profiler started')
+
+
+@admin_bp.route('/profiler/stop', methods=['POST'])
+@require_admin
+def stop_profiler():
+    """Stop the sampling profiler, keeping the collected stacks."""
+    profiler.stop()
+    return success_response(profiler.stats(), message='Profiler stopped')
+
+
+@admin_bp.route('/profiler/flamegraph', methods=['GET'])
+@require_admin
+def profiler_flamegraph():
+    """Collected stacks in collapsed-stack format.
+
+    Pass ``reset=true`` to clear the stacks after reading them.
+    """
+    reset = request.args.get('reset', 'false').lower() == 'true'
+    return Response(profiler.collapsed(reset=reset), content_type='text/plain; charset=utf-8')
+
+
+@admin_bp.route('/capture', methods=['GET'])
+@require_admin
+def capture_status():
+    """Report the capture sample rate and how many requests were captured or dropped."""
+    return success_response(traffic_capture.stats())
+
+
+@admin_bp.route('/capture/start', methods=['POST'])
+@require_admin
+def start_capture():
+    """Capture a fraction of this worker's requests; takes a JSON body with ``sample_rate``."""
+    data = request.get_json(silent=True) or {}
+
+    sample_rate = data.get('sample_rate')
+    if (not isinstance(sample_rate, (int, float)) or isinstance(sample_rate, bool)
+            or not 0 < sample_rate <= 1):
+        return error_response('sample_rate must be a number greater than 0 and at most 1', 400)
+
+    traffic_capture.sample_rate = float(sample_rate)
+    return success_response(traffic_capture.stats(), message='Capture started')
+
+
+@admin_bp.route('/capture/stop', methods=['POST'])
+@require_admin
+def stop_capture():
+    """Stop capturing and write out everything already captured."""
+    traffic_capture.sample_rate = 0.0
+    traffic_capture.stop()
+    return success_response(traffic_capture.stats(), message='Capture stopped')
+
+
+@admin_bp.route('/memory', methods=['GET'])
+@require_admin
+def memory_overview():
+    """RSS of this and every sibling worker, GC counters and tracemalloc status."""
+    pids = worker_pids()
+    return success_response({
+        'process': process_memory(),
+        'workers': worker_memory(pids) if pids is not None else None,
+        'gc': gc_stats(),
+        'tracemalloc': memory_profiler.stats()
+    })
+
+
+@admin_bp.route('/memory/tracemalloc/start', methods=['POST'])
+@require_admin
+def start_tracemalloc():
+    """Start tracing allocations; takes an optional JSON body with ``frames``."""
+    data = request.get_json(silent=True) or {}
+
+    frames = data.get('frames', memory_profiler.frames)
+    if not isinstance(frames, int) or isinstance(frames, bool) or not 1 <= frames <= MAX_TRACE_FRAMES:
+        return error_response(f'frames must be an integer between 1 and {MAX_TRACE_FRAMES}', 400)
+
+    memory_profiler.start(frames)
+    return success_response(memory_profiler.stats(), message='tracemalloc started')
+
+
+@admin_bp.route('/memory/tracemalloc/stop', methods=['POST'])
+@require_admin
+def stop_tracemalloc():
+    """Stop tracing allocations, keeping retained snapshots."""
+    memory_profiler.stop()
+    return success_response(memory_profiler.stats(), message='tracemalloc stopped')
+
+
+@admin_bp.route('/memory/snapshots', methods=['POST'])
+@require_admin
+def take_memory_snapshot():
+    """Take a tracemalloc snapshot of this worker."""
+    try:
+        snapshot = memory_profiler.take_snapshot()
+    except RuntimeError as e:
+        return error_response(str(e), 409)
+    return success_response(snapshot, message='Snapshot taken', status_code=201)
+
+
+def _group_by_arg():
+    group_by = request.args.get('group_by', 'lineno')
+    return group_by if group_by in GROUP_BY else None
+
+
+@admin_bp.route('/memory/snapshots/<int:snapshot_id>', methods=['GET'])
+@require_admin
+def memory_snapshot(snapshot_id):
+    """Largest allocation sites in a snapshot, by ``group_by`` (lineno or filename)."""
+    group_by = _group_by_arg()
+    if group_by is None:
+        return error_response(f"group_by must be one of: {', '.join(GROUP_BY)}", 400)
+
+    try:
+        stats = memory_profiler.top(snapshot_id, group_by, get_limit_arg(request, 20))
+    except SnapshotNotFound:
+        return error_response('Snapshot not found', 404)
+    return success_response({'id': snapshot_id, 'group_by': group_by, 'stats': stats})
+
+
+@admin_bp.route('/memory/snapshots/<int:old_id>/diff/<int:new_id>', methods=['GET'])
+@require_admin
+def memory_snapshot_diff(old_id, new_id):
+    """Allocation sites that grew or shrank most between two snapshots."""
+    group_by = _group_by_arg()
+    if group_by is None:
+        return error_response(f"group_by must be one of: {', '.join(GROUP_BY)}", 400)
+
+    try:
+        stats = memory_profiler.diff(old_id, new_id, group_by, get_limit_arg(request, 20))
+    except SnapshotNotFound:
+        return error_response('Snapshot not found', 404)
+    return success_response({'old': old_id, 'new': new_id, 'group_by': group_by, 'stats': stats})
+
+
+@admin_bp.route('/memory/objects', methods=['GET'])
+@require_admin
+def memory_objects():
+    """Most common live object types in this worker."""
+    types = object_histogram(get_limit_arg(request, 25))
+    return success_response({'types': types, 'count': len(types)})
@@ -5,6 +5,7 @@ import logging
 from ..models.post import Post
 from ..utils.validation import validate_json, validate_required_fields
 from ..utils.responses import success_response, error_response
+from ..utils.pagination import get_limit_arg, get_cursor_arg, paginate, InvalidCursorError
 
 logger = logging.getLogger(__name__)
 posts_bp = Blueprint('posts', __name__, url_prefix='/api/posts')
@@ -14,19 +15,23 @@ posts_bp = Blueprint('posts', __name__, url_prefix='/api/posts')
 def get_posts():
     """Get all posts."""
     try:
-        limit = request.args.get('limit', 100, type=int)
-        if limit > 100:
-            limit = 100
-            
-        posts = Post.get_all(limit)
+        limit = get_limit_arg(request, 100)
+        try:
+            after = get_cursor_arg(request, (str, int))
+        except InvalidCursorError:
+            return error_response('Invalid cursor', 400)
+        
+        # Fetch one extra row to learn whether another page exists
+        posts, next_cursor = paginate(Post.get_all(limit + 1, after), limit, Post.page_key)
         
         return success_response({
             'posts': [post.to_dict() for post in posts],
-            'count': len(posts)
+            'count': len(posts),
+            'next_cursor': next_cursor
         })
         
     except Exception as e:
-        logger.error(f"Error in get_posts: {e}")
+        logger.error("Error in get_posts: %s", e)
         return error_response('Internal server error', 500)
 
 
@@ -61,7 +66,7 @@ def create_post():
             return error_response('Failed to create post', 500)
             
     except Exception as e:
-        logger.error(f"Error in create_post: {e}")
+        logger.error("Error in create_post: %s", e)
         return error_response('Internal server error', 500)
 
 
@@ -77,7 +82,7 @@ def get_post(post_id):
             return error_response('Post not found', 404)
             
     except Exception as e:
-        logger.error(f"Error in get_post: {e}")
+        logger.error("Error in get_post: %s", e)
         return error_response('Internal server error', 500)
 
 
@@ -85,18 +90,23 @@ def get_post(post_id):
 def get_user_posts(user_id):
     """Get posts by user."""
     try:
-        limit = request.args.get('limit', 50, type=int)
-        if limit > 100:
-            limit = 100
-            
-        posts = Post.get_by_user(user_id, limit)
+        limit = get_limit_arg(request, 50)
+        try:
+            after = get_cursor_arg(request, (str, int))
+        except InvalidCursorError:
+            return error_response('Invalid cursor', 400)
+        
+        posts, next_cursor = paginate(
+            Post.get_by_user(user_id, limit + 1, after), limit, Post.page_key
+        )
         
         return success_response({
             'posts': [post.to_dict() for post in posts],
             'count': len(posts),
-            'user_id': user_id
+            'user_id': user_id,
+            'next_cursor': next_cursor
         })
         
     except Exception as e:
-        logger.error(f"Error in get_user_posts: {e}")
+        logger.error("Error in get_user_posts: %s", e)
         return error_response('Internal server error', 500)
\ No newline at end of file
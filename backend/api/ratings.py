@@ -2,9 +2,12 @@
 
 from flask import Blueprint, request, jsonify
 import logging
+from ..config import config
 from ..models.rating import Rating
-from ..utils.validation import validate_json, validate_rating
+from ..services.events import event_broadcaster
+from ..utils.validation import validate_json, validate_rating, validate_track_ids
 from ..utils.responses import success_response, error_response
+from ..utils.pagination import get_limit_arg, get_cursor_arg, paginate, InvalidCursorError
 
 logger = logging.getLogger(__name__)
 ratings_bp = Blueprint('ratings', __name__, url_prefix='/api/ratings')
@@ -33,21 +36,68 @@ def create_rating():
         if not validate_rating(rating):
             return error_response('Rating must be "up", "down", or null', 400)
         
-        # Save rating
-        success = Rating.save_rating(track_id, rating, user_fingerprint)
+        # Save rating and get fresh counts in one transaction
+        result = Rating.save_rating(track_id, rating, user_fingerprint)
         
-        if success:
+        if result is not None:
+            if result['changed']:
+                event_broadcaster.notify_rating(track_id)
+            
             action = 'removed' if rating is None else 'saved'
             return success_response({
                 'track_id': track_id,
                 'rating': rating,
+                'ratings': result['ratings'],
+                'user_rating': result['user_rating'],
+                'changed': result['changed'],
                 'message': f'Rating {action} successfully'
             })
         else:
             return error_response('Failed to save rating', 500)
             
     except Exception as e:
-        logger.error(f"Error in create_rating: {e}")
+        logger.error("Error in create_rating: %s", e)
+        return error_response('Internal server error', 500)
+
+
+@ratings_bp.route('/batch', methods=['GET', 'POST'])
+def get_batch_ratings():
+    """Get ratings for several tracks in one request.
+    
+    GET takes ``track_ids`` as a comma-separated query parameter and an
+    optional ``fingerprint``; POST takes a JSON body with ``track_ids``
+    and an optional ``user_fingerprint``.
+    """
+    try:
+        if request.method == 'POST':
+            data = validate_json(request)
+            if not data:
+                return error_response('Invalid JSON data', 400)
+            track_ids = data.get('track_ids')
+            user_fingerprint = data.get('user_fingerprint')
+        else:
+            track_ids_arg = request.args.get('track_ids', '')
+            track_ids = [track_id for track_id in track_ids_arg.split(',') if track_id]
+            user_fingerprint = request.args.get('fingerprint')
+        
+        validation_error = validate_track_ids(track_ids, config.RATINGS_BATCH_MAX)
+        if validation_error:
+            return error_response(validation_error, 400)
+        if user_fingerprint is not None and not isinstance(user_fingerprint, str):
+            return error_response('user_fingerprint must be a string', 400)
+        
+        # Drop duplicates, keeping request order
+        track_ids = list(dict.fromkeys(track_id.strip() for track_id in track_ids))
+        
+        tracks = Rating.get_many_track_ratings(track_ids, user_fingerprint)
+        
+        return success_response({
+            'tracks': tracks,
+            'count': len(tracks)
+        })
+        
+    except Exception as e:
+        logger.error("Error in get_batch_ratings: %s", e)
         return error_response('Internal server error', 500)
 
 
@@ -63,7 +113,7 @@ def get_track_ratings(track_id):
         return success_response(ratings_data)
         
     except Exception as e:
-        logger.error(f"Error in get_track_ratings: {e}")
+        logger.error("Error in get_track_ratings: %s", e)
         return error_response('Internal server error', 500)
 
 
@@ -71,20 +121,25 @@ def get_track_ratings(track_id):
 def get_user_ratings(user_fingerprint):
     """Get recent ratings by a user."""
     try:
-        limit = request.args.get('limit', 50, type=int)
-        
-        # Validate limit
-        if limit > 100:
-            limit = 100
+        limit = get_limit_arg(request, 50)
+        try:
+            after = get_cursor_arg(request, (str, str))
+        except InvalidCursorError:
+            return error_response('Invalid cursor', 400)
         
-        ratings = Rating.get_user_ratings(user_fingerprint, limit)
+        ratings, next_cursor = paginate(
+            Rating.get_user_ratings(user_fingerprint, limit + 1, after),
+            limit,
+            Rating.rating_page_key
+        )
         
         return success_response({
             'user_fingerprint': user_fingerprint,
             'ratings': ratings,
-            'count': len(ratings)
+            'count': len(ratings),
+            'next_cursor': next_cursor
         })
         
     except Exception as e:
-        logger.error(f"Error in get_user_ratings: {e}")
+        logger.error("Error in get_user_ratings: %s", e)
         return error_response('Internal server error', 500)
\ No newline at end of file
@@ -1,9 +1,14 @@
 """Stream API endpoints for Radio Calico."""
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify
 import logging
+import time
 import requests
 from ..config import config
+from ..server import release_request_slot
+from ..services.events import SubscriberLimitError, event_broadcaster
+from ..services.metadata import metadata_cache
+from ..services.stream_health import stream_prober
 from ..utils.responses import success_response, error_response
 
 logger = logging.getLogger(__name__)
@@ -24,7 +29,7 @@ def stream_info():
         })
         
     except Exception as e:
-        logger.error(f"Error in stream_info: {e}")
+        logger.error("Error in stream_info: %s", e)
         return error_response('Internal server error', 500)
 
 
@@ -32,45 +37,68 @@ def stream_info():
 def get_metadata():
     """Proxy metadata requests to avoid CORS issues."""
     try:
-        response = requests.get(config.METADATA_URL, timeout=10)
-        response.raise_for_status()
-        
-        metadata = response.json()
+        cached = metadata_cache.get()
         
         return success_response({
-            'metadata': metadata,
-            'timestamp': response.headers.get('date'),
-            'cache_control': response.headers.get('cache-control')
+            'metadata': cached.metadata,
+            'timestamp': cached.date,
+            'cache_control': cached.cache_control,
+            'stale': cached.stale
         })
         
     except requests.RequestException as e:
-        logger.error(f"Error fetching metadata: {e}")
+        logger.error("Error fetching metadata: %s", e)
         return error_response('Failed to fetch metadata', 502)
     except Exception as e:
-        logger.error(f"Error in get_metadata: {e}")
+        logger.error("Error in get_metadata: %s", e)
         return error_response('Internal server error', 500)
 
 
+@stream_bp.route('/events', methods=['GET'])
+def stream_events():
+    """Push track changes and vote counts as Server-Sent Events."""
+    try:
+        subscription = event_broadcaster.subscribe()
+    except SubscriberLimitError as e:
+        logger.warning("Refusing live update stream: %s", e)
+        return error_response('Too many live update streams', 503)
+    
+    # The stream may stay open for minutes; don't hold a request thread slot
+    release_request_slot()
+    
+    def generate():
+        yield 'retry: 5000\n\n'
+        deadline = time.monotonic() + config.EVENTS_MAX_DURATION
+        while time.monotonic() < deadline and not subscription.closed:
+            message = subscription.get(timeout=config.EVENTS_KEEPALIVE)
+            yield message if message is not None else ': keepalive\n\n'
+    
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    response.call_on_close(lambda: event_broadcaster.unsubscribe(subscription))
+    return response
+
+
 @stream_bp.route('/status', methods=['GET'])
 def stream_status():
-    """Check if the stream is available."""
+    """Report stream availability from the background prober."""
     try:
-        # Check stream availability
-        response = requests.head(config.STREAM_URL, timeout=10)
+        probe = stream_prober.snapshot()
+        details = {
+            'stream_url': config.STREAM_URL,
+            'content_type': probe.content_type,
+            'server': probe.server,
+            'probe': probe.to_dict(),
+            'history': stream_prober.history()
+        }
+        
+        if probe.status == 'offline':
+            return error_response(f'Stream unavailable ({probe.error})', 502, **details)
+        
+        return success_response({'status': probe.status, **details})
         
-        if response.status_code == 200:
-            return success_response({
-                'status': 'online',
-                'stream_url': config.STREAM_URL,
-                'content_type': response.headers.get('content-type'),
-                'server': response.headers.get('server')
-            })
-        else:
-            return error_response(f'Stream unavailable (HTTP {response.status_code})', 502)
-            
-    except requests.RequestException as e:
-        logger.error(f"Stream status check failed: {e}")
-        return error_response('Stream unavailable', 502)
     except Exception as e:
-        logger.error(f"Error in stream_status: {e}")
-        return error_response('Internal server error', 500)
\ No newline at end of file
+        logger.error("Error in stream_status: %s", e)
+        return error_response('Internal server error', 500)
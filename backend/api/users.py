@@ -5,6 +5,7 @@ import logging
 from ..models.user import User
 from ..utils.validation import validate_json, validate_email, validate_required_fields
 from ..utils.responses import success_response, error_response
+from ..utils.pagination import get_limit_arg, get_cursor_arg, paginate, InvalidCursorError
 
 logger = logging.getLogger(__name__)
 users_bp = Blueprint('users', __name__, url_prefix='/api/users')
@@ -14,19 +15,23 @@ users_bp = Blueprint('users', __name__, url_prefix='/api/users')
 def get_users():
     """Get all users."""
     try:
-        limit = request.args.get('limit', 100, type=int)
-        if limit > 100:
-            limit = 100
-            
-        users = User.get_all(limit)
+        limit = get_limit_arg(request, 100)
+        try:
+            after = get_cursor_arg(request, (str, int))
+        except InvalidCursorError:
+            return error_response('Invalid cursor', 400)
+        
+        # Fetch one extra row to learn whether another page exists
+        users, next_cursor = paginate(User.get_all(limit + 1, after), limit, User.page_key)
         
         return success_response({
             'users': [user.to_dict() for user in users],
-            'count': len(users)
+            'count': len(users),
+            'next_cursor': next_cursor
         })
         
     except Exception as e:
-        logger.error(f"Error in get_users: {e}")
+        logger.error("Error in get_users: %s", e)
         return error_response('Internal server error', 500)
 
 
@@ -64,7 +69,7 @@ def create_user():
             return error_response('Email already exists', 400)
             
     except Exception as e:
-        logger.error(f"Error in create_user: {e}")
+        logger.error("Error in create_user: %s", e)
         return error_response('Internal server error', 500)
 
 
@@ -80,5 +85,5 @@ def get_user(user_id):
             return error_response('User not found', 404)
             
     except Exception as e:
-        logger.error(f"Error in get_user: {e}")
+        logger.error("Error in get_user: %s", e)
         return error_response('Internal server error', 500)
\ No newline at end of file
@@ -4,7 +4,9 @@ Refactored for better organization, security, and maintainability.
 """
 
 import os
-from flask import Flask, render_template, send_from_directory
+import sys
+import time
+from flask import Flask, Response, g, render_template, request, send_from_directory
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -13,10 +15,19 @@ load_dotenv()
 
 # Import application modules
 from .config import config
-from .models import init_db
-from .api import users_bp, posts_bp, ratings_bp, stream_bp
-from .utils.logging_config import setup_logging
+from .models import init_db, Rating
+from .models.database import check_database, get_replica_stats, get_storage_stats, get_writer_stats
+from .models.shards import get_shard_stats
+from .api import users_bp, posts_bp, ratings_bp, stream_bp, admin_bp
+from .services import event_broadcaster, metadata_cache, upstream_stats
+from .utils.logging_config import logging_stats, setup_logging
 from .utils.responses import error_response
+from .utils import metrics
+from .utils.tracing import tracer
+from .utils.capture import capture_request, traffic_capture
+from .utils.profiler import profiler
+from .cli import register_commands
+from .server import parse_args, serve, worker_stats
 
 # Setup logging
 setup_logging()
@@ -44,13 +55,23 @@ def create_app() -> Flask:
     app.register_blueprint(posts_bp)
     app.register_blueprint(ratings_bp)
     app.register_blueprint(stream_bp)
+    app.register_blueprint(admin_bp)
     
     # Register error handlers
     register_error_handlers(app)
     
+    # Register request instrumentation
+    register_metrics(app)
+    register_tracing(app)
+    register_capture(app)
+    register_profiler(app)
+    
     # Register main routes
     register_routes(app)
     
+    # Register CLI commands
+    register_commands(app)
+    
     return app
 
 
@@ -95,12 +116,119 @@ def register_routes(app: Flask) -> None:
     @app.route('/health')
     def health_check():
         """Health check endpoint for monitoring."""
+        database_ok = check_database()
         return {
-            'status': 'healthy',
+            'status': 'healthy' if database_ok else 'degraded',
             'version': '2.0',
-            'database': 'connected',
-            'stream_url': config.STREAM_URL
-        }
+            'database': 'connected' if database_ok else 'unavailable',
+            'stream_url': config.STREAM_URL,
+            'caches': {
+                'track_ratings': Rating.cache_stats(),
+                'rating_ids': Rating.id_cache_stats(),
+                'metadata': metadata_cache.stats()
+            },
+            'storage': get_storage_stats(),
+            'writes': get_writer_stats(),
+            'replica': get_replica_stats(),
+            'rating_shards': get_shard_stats(),
+            'live_updates': event_broadcaster.stats(),
+            'upstreams': upstream_stats(),
+            'logging': logging_stats(),
+            'server': worker_stats()
+        }, 200 if database_ok else 503
+    
+    @app.route('/metrics')
+    def prometheus_metrics():
+        """Prometheus metrics for this process."""
+        return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def register_metrics(app: Flask) -> None:
+    """Record request counts, latency and concurrency for /metrics.
+    
+    Routes are labelled by their URL rule (``/api/ratings/<track_id>``),
+    not the concrete path, so label cardinality stays bounded.
+    """
+    
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+        metrics.http_requests_in_flight.inc()
+    
+    @app.after_request
+    def record_request(response):
+        started = g.get('request_started')
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else '<unmatched>'
+            method = metrics.method_label(request.method)
+            metrics.http_requests.inc(method=method, route=route, status=str(response.status_code))
+            metrics.http_request_duration.observe(time.perf_counter() - started, method=method, route=route)
+        return response
+    
+    @app.teardown_request
+    def finish_request(exc):
+        if g.pop('request_started', None) is not None:
+            metrics.http_requests_in_flight.dec()
+
+
+def register_tracing(app: Flask) -> None:
+    """Trace a sample of requests (TRACE_SAMPLE_RATE) to Chrome trace files."""
+    
+    @app.before_request
+    def start_trace():
+        route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        g.trace_token = tracer.start(f'{request.method} {route}', path=request.path)
+    
+    @app.after_request
+    def record_trace_status(response):
+        g.trace_status = response.status_code
+        return response
+    
+    @app.teardown_request
+    def finish_trace(exc):
+        tracer.finish(g.pop('trace_token', None), status=g.pop('trace_status', None),
+                      error=repr(exc) if exc else None)
+
+
+def register_capture(app: Flask) -> None:
+    """Capture a sample of requests (CAPTURE_SAMPLE_RATE) for replay."""
+    
+    @app.before_request
+    def start_capture():
+        if traffic_capture.sample_rate > 0:
+            g.capture_started = (time.time(), time.perf_counter())
+    
+    @app.after_request
+    def finish_capture(response):
+        started = g.pop('capture_started', None)
+        if started is not None:
+            started_at, started_perf = started
+            try:
+                capture_request(traffic_capture, request, response, started_at,
+                                time.perf_counter() - started_perf)
+            except Exception as e:
+                # Capture must never fail the request it observes
+                logger.warning("Could not capture %s %s: %s", request.method, request.path, e)
+        return response
+
+
+def register_profiler(app: Flask) -> None:
+    """Tell the sampling profiler which threads are serving which blueprint.
+    
+    With PROFILER_ENABLED the profiler starts with the app, so each
+    pre-fork worker samples itself.
+    """
+    
+    @app.before_request
+    def enter_profiler():
+        profiler.enter(request.blueprint)
+    
+    @app.teardown_request
+    def exit_profiler(exc):
+        profiler.exit()
+    
+    if config.PROFILER_ENABLED and not profiler.running:
+        profiler.start(hz=config.PROFILER_HZ, blueprints=config.PROFILER_BLUEPRINTS)
 
 
 def register_error_handlers(app: Flask) -> None:
@@ -114,7 +242,7 @@ def register_error_handlers(app: Flask) -> None:
     @app.errorhandler(500)
     def internal_error(error):
         """Handle 500 errors."""
-        logger.error(f"Internal server error: {error}")
+        logger.error("Internal server error: %s", error)
         return error_response('Internal server error', 500)
     
     @app.errorhandler(400)
@@ -123,9 +251,21 @@ def register_error_handlers(app: Flask) -> None:
         return error_response('Bad request', 400)
 
 
-def main():
-    """Main entry point for the application."""
+def main(argv=None):
+    """Main entry point for the application.
+    
+    ``python -m backend.app`` runs the development server;
+    ``python -m backend.app serve --workers N --threads M`` runs the
+    pre-fork production server.
+    """
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    
     try:
+        if args.command == 'serve':
+            serve(args.workers, args.threads, host=args.host, port=args.port,
+                  graceful_timeout=args.graceful_timeout)
+            return
+        
         # Initialize database
         init_db()
         logger.info("Database initialized successfully")
@@ -133,9 +273,9 @@ def main():
         # Create Flask app
         app = create_app()
         
-        logger.info(f"Starting Radio Sahoo server...")
-        logger.info(f"Debug mode: {config.DEBUG}")
-        logger.info(f"Host: {config.HOST}:{config.PORT}")
+        logger.info("Starting Radio Sahoo server...")
+        logger.info("Debug mode: %s", config.DEBUG)
+        logger.info("Host: %s:%s", config.HOST, config.PORT)
         
         # Run the application
         app.run(
@@ -145,7 +285,7 @@ def main():
         )
         
     except Exception as e:
-        logger.error(f"Failed to start application: {e}")
+        logger.error("Failed to start application: %s", e)
         raise
 
 
@@ -0,0 +1,178 @@
+"""Command line maintenance commands for Radio Calico.
+
+Run with ``flask --app backend.app <group> <command>``.
+"""
+
+import os
+import sqlite3
+import time
+from functools import partial
+from typing import List
+
+import click
+from flask import Flask
+from flask.cli import AppGroup
+
+from .config import config
+from .models.database import get_db_connection
+from .models.migrations import (
+    MIGRATIONS, apply_migrations, backfill_compact_ratings, get_schema_version, prepare_compact_ratings
+)
+from .models.rating import Rating
+from .models.shards import rebalance, shard_paths
+
+db_cli = AppGroup('db', help='Database schema management.')
+ratings_cli = AppGroup('ratings', help='Track rating maintenance.')
+
+
+@db_cli.command('upgrade')
+def upgrade_command():
+    """Apply pending schema migrations."""
+    conn = get_db_connection()
+    try:
+        applied = apply_migrations(conn)
+    finally:
+        conn.close()
+
+    if applied:
+        click.echo(f"Applied migrations: {', '.join(str(version) for version in applied)}")
+    else:
+        click.echo('Database schema is up to date')
+
+
+@db_cli.command('version')
+def version_command():
+    """Show the current and latest schema versions."""
+    conn = get_db_connection()
+    try:
+        current = get_schema_version(conn)
+        conn.commit()
+    finally:
+        conn.close()
+
+    click.echo(f'Schema version {current} (latest {MIGRATIONS[-1].version})')
+
+
+@ratings_cli.command('rebuild-counts')
+def rebuild_counts_command():
+    """Recompute per-track vote counters from the ratings table.
+
+    Safe while the app is serving: the rebuild is committed through the
+    group-commit writer like any other write.
+    """
+    tracks = Rating.rebuild_counts()
+    click.echo(f'Rebuilt rating counters for {tracks} tracks')
+
+
+@ratings_cli.command('verify-counts')
+def verify_counts_command():
+    """Check per-track vote counters against the ratings table."""
+    mismatches = Rating.verify_counts()
+
+    for mismatch in mismatches:
+        click.echo(
+            f"{mismatch['track_id']}: stored up={mismatch['stored']['up']} "
+            f"down={mismatch['stored']['down']}, expected up={mismatch['expected']['up']} "
+            f"down={mismatch['expected']['down']}"
+        )
+
+    if mismatches:
+        raise click.ClickException(
+            f'{len(mismatches)} tracks have stale counters; run "ratings rebuild-counts"'
+        )
+    click.echo('Rating counters are consistent')
+
+
+def _layout(count: int) -> List[str]:
+    """Database files holding ratings with ``count`` shards (0: the main database)."""
+    return shard_paths(config.RATINGS_SHARD_DIR, count) if count > 0 else [config.DATABASE_PATH]
+
+
+@ratings_cli.command('reshard')
+@click.option('--to', 'target_count', type=int, required=True,
+              help='Shard count of the new layout; 0 moves ratings back into the main database.')
+@click.option('--from', 'source_count', type=int, default=None,
+              help='Shard count of the current layout (default: RATINGS_SHARDS).')
+def reshard_command(target_count, source_count):
+    """Copy every rating into a layout with a different number of shards.
+
+    Run it with the app stopped, then set RATINGS_SHARDS to the new count.
+    Ratings already in the new layout's files (the main database's from
+    before sharding, or an earlier run's) are replaced. The old files are
+    left in place; delete them once the app runs on the new layout.
+    """
+    if source_count is None:
+        source_count = config.RATINGS_SHARDS
+    if target_count < 0 or source_count < 0:
+        raise click.BadParameter('shard counts cannot be negative')
+    if target_count == source_count:
+        raise click.ClickException(f'Ratings already use {source_count} shards')
+
+    sources = _layout(source_count)
+    missing = [path for path in sources if not os.path.exists(path)]
+    if missing:
+        raise click.ClickException(f"No such database: {', '.join(missing)}")
+
+    targets = _layout(target_count)
+    copied = rebalance(sources, targets)
+    for path, count in zip(targets, copied):
+        click.echo(f'{path}: {count} ratings')
+    click.echo(f'Copied {sum(copied)} ratings; set RATINGS_SHARDS={target_count} and restart')
+
+
+def _write(conn: sqlite3.Connection, work):
+    """Run ``work(conn)`` in its own write transaction."""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        result = work(conn)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return result
+
+
+@ratings_cli.command('compact')
+@click.option('--batch-size', type=int, default=1000, show_default=True,
+              help='Ratings copied per transaction.')
+@click.option('--pause', type=float, default=0.05, show_default=True,
+              help='Seconds to wait between batches so writers get the lock.')
+def compact_command(batch_size, pause):
+    """Copy ratings into the compact schema while the current app keeps serving.
+
+    New votes are mirrored into the compact tables as they arrive. The
+    next start of the upgraded app switches over (migration 4) with only
+    what arrived since left to copy. Safe to interrupt and run again.
+    """
+    if batch_size < 1:
+        raise click.BadParameter('batch size must be at least 1')
+
+    paths = _layout(config.RATINGS_SHARDS)
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        raise click.ClickException(f"No such database: {', '.join(missing)}")
+
+    for path in paths:
+        conn = sqlite3.connect(path, timeout=config.DB_WRITE_BUSY_TIMEOUT, isolation_level=None)
+        try:
+            if get_schema_version(conn) >= 4:
+                click.echo(f'{path}: ratings are already compact')
+                continue
+            _write(conn, prepare_compact_ratings)
+            copied = 0
+            while True:
+                batch = _write(conn, partial(backfill_compact_ratings, batch_size=batch_size))
+                if not batch:
+                    break
+                copied += batch
+                time.sleep(pause)
+            click.echo(f'{path}: copied {copied} ratings')
+        finally:
+            conn.close()
+    click.echo('Restart the app to switch to the compact ratings table')
+
+
+def register_commands(app: Flask) -> None:
+    """Register CLI command groups on the application."""
+    app.cli.add_command(db_cli)
+    app.cli.add_command(ratings_cli)
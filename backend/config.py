@@ -4,8 +4,46 @@ Handles environment variables and application settings.
 """
 
 import os
+import secrets
 from dataclasses import dataclass
-from typing import Optional
+from typing import Any, Dict, Optional
+
+# SQLite settings applied to every new connection, by DB_STORAGE_PROFILE.
+# All three keep WAL, which the read-only read path depends on; they differ
+# in how often commits wait for the disk and how much memory SQLite uses.
+# 'durable' is the default: it keeps SQLite's default synchronous=FULL and
+# cache size but switches to WAL with a 5 s busy timeout. 'balanced' and
+# 'throughput' trade durability of the latest commits for faster writes, so
+# they must be chosen explicitly.
+STORAGE_PROFILES: Dict[str, Dict[str, Any]] = {
+    # fsync on every commit: a committed vote survives power loss
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -2000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 5000
+    },
+    # fsync at checkpoints only: power loss may undo the last commits, never corrupts
+    'balanced': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,
+        'mmap_size': 67108864,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000
+    },
+    # Never fsync: an OS crash or power loss may corrupt the database
+    'throughput': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -64000,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000
+    }
+}
 
 
 @dataclass
@@ -18,11 +56,58 @@ class Config:
     # Database
     DATABASE_URL: str = "sqlite:///radio.db"
     DATABASE_PATH: str = "radio.db"
+    DB_POOL_SIZE: int = 5
+    DB_POOL_TIMEOUT: float = 5.0
+    DB_POOL_MAX_AGE: float = 3600.0
+    DB_POOL_HEALTH_CHECK_INTERVAL: float = 30.0
+    DB_WRITE_BATCH_MAX: int = 64
+    DB_WRITE_MAX_DELAY: float = 0.002
+    DB_WRITE_BUSY_TIMEOUT: float = 5.0
+    DB_WRITE_TIMEOUT: float = 10.0
+    DB_READ_POOL_SIZE: int = 10
+    DB_READ_REPLICA_PATH: Optional[str] = None
+    DB_REPLICA_REFRESH_INTERVAL: float = 5.0
+    DB_STORAGE_PROFILE: str = "durable"
+    
+    # Caching
+    RATINGS_CACHE_SIZE: int = 1024
+    RATINGS_CACHE_TTL: float = 5.0
+    RATINGS_ID_CACHE_SIZE: int = 100000
+    
+    # Ratings sharding (0 keeps ratings in the main database)
+    RATINGS_SHARDS: int = 0
+    RATINGS_SHARD_DIR: str = "shards"
+    
+    # API limits
+    RATINGS_BATCH_MAX: int = 50
     
     # Stream Configuration
     STREAM_URL: str = "https://d3d4yli4hf5bmh.cloudfront.net/hls/live.m3u8"
     METADATA_URL: str = "https://d3d4yli4hf5bmh.cloudfront.net/metadatav2.json"
     COVER_ART_URL: str = "https://d3d4yli4hf5bmh.cloudfront.net/cover.jpg"
+    METADATA_CACHE_MIN_TTL: float = 1.0
+    METADATA_CACHE_MAX_TTL: float = 30.0
+    METADATA_CACHE_MAX_STALE: float = 300.0
+    
+    # Upstream HTTP client
+    UPSTREAM_CONNECT_TIMEOUT: float = 3.05
+    UPSTREAM_READ_TIMEOUT: float = 10.0
+    UPSTREAM_RETRIES: int = 2
+    UPSTREAM_RETRY_BACKOFF: float = 0.2
+    UPSTREAM_BREAKER_THRESHOLD: int = 5
+    UPSTREAM_BREAKER_RESET: float = 30.0
+    UPSTREAM_POOL_SIZE: int = 10
+    STREAM_PROBE_INTERVAL: float = 15.0
+    STREAM_PROBE_HISTORY: int = 60
+    
+    # Live updates (Server-Sent Events)
+    EVENTS_POLL_INTERVAL: float = 5.0
+    EVENTS_RATING_DEBOUNCE: float = 1.0
+    EVENTS_KEEPALIVE: float = 15.0
+    EVENTS_MAX_DURATION: float = 600.0
+    EVENTS_MAX_PENDING: int = 32
+    # Per worker, and each open stream holds a thread (see PROJECT.md, Live Updates)
+    EVENTS_MAX_SUBSCRIBERS: int = 256
     
     # Flask Configuration
     SECRET_KEY: str = "dev-secret-key-change-in-production"
@@ -30,27 +115,136 @@ class Config:
     HOST: str = "127.0.0.1"
     PORT: int = 5000
     
+    # Production server (python -m backend.app serve)
+    SERVER_WORKERS: int = 2
+    SERVER_THREADS: int = 8
+    SERVER_GRACEFUL_TIMEOUT: float = 30.0
+    SERVER_BACKLOG: int = 2048
+    
     # Security
     ALLOWED_ORIGINS: list = None
+    ADMIN_TOKEN: Optional[str] = None
     
     # Logging
     LOG_LEVEL: str = "INFO"
     LOG_FILE: str = "logs/radio.log"
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_MAX_FILE_MB: float = 50.0
+    LOG_BACKUP_COUNT: int = 5
+    LOG_RATE_LIMIT: float = 100.0
+    LOG_SAMPLING: dict = None
+    
+    # Tracing
+    TRACE_SAMPLE_RATE: float = 0.0
+    TRACE_DIR: str = "traces"
+    TRACE_MAX_FILE_MB: float = 50.0
+    
+    # Sampling profiler
+    PROFILER_ENABLED: bool = False
+    PROFILER_HZ: int = 99
+    PROFILER_BLUEPRINTS: list = None
+    PROFILER_MAX_STACKS: int = 10000
+    
+    # Memory introspection
+    MEMORY_TRACE_FRAMES: int = 1
+    MEMORY_MAX_SNAPSHOTS: int = 5
+    
+    # Traffic capture
+    CAPTURE_SAMPLE_RATE: float = 0.0
+    CAPTURE_DIR: str = "captures"
+    CAPTURE_MAX_FILE_MB: float = 100.0
+    CAPTURE_SALT: Optional[str] = None
     
     def __post_init__(self):
         """Load configuration from environment variables."""
         self.CLAUDE_API_KEY = os.getenv('CLAUDE_API_KEY')
         self.DATABASE_URL = os.getenv('DATABASE_URL', self.DATABASE_URL)
         self.DATABASE_PATH = os.getenv('DATABASE_PATH', self.DATABASE_PATH)
+        self.DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', self.DB_POOL_SIZE))
+        self.DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', self.DB_POOL_TIMEOUT))
+        self.DB_POOL_MAX_AGE = float(os.getenv('DB_POOL_MAX_AGE', self.DB_POOL_MAX_AGE))
+        self.DB_POOL_HEALTH_CHECK_INTERVAL = float(
+            os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', self.DB_POOL_HEALTH_CHECK_INTERVAL)
+        )
+        self.DB_WRITE_BATCH_MAX = int(os.getenv('DB_WRITE_BATCH_MAX', self.DB_WRITE_BATCH_MAX))
+        self.DB_WRITE_MAX_DELAY = float(os.getenv('DB_WRITE_MAX_DELAY', self.DB_WRITE_MAX_DELAY))
+        self.DB_WRITE_BUSY_TIMEOUT = float(os.getenv('DB_WRITE_BUSY_TIMEOUT', self.DB_WRITE_BUSY_TIMEOUT))
+        self.DB_WRITE_TIMEOUT = float(os.getenv('DB_WRITE_TIMEOUT', self.DB_WRITE_TIMEOUT))
+        self.DB_READ_POOL_SIZE = int(os.getenv('DB_READ_POOL_SIZE', self.DB_READ_POOL_SIZE))
+        self.DB_READ_REPLICA_PATH = os.getenv('DB_READ_REPLICA_PATH', self.DB_READ_REPLICA_PATH) or None
+        self.DB_REPLICA_REFRESH_INTERVAL = float(
+            os.getenv('DB_REPLICA_REFRESH_INTERVAL', self.DB_REPLICA_REFRESH_INTERVAL)
+        )
+        self.DB_STORAGE_PROFILE = os.getenv('DB_STORAGE_PROFILE', self.DB_STORAGE_PROFILE).lower()
+        if self.DB_STORAGE_PROFILE not in STORAGE_PROFILES:
+            raise ValueError(f"DB_STORAGE_PROFILE must be one of {', '.join(STORAGE_PROFILES)}")
+        self.RATINGS_CACHE_SIZE = int(os.getenv('RATINGS_CACHE_SIZE', self.RATINGS_CACHE_SIZE))
+        self.RATINGS_CACHE_TTL = float(os.getenv('RATINGS_CACHE_TTL', self.RATINGS_CACHE_TTL))
+        self.RATINGS_ID_CACHE_SIZE = int(os.getenv('RATINGS_ID_CACHE_SIZE', self.RATINGS_ID_CACHE_SIZE))
+        self.RATINGS_SHARDS = int(os.getenv('RATINGS_SHARDS', self.RATINGS_SHARDS))
+        self.RATINGS_SHARD_DIR = os.getenv('RATINGS_SHARD_DIR', self.RATINGS_SHARD_DIR)
+        self.RATINGS_BATCH_MAX = int(os.getenv('RATINGS_BATCH_MAX', self.RATINGS_BATCH_MAX))
         self.STREAM_URL = os.getenv('STREAM_URL', self.STREAM_URL)
         self.METADATA_URL = os.getenv('METADATA_URL', self.METADATA_URL)
         self.COVER_ART_URL = os.getenv('COVER_ART_URL', self.COVER_ART_URL)
+        self.METADATA_CACHE_MIN_TTL = float(os.getenv('METADATA_CACHE_MIN_TTL', self.METADATA_CACHE_MIN_TTL))
+        self.METADATA_CACHE_MAX_TTL = float(os.getenv('METADATA_CACHE_MAX_TTL', self.METADATA_CACHE_MAX_TTL))
+        self.METADATA_CACHE_MAX_STALE = float(
+            os.getenv('METADATA_CACHE_MAX_STALE', self.METADATA_CACHE_MAX_STALE)
+        )
+        self.UPSTREAM_CONNECT_TIMEOUT = float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', self.UPSTREAM_CONNECT_TIMEOUT))
+        self.UPSTREAM_READ_TIMEOUT = float(os.getenv('UPSTREAM_READ_TIMEOUT', self.UPSTREAM_READ_TIMEOUT))
+        self.UPSTREAM_RETRIES = int(os.getenv('UPSTREAM_RETRIES', self.UPSTREAM_RETRIES))
+        self.UPSTREAM_RETRY_BACKOFF = float(os.getenv('UPSTREAM_RETRY_BACKOFF', self.UPSTREAM_RETRY_BACKOFF))
+        self.UPSTREAM_BREAKER_THRESHOLD = int(
+            os.getenv('UPSTREAM_BREAKER_THRESHOLD', self.UPSTREAM_BREAKER_THRESHOLD)
+        )
+        self.UPSTREAM_BREAKER_RESET = float(os.getenv('UPSTREAM_BREAKER_RESET', self.UPSTREAM_BREAKER_RESET))
+        self.UPSTREAM_POOL_SIZE = int(os.getenv('UPSTREAM_POOL_SIZE', self.UPSTREAM_POOL_SIZE))
+        self.STREAM_PROBE_INTERVAL = float(os.getenv('STREAM_PROBE_INTERVAL', self.STREAM_PROBE_INTERVAL))
+        self.STREAM_PROBE_HISTORY = int(os.getenv('STREAM_PROBE_HISTORY', self.STREAM_PROBE_HISTORY))
+        self.EVENTS_POLL_INTERVAL = float(os.getenv('EVENTS_POLL_INTERVAL', self.EVENTS_POLL_INTERVAL))
+        self.EVENTS_RATING_DEBOUNCE = float(os.getenv('EVENTS_RATING_DEBOUNCE', self.EVENTS_RATING_DEBOUNCE))
+        self.EVENTS_KEEPALIVE = float(os.getenv('EVENTS_KEEPALIVE', self.EVENTS_KEEPALIVE))
+        self.EVENTS_MAX_DURATION = float(os.getenv('EVENTS_MAX_DURATION', self.EVENTS_MAX_DURATION))
+        self.EVENTS_MAX_PENDING = int(os.getenv('EVENTS_MAX_PENDING', self.EVENTS_MAX_PENDING))
+        self.EVENTS_MAX_SUBSCRIBERS = int(os.getenv('EVENTS_MAX_SUBSCRIBERS', self.EVENTS_MAX_SUBSCRIBERS))
         self.SECRET_KEY = os.getenv('FLASK_SECRET_KEY', self.SECRET_KEY)
         self.DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
         self.HOST = os.getenv('FLASK_HOST', self.HOST)
         self.PORT = int(os.getenv('FLASK_PORT', self.PORT))
+        self.SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', self.SERVER_WORKERS))
+        self.SERVER_THREADS = int(os.getenv('SERVER_THREADS', self.SERVER_THREADS))
+        self.SERVER_GRACEFUL_TIMEOUT = float(os.getenv('SERVER_GRACEFUL_TIMEOUT', self.SERVER_GRACEFUL_TIMEOUT))
+        self.SERVER_BACKLOG = int(os.getenv('SERVER_BACKLOG', self.SERVER_BACKLOG))
         self.LOG_LEVEL = os.getenv('LOG_LEVEL', self.LOG_LEVEL)
         self.LOG_FILE = os.getenv('LOG_FILE', self.LOG_FILE)
+        self.LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', self.LOG_QUEUE_SIZE))
+        self.LOG_MAX_FILE_MB = float(os.getenv('LOG_MAX_FILE_MB', self.LOG_MAX_FILE_MB))
+        self.LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', self.LOG_BACKUP_COUNT))
+        self.LOG_RATE_LIMIT = float(os.getenv('LOG_RATE_LIMIT', self.LOG_RATE_LIMIT))
+        self.TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', self.TRACE_SAMPLE_RATE))
+        self.TRACE_DIR = os.getenv('TRACE_DIR', self.TRACE_DIR)
+        self.TRACE_MAX_FILE_MB = float(os.getenv('TRACE_MAX_FILE_MB', self.TRACE_MAX_FILE_MB))
+        self.ADMIN_TOKEN = os.getenv('ADMIN_TOKEN') or None
+        self.PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', 'False').lower() == 'true'
+        self.PROFILER_HZ = int(os.getenv('PROFILER_HZ', self.PROFILER_HZ))
+        self.PROFILER_MAX_STACKS = int(os.getenv('PROFILER_MAX_STACKS', self.PROFILER_MAX_STACKS))
+        self.MEMORY_TRACE_FRAMES = int(os.getenv('MEMORY_TRACE_FRAMES', self.MEMORY_TRACE_FRAMES))
+        self.MEMORY_MAX_SNAPSHOTS = int(os.getenv('MEMORY_MAX_SNAPSHOTS', self.MEMORY_MAX_SNAPSHOTS))
+        self.CAPTURE_SAMPLE_RATE = float(os.getenv('CAPTURE_SAMPLE_RATE', self.CAPTURE_SAMPLE_RATE))
+        self.CAPTURE_DIR = os.getenv('CAPTURE_DIR', self.CAPTURE_DIR)
+        self.CAPTURE_MAX_FILE_MB = float(os.getenv('CAPTURE_MAX_FILE_MB', self.CAPTURE_MAX_FILE_MB))
+        # Without a configured salt anonymized ids only match within one server run
+        self.CAPTURE_SALT = os.getenv('CAPTURE_SALT') or secrets.token_hex(16)
+        # e.g. "backend.models.rating=0.1,backend.api=0.5"
+        sampling_str = os.getenv('LOG_SAMPLING', '')
+        self.LOG_SAMPLING = {
+            name.strip(): float(fraction)
+            for name, _, fraction in (item.partition('=') for item in sampling_str.split(',') if item.strip())
+        }
+        blueprints_str = os.getenv('PROFILER_BLUEPRINTS', '')
+        self.PROFILER_BLUEPRINTS = [name.strip() for name in blueprints_str.split(',') if name.strip()]
         
         # Parse allowed origins
         origins_str = os.getenv('ALLOWED_ORIGINS', 'http://localhost:5000,http://127.0.0.1:5000')
@@ -1,8 +1,15 @@
 """Database models for Radio Calico application."""
 
-from .database import get_db_connection, init_db
+from .database import (
+    get_db_connection, get_read_connection, init_db, close_pool, get_pool_stats, get_writer_stats,
+    get_replica_stats, get_storage_stats
+)
 from .user import User
 from .post import Post
 from .rating import Rating
 
-__all__ = ['get_db_connection', 'init_db', 'User', 'Post', 'Rating']
\ No newline at end of file
+__all__ = [
+    'get_db_connection', 'get_read_connection', 'init_db', 'close_pool', 'get_pool_stats',
+    'get_writer_stats', 'get_replica_stats', 'get_storage_stats',
+    'User', 'Post', 'Rating'
+]
\ No newline at end of file
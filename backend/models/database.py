@@ -2,79 +2,215 @@
 
 import sqlite3
 import logging
-from typing import Optional
-from ..config import config
+import threading
+from typing import Optional, Dict, Any
+from ..config import STORAGE_PROFILES, config
+from ..utils.metrics import sql_operation
+from ..utils.tracing import span
+from .pool import ConnectionPool, PooledConnection
+from .migrations import apply_migrations
+from .replica import ReplicaRefresher
+from .shards import close_shards
+from .writer import GroupCommitWriter, WriteJob
 
 logger = logging.getLogger(__name__)
 
+_pool: Optional[ConnectionPool] = None
+_read_pool: Optional[ConnectionPool] = None
+_replica: Optional[ReplicaRefresher] = None
+_pool_lock = threading.Lock()
+_writer: Optional[GroupCommitWriter] = None
+_writer_lock = threading.Lock()
 
-def get_db_connection() -> sqlite3.Connection:
-    """Get database connection with proper configuration."""
+
+def get_pool() -> ConnectionPool:
+    """Get the process-wide connection pool, creating it on first use.
+
+    The pool is rebuilt if ``config.DATABASE_PATH`` or
+    ``config.DB_STORAGE_PROFILE`` has changed since it was created.
+    """
+    global _pool
+    
+    with _pool_lock:
+        pragmas = STORAGE_PROFILES[config.DB_STORAGE_PROFILE]
+        if _pool is None or _pool.database != config.DATABASE_PATH or _pool.pragmas != pragmas:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(
+                config.DATABASE_PATH,
+                size=config.DB_POOL_SIZE,
+                timeout=config.DB_POOL_TIMEOUT,
+                max_age=config.DB_POOL_MAX_AGE,
+                health_check_interval=config.DB_POOL_HEALTH_CHECK_INTERVAL,
+                pragmas=pragmas
+            )
+        return _pool
+
+
+def get_read_pool() -> ConnectionPool:
+    """Get the process-wide read-only pool, creating it on first use.
+    
+    It reads ``config.DB_READ_REPLICA_PATH`` when set, copying the
+    primary there first and refreshing it in the background, and
+    ``config.DATABASE_PATH`` otherwise.
+    """
+    global _read_pool, _replica
+    
+    with _pool_lock:
+        replica_path = config.DB_READ_REPLICA_PATH
+        path = replica_path or config.DATABASE_PATH
+        pragmas = STORAGE_PROFILES[config.DB_STORAGE_PROFILE]
+        if _read_pool is None or _read_pool.database != path or _read_pool.pragmas != pragmas:
+            if _read_pool is not None:
+                _read_pool.close()
+            if _replica is not None:
+                _replica.stop()
+                _replica = None
+            if replica_path:
+                _replica = ReplicaRefresher(config.DATABASE_PATH, replica_path, config.DB_REPLICA_REFRESH_INTERVAL)
+                _replica.refresh()
+            _read_pool = ConnectionPool(
+                path,
+                size=config.DB_READ_POOL_SIZE,
+                timeout=config.DB_POOL_TIMEOUT,
+                max_age=config.DB_POOL_MAX_AGE,
+                health_check_interval=config.DB_POOL_HEALTH_CHECK_INTERVAL,
+                read_only=True,
+                pragmas=pragmas
+            )
+        if _replica is not None:
+            _replica.start()
+        return _read_pool
+
+
+def get_replica_stats() -> Optional[Dict[str, Any]]:
+    """Get refresh statistics for the read replica, or None if reads use the primary."""
+    return _replica.stats() if _replica is not None else None
+
+
+def get_writer() -> GroupCommitWriter:
+    """Get the process-wide group-commit writer, creating it on first use."""
+    global _writer
+    
+    with _writer_lock:
+        if _writer is None:
+            _writer = GroupCommitWriter(
+                # Looked up per batch so the writer follows the current pool
+                lambda: get_db_connection(),
+                batch_max=config.DB_WRITE_BATCH_MAX,
+                max_delay=config.DB_WRITE_MAX_DELAY,
+                busy_timeout=config.DB_WRITE_BUSY_TIMEOUT,
+                timeout=config.DB_WRITE_TIMEOUT
+            )
+        return _writer
+
+
+def run_write(job: WriteJob) -> Any:
+    """Run ``job(conn)`` in the writer's next group commit and return its result."""
+    return get_writer().submit(job)
+
+
+def get_writer_stats() -> Dict[str, Any]:
+    """Get batch and retry statistics for the group-commit writer."""
+    return get_writer().stats()
+
+
+def close_pool() -> None:
+    """Commit queued writes, then close the connection pools and all idle connections."""
+    global _pool, _read_pool, _replica
+    
+    if _writer is not None:
+        _writer.stop()
+    close_shards()
+    
+    with _pool_lock:
+        if _replica is not None:
+            _replica.stop()
+            _replica = None
+        if _read_pool is not None:
+            _read_pool.close()
+            _read_pool = None
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Get statistics for the active connection pool."""
+    return get_pool().stats()
+
+
+def get_storage_stats() -> Dict[str, Any]:
+    """The active storage profile and the settings a primary connection reports."""
+    stats: Dict[str, Any] = {'profile': config.DB_STORAGE_PROFILE}
     try:
-        conn = sqlite3.connect(config.DATABASE_PATH)
-        conn.row_factory = sqlite3.Row
-        return conn
+        conn = get_db_connection()
+        try:
+            for name in STORAGE_PROFILES[config.DB_STORAGE_PROFILE]:
+                stats[name] = conn.execute(f'PRAGMA {name}').fetchone()[0]
+        finally:
+            conn.close()
     except sqlite3.Error as e:
-        logger.error(f"Database connection error: {e}")
+        logger.warning("Could not read storage settings: %s", e)
+    return stats
+
+
+def check_database() -> bool:
+    """Return True if a pooled connection can run a trivial query."""
+    try:
+        conn = get_db_connection()
+        try:
+            conn.execute('SELECT 1').fetchone()
+        finally:
+            conn.close()
+        return True
+    except sqlite3.Error as e:
+        logger.error("Database health check failed: %s", e)
+        return False
+
+
+def get_db_connection() -> PooledConnection:
+    """Check out a pooled database connection.
+    
+    Calling ``close()`` on the returned connection returns it to the pool.
+    """
+    try:
+        with span('acquire connection', 'db'):
+            return get_pool().acquire()
+    except sqlite3.Error as e:
+        logger.error("Database connection error: %s", e)
+        raise
+
+
+def get_read_connection() -> PooledConnection:
+    """Check out a read-only pooled connection for queries that never write.
+    
+    Calling ``close()`` on the returned connection returns it to the pool.
+    """
+    if config.DATABASE_PATH == ':memory:':
+        # A second pool would open a different in-memory database
+        return get_db_connection()
+    try:
+        with span('acquire read connection', 'db'):
+            return get_read_pool().acquire()
+    except sqlite3.Error as e:
+        logger.error("Database connection error: %s", e)
         raise
 
 
 def init_db() -> None:
     """Initialize the database with all required tables."""
     conn = get_db_connection()
-    cursor = conn.cursor()
     
     try:
-        # Create users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create posts table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS posts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                content TEXT,
-                user_id INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Create ratings table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ratings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                track_id TEXT NOT NULL,
-                rating TEXT CHECK(rating IN ('up', 'down')) NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                user_fingerprint TEXT NOT NULL,
-                UNIQUE(track_id, user_fingerprint)
-            )
-        ''')
-        
-        # Create index for faster rating queries
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_ratings_track_id 
-            ON ratings(track_id)
-        ''')
+        applied = apply_migrations(conn)
         
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_ratings_fingerprint 
-            ON ratings(user_fingerprint)
-        ''')
-        
-        conn.commit()
+        if applied:
+            logger.info("Applied schema migrations: %s", applied)
         logger.info("Database initialized successfully")
         
     except sqlite3.Error as e:
-        logger.error(f"Database initialization error: {e}")
+        logger.error("Database initialization error: %s", e)
         conn.rollback()
         raise
     finally:
@@ -82,24 +218,31 @@ def init_db() -> None:
 
 
 def execute_query(query: str, params: tuple = (), fetch_one: bool = False, fetch_all: bool = False):
-    """Execute a database query with proper error handling."""
-    conn = get_db_connection()
+    """Execute a database query with proper error handling.
+    
+    INSERT, UPDATE and DELETE statements without results to fetch go
+    through the group-commit writer and return ``lastrowid``; everything
+    else runs on a read-only connection.
+    """
+    if not (fetch_one or fetch_all) and sql_operation(query) in ('insert', 'update', 'delete'):
+        try:
+            return run_write(lambda conn: conn.execute(query, params).lastrowid)
+        except sqlite3.Error as e:
+            logger.error("Query execution error: %s", e)
+            raise
+    
+    conn = get_read_connection()
     try:
         cursor = conn.execute(query, params)
         
         if fetch_one:
-            result = cursor.fetchone()
-        elif fetch_all:
-            result = cursor.fetchall()
-        else:
-            result = cursor.lastrowid
-            
-        conn.commit()
-        return result
+            return cursor.fetchone()
+        if fetch_all:
+            return cursor.fetchall()
+        return cursor.lastrowid
         
     except sqlite3.Error as e:
-        logger.error(f"Query execution error: {e}")
-        conn.rollback()
+        logger.error("Query execution error: %s", e)
         raise
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
@@ -0,0 +1,418 @@
+"""Versioned schema migrations for Radio Calico.
+
+Each migration runs once, in order, inside its own transaction; the
+highest applied version is recorded in the ``schema_version`` table.
+Add new migrations to the end of ``MIGRATIONS`` and never edit one that
+has already shipped.
+"""
+
+import sqlite3
+import logging
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Migration:
+    """A single schema change."""
+
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Connection], None]
+
+
+def rebuild_track_rating_counts(conn: sqlite3.Connection) -> int:
+    """Recompute track_rating_counts from the ratings table.
+
+    Runs on the caller's connection and transaction; returns the number
+    of tracks written.
+    """
+    conn.execute('DELETE FROM track_rating_counts')
+    cursor = conn.execute('''
+        INSERT INTO track_rating_counts (track_id, up_count, down_count)
+        SELECT tracks.key, SUM(ratings.rating = 1), SUM(ratings.rating = -1)
+        FROM ratings
+        JOIN tracks ON tracks.id = ratings.track_id
+        GROUP BY ratings.track_id
+    ''')
+    return cursor.rowcount
+
+
+def insert_ratings(conn: sqlite3.Connection, rows: Iterable[Tuple[str, str, int, int]],
+                   keep_newer: bool = False) -> int:
+    """Insert ``(track key, fingerprint, rating, rated_at)`` rows into the ratings table.
+
+    Keys and fingerprints are interned as needed. A rating that already
+    exists is kept, or with ``keep_newer`` replaced when the new one is
+    more recent. Runs on the caller's transaction; returns the number of
+    ratings written.
+    """
+    rows = list(rows)
+    conn.executemany('INSERT OR IGNORE INTO tracks (key) VALUES (?)', ((row[0],) for row in rows))
+    conn.executemany('INSERT OR IGNORE INTO listeners (fingerprint) VALUES (?)', ((row[1],) for row in rows))
+    conflict = (
+        'DO UPDATE SET rating = excluded.rating, rated_at = excluded.rated_at '
+        'WHERE excluded.rated_at > ratings.rated_at'
+    ) if keep_newer else 'DO NOTHING'
+    cursor = conn.executemany(f'''
+        INSERT INTO ratings (track_id, listener_id, rating, rated_at)
+        SELECT tracks.id, listeners.id, ?, ?
+        FROM tracks, listeners
+        WHERE tracks.key = ? AND listeners.fingerprint = ?
+        ON CONFLICT(track_id, listener_id) {conflict}
+    ''', ((rating, rated_at, key, fingerprint) for key, fingerprint, rating, rated_at in rows))
+    return cursor.rowcount
+
+
+def _initial_schema(conn: sqlite3.Connection) -> None:
+    """Users, posts and ratings tables.
+
+    Uses IF NOT EXISTS so databases created before migrations existed are
+    adopted as version 1 unchanged.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            content TEXT,
+            user_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ratings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            track_id TEXT NOT NULL,
+            rating TEXT CHECK(rating IN ('up', 'down')) NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_fingerprint TEXT NOT NULL,
+            UNIQUE(track_id, user_fingerprint)
+        )
+    ''')
+
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_ratings_track_id ON ratings(track_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_ratings_fingerprint ON ratings(user_fingerprint)')
+
+
+def _track_rating_counts(conn: sqlite3.Connection) -> None:
+    """Per-track vote counters kept in step with ratings by triggers."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS track_rating_counts (
+            track_id TEXT PRIMARY KEY,
+            up_count INTEGER NOT NULL DEFAULT 0,
+            down_count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_ratings_counts_insert
+        AFTER INSERT ON ratings
+        BEGIN
+            INSERT INTO track_rating_counts (track_id, up_count, down_count)
+            VALUES (NEW.track_id, NEW.rating = 'up', NEW.rating = 'down')
+            ON CONFLICT(track_id) DO UPDATE SET
+                up_count = up_count + excluded.up_count,
+                down_count = down_count + excluded.down_count;
+        END
+    ''')
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_ratings_counts_delete
+        AFTER DELETE ON ratings
+        BEGIN
+            UPDATE track_rating_counts SET
+                up_count = up_count - (OLD.rating = 'up'),
+                down_count = down_count - (OLD.rating = 'down')
+            WHERE track_id = OLD.track_id;
+        END
+    ''')
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_ratings_counts_update
+        AFTER UPDATE OF track_id, rating ON ratings
+        BEGIN
+            UPDATE track_rating_counts SET
+                up_count = up_count - (OLD.rating = 'up'),
+                down_count = down_count - (OLD.rating = 'down')
+            WHERE track_id = OLD.track_id;
+            INSERT INTO track_rating_counts (track_id, up_count, down_count)
+            VALUES (NEW.track_id, NEW.rating = 'up', NEW.rating = 'down')
+            ON CONFLICT(track_id) DO UPDATE SET
+                up_count = up_count + excluded.up_count,
+                down_count = down_count + excluded.down_count;
+        END
+    ''')
+
+    # Backfill counters for databases that already hold ratings
+    conn.execute('DELETE FROM track_rating_counts')
+    conn.execute('''
+        INSERT INTO track_rating_counts (track_id, up_count, down_count)
+        SELECT track_id, SUM(rating = 'up'), SUM(rating = 'down')
+        FROM ratings
+        GROUP BY track_id
+    ''')
+
+
+def _covering_indexes(conn: sqlite3.Connection) -> None:
+    """Indexes that let every model query seek and return rows in order."""
+    # UNIQUE(track_id, user_fingerprint) already serves track_id lookups
+    conn.execute('DROP INDEX IF EXISTS idx_ratings_track_id')
+    # Superseded by the covering (user_fingerprint, timestamp, ...) index
+    conn.execute('DROP INDEX IF EXISTS idx_ratings_fingerprint')
+
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_ratings_fingerprint_timestamp
+        ON ratings(user_fingerprint, timestamp, track_id, rating)
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_posts_user_created ON posts(user_id, created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_posts_created ON posts(created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_created ON users(created_at)')
+
+
+def _epoch(column: str) -> str:
+    """SQL for a text timestamp of the old ratings table in Unix epoch seconds."""
+    return f"COALESCE(CAST(strftime('%s', {column}) AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER))"
+
+
+def _compact_tables(conn: sqlite3.Connection) -> None:
+    """Id tables and the compact ratings table, named ratings_v2 until the switch."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tracks (
+            id INTEGER PRIMARY KEY,
+            key TEXT UNIQUE NOT NULL
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS listeners (
+            id INTEGER PRIMARY KEY,
+            fingerprint TEXT UNIQUE NOT NULL
+        )
+    ''')
+
+    # rating is 1 (up) or -1 (down); rated_at is Unix epoch seconds
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ratings_v2 (
+            track_id INTEGER NOT NULL REFERENCES tracks (id),
+            listener_id INTEGER NOT NULL REFERENCES listeners (id),
+            rating INTEGER CHECK(rating IN (1, -1)) NOT NULL,
+            rated_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+            PRIMARY KEY (track_id, listener_id)
+        ) WITHOUT ROWID
+    ''')
+
+    # The primary key is part of every index entry, so this also covers track_id
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_ratings_listener_rated_at
+        ON ratings_v2(listener_id, rated_at, rating)
+    ''')
+
+    # Highest old ratings id copied by backfill_compact_ratings
+    conn.execute('CREATE TABLE IF NOT EXISTS ratings_v2_backfill (last_id INTEGER NOT NULL)')
+    conn.execute('''
+        INSERT INTO ratings_v2_backfill (last_id)
+        SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM ratings_v2_backfill)
+    ''')
+
+
+def _copy_to_compact(conn: sqlite3.Connection, after_id: int, last_id: Optional[int] = None) -> int:
+    """Copy old ratings with ``after_id < id <= last_id`` into ratings_v2, keeping rows already there."""
+    bounds = 'ratings.id > ? AND ratings.id <= ?' if last_id is not None else 'ratings.id > ?'
+    params = (after_id, last_id) if last_id is not None else (after_id,)
+    conn.execute(f'INSERT OR IGNORE INTO tracks (key) SELECT track_id FROM ratings WHERE {bounds}', params)
+    conn.execute(
+        f'INSERT OR IGNORE INTO listeners (fingerprint) SELECT user_fingerprint FROM ratings WHERE {bounds}',
+        params
+    )
+    cursor = conn.execute(f'''
+        INSERT INTO ratings_v2 (track_id, listener_id, rating, rated_at)
+        SELECT tracks.id, listeners.id, CASE ratings.rating WHEN 'up' THEN 1 ELSE -1 END,
+               {_epoch('ratings.timestamp')}
+        FROM ratings
+        JOIN tracks ON tracks.key = ratings.track_id
+        JOIN listeners ON listeners.fingerprint = ratings.user_fingerprint
+        WHERE {bounds}
+        ON CONFLICT(track_id, listener_id) DO NOTHING
+    ''', params)
+    return cursor.rowcount
+
+
+def prepare_compact_ratings(conn: sqlite3.Connection) -> None:
+    """Start migrating to the compact ratings table while the old one stays in use.
+
+    Creates the new tables and triggers that mirror every later change to
+    the old table into them; ``backfill_compact_ratings`` then copies the
+    existing rows. Runs on the caller's transaction and may be repeated.
+    """
+    _compact_tables(conn)
+
+    intern = f'''
+            INSERT INTO tracks (key) VALUES (NEW.track_id) ON CONFLICT(key) DO NOTHING;
+            INSERT INTO listeners (fingerprint) VALUES (NEW.user_fingerprint) ON CONFLICT(fingerprint) DO NOTHING;
+            INSERT INTO ratings_v2 (track_id, listener_id, rating, rated_at)
+            SELECT tracks.id, listeners.id, CASE NEW.rating WHEN 'up' THEN 1 ELSE -1 END, {_epoch('NEW.timestamp')}
+            FROM tracks, listeners
+            WHERE tracks.key = NEW.track_id AND listeners.fingerprint = NEW.user_fingerprint
+            ON CONFLICT(track_id, listener_id) DO UPDATE SET
+                rating = excluded.rating,
+                rated_at = excluded.rated_at;
+    '''
+    remove = '''
+            DELETE FROM ratings_v2
+            WHERE track_id = (SELECT id FROM tracks WHERE key = OLD.track_id)
+            AND listener_id = (SELECT id FROM listeners WHERE fingerprint = OLD.user_fingerprint);
+    '''
+    conn.execute(f'CREATE TRIGGER IF NOT EXISTS trg_ratings_v2_insert AFTER INSERT ON ratings BEGIN {intern} END')
+    conn.execute(f'CREATE TRIGGER IF NOT EXISTS trg_ratings_v2_delete AFTER DELETE ON ratings BEGIN {remove} END')
+    conn.execute(
+        f'CREATE TRIGGER IF NOT EXISTS trg_ratings_v2_update AFTER UPDATE ON ratings BEGIN {remove} {intern} END'
+    )
+
+
+def backfill_compact_ratings(conn: sqlite3.Connection, batch_size: int = 1000) -> int:
+    """Copy the next ``batch_size`` old ratings into the compact table.
+
+    Call after ``prepare_compact_ratings``, one transaction per batch so
+    writers wait at most one batch. Returns the number of old rows
+    covered, 0 once every row has been copied.
+    """
+    after_id = conn.execute('SELECT last_id FROM ratings_v2_backfill').fetchone()[0]
+    row = conn.execute('''
+        SELECT COUNT(*), MAX(id) FROM (
+            SELECT id FROM ratings WHERE id > ? ORDER BY id LIMIT ?
+        )
+    ''', (after_id, batch_size)).fetchone()
+    if not row[0]:
+        return 0
+
+    _copy_to_compact(conn, after_id, row[1])
+    conn.execute('UPDATE ratings_v2_backfill SET last_id = ?', (row[1],))
+    return row[0]
+
+
+def _compact_ratings(conn: sqlite3.Connection) -> None:
+    """Switch ratings to the compact table keyed by interned ids.
+
+    Whatever ``backfill_compact_ratings`` has not copied yet (everything,
+    if the online migration was never started) is copied here.
+    """
+    _compact_tables(conn)
+    after_id = conn.execute('SELECT last_id FROM ratings_v2_backfill').fetchone()[0]
+    _copy_to_compact(conn, after_id)
+
+    # Dropping the old table also drops its indexes and remaining triggers
+    conn.execute('DROP TABLE ratings')
+    conn.execute('DROP TABLE ratings_v2_backfill')
+    conn.execute('ALTER TABLE ratings_v2 RENAME TO ratings')
+
+    # Vote counters stay keyed by track key, so reading them needs no id lookup
+    conn.execute('''
+        CREATE TRIGGER trg_ratings_counts_insert
+        AFTER INSERT ON ratings
+        BEGIN
+            INSERT INTO track_rating_counts (track_id, up_count, down_count)
+            SELECT key, NEW.rating = 1, NEW.rating = -1 FROM tracks WHERE id = NEW.track_id
+            ON CONFLICT(track_id) DO UPDATE SET
+                up_count = up_count + excluded.up_count,
+                down_count = down_count + excluded.down_count;
+        END
+    ''')
+
+    conn.execute('''
+        CREATE TRIGGER trg_ratings_counts_delete
+        AFTER DELETE ON ratings
+        BEGIN
+            UPDATE track_rating_counts SET
+                up_count = up_count - (OLD.rating = 1),
+                down_count = down_count - (OLD.rating = -1)
+            WHERE track_id = (SELECT key FROM tracks WHERE id = OLD.track_id);
+        END
+    ''')
+
+    conn.execute('''
+        CREATE TRIGGER trg_ratings_counts_update
+        AFTER UPDATE OF track_id, rating ON ratings
+        BEGIN
+            UPDATE track_rating_counts SET
+                up_count = up_count - (OLD.rating = 1),
+                down_count = down_count - (OLD.rating = -1)
+            WHERE track_id = (SELECT key FROM tracks WHERE id = OLD.track_id);
+            INSERT INTO track_rating_counts (track_id, up_count, down_count)
+            SELECT key, NEW.rating = 1, NEW.rating = -1 FROM tracks WHERE id = NEW.track_id
+            ON CONFLICT(track_id) DO UPDATE SET
+                up_count = up_count + excluded.up_count,
+                down_count = down_count + excluded.down_count;
+        END
+    ''')
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'initial schema', _initial_schema),
+    Migration(2, 'track rating counters', _track_rating_counts),
+    Migration(3, 'covering indexes for model queries', _covering_indexes),
+    Migration(4, 'compact ratings with interned ids', _compact_ratings),
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Return the highest applied migration version, or 0."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def apply_migrations(conn: sqlite3.Connection) -> List[int]:
+    """Apply every pending migration; returns the versions applied.
+
+    Each migration and its schema_version row commit together, so a
+    failed migration leaves the database at the previous version.
+    """
+    applied = []
+    current = get_schema_version(conn)
+    conn.commit()
+
+    for migration in MIGRATIONS:
+        if migration.version <= current:
+            continue
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Re-check under the write lock in case another process migrated
+            if get_schema_version(conn) >= migration.version:
+                conn.rollback()
+                continue
+
+            migration.apply(conn)
+            conn.execute(
+                'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                (migration.version, migration.description)
+            )
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            logger.error("Migration %s (%s) failed", migration.version, migration.description)
+            raise
+
+        applied.append(migration.version)
+        logger.info("Applied migration %s: %s", migration.version, migration.description)
+
+    return applied
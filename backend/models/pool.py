@@ -0,0 +1,253 @@
+"""SQLite connection pooling for Radio Calico."""
+
+import sqlite3
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from ..utils.metrics import observe_query, sql_operation
+from ..utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Raised when no pooled connection becomes available in time."""
+
+
+class PooledConnection:
+    """Checked-out pool connection.
+
+    Behaves like the underlying ``sqlite3.Connection`` except that
+    ``close()`` hands the connection back to its pool instead of closing it.
+    """
+
+    def __init__(self, pool: 'ConnectionPool', conn: sqlite3.Connection, created_at: float):
+        self._pool = pool
+        self._conn = conn
+        self._created_at = created_at
+        self._released = False
+
+    @property
+    def raw(self) -> sqlite3.Connection:
+        """The underlying sqlite3 connection."""
+        return self._conn
+
+    def execute(self, sql: str, parameters: Any = ()) -> sqlite3.Cursor:
+        """Execute a statement, recording its count and duration."""
+        started = time.perf_counter()
+        try:
+            with span(sql_operation(sql), 'db', sql=sql):
+                return self.__getattr__('execute')(sql, parameters)
+        finally:
+            observe_query(sql, time.perf_counter() - started)
+
+    def executemany(self, sql: str, seq_of_parameters: Iterable[Any]) -> sqlite3.Cursor:
+        """Execute a statement for each parameter set, recording the total duration."""
+        started = time.perf_counter()
+        try:
+            with span(sql_operation(sql), 'db', sql=sql, many=True):
+                return self.__getattr__('executemany')(sql, seq_of_parameters)
+        finally:
+            observe_query(sql, time.perf_counter() - started)
+
+    def close(self) -> None:
+        """Return the connection to the pool."""
+        if not self._released:
+            self._released = True
+            self._pool.release(self)
+
+    def __getattr__(self, name: str) -> Any:
+        if self._released:
+            raise sqlite3.ProgrammingError('Cannot operate on a released pooled connection.')
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._conn, name, value)
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of long-lived SQLite connections.
+
+    Connections are created lazily up to ``size``. A checkout waits up to
+    ``timeout`` seconds for a free connection before raising
+    ``PoolTimeoutError``. Connections older than ``max_age`` seconds are
+    recycled on checkout, and connections idle for longer than
+    ``health_check_interval`` seconds are pinged before being handed out.
+
+    ``:memory:`` databases are opened as a named shared-cache database so
+    that every connection in the pool sees the same data; an extra anchor
+    connection keeps it alive while connections are recycled.
+
+    A ``read_only`` pool opens files with ``mode=ro`` and sets
+    ``PRAGMA query_only``, so its connections can never take the write lock.
+
+    ``pragmas`` (e.g. a ``STORAGE_PROFILES`` entry) are set on every new
+    connection; read-only connections skip ``journal_mode``, which they
+    cannot change.
+    """
+
+    def __init__(self, database: str, size: int = 5, timeout: float = 5.0,
+                 max_age: float = 3600.0, health_check_interval: float = 30.0, read_only: bool = False,
+                 pragmas: Optional[Dict[str, Any]] = None):
+        self.database = database
+        self.read_only = read_only
+        self.pragmas = dict(pragmas or {})
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.max_age = max_age
+        self.health_check_interval = health_check_interval
+        # Tells this pool's database apart from any earlier one at the same path
+        self.instance_id = uuid.uuid4().hex
+
+        self._lock = threading.Condition()
+        self._idle = deque()  # (conn, created_at, last_used)
+        self._open = 0
+        self._closed = False
+        self._stats = {'created': 0, 'recycled': 0, 'checkouts': 0, 'timeouts': 0}
+
+        self._uri: Optional[str] = None
+        self._anchor: Optional[sqlite3.Connection] = None
+        if database == ':memory:':
+            self._uri = f'file:radio-{self.instance_id}?mode=memory&cache=shared'
+            self._anchor = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new configured connection."""
+        if self._uri:
+            conn = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+        elif self.read_only:
+            uri = f'{Path(self.database).absolute().as_uri()}?mode=ro'
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.database, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            if not (self.read_only and name == 'journal_mode'):
+                conn.execute(f'PRAGMA {name} = {value}')
+        if self.read_only:
+            conn.execute('PRAGMA query_only = ON')
+        return conn
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    @staticmethod
+    def _discard(conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def acquire(self) -> PooledConnection:
+        """Check a connection out of the pool."""
+        deadline = time.monotonic() + self.timeout
+
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError('Connection pool is closed.')
+
+                if self._idle:
+                    conn, created_at, last_used = self._idle.pop()
+                    break
+
+                if self._open < self.size:
+                    self._open += 1
+                    conn = None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f'Timed out after {self.timeout}s waiting for a database connection'
+                    )
+                self._lock.wait(remaining)
+
+            self._stats['checkouts'] += 1
+
+        # Connect and health-check outside the lock.
+        try:
+            now = time.monotonic()
+            if conn is not None:
+                expired = now - created_at > self.max_age
+                if expired or (now - last_used > self.health_check_interval
+                               and not self._is_healthy(conn)):
+                    self._discard(conn)
+                    conn = None
+                    self._count('recycled')
+
+            if conn is None:
+                conn = self._connect()
+                created_at = now
+                self._count('created')
+        except Exception:
+            with self._lock:
+                self._open -= 1
+                self._lock.notify()
+            raise
+
+        return PooledConnection(self, conn, created_at)
+
+    def release(self, pooled: PooledConnection) -> None:
+        """Return a checked-out connection to the pool."""
+        conn = pooled.raw
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            logger.warning("Discarding broken pooled connection: %s", e)
+            self._discard(conn)
+            conn = None
+
+        with self._lock:
+            if conn is None or self._closed:
+                if conn is not None:
+                    self._discard(conn)
+                self._open -= 1
+            else:
+                self._idle.append((conn, pooled._created_at, time.monotonic()))
+            self._lock.notify()
+
+    def close(self) -> None:
+        """Close all idle connections and refuse further checkouts."""
+        with self._lock:
+            self._closed = True
+            while self._idle:
+                conn, _, _ = self._idle.pop()
+                self._discard(conn)
+                self._open -= 1
+            self._lock.notify_all()
+
+        if self._anchor is not None:
+            self._discard(self._anchor)
+            self._anchor = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool usage statistics."""
+        with self._lock:
+            return {
+                'database': self.database,
+                'read_only': self.read_only,
+                'size': self.size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle),
+                **self._stats
+            }
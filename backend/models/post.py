@@ -2,9 +2,9 @@
 
 import sqlite3
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from dataclasses import dataclass
-from .database import execute_query, get_db_connection
+from .database import execute_query, get_read_connection
 
 logger = logging.getLogger(__name__)
 
@@ -31,25 +31,27 @@ class Post:
             
             if post_id:
                 post = cls(title=title, content=content, user_id=user_id, id=post_id)
-                logger.info(f"Post created: {title}")
+                logger.info("Post created: %s", title)
                 return post
             
         except sqlite3.Error as e:
-            logger.error(f"Error creating post: {e}")
+            logger.error("Error creating post: %s", e)
             return None
     
     @classmethod
     def get_by_id(cls, post_id: int) -> Optional['Post']:
         """Get post by ID."""
         try:
-            conn = get_db_connection()
-            post_data = conn.execute('''
-                SELECT posts.*, users.name as author_name 
-                FROM posts 
-                LEFT JOIN users ON posts.user_id = users.id 
-                WHERE posts.id = ?
-            ''', (post_id,)).fetchone()
-            conn.close()
+            conn = get_read_connection()
+            try:
+                post_data = conn.execute('''
+                    SELECT posts.*, users.name as author_name 
+                    FROM posts 
+                    LEFT JOIN users ON posts.user_id = users.id 
+                    WHERE posts.id = ?
+                ''', (post_id,)).fetchone()
+            finally:
+                conn.close()
             
             if post_data:
                 return cls(
@@ -62,22 +64,30 @@ class Post:
                 )
             
         except sqlite3.Error as e:
-            logger.error(f"Error getting post by ID: {e}")
+            logger.error("Error getting post by ID: %s", e)
             return None
     
     @classmethod
-    def get_all(cls, limit: int = 100) -> List['Post']:
-        """Get all posts with author information."""
+    def get_all(cls, limit: int = 100, after: Optional[Tuple[str, int]] = None) -> List['Post']:
+        """Get posts with author information, newest first.
+        
+        ``after`` is the ``(created_at, id)`` of the last post on the
+        previous page; see ``page_key``.
+        """
         try:
-            conn = get_db_connection()
-            posts_data = conn.execute('''
-                SELECT posts.*, users.name as author_name 
-                FROM posts 
-                LEFT JOIN users ON posts.user_id = users.id 
-                ORDER BY posts.created_at DESC 
-                LIMIT ?
-            ''', (limit,)).fetchall()
-            conn.close()
+            seek = 'WHERE (posts.created_at, posts.id) < (?, ?)' if after else ''
+            conn = get_read_connection()
+            try:
+                posts_data = conn.execute(f'''
+                    SELECT posts.*, users.name as author_name 
+                    FROM posts 
+                    LEFT JOIN users ON posts.user_id = users.id 
+                    {seek} 
+                    ORDER BY posts.created_at DESC, posts.id DESC 
+                    LIMIT ?
+                ''', (*(after or ()), limit)).fetchall()
+            finally:
+                conn.close()
             
             return [
                 cls(
@@ -92,23 +102,31 @@ class Post:
             ]
             
         except sqlite3.Error as e:
-            logger.error(f"Error getting all posts: {e}")
+            logger.error("Error getting all posts: %s", e)
             return []
     
     @classmethod
-    def get_by_user(cls, user_id: int, limit: int = 50) -> List['Post']:
-        """Get posts by user."""
+    def get_by_user(cls, user_id: int, limit: int = 50,
+                    after: Optional[Tuple[str, int]] = None) -> List['Post']:
+        """Get posts by user, newest first.
+        
+        ``after`` is the ``(created_at, id)`` of the last post on the
+        previous page; see ``page_key``.
+        """
         try:
-            conn = get_db_connection()
-            posts_data = conn.execute('''
-                SELECT posts.*, users.name as author_name 
-                FROM posts 
-                LEFT JOIN users ON posts.user_id = users.id 
-                WHERE posts.user_id = ? 
-                ORDER BY posts.created_at DESC 
-                LIMIT ?
-            ''', (user_id, limit)).fetchall()
-            conn.close()
+            seek = 'AND (posts.created_at, posts.id) < (?, ?)' if after else ''
+            conn = get_read_connection()
+            try:
+                posts_data = conn.execute(f'''
+                    SELECT posts.*, users.name as author_name 
+                    FROM posts 
+                    LEFT JOIN users ON posts.user_id = users.id 
+                    WHERE posts.user_id = ? {seek} 
+                    ORDER BY posts.created_at DESC, posts.id DESC 
+                    LIMIT ?
+                ''', (user_id, *(after or ()), limit)).fetchall()
+            finally:
+                conn.close()
             
             return [
                 cls(
@@ -123,9 +141,13 @@ class Post:
             ]
             
         except sqlite3.Error as e:
-            logger.error(f"Error getting posts by user: {e}")
+            logger.error("Error getting posts by user: %s", e)
             return []
     
+    def page_key(self) -> Tuple[str, int]:
+        """Sort key used as the pagination cursor for post listings."""
+        return (self.created_at, self.id)
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert post to dictionary."""
         return {
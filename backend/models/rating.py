@@ -1,13 +1,110 @@
-"""Rating model for track ratings."""
+"""Rating model for track ratings.
 
+Ratings are stored compactly: track keys and listener fingerprints are
+interned into the ``tracks`` and ``listeners`` tables, and a rating row
+holds only their integer ids, +1 or -1 and an epoch timestamp. Ids are
+cached in-process per open database once committed; the public shape
+(track key, 'up'/'down', text timestamp) is unchanged.
+"""
+
+import calendar
+import heapq
+import itertools
 import sqlite3
 import logging
-from typing import Optional, Dict, Any
+import time
+from typing import Callable, Optional, Dict, Any, List, Tuple
 from dataclasses import dataclass
-from .database import execute_query, get_db_connection
+from ..config import config
+from ..utils.cache import TTLCache
+from ..utils.tracing import traced
+from .database import get_db_connection, get_pool, get_read_connection, run_write
+from .migrations import rebuild_track_rating_counts
+from .shards import RatingShard, get_shards
 
 logger = logging.getLogger(__name__)
 
+# Shared vote counts per track_id, invalidated on every rating change
+_counts_cache = TTLCache(max_size=config.RATINGS_CACHE_SIZE, ttl=config.RATINGS_CACHE_TTL)
+
+# Interned ids by (database, table, key); a committed id never changes, so
+# entries only leave by eviction. The database is named by its write pool's
+# instance_id, not its path: a new pool may open a new database at the same
+# path (``:memory:``, a fresh shard layout), whose ids would differ.
+_id_cache = TTLCache(max_size=config.RATINGS_ID_CACHE_SIZE, ttl=float('inf'))
+
+# Key column of each id table
+_KEY_COLUMNS = {'tracks': 'key', 'listeners': 'fingerprint'}
+
+# Stored value of each rating
+_RATING_VALUES = {'up': 1, 'down': -1}
+_RATING_NAMES = {value: name for name, value in _RATING_VALUES.items()}
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _store_key(shard: Optional[RatingShard]) -> str:
+    """Id cache name of ``shard``'s database, or the main database's for None."""
+    return (shard.pool if shard is not None else get_pool()).instance_id
+
+
+def _store(track_id: str) -> str:
+    """Id cache name of the database holding ``track_id``'s ratings."""
+    shards = get_shards()
+    return _store_key(shards.for_track(track_id) if shards is not None else None)
+
+
+def _read_connection(track_id: str):
+    """Read-only connection to the database holding ``track_id``'s ratings."""
+    shards = get_shards()
+    return shards.for_track(track_id).read_connection() if shards is not None else get_read_connection()
+
+
+def _run_write(track_id: str, job: Callable[[sqlite3.Connection], Any]) -> Any:
+    """Commit ``job`` on the database holding ``track_id``'s ratings."""
+    shards = get_shards()
+    return shards.for_track(track_id).run_write(job) if shards is not None else run_write(job)
+
+
+def _stores(read_only: bool = True) -> List[Tuple[str, Callable[[], Any]]]:
+    """Id cache name and connection factory of every database holding ratings: each shard, or the main database."""
+    shards = get_shards()
+    if shards is None:
+        return [(_store_key(None), get_read_connection if read_only else get_db_connection)]
+    return [(_store_key(shard), shard.read_connection if read_only else shard.connection) for shard in shards.shards]
+
+
+def _lookup_id(conn: sqlite3.Connection, store: str, table: str, key: str,
+               interned: Optional[Dict[tuple, int]] = None) -> Optional[int]:
+    """Id of ``key`` in the id table ``table``, or None if it was never interned.
+
+    Inside a write job pass ``interned``: ids read there may not be
+    committed yet, so they are collected for the caller to cache after
+    the commit instead of being cached here.
+    """
+    cache_key = (store, table, key)
+    found = _id_cache.get(cache_key)
+    if found is not None:
+        return found
+    
+    row = conn.execute(f'SELECT id FROM {table} WHERE {_KEY_COLUMNS[table]} = ?', (key,)).fetchone()
+    if row is None:
+        return None
+    if interned is None:
+        _id_cache.set(cache_key, row[0])
+    else:
+        interned[cache_key] = row[0]
+    return row[0]
+
+
+def _intern(conn: sqlite3.Connection, store: str, table: str, key: str, interned: Dict[tuple, int]) -> int:
+    """Id of ``key`` in ``table``, adding it first if new; for use inside a write job."""
+    found = _lookup_id(conn, store, table, key, interned)
+    if found is None:
+        cursor = conn.execute(f'INSERT INTO {table} ({_KEY_COLUMNS[table]}) VALUES (?)', (key,))
+        found = interned[(store, table, key)] = cursor.lastrowid
+    return found
+
 
 @dataclass
 class Rating:
@@ -20,90 +117,136 @@ class Rating:
     timestamp: Optional[str] = None
     
     @classmethod
-    def save_rating(cls, track_id: str, rating: Optional[str], user_fingerprint: str) -> bool:
-        """Save or update a rating for a track."""
-        try:
+    @traced()
+    def save_rating(cls, track_id: str, rating: Optional[str],
+                    user_fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Save, update or remove a rating for a track in one transaction.
+        
+        The write joins the writer's next group commit and this returns
+        once it has committed. Returns the track's fresh rating summary
+        (same shape as ``get_track_ratings``) with a ``changed`` flag, or
+        None on error. Re-submitting an unchanged rating does not rewrite
+        the row.
+        """
+        store = _store(track_id)
+        
+        def write(conn: sqlite3.Connection) -> Tuple[bool, Dict[str, int], Dict[tuple, int]]:
+            interned: Dict[tuple, int] = {}
             if rating is None:
-                # Remove existing rating
-                execute_query(
-                    'DELETE FROM ratings WHERE track_id = ? AND user_fingerprint = ?',
-                    (track_id, user_fingerprint)
-                )
-                logger.info(f"Rating removed for track {track_id}")
-                return True
-            
-            # Check if rating already exists
-            conn = get_db_connection()
-            existing = conn.execute(
-                'SELECT id FROM ratings WHERE track_id = ? AND user_fingerprint = ?',
-                (track_id, user_fingerprint)
-            ).fetchone()
-            
-            if existing:
-                # Update existing rating
-                execute_query(
-                    '''UPDATE ratings SET rating = ?, timestamp = CURRENT_TIMESTAMP 
-                       WHERE track_id = ? AND user_fingerprint = ?''',
-                    (rating, track_id, user_fingerprint)
-                )
-                logger.info(f"Rating updated for track {track_id}: {rating}")
+                track = _lookup_id(conn, store, 'tracks', track_id, interned)
+                listener = _lookup_id(conn, store, 'listeners', user_fingerprint, interned)
+                changed = track is not None and listener is not None and conn.execute(
+                    'DELETE FROM ratings WHERE track_id = ? AND listener_id = ?',
+                    (track, listener)
+                ).rowcount > 0
             else:
-                # Create new rating
-                execute_query(
-                    'INSERT INTO ratings (track_id, rating, user_fingerprint) VALUES (?, ?, ?)',
-                    (track_id, rating, user_fingerprint)
-                )
-                logger.info(f"New rating created for track {track_id}: {rating}")
+                track = _intern(conn, store, 'tracks', track_id, interned)
+                listener = _intern(conn, store, 'listeners', user_fingerprint, interned)
+                changed = conn.execute('''
+                    INSERT INTO ratings (track_id, listener_id, rating) 
+                    VALUES (?, ?, ?) 
+                    ON CONFLICT(track_id, listener_id) DO UPDATE 
+                    SET rating = excluded.rating, rated_at = excluded.rated_at 
+                    WHERE ratings.rating != excluded.rating
+                ''', (track, listener, _RATING_VALUES.get(rating))).rowcount > 0
+            return changed, cls._fetch_counts(conn, track_id), interned
+        
+        try:
+            changed, counts, interned = _run_write(track_id, write)
+            # Only now are the ids committed
+            for cache_key, interned_id in interned.items():
+                _id_cache.set(cache_key, interned_id)
             
-            conn.close()
-            return True
+            if changed:
+                _counts_cache.invalidate(track_id)
+                action = 'removed' if rating is None else 'saved'
+                logger.info("Rating %s for track %s: %s", action, track_id, rating)
+            
+            result = cls._format_summary(track_id, counts, rating)
+            result['changed'] = changed
+            return result
             
         except sqlite3.Error as e:
-            logger.error(f"Error saving rating: {e}")
-            return False
+            logger.error("Error saving rating: %s", e)
+            return None
+    
+    @staticmethod
+    def _fetch_counts(conn: sqlite3.Connection, track_id: str) -> Dict[str, int]:
+        """Read a track's up and down vote counters on an open connection."""
+        row = conn.execute(
+            'SELECT up_count, down_count FROM track_rating_counts WHERE track_id = ?',
+            (track_id,)
+        ).fetchone()
+        
+        if row is None:
+            return {'up': 0, 'down': 0}
+        return {'up': row['up_count'], 'down': row['down_count']}
+    
+    @classmethod
+    def _load_counts(cls, track_id: str) -> Dict[str, int]:
+        """Read a track's vote counters on a read-only pooled connection."""
+        conn = _read_connection(track_id)
+        try:
+            return cls._fetch_counts(conn, track_id)
+        finally:
+            conn.close()
+    
+    @classmethod
+    def cache_stats(cls) -> Dict[str, Any]:
+        """Get hit, miss and eviction statistics for the counts cache."""
+        return _counts_cache.stats()
     
     @classmethod
+    def id_cache_stats(cls) -> Dict[str, Any]:
+        """Get hit, miss and eviction statistics for the interned id cache."""
+        return _id_cache.stats()
+    
+    @classmethod
+    def clear_cache(cls) -> None:
+        """Drop all cached track counts and interned ids."""
+        _counts_cache.clear()
+        _id_cache.clear()
+    
+    @staticmethod
+    def _format_summary(track_id: str, counts: Dict[str, int],
+                        user_rating: Optional[str]) -> Dict[str, Any]:
+        """Build the public rating summary for a track."""
+        return {
+            'track_id': track_id,
+            'ratings': {
+                'up': counts.get('up', 0),
+                'down': counts.get('down', 0)
+            },
+            'user_rating': user_rating
+        }
+    
+    @classmethod
+    @traced()
     def get_track_ratings(cls, track_id: str, user_fingerprint: Optional[str] = None) -> Dict[str, Any]:
         """Get rating counts and user's current rating for a track."""
         try:
-            conn = get_db_connection()
-            
-            # Get rating counts
-            ratings = conn.execute('''
-                SELECT rating, COUNT(*) as count 
-                FROM ratings 
-                WHERE track_id = ? 
-                GROUP BY rating
-            ''', (track_id,)).fetchall()
+            counts = _counts_cache.get_or_load(track_id, lambda: cls._load_counts(track_id))
             
             # Get user's current rating if fingerprint provided
             user_rating = None
             if user_fingerprint:
-                user_rating_row = conn.execute(
-                    'SELECT rating FROM ratings WHERE track_id = ? AND user_fingerprint = ?',
-                    (track_id, user_fingerprint)
-                ).fetchone()
-                user_rating = user_rating_row['rating'] if user_rating_row else None
-            
-            conn.close()
-            
-            # Format response
-            result = {
-                'track_id': track_id,
-                'ratings': {
-                    'up': 0,
-                    'down': 0
-                },
-                'user_rating': user_rating
-            }
-            
-            for rating in ratings:
-                result['ratings'][rating['rating']] = rating['count']
+                store = _store(track_id)
+                conn = _read_connection(track_id)
+                try:
+                    track = _lookup_id(conn, store, 'tracks', track_id)
+                    listener = _lookup_id(conn, store, 'listeners', user_fingerprint) if track is not None else None
+                    user_rating_row = conn.execute(
+                        'SELECT rating FROM ratings WHERE track_id = ? AND listener_id = ?',
+                        (track, listener)
+                    ).fetchone() if listener is not None else None
+                finally:
+                    conn.close()
+                user_rating = _RATING_NAMES[user_rating_row['rating']] if user_rating_row else None
             
-            return result
+            return cls._format_summary(track_id, counts, user_rating)
             
         except sqlite3.Error as e:
-            logger.error(f"Error getting track ratings: {e}")
+            logger.error("Error getting track ratings: %s", e)
             return {
                 'track_id': track_id,
                 'ratings': {'up': 0, 'down': 0},
@@ -111,22 +254,198 @@ class Rating:
                 'error': str(e)
             }
     
+    @staticmethod
+    def _fetch_many(conn: sqlite3.Connection, store: str, track_ids: List[str],
+                    user_fingerprint: Optional[str]) -> Tuple[Dict[str, Dict[str, int]], Dict[str, str]]:
+        """Counters and the user's ratings for ``track_ids`` on an open connection."""
+        placeholders = ', '.join('?' for _ in track_ids)
+        counts = {
+            row['track_id']: {'up': row['up_count'], 'down': row['down_count']}
+            for row in conn.execute(f'''
+                SELECT track_id, up_count, down_count 
+                FROM track_rating_counts 
+                WHERE track_id IN ({placeholders})
+            ''', tuple(track_ids))
+        }
+        
+        user_ratings = {}
+        listener = _lookup_id(conn, store, 'listeners', user_fingerprint) if user_fingerprint else None
+        if listener is not None:
+            user_ratings = {
+                row['track_id']: _RATING_NAMES[row['rating']]
+                for row in conn.execute(f'''
+                    SELECT tracks.key AS track_id, ratings.rating 
+                    FROM tracks 
+                    JOIN ratings ON ratings.track_id = tracks.id AND ratings.listener_id = ? 
+                    WHERE tracks.key IN ({placeholders})
+                ''', (listener, *track_ids))
+            }
+        return counts, user_ratings
+    
     @classmethod
-    def get_user_ratings(cls, user_fingerprint: str, limit: int = 50) -> list:
-        """Get recent ratings by a user."""
+    @traced()
+    def get_many_track_ratings(cls, track_ids: List[str],
+                               user_fingerprint: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get rating counts and the user's rating for several tracks at once.
+        
+        Results follow the order of ``track_ids``; unknown tracks report zero counts.
+        With sharded ratings each shard is asked only about its own tracks.
+        """
+        if not track_ids:
+            return []
+        
+        shards = get_shards()
+        groups = (
+            [(shards.shards[index], group) for index, group in shards.group_tracks(track_ids).items()]
+            if shards is not None else [(None, track_ids)]
+        )
         try:
-            conn = get_db_connection()
-            ratings = conn.execute('''
-                SELECT track_id, rating, timestamp 
-                FROM ratings 
-                WHERE user_fingerprint = ? 
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            ''', (user_fingerprint, limit)).fetchall()
-            conn.close()
+            counts: Dict[str, Dict[str, int]] = {}
+            user_ratings: Dict[str, str] = {}
+            for shard, group in groups:
+                store = _store_key(shard)
+                conn = shard.read_connection() if shard is not None else get_read_connection()
+                try:
+                    group_counts, group_ratings = cls._fetch_many(conn, store, group, user_fingerprint)
+                finally:
+                    conn.close()
+                counts.update(group_counts)
+                user_ratings.update(group_ratings)
             
-            return [dict(rating) for rating in ratings]
+            return [
+                cls._format_summary(track_id, counts.get(track_id, {}), user_ratings.get(track_id))
+                for track_id in track_ids
+            ]
             
         except sqlite3.Error as e:
-            logger.error(f"Error getting user ratings: {e}")
-            return []
\ No newline at end of file
+            logger.error("Error getting ratings for %s tracks: %s", len(track_ids), e)
+            raise
+    
+    @classmethod
+    @traced()
+    def get_user_ratings(cls, user_fingerprint: str, limit: int = 50,
+                         after: Optional[Tuple[str, str]] = None) -> list:
+        """Get recent ratings by a user.
+        
+        ``after`` is the ``(timestamp, track_id)`` of the last rating on
+        the previous page; see ``rating_page_key``. With sharded ratings
+        every shard returns its newest ``limit`` and the pages are merged.
+        
+        The index orders a listener's ratings by time alone, so each store
+        also returns the rest of the oldest second its page reaches, and
+        ratings within a second are ordered by track here.
+        """
+        try:
+            seek = []
+            if after:
+                # Ratings from the cursor's second are filtered below
+                seek = [calendar.timegm(time.strptime(after[0], TIMESTAMP_FORMAT))]
+            upper = 'AND ratings.rated_at <= ?' if after else ''
+            below = 'AND rated_at < ?' if after else ''
+            pages = []
+            for store, connect in _stores():
+                conn = connect()
+                try:
+                    listener = _lookup_id(conn, store, 'listeners', user_fingerprint)
+                    ratings = conn.execute(f'''
+                        SELECT tracks.key AS track_id, ratings.rating, 
+                               datetime(ratings.rated_at, 'unixepoch') AS timestamp 
+                        FROM ratings 
+                        JOIN tracks ON tracks.id = ratings.track_id 
+                        WHERE ratings.listener_id = ? {upper} AND ratings.rated_at >= COALESCE((
+                            SELECT MIN(rated_at) FROM (
+                                SELECT rated_at FROM ratings 
+                                WHERE listener_id = ? {below} 
+                                ORDER BY rated_at DESC 
+                                LIMIT ?
+                            )
+                        ), 0)
+                    ''', (listener, *seek, listener, *seek, limit)).fetchall() if listener is not None else []
+                finally:
+                    conn.close()
+                page = [
+                    {'track_id': row['track_id'], 'rating': _RATING_NAMES[row['rating']],
+                     'timestamp': row['timestamp']}
+                    for row in ratings
+                ]
+                if after:
+                    page = [rating for rating in page if cls.rating_page_key(rating) < tuple(after)]
+                page.sort(key=cls.rating_page_key, reverse=True)
+                pages.append(page[:limit])
+            
+            if len(pages) == 1:
+                return pages[0]
+            merged = heapq.merge(*pages, key=cls.rating_page_key, reverse=True)
+            return list(itertools.islice(merged, limit))
+            
+        except ValueError:
+            # A cursor whose timestamp is not one of ours matches nothing
+            return []
+        except sqlite3.Error as e:
+            logger.error("Error getting user ratings: %s", e)
+            return []
+    
+    @staticmethod
+    def rating_page_key(rating: Dict[str, Any]) -> Tuple[str, str]:
+        """Sort key used as the pagination cursor for ``get_user_ratings``."""
+        return (rating['timestamp'], rating['track_id'])
+    
+    @classmethod
+    def rebuild_counts(cls) -> int:
+        """Recompute every track's vote counters from the ratings table.
+        
+        Each database is rebuilt in one job of its group-commit writer, so
+        the rebuild queues behind in-flight votes instead of racing them.
+        """
+        shards = get_shards()
+        writers = [shard.run_write for shard in shards.shards] if shards is not None else [run_write]
+        tracks = sum(write(rebuild_track_rating_counts) for write in writers)
+        
+        _counts_cache.clear()
+        logger.info("Rebuilt rating counters for %s tracks", tracks)
+        return tracks
+    
+    @classmethod
+    def verify_counts(cls) -> List[Dict[str, Any]]:
+        """Compare stored vote counters with the ratings table.
+        
+        Returns one entry per track whose counters disagree.
+        """
+        actual: Dict[str, Tuple[int, int]] = {}
+        stored: Dict[str, Tuple[int, int]] = {}
+        for _, connect in _stores():
+            conn = connect()
+            try:
+                # Read both tables from one snapshot so concurrent votes don't show as mismatches
+                conn.execute('BEGIN')
+                actual.update(
+                    (row['track_id'], (row['up'], row['down']))
+                    for row in conn.execute('''
+                        SELECT tracks.key as track_id, SUM(ratings.rating = 1) as up, 
+                               SUM(ratings.rating = -1) as down 
+                        FROM ratings 
+                        JOIN tracks ON tracks.id = ratings.track_id 
+                        GROUP BY ratings.track_id
+                    ''')
+                )
+                stored.update(
+                    (row['track_id'], (row['up_count'], row['down_count']))
+                    for row in conn.execute(
+                        'SELECT track_id, up_count, down_count FROM track_rating_counts'
+                    )
+                )
+            finally:
+                conn.rollback()
+                conn.close()
+        
+        mismatches = []
+        for track_id in sorted(set(actual) | set(stored)):
+            expected = actual.get(track_id, (0, 0))
+            found = stored.get(track_id, (0, 0))
+            if expected != found:
+                mismatches.append({
+                    'track_id': track_id,
+                    'expected': {'up': expected[0], 'down': expected[1]},
+                    'stored': {'up': found[0], 'down': found[1]}
+                })
+        return mismatches
@@ -0,0 +1,135 @@
+"""Read replica kept fresh with the SQLite online backup API.
+
+``ReplicaRefresher`` copies the primary database into the replica file
+every ``interval`` seconds. The replica is in WAL mode, so read-only
+connections that already have it open keep reading their snapshot while
+a copy is written and see the new data on their next statement. Reads
+served from the replica may lag writes by up to one interval.
+
+Every pre-fork worker runs a refresher; a non-blocking lock on
+``<replica>.lock`` lets one of them copy while the others skip that
+round. The lock file's modification time records the last copy made by
+any of them.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not POSIX; the pre-fork server needs POSIX anyway
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _try_lock(path: str) -> Iterator[bool]:
+    """Take an exclusive lock on ``path`` if nobody holds it; yields whether it did."""
+    with open(path, 'a') as lock_file:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class ReplicaRefresher:
+    """Periodically copies ``primary`` into ``replica``."""
+
+    def __init__(self, primary: str, replica: str, interval: float = 5.0):
+        self.primary = primary
+        self.replica = replica
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+        self._lock_path = replica + '.lock'
+        self._stats: Dict[str, Any] = {'refreshes': 0, 'skipped': 0, 'errors': 0, 'last_duration_ms': None}
+
+    def refresh(self) -> bool:
+        """Copy the primary now; returns False if another process is copying."""
+        with _try_lock(self._lock_path) as acquired:
+            if not acquired:
+                with self._lock:
+                    self._stats['skipped'] += 1
+                return False
+
+            started = time.perf_counter()
+            source = sqlite3.connect(f'{Path(self.primary).absolute().as_uri()}?mode=ro', uri=True)
+            try:
+                target = sqlite3.connect(self.replica)
+                try:
+                    # Lets readers keep their snapshot while the copy is written
+                    target.execute('PRAGMA journal_mode = WAL')
+                    source.backup(target)
+                finally:
+                    target.close()
+            finally:
+                source.close()
+            os.utime(self._lock_path)
+
+        with self._lock:
+            self._stats['refreshes'] += 1
+            self._stats['last_duration_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except sqlite3.Error as e:
+                with self._lock:
+                    self._stats['errors'] += 1
+                logger.warning("Refreshing read replica %s failed: %s", self.replica, e)
+
+    def start(self) -> None:
+        """Start refreshing in the background; safe to call repeatedly and after fork."""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked: the parent's refresher thread did not come along
+                self._pid = os.getpid()
+                self._thread = None
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='replica-refresher', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self._thread = None
+
+    def age(self) -> Optional[float]:
+        """Seconds since any process last copied the primary, or None if never."""
+        try:
+            return max(0.0, time.time() - os.path.getmtime(self._lock_path))
+        except OSError:
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        age = self.age()
+        with self._lock:
+            return {
+                'path': self.replica,
+                'interval': self.interval,
+                'age_seconds': round(age, 3) if age is not None else None,
+                **self._stats
+            }
@@ -0,0 +1,236 @@
+"""Hash-sharded storage for ratings.
+
+With ``RATINGS_SHARDS`` set to N, ratings and their per-track counters
+live in N SQLite files instead of the main database, and a rating
+belongs to the file ``shard_index(track_id, N)`` picks. Each shard has
+its own connection pools and its own group-commit writer, so votes for
+tracks on different shards never wait for the same write lock. Every
+shard is created with the full schema, so migrations apply to shards
+unchanged; only the rating tables are used.
+
+Files are named ``ratings-<index>-of-<N>.db`` inside
+``RATINGS_SHARD_DIR``, so a layout with a different shard count can be
+built next to the current one. ``rebalance`` copies ratings from one
+layout into another (the main database counts as a layout of one file).
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Any, Dict, List, Optional
+
+from ..config import STORAGE_PROFILES, config
+from ..utils.tracing import span
+from .migrations import apply_migrations, insert_ratings
+from .pool import ConnectionPool, PooledConnection
+from .writer import GroupCommitWriter, WriteJob
+
+logger = logging.getLogger(__name__)
+
+# Ratings copied per transaction by rebalance
+REBALANCE_BATCH_SIZE = 1000
+
+
+def shard_index(track_id: str, count: int) -> int:
+    """The shard owning ``track_id``; stable across processes and runs."""
+    # crc32 rather than hash(): string hashes change between runs
+    return zlib.crc32(track_id.encode('utf-8')) % count
+
+
+def shard_paths(directory: str, count: int) -> List[str]:
+    """Files of a layout of ``count`` shards."""
+    return [os.path.join(directory, f'ratings-{index:02d}-of-{count:02d}.db') for index in range(count)]
+
+
+class RatingShard:
+    """One shard file with its own pools and writer."""
+
+    def __init__(self, path: str):
+        self.path = path
+        pragmas = STORAGE_PROFILES[config.DB_STORAGE_PROFILE]
+        pool_options = dict(timeout=config.DB_POOL_TIMEOUT, max_age=config.DB_POOL_MAX_AGE,
+                            health_check_interval=config.DB_POOL_HEALTH_CHECK_INTERVAL, pragmas=pragmas)
+        self.pool = ConnectionPool(path, size=config.DB_POOL_SIZE, **pool_options)
+        conn = self.pool.acquire()
+        try:
+            apply_migrations(conn)
+        finally:
+            conn.close()
+        self.read_pool = ConnectionPool(path, size=config.DB_READ_POOL_SIZE, read_only=True, **pool_options)
+        self.writer = GroupCommitWriter(
+            self.connection,
+            batch_max=config.DB_WRITE_BATCH_MAX,
+            max_delay=config.DB_WRITE_MAX_DELAY,
+            busy_timeout=config.DB_WRITE_BUSY_TIMEOUT,
+            timeout=config.DB_WRITE_TIMEOUT
+        )
+
+    def connection(self) -> PooledConnection:
+        with span('acquire shard connection', 'db'):
+            return self.pool.acquire()
+
+    def read_connection(self) -> PooledConnection:
+        with span('acquire shard read connection', 'db'):
+            return self.read_pool.acquire()
+
+    def run_write(self, job: WriteJob) -> Any:
+        """Run ``job(conn)`` in this shard's next group commit."""
+        return self.writer.submit(job)
+
+    def close(self) -> None:
+        """Commit queued writes, then close both pools."""
+        self.writer.stop()
+        self.read_pool.close()
+        self.pool.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'path': self.path, 'writes': self.writer.stats(), 'pool': self.pool.stats()}
+
+
+class ShardSet:
+    """The ``count`` shards of one layout in ``directory``."""
+
+    def __init__(self, directory: str, count: int):
+        if count < 1:
+            raise ValueError('A shard set needs at least one shard')
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.count = count
+        self.shards = [RatingShard(path) for path in shard_paths(directory, count)]
+
+    def for_track(self, track_id: str) -> RatingShard:
+        return self.shards[shard_index(track_id, self.count)]
+
+    def group_tracks(self, track_ids: List[str]) -> Dict[int, List[str]]:
+        """``track_ids`` grouped by owning shard index, keeping their order."""
+        groups: Dict[int, List[str]] = {}
+        for track_id in track_ids:
+            groups.setdefault(shard_index(track_id, self.count), []).append(track_id)
+        return groups
+
+    def close(self) -> None:
+        for shard in self.shards:
+            shard.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'directory': self.directory, 'count': self.count,
+                'shards': [shard.stats() for shard in self.shards]}
+
+
+_shards: Optional[ShardSet] = None
+_shards_lock = threading.Lock()
+
+
+def get_shards() -> Optional[ShardSet]:
+    """The configured shard set, or None when ratings live in the main database.
+
+    Rebuilt if ``config.RATINGS_SHARDS`` or ``config.RATINGS_SHARD_DIR``
+    has changed since it was created.
+    """
+    global _shards
+
+    count, directory = config.RATINGS_SHARDS, config.RATINGS_SHARD_DIR
+    # Lock-free on the request path once the configuration has settled
+    shards = _shards
+    if shards is None and count <= 0:
+        return None
+    if shards is not None and (shards.count, shards.directory) == (count, directory):
+        return shards
+    with _shards_lock:
+        if _shards is not None and (_shards.count, _shards.directory) != (count, directory):
+            _shards.close()
+            _shards = None
+        if _shards is None and count > 0:
+            _shards = ShardSet(directory, count)
+        return _shards
+
+
+def get_shard_stats() -> Optional[Dict[str, Any]]:
+    """Per-shard write and pool statistics, or None when ratings are not sharded."""
+    return _shards.stats() if _shards is not None else None
+
+
+def close_shards() -> None:
+    """Commit queued writes on every shard and close them."""
+    global _shards
+
+    with _shards_lock:
+        if _shards is not None:
+            _shards.close()
+            _shards = None
+
+
+def clear_ratings(conn: sqlite3.Connection) -> int:
+    """Delete every rating, vote counter and interned id; returns the ratings deleted.
+
+    Runs on the caller's connection and transaction.
+    """
+    # Counters first, so the delete triggers have nothing left to adjust
+    conn.execute('DELETE FROM track_rating_counts')
+    deleted = conn.execute('DELETE FROM ratings').rowcount
+    conn.execute('DELETE FROM tracks')
+    conn.execute('DELETE FROM listeners')
+    return deleted
+
+
+def rebalance(sources: List[str], targets: List[str], batch_size: int = REBALANCE_BATCH_SIZE) -> List[int]:
+    """Copy every rating in ``sources`` into the layout ``targets``.
+
+    Each target is emptied first: ratings left there by an earlier layout
+    (such as the main database's from before sharding) would otherwise
+    bring back votes removed or changed since. Each rating then goes to
+    ``targets[shard_index(track_id, len(targets))]``; track keys and
+    fingerprints are interned again there, and vote counters follow
+    through the targets' triggers. An interrupted run can simply be
+    repeated. Sources are brought up to the current schema but their
+    ratings are left untouched. Returns the number of ratings routed to
+    each target.
+    """
+    if {os.path.abspath(path) for path in sources} & {os.path.abspath(path) for path in targets}:
+        raise ValueError('A database cannot be both a source and a target')
+
+    target_conns = []
+    try:
+        for path in targets:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(path)
+            target_conns.append(conn)
+            apply_migrations(conn)
+            with conn:
+                cleared = clear_ratings(conn)
+            if cleared:
+                logger.info("Cleared %s earlier ratings from %s", cleared, path)
+
+        copied = [0] * len(targets)
+        for source_path in sources:
+            source = sqlite3.connect(source_path)
+            try:
+                apply_migrations(source)
+                cursor = source.execute('''
+                    SELECT tracks.key, listeners.fingerprint, ratings.rating, ratings.rated_at
+                    FROM ratings
+                    JOIN tracks ON tracks.id = ratings.track_id
+                    JOIN listeners ON listeners.id = ratings.listener_id
+                ''')
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    groups: Dict[int, list] = {}
+                    for row in rows:
+                        groups.setdefault(shard_index(row[0], len(targets)), []).append(row)
+                    for index, group in groups.items():
+                        with target_conns[index]:
+                            insert_ratings(target_conns[index], group, keep_newer=True)
+                        copied[index] += len(group)
+            finally:
+                source.close()
+            logger.info("Copied ratings from %s", source_path)
+        return copied
+    finally:
+        for conn in target_conns:
+            conn.close()
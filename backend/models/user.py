@@ -2,7 +2,7 @@
 
 import sqlite3
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from dataclasses import dataclass
 from .database import execute_query, get_db_connection
 
@@ -29,14 +29,14 @@ class User:
             
             if user_id:
                 user = cls(name=name, email=email, id=user_id)
-                logger.info(f"User created: {email}")
+                logger.info("User created: %s", email)
                 return user
             
         except sqlite3.IntegrityError:
-            logger.warning(f"User creation failed - email already exists: {email}")
+            logger.warning("User creation failed - email already exists: %s", email)
             return None
         except sqlite3.Error as e:
-            logger.error(f"Error creating user: {e}")
+            logger.error("Error creating user: %s", e)
             return None
     
     @classmethod
@@ -58,7 +58,7 @@ class User:
                 )
             
         except sqlite3.Error as e:
-            logger.error(f"Error getting user by ID: {e}")
+            logger.error("Error getting user by ID: %s", e)
             return None
     
     @classmethod
@@ -80,18 +80,30 @@ class User:
                 )
             
         except sqlite3.Error as e:
-            logger.error(f"Error getting user by email: {e}")
+            logger.error("Error getting user by email: %s", e)
             return None
     
     @classmethod
-    def get_all(cls, limit: int = 100) -> List['User']:
-        """Get all users."""
+    def get_all(cls, limit: int = 100, after: Optional[Tuple[str, int]] = None) -> List['User']:
+        """Get users, newest first.
+        
+        ``after`` is the ``(created_at, id)`` of the last user on the
+        previous page; see ``page_key``.
+        """
         try:
-            users_data = execute_query(
-                'SELECT * FROM users ORDER BY created_at DESC LIMIT ?',
-                (limit,),
-                fetch_all=True
-            )
+            if after:
+                users_data = execute_query(
+                    '''SELECT * FROM users WHERE (created_at, id) < (?, ?) 
+                       ORDER BY created_at DESC, id DESC LIMIT ?''',
+                    (*after, limit),
+                    fetch_all=True
+                )
+            else:
+                users_data = execute_query(
+                    'SELECT * FROM users ORDER BY created_at DESC, id DESC LIMIT ?',
+                    (limit,),
+                    fetch_all=True
+                )
             
             return [
                 cls(
@@ -104,9 +116,13 @@ class User:
             ]
             
         except sqlite3.Error as e:
-            logger.error(f"Error getting all users: {e}")
+            logger.error("Error getting all users: %s", e)
             return []
     
+    def page_key(self) -> Tuple[str, int]:
+        """Sort key used as the pagination cursor for ``get_all``."""
+        return (self.created_at, self.id)
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert user to dictionary."""
         return {
@@ -0,0 +1,215 @@
+"""Single-writer group commit for SQLite writes.
+
+Models hand their writes to ``submit`` as a function of a connection.
+One writer thread per process takes whatever is queued (up to
+``batch_max`` jobs, waiting at most ``max_delay`` for more after the
+first) and runs it in a single ``BEGIN IMMEDIATE`` transaction, each job
+under its own savepoint so a failing job is rolled back alone. Callers
+get their job's return value, or its exception, once the transaction
+has committed.
+
+The writer's connection waits for no lock inside SQLite: when another
+process holds the write lock, ``BEGIN`` and ``COMMIT`` are retried with
+jittered exponential backoff for up to ``busy_timeout`` seconds.
+Pre-fork workers each have their own writer, so this is where they meet.
+"""
+
+import contextvars
+import logging
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional
+
+from ..utils import metrics
+from ..utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Backoff between busy retries, doubling from the first to the last
+BUSY_BACKOFF_INITIAL = 0.001
+BUSY_BACKOFF_MAX = 0.05
+
+WriteJob = Callable[[sqlite3.Connection], Any]
+
+
+class WriteTimeoutError(sqlite3.OperationalError):
+    """Raised when a write has not committed in time; it may still commit later."""
+
+
+def is_busy(error: sqlite3.Error) -> bool:
+    """True for SQLITE_BUSY and SQLITE_LOCKED errors."""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+
+class _Job:
+    __slots__ = ('fn', 'future', 'queued_at', 'context')
+
+    def __init__(self, fn: WriteJob):
+        self.fn = fn
+        self.future: Future = Future()
+        self.queued_at = time.perf_counter()
+        # Runs in the caller's context, so its statements join the caller's trace
+        self.context = contextvars.copy_context()
+
+
+class GroupCommitWriter:
+    """Serializes writes through one thread and commits them in groups."""
+
+    def __init__(self, connect: Callable[[], Any], batch_max: int = 64, max_delay: float = 0.002,
+                 busy_timeout: float = 5.0, timeout: float = 10.0):
+        self.connect = connect
+        self.batch_max = max(1, batch_max)
+        self.max_delay = max_delay
+        self.busy_timeout = busy_timeout
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+        self._stats = {'jobs': 0, 'failed_jobs': 0, 'batches': 0, 'failed_batches': 0, 'busy_retries': 0}
+
+    def submit(self, fn: WriteJob) -> Any:
+        """Run ``fn(conn)`` in the next group transaction and return its result."""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError('Writes cannot be submitted from inside a write job')
+        job = _Job(fn)
+        with self._lock:
+            self._ensure_thread()
+            self._queue.put(job)
+        with span('wait for writer', 'db'):
+            try:
+                return job.future.result(self.timeout)
+            except FutureTimeoutError:
+                raise WriteTimeoutError(f'Write did not commit within {self.timeout}s') from None
+
+    def _ensure_thread(self) -> None:
+        if self._pid != os.getpid():
+            # Forked: the parent's writer thread and queue did not come along
+            self._pid = os.getpid()
+            self._queue = queue.Queue()
+            self._thread = None
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, args=(self._queue,), name='db-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Commit everything already queued, then stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None or self._pid != os.getpid():
+                return
+            # Later writes start a new thread on a new queue
+            self._queue.put(None)
+            self._queue = queue.Queue()
+        thread.join(timeout)
+
+    def _run(self, jobs: queue.Queue) -> None:
+        while True:
+            batch, stopping = self._next_batch(jobs)
+            if batch:
+                self._commit(batch)
+            if stopping:
+                return
+
+    def _next_batch(self, jobs: queue.Queue) -> tuple:
+        job = jobs.get()
+        if job is None:
+            return [], True
+        batch = [job]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.batch_max:
+            try:
+                remaining = deadline - time.monotonic()
+                job = jobs.get(timeout=remaining) if remaining > 0 else jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                return batch, True
+            batch.append(job)
+        return batch, False
+
+    def _retry_busy(self, operation: Callable[[], Any]) -> Any:
+        """Run ``operation``, backing off while the database is busy."""
+        deadline = time.monotonic() + self.busy_timeout
+        delay = BUSY_BACKOFF_INITIAL
+        while True:
+            try:
+                return operation()
+            except sqlite3.OperationalError as e:
+                if not is_busy(e) or time.monotonic() >= deadline:
+                    raise
+            with self._lock:
+                self._stats['busy_retries'] += 1
+            metrics.db_write_busy_retries.inc()
+            time.sleep(random.uniform(delay / 2, delay))
+            delay = min(delay * 2, BUSY_BACKOFF_MAX)
+
+    def _commit(self, batch: List[_Job]) -> None:
+        started = time.perf_counter()
+        outcomes: List[tuple] = []
+        try:
+            conn = batch[0].context.run(self.connect)
+            try:
+                busy_timeout = conn.execute('PRAGMA busy_timeout').fetchone()[0]
+                # Fail fast on a held lock so the backoff below decides how long to wait
+                conn.execute('PRAGMA busy_timeout = 0')
+                try:
+                    outcomes = self._run_jobs(conn, batch)
+                finally:
+                    conn.execute(f'PRAGMA busy_timeout = {int(busy_timeout)}')
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.error("Group commit of %s writes failed: %s", len(batch), e)
+            with self._lock:
+                self._stats['failed_batches'] += 1
+            outcomes = [(None, e)] * len(batch)
+
+        elapsed = time.perf_counter() - started
+        metrics.db_write_batch_size.observe(len(batch))
+        metrics.db_write_commit_duration.observe(elapsed)
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['jobs'] += len(batch)
+            self._stats['failed_jobs'] += sum(1 for _, error in outcomes if error is not None)
+
+        # Results are only released once the whole group is durable
+        for job, (result, error) in zip(batch, outcomes):
+            metrics.db_write_wait_duration.observe(time.perf_counter() - job.queued_at)
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
+
+    def _run_jobs(self, conn: Any, batch: List[_Job]) -> List[tuple]:
+        outcomes = []
+        self._retry_busy(lambda: conn.execute('BEGIN IMMEDIATE'))
+        try:
+            for job in batch:
+                conn.execute('SAVEPOINT write_job')
+                try:
+                    outcomes.append((job.context.run(job.fn, conn), None))
+                    conn.execute('RELEASE write_job')
+                except Exception as e:
+                    conn.execute('ROLLBACK TO write_job')
+                    conn.execute('RELEASE write_job')
+                    outcomes.append((None, e))
+            self._retry_busy(conn.commit)
+        except BaseException:
+            conn.rollback()
+            raise
+        return outcomes
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['queued'] = self._queue.qsize()
+        stats['average_batch'] = round(stats['jobs'] / stats['batches'], 2) if stats['batches'] else 0.0
+        return stats
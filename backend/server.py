@@ -0,0 +1,336 @@
+"""Pre-forking production server for Radio Calico.
+
+The parent process initializes the database, opens the listening socket
+and forks ``workers`` children that inherit it; the kernel hands each
+new connection to whichever worker accepts first. Each worker serves
+requests on a bounded pool of ``threads``; long-lived event streams
+detach from that pool with ``release_request_slot`` so they cannot
+starve ordinary requests. The parent restarts workers
+that exit unexpectedly and, on SIGTERM/SIGINT, asks every worker to
+finish its in-flight requests before exiting.
+
+Run with ``python -m backend.app serve --workers N --threads M``.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from multiprocessing.sharedctypes import RawArray
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from werkzeug.serving import BaseWSGIServer
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+# Workers that die sooner than this after starting are restarted with a delay
+_MIN_WORKER_LIFETIME = 1.0
+
+_request_local = threading.local()
+
+
+def release_request_slot() -> None:
+    """Stop counting the current request against the worker's thread pool.
+
+    Called by long-lived responses such as event streams; a no-op
+    outside ``PooledWSGIServer`` or when called twice.
+    """
+    release = getattr(_request_local, 'release', None)
+    if release is not None:
+        _request_local.release = None
+        release()
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug server that handles requests on a fixed-size thread pool.
+
+    The accept loop blocks while every thread is busy, leaving further
+    connections in the shared listen backlog for less busy workers.
+    Requests that call ``release_request_slot`` keep their thread but free
+    their slot; ``detached`` extra threads are reserved for them.
+    """
+
+    multithread = True
+
+    def __init__(self, host: str, port: int, app: Callable, threads: int, fd: Optional[int] = None,
+                 detached: int = 0):
+        # The base constructor calls server_close() when adopting ``fd``
+        self._executor: Optional[ThreadPoolExecutor] = None
+        super().__init__(host, port, app, fd=fd)
+        self._slots = threading.BoundedSemaphore(threads)
+        self._executor = ThreadPoolExecutor(max_workers=threads + detached, thread_name_prefix='http')
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        self._slots.acquire()
+        try:
+            self._executor.submit(self._process_request_thread, request, client_address)
+        except RuntimeError:
+            # Executor already shut down while draining
+            self._slots.release()
+            self.shutdown_request(request)
+
+    def _process_request_thread(self, request: Any, client_address: Any) -> None:
+        _request_local.release = self._slots.release
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            release_request_slot()
+
+    def server_close(self) -> None:
+        super().server_close()
+        if self._executor is not None:
+            # Wait for in-flight requests to finish
+            self._executor.shutdown(wait=True)
+
+
+@dataclass
+class WorkerInfo:
+    """Identity of the current worker process."""
+
+    index: int
+    pid: int
+    counters: Any
+    pids: Any
+
+
+_worker: Optional[WorkerInfo] = None
+
+
+class RequestCounter:
+    """WSGI middleware counting requests into this worker's shared slot."""
+
+    def __init__(self, app: Callable, counters: Any, index: int):
+        self.app = app
+        self.counters = counters
+        self.index = index
+        self._lock = threading.Lock()
+
+    def __call__(self, environ: Dict[str, Any], start_response: Callable) -> Iterable[bytes]:
+        with self._lock:
+            self.counters[self.index] += 1
+        return self.app(environ, start_response)
+
+
+def worker_stats() -> Optional[Dict[str, Any]]:
+    """Per-worker request counts, or None outside the pre-fork server."""
+    if _worker is None:
+        return None
+    return {
+        'worker': _worker.index,
+        'pid': _worker.pid,
+        'requests_by_worker': list(_worker.counters)
+    }
+
+
+def worker_pids() -> Optional[List[int]]:
+    """Pids of every live worker, or None outside the pre-fork server."""
+    if _worker is None:
+        return None
+    return [pid for pid in _worker.pids if pid]
+
+
+def create_listen_socket(host: str, port: int, backlog: int) -> socket.socket:
+    """Bind the socket every worker will accept on."""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(index: int, sock: socket.socket, threads: int, counters: Any, pids: Any) -> None:
+    """Body of a worker process; never returns."""
+    global _worker
+
+    # Ctrl-C reaches the whole process group; the parent coordinates shutdown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    exit_code = 0
+    try:
+        from .app import create_app
+        from .models.database import close_pool
+        from .services import event_broadcaster, stream_prober
+        from .utils.capture import traffic_capture
+
+        pids[index] = os.getpid()
+        _worker = WorkerInfo(index=index, pid=os.getpid(), counters=counters, pids=pids)
+        app = RequestCounter(create_app(), counters, index)
+        server = PooledWSGIServer(config.HOST, config.PORT, app, threads=threads, fd=sock.fileno(),
+                                  detached=config.EVENTS_MAX_SUBSCRIBERS)
+
+        def drain(signum, frame):
+            logger.info("Worker %s draining", index)
+            # Long-lived streams would otherwise hold the drain open
+            event_broadcaster.close_subscribers()
+            # shutdown() waits for serve_forever, so it cannot run on this thread
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, drain)
+        logger.info("Worker %s (pid %s) serving with %s threads", index, os.getpid(), threads)
+
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            event_broadcaster.stop()
+            stream_prober.stop()
+            traffic_capture.stop()
+            close_pool()
+    except Exception as e:
+        logger.error("Worker %s failed: %s", index, e)
+        exit_code = 1
+    finally:
+        logging.shutdown()
+        os._exit(exit_code)
+
+
+class Arbiter:
+    """Parent process that forks, watches and stops workers."""
+
+    def __init__(self, sock: socket.socket, workers: int, threads: int, graceful_timeout: float):
+        self.sock = sock
+        self.workers = workers
+        self.threads = threads
+        self.graceful_timeout = graceful_timeout
+        self.counters = RawArray('Q', workers)
+        # Lets any worker report the memory of its siblings
+        self.pids = RawArray('Q', workers)
+        self.restarts = [0] * workers
+        self._children: Dict[int, int] = {}
+        self._started_at: Dict[int, float] = {}
+        self._stopping = False
+
+    def spawn(self, index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(index, self.sock, self.threads, self.counters, self.pids)
+        self.pids[index] = pid
+        self._children[pid] = index
+        self._started_at[pid] = time.monotonic()
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        for index in range(self.workers):
+            self.spawn(index)
+        logger.info("Serving on %s:%s with %s workers x %s threads",
+                    config.HOST, config.PORT, self.workers, self.threads)
+
+        while not self._stopping:
+            self._reap(restart=True)
+            time.sleep(0.5)
+
+        self._drain()
+
+    def _handle_stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _reap(self, restart: bool) -> None:
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self._children.clear()
+                return
+            if pid == 0:
+                return
+
+            index = self._children.pop(pid)
+            self.pids[index] = 0
+            lifetime = time.monotonic() - self._started_at.pop(pid)
+            if not restart or self._stopping:
+                continue
+
+            logger.error("Worker %s (pid %s) exited with status %s; restarting", index, pid, status)
+            self.restarts[index] += 1
+            if lifetime < _MIN_WORKER_LIFETIME:
+                # Don't spin on a worker that crashes at startup
+                time.sleep(_MIN_WORKER_LIFETIME)
+            self.spawn(index)
+
+    def _drain(self) -> None:
+        logger.info("Draining %s workers", len(self._children))
+        for pid in list(self._children):
+            self._signal(pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + self.graceful_timeout
+        while self._children and time.monotonic() < deadline:
+            self._reap(restart=False)
+            time.sleep(0.1)
+
+        for pid in list(self._children):
+            logger.warning("Worker pid %s did not drain in time; killing", pid)
+            self._signal(pid, signal.SIGKILL)
+        while self._children:
+            self._reap(restart=False)
+            time.sleep(0.1)
+
+        self.sock.close()
+        logger.info("Requests by worker: %s; restarts: %s", list(self.counters), self.restarts)
+
+    @staticmethod
+    def _signal(pid: int, signum: int) -> None:
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+
+def serve(workers: int, threads: int, host: Optional[str] = None, port: Optional[int] = None,
+          graceful_timeout: Optional[float] = None) -> None:
+    """Initialize the database once, then run the pre-fork server until stopped."""
+    from .models import init_db
+    from .models.database import close_pool
+
+    if host is not None:
+        config.HOST = host
+    if port is not None:
+        config.PORT = port
+
+    init_db()
+    # Children must open their own SQLite connections
+    close_pool()
+
+    sock = create_listen_socket(config.HOST, config.PORT, config.SERVER_BACKLOG)
+    arbiter = Arbiter(
+        sock,
+        workers,
+        threads,
+        config.SERVER_GRACEFUL_TIMEOUT if graceful_timeout is None else graceful_timeout
+    )
+    arbiter.run()
+
+
+def add_serve_arguments(parser: argparse.ArgumentParser) -> None:
+    """Arguments for the ``serve`` sub-command."""
+    parser.add_argument('--workers', type=int, default=config.SERVER_WORKERS,
+                        help='worker processes (default: %(default)s)')
+    parser.add_argument('--threads', type=int, default=config.SERVER_THREADS,
+                        help='request threads per worker (default: %(default)s)')
+    parser.add_argument('--host', default=None, help='bind address (default: FLASK_HOST)')
+    parser.add_argument('--port', type=int, default=None, help='bind port (default: FLASK_PORT)')
+    parser.add_argument('--graceful-timeout', type=float, default=None,
+                        help='seconds to let workers drain on shutdown (default: SERVER_GRACEFUL_TIMEOUT)')
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """Parse ``python -m backend.app`` arguments."""
+    parser = argparse.ArgumentParser(prog='python -m backend.app')
+    commands = parser.add_subparsers(dest='command')
+    add_serve_arguments(commands.add_parser('serve', help='run the pre-fork production server'))
+    commands.add_parser('dev', help='run the Werkzeug development server (default)')
+    return parser.parse_args(argv)
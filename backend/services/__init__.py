@@ -0,0 +1,11 @@
+"""Upstream-facing services for Radio Calico."""
+
+from .events import EventBroadcaster, SubscriberLimitError, event_broadcaster
+from .metadata import MetadataCache, metadata_cache
+from .stream_health import StreamProber, stream_prober
+from .upstream import CircuitOpenError, UpstreamClient, upstream_stats
+
+__all__ = [
+    'EventBroadcaster', 'SubscriberLimitError', 'event_broadcaster', 'MetadataCache', 'metadata_cache',
+    'StreamProber', 'stream_prober', 'CircuitOpenError', 'UpstreamClient', 'upstream_stats'
+]
@@ -0,0 +1,302 @@
+"""Server-Sent Events broadcast of track changes and live vote counts."""
+
+import json
+import logging
+import queue
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from ..config import config
+from ..models.rating import Rating
+from .metadata import metadata_cache
+
+logger = logging.getLogger(__name__)
+
+# Metadata fields the player renders; everything else stays server-side
+TRACK_FIELDS = (
+    'artist', 'title', 'album', 'date', 'bit_depth', 'sample_rate',
+    'is_new', 'is_summer', 'is_vidgames',
+    *(f'prev_{field}_{i}' for i in range(1, 6) for field in ('artist', 'title'))
+)
+
+_TRACK_ID_RE = re.compile(r'[^a-z0-9-]')
+
+
+def track_id_for(metadata: Dict[str, Any]) -> str:
+    """Build the same track ID as ``MetadataManager.generateTrackId``.
+
+    The browser replaces each UTF-16 code unit, so characters outside
+    the BMP become two dashes.
+    """
+    artist = metadata.get('artist') or 'unknown'
+    title = metadata.get('title') or 'unknown'
+    return _TRACK_ID_RE.sub(
+        lambda match: '--' if ord(match.group()) > 0xFFFF else '-',
+        f'{artist}-{title}'.lower()
+    )
+
+
+def format_event(event: str, data: Dict[str, Any]) -> str:
+    """Serialise one SSE message."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def _load_current_metadata() -> Dict[str, Any]:
+    return metadata_cache.get().metadata
+
+
+def _load_counts(track_id: str) -> Dict[str, int]:
+    return Rating.get_track_ratings(track_id)['ratings']
+
+
+class SubscriberLimitError(RuntimeError):
+    """Raised when a process already serves ``max_subscribers`` streams."""
+
+
+class Subscription:
+    """One connected client's queue of pending messages."""
+
+    def __init__(self, max_pending: int):
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self.closed = False
+
+    def put(self, message: str) -> bool:
+        """Queue a message; returns False if the client has fallen behind."""
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except queue.Full:
+            self.closed = True
+            return False
+
+    def get(self, timeout: float) -> Optional[str]:
+        """Next message, or None after ``timeout`` seconds of silence."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroadcaster:
+    """Fans out now-playing changes to every SSE subscriber.
+
+    A single background thread polls the metadata source every
+    ``poll_interval`` seconds while anyone is subscribed and publishes a
+    ``track`` event only when the track ID changes. Vote counts for the
+    current track are re-read on every poll (catching votes taken by
+    other processes) and after ``notify_rating``, coalescing bursts of
+    votes into at most one ``ratings`` event per ``debounce`` seconds.
+
+    A subscriber that falls more than ``max_pending`` messages behind is
+    closed; the browser reconnects and starts again from a snapshot. At
+    most ``max_subscribers`` clients are accepted at once.
+    """
+
+    def __init__(self, metadata_source: Callable[[], Dict[str, Any]] = _load_current_metadata,
+                 counts_loader: Callable[[str], Dict[str, int]] = _load_counts,
+                 poll_interval: float = 5.0, debounce: float = 1.0, max_pending: int = 32,
+                 max_subscribers: int = 256, clock: Callable[[], float] = time.monotonic):
+        self.metadata_source = metadata_source
+        self.counts_loader = counts_loader
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.max_pending = max_pending
+        self.max_subscribers = max_subscribers
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscription] = []
+        self._track_id: Optional[str] = None
+        self._track_message: Optional[str] = None
+        self._counts: Optional[Dict[str, int]] = None
+        self._counts_message: Optional[str] = None
+        self._dirty_since: Optional[float] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {'track_events': 0, 'rating_events': 0, 'messages_sent': 0,
+                       'dropped_subscribers': 0, 'rejected_subscribers': 0, 'poll_errors': 0}
+
+    @property
+    def current_track_id(self) -> Optional[str]:
+        return self._track_id
+
+    def subscribe(self) -> Subscription:
+        """Register a client, queueing the current state as its first messages.
+
+        Raises ``SubscriberLimitError`` once ``max_subscribers`` are connected.
+        """
+        subscription = Subscription(self.max_pending)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self._stats['rejected_subscribers'] += 1
+                raise SubscriberLimitError(f'{self.max_subscribers} live update streams already open')
+            for message in (self._track_message, self._counts_message):
+                if message is not None:
+                    subscription.put(message)
+            self._subscribers.append(subscription)
+        self.start()
+        self._wake.set()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Forget a client."""
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def close_subscribers(self) -> None:
+        """End every open stream; clients reconnect elsewhere."""
+        with self._lock:
+            subscriptions, self._subscribers = self._subscribers, []
+        for subscription in subscriptions:
+            subscription.closed = True
+            # Wake the stream so it notices promptly
+            subscription.put(': closing\n\n')
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event: str, data: Dict[str, Any]) -> str:
+        """Send an event to every subscriber; returns the formatted message."""
+        message = format_event(event, data)
+        with self._lock:
+            for subscription in list(self._subscribers):
+                if subscription.put(message):
+                    self._stats['messages_sent'] += 1
+                else:
+                    self._subscribers.remove(subscription)
+                    self._stats['dropped_subscribers'] += 1
+        return message
+
+    def notify_rating(self, track_id: str) -> None:
+        """Note that votes for ``track_id`` changed."""
+        with self._lock:
+            if track_id != self._track_id or not self._subscribers:
+                return
+            if self._dirty_since is None:
+                self._dirty_since = self._clock()
+        self._wake.set()
+
+    def poll(self) -> bool:
+        """Check the metadata source once; returns True if the track changed."""
+        try:
+            metadata = self.metadata_source()
+        except Exception as e:
+            self._stats['poll_errors'] += 1
+            logger.warning("Live updates metadata poll failed: %s", e)
+            return False
+
+        track_id = track_id_for(metadata)
+        if track_id == self._track_id:
+            return False
+
+        track = {field: metadata[field] for field in TRACK_FIELDS if field in metadata}
+        counts = self._read_counts(track_id)
+        message = self.publish('track', {'track_id': track_id, 'track': track, 'ratings': counts})
+        with self._lock:
+            self._track_id = track_id
+            self._track_message = message
+            self._counts = counts
+            self._counts_message = None
+            self._dirty_since = None
+            self._stats['track_events'] += 1
+        return True
+
+    def flush_ratings(self) -> bool:
+        """Publish the current track's counts if they changed."""
+        with self._lock:
+            track_id = self._track_id
+            self._dirty_since = None
+        if track_id is None:
+            return False
+
+        counts = self._read_counts(track_id)
+        if counts is None or counts == self._counts:
+            return False
+
+        message = self.publish('ratings', {'track_id': track_id, 'ratings': counts})
+        with self._lock:
+            if self._track_id == track_id:
+                self._counts = counts
+                self._counts_message = message
+            self._stats['rating_events'] += 1
+        return True
+
+    def _read_counts(self, track_id: str) -> Optional[Dict[str, int]]:
+        try:
+            return self.counts_loader(track_id)
+        except Exception as e:
+            logger.warning("Live updates could not read counts for %s: %s", track_id, e)
+            return None
+
+    def start(self) -> None:
+        """Start the poller thread if it is not already running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='live-updates', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the poller thread."""
+        self._stop.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        next_poll = self._clock()
+        while not self._stop.is_set():
+            if not self.subscriber_count():
+                # Nobody listening: sleep until someone subscribes
+                self._wake.wait()
+                self._wake.clear()
+                next_poll = self._clock()
+                continue
+
+            now = self._clock()
+            if now >= next_poll:
+                if not self.poll():
+                    self.flush_ratings()
+                next_poll = now + self.poll_interval
+            elif self._dirty_since is not None and now - self._dirty_since >= self.debounce:
+                self.flush_ratings()
+
+            timeout = next_poll - self._clock()
+            if self._dirty_since is not None:
+                timeout = min(timeout, self._dirty_since + self.debounce - self._clock())
+            self._wake.wait(max(0.0, timeout))
+            self._wake.clear()
+
+    def clear(self) -> None:
+        """Forget the current track and counts."""
+        with self._lock:
+            self._track_id = None
+            self._track_message = None
+            self._counts = None
+            self._counts_message = None
+            self._dirty_since = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return subscriber and event counters."""
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'current_track_id': self._track_id,
+                'running': self._thread is not None and self._thread.is_alive(),
+                **self._stats
+            }
+
+
+event_broadcaster = EventBroadcaster(
+    poll_interval=config.EVENTS_POLL_INTERVAL,
+    debounce=config.EVENTS_RATING_DEBOUNCE,
+    max_pending=config.EVENTS_MAX_PENDING,
+    max_subscribers=config.EVENTS_MAX_SUBSCRIBERS
+)
@@ -0,0 +1,202 @@
+"""Shared, upstream-aware cache for now-playing metadata."""
+
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass, replace
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from ..config import config
+from .upstream import metadata_client
+
+logger = logging.getLogger(__name__)
+
+_MAX_AGE_RE = re.compile(r'(?:^|,)\s*(s-maxage|max-age)\s*=\s*"?(\d+)"?', re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class CachedMetadata:
+    """A metadata document and the upstream headers it came with."""
+
+    metadata: Dict[str, Any]
+    date: Optional[str]
+    cache_control: Optional[str]
+    fetched_at: float
+    expires_at: float
+    stale: bool = False
+
+    def age(self, now: float) -> float:
+        """Seconds since the document was fetched."""
+        return max(0.0, now - self.fetched_at)
+
+
+def upstream_ttl(headers: Mapping[str, str], now: Optional[float] = None) -> Optional[float]:
+    """Remaining freshness lifetime advertised by upstream response headers.
+
+    Uses ``s-maxage``/``max-age`` from Cache-Control minus the response's
+    current age (the ``Age`` header, or ``now - Date``). Returns 0 for
+    ``no-cache``/``no-store`` and None when the headers give no guidance.
+    """
+    cache_control = headers.get('cache-control') or ''
+    directives = cache_control.lower()
+    if 'no-store' in directives or 'no-cache' in directives:
+        return 0.0
+
+    max_ages = dict((name.lower(), int(value)) for name, value in _MAX_AGE_RE.findall(cache_control))
+    lifetime = max_ages.get('s-maxage', max_ages.get('max-age'))
+    if lifetime is None:
+        return None
+
+    age = 0.0
+    if headers.get('age'):
+        try:
+            age = float(headers['age'])
+        except ValueError:
+            pass
+    elif headers.get('date'):
+        try:
+            sent = parsedate_to_datetime(headers['date']).timestamp()
+            age = max(0.0, (time.time() if now is None else now) - sent)
+        except (TypeError, ValueError):
+            pass
+
+    return max(0.0, lifetime - age)
+
+
+def fetch_metadata() -> Tuple[Dict[str, Any], Mapping[str, str]]:
+    """Fetch the metadata document from the upstream CDN."""
+    response = metadata_client.get(config.METADATA_URL)
+    response.raise_for_status()
+    return response.json(), response.headers
+
+
+class _Refresh:
+    """An upstream fetch in progress, shared by every caller that needs it."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Optional[CachedMetadata] = None
+        self.error: Optional[BaseException] = None
+
+
+class MetadataCache:
+    """Process-wide metadata cache.
+
+    Freshness follows the upstream Cache-Control/Date headers, clamped to
+    ``[min_ttl, max_ttl]``. Concurrent misses share a single upstream
+    fetch; while it runs, callers that can be served a stale copy (no
+    older than ``max_stale`` seconds past expiry) get it immediately. If
+    the fetch fails, the stale copy is served instead of an error.
+    """
+
+    def __init__(self, fetch: Callable[[], Tuple[Dict[str, Any], Mapping[str, str]]] = fetch_metadata,
+                 min_ttl: float = 1.0, max_ttl: float = 30.0, max_stale: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.fetch = fetch
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.max_stale = max_stale
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entry: Optional[CachedMetadata] = None
+        self._refresh: Optional[_Refresh] = None
+        self._stats = {'hits': 0, 'misses': 0, 'stale_served': 0,
+                       'upstream_fetches': 0, 'upstream_errors': 0, 'coalesced': 0}
+
+    def _usable_stale(self, entry: Optional[CachedMetadata], now: float) -> bool:
+        return entry is not None and now - entry.expires_at <= self.max_stale
+
+    def get(self) -> CachedMetadata:
+        """Return current metadata, fetching upstream only when needed.
+
+        Raises the upstream error if there is nothing usable to serve.
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entry
+            if entry is not None and now < entry.expires_at:
+                self._stats['hits'] += 1
+                return entry
+
+            self._stats['misses'] += 1
+            refresh = self._refresh
+            if refresh is not None:
+                if self._usable_stale(entry, now):
+                    self._stats['stale_served'] += 1
+                    return replace(entry, stale=True)
+                self._stats['coalesced'] += 1
+                leader = False
+            else:
+                refresh = self._refresh = _Refresh()
+                self._stats['upstream_fetches'] += 1
+                leader = True
+
+        if not leader:
+            refresh.event.wait()
+            if refresh.error is not None:
+                raise refresh.error
+            return refresh.result
+
+        try:
+            refresh.result = self._fetch(entry)
+            return refresh.result
+        except BaseException as e:
+            refresh.error = e
+            raise
+        finally:
+            with self._lock:
+                self._refresh = None
+            refresh.event.set()
+
+    def _fetch(self, previous: Optional[CachedMetadata]) -> CachedMetadata:
+        try:
+            metadata, headers = self.fetch()
+        except Exception as e:
+            now = self._clock()
+            with self._lock:
+                self._stats['upstream_errors'] += 1
+                if self._usable_stale(previous, now):
+                    self._stats['stale_served'] += 1
+                    logger.warning("Metadata upstream failed, serving stale copy: %s", e)
+                    return replace(previous, stale=True)
+            raise
+
+        now = self._clock()
+        ttl = upstream_ttl(headers)
+        ttl = self.min_ttl if ttl is None else min(max(ttl, self.min_ttl), self.max_ttl)
+        entry = CachedMetadata(
+            metadata=metadata,
+            date=headers.get('date'),
+            cache_control=headers.get('cache-control'),
+            fetched_at=now,
+            expires_at=now + ttl
+        )
+        with self._lock:
+            self._entry = entry
+        return entry
+
+    def clear(self) -> None:
+        """Forget the cached document."""
+        with self._lock:
+            self._entry = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache counters and the age of the cached document."""
+        now = self._clock()
+        with self._lock:
+            entry = self._entry
+            return {
+                'cached': entry is not None,
+                'age': entry.age(now) if entry else None,
+                'fresh': entry is not None and now < entry.expires_at,
+                **self._stats
+            }
+
+
+metadata_cache = MetadataCache(
+    min_ttl=config.METADATA_CACHE_MIN_TTL,
+    max_ttl=config.METADATA_CACHE_MAX_TTL,
+    max_stale=config.METADATA_CACHE_MAX_STALE
+)
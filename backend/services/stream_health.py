@@ -0,0 +1,274 @@
+"""Background health prober for the HLS stream."""
+
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urljoin
+
+import requests
+
+from ..config import config
+from .upstream import UpstreamClient, stream_client
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Playlist:
+    """The parts of an HLS playlist the prober cares about."""
+
+    variants: List[str]
+    segments: List[str]
+    target_duration: Optional[float] = None
+    media_sequence: Optional[int] = None
+    last_segment_duration: Optional[float] = None
+    last_program_date_time: Optional[datetime] = None
+
+    @classmethod
+    def parse(cls, text: str, base_url: str) -> 'Playlist':
+        """Parse a master or media playlist, resolving URIs against ``base_url``."""
+        playlist = cls(variants=[], segments=[])
+        pending_variant = False
+        duration = None
+        program_date_time = None
+
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('#EXT-X-STREAM-INF'):
+                pending_variant = True
+            elif line.startswith('#EXT-X-TARGETDURATION:'):
+                playlist.target_duration = float(line.split(':', 1)[1])
+            elif line.startswith('#EXT-X-MEDIA-SEQUENCE:'):
+                playlist.media_sequence = int(line.split(':', 1)[1])
+            elif line.startswith('#EXTINF:'):
+                duration = float(line.split(':', 1)[1].split(',', 1)[0])
+            elif line.startswith('#EXT-X-PROGRAM-DATE-TIME:'):
+                try:
+                    program_date_time = datetime.fromisoformat(
+                        line.split(':', 1)[1].replace('Z', '+00:00')
+                    )
+                except ValueError:
+                    program_date_time = None
+            elif not line.startswith('#'):
+                uri = urljoin(base_url, line)
+                if pending_variant:
+                    playlist.variants.append(uri)
+                    pending_variant = False
+                else:
+                    playlist.segments.append(uri)
+                    playlist.last_segment_duration = duration
+                    playlist.last_program_date_time = program_date_time
+                    duration = program_date_time = None
+
+        return playlist
+
+
+@dataclass
+class ProbeResult:
+    """Outcome of one probe of the stream."""
+
+    checked_at: float
+    status: str
+    playlist_status: Optional[int] = None
+    playlist_ttfb_ms: Optional[float] = None
+    segment_status: Optional[int] = None
+    segment_ttfb_ms: Optional[float] = None
+    media_sequence: Optional[int] = None
+    segment_age: Optional[float] = None
+    live_edge_lag: Optional[float] = None
+    content_type: Optional[str] = None
+    server: Optional[str] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def summary(self) -> Dict[str, Any]:
+        """The fields kept in the latency history."""
+        return {
+            'checked_at': self.checked_at,
+            'status': self.status,
+            'playlist_ttfb_ms': self.playlist_ttfb_ms,
+            'segment_ttfb_ms': self.segment_ttfb_ms,
+            'segment_age': self.segment_age
+        }
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+class StreamProber:
+    """Periodically checks the HLS playlist and its newest segment.
+
+    Each probe fetches the playlist (following the first variant of a
+    master playlist), then HEADs the newest segment. The stream is
+    ``online`` when both answer and the live edge is moving,
+    ``degraded`` when the playlist answers but the segment fails or the
+    newest segment has not changed for three target durations, and
+    ``offline`` otherwise. The last ``history`` results are kept in a
+    ring buffer.
+    """
+
+    def __init__(self, client: UpstreamClient = stream_client, url: Optional[str] = None,
+                 interval: float = 15.0, history: int = 60,
+                 clock: Callable[[], float] = time.monotonic,
+                 wall_clock: Callable[[], float] = time.time):
+        self.client = client
+        self.url = url
+        self.interval = interval
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._lock = threading.Lock()
+        self._history: deque = deque(maxlen=history)
+        self._newest_segment: Optional[str] = None
+        self._newest_segment_seen_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def probe(self) -> ProbeResult:
+        """Run one probe and record it."""
+        result = self._probe(self.url or config.STREAM_URL)
+        with self._lock:
+            self._history.append(result)
+        if result.status != 'online':
+            logger.warning("Stream probe: %s (%s)", result.status, result.error)
+        return result
+
+    def _probe(self, url: str) -> ProbeResult:
+        result = ProbeResult(checked_at=self._wall_clock(), status='offline')
+        try:
+            started = time.perf_counter()
+            response = self.client.get(url, stream=True)
+            # Close even unread bodies, or the keep-alive connection never returns to the pool
+            try:
+                result.playlist_ttfb_ms = _elapsed_ms(started)
+                result.playlist_status = response.status_code
+                result.content_type = response.headers.get('content-type')
+                result.server = response.headers.get('server')
+                if response.status_code != 200:
+                    result.error = f'HTTP {response.status_code}'
+                    return result
+                playlist = Playlist.parse(response.text, url)
+            finally:
+                response.close()
+
+            if playlist.variants and not playlist.segments:
+                response = self.client.get(playlist.variants[0])
+                try:
+                    if response.status_code != 200:
+                        result.error = f'Variant playlist HTTP {response.status_code}'
+                        return result
+                    playlist = Playlist.parse(response.text, playlist.variants[0])
+                finally:
+                    response.close()
+        except (requests.RequestException, ValueError) as e:
+            result.error = str(e)
+            return result
+
+        result.status = 'online'
+        result.media_sequence = playlist.media_sequence
+        if not playlist.segments:
+            result.status = 'degraded'
+            result.error = 'Playlist has no segments'
+            return result
+
+        self._check_freshness(playlist, result)
+        self._check_segment(playlist.segments[-1], result)
+        return result
+
+    def _check_freshness(self, playlist: Playlist, result: ProbeResult) -> None:
+        now = self._clock()
+        newest = playlist.segments[-1]
+        if newest != self._newest_segment:
+            self._newest_segment = newest
+            self._newest_segment_seen_at = now
+        result.segment_age = round(now - self._newest_segment_seen_at, 2)
+
+        if playlist.last_program_date_time is not None:
+            live_edge = playlist.last_program_date_time.timestamp() + (playlist.last_segment_duration or 0)
+            result.live_edge_lag = round(self._wall_clock() - live_edge, 2)
+
+        if playlist.target_duration and result.segment_age > 3 * playlist.target_duration:
+            result.status = 'degraded'
+            result.error = f'Live edge has not moved for {result.segment_age:.0f}s'
+
+    def _check_segment(self, segment_url: str, result: ProbeResult) -> None:
+        try:
+            started = time.perf_counter()
+            response = self.client.head(segment_url)
+            response.close()
+            result.segment_ttfb_ms = _elapsed_ms(started)
+            result.segment_status = response.status_code
+        except requests.RequestException as e:
+            result.status = 'degraded'
+            result.error = f'Segment unavailable: {e}'
+            return
+
+        if response.status_code >= 400:
+            result.status = 'degraded'
+            result.error = f'Segment HTTP {response.status_code}'
+
+    def latest(self) -> Optional[ProbeResult]:
+        with self._lock:
+            return self._history[-1] if self._history else None
+
+    def history(self) -> List[Dict[str, Any]]:
+        """Summaries of recent probes, oldest first."""
+        with self._lock:
+            return [result.summary() for result in self._history]
+
+    def snapshot(self) -> ProbeResult:
+        """Latest result, probing inline if nothing has run yet.
+
+        Also starts the background thread, so only the very first caller
+        waits on the CDN.
+        """
+        result = self.latest()
+        if result is None:
+            result = self.probe()
+        self.start()
+        return result
+
+    def start(self) -> None:
+        """Start the background prober if it is not already running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='stream-prober', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the background prober."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.probe()
+            except Exception as e:
+                logger.error("Stream probe crashed: %s", e)
+
+    def clear(self) -> None:
+        """Forget recorded probes."""
+        with self._lock:
+            self._history.clear()
+            self._newest_segment = None
+            self._newest_segment_seen_at = None
+
+
+stream_prober = StreamProber(
+    interval=config.STREAM_PROBE_INTERVAL,
+    history=config.STREAM_PROBE_HISTORY
+)
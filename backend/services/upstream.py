@@ -0,0 +1,255 @@
+"""Shared HTTP client for the upstream CDN.
+
+Every upstream request goes through a pooled keep-alive ``requests``
+session with separate connect/read timeouts. Idempotent requests are
+retried a bounded number of times with jittered exponential backoff, and
+each upstream has a circuit breaker that fails fast after repeated
+failures so callers can fall back to cached data.
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..config import config
+from ..utils.metrics import upstream_request_duration
+from ..utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of contacting an upstream whose breaker is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    Opens after ``failure_threshold`` failures in a row. Once
+    ``reset_timeout`` seconds have passed a single trial request is let
+    through (half-open); its outcome closes or re-opens the breaker.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Return True if a request may be sent now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.times_opened += 1
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+    def reset(self) -> None:
+        """Close the breaker and forget past failures."""
+        self.record_success()
+
+
+def create_session(pool_size: int) -> requests.Session:
+    """Keep-alive session with a connection pool per upstream host.
+
+    Retries are handled by ``UpstreamClient`` so they can be jittered and
+    counted, so the adapter itself never retries.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class UpstreamClient:
+    """Requests to one upstream, with retries, a breaker and latency stats."""
+
+    def __init__(self, name: str, session: requests.Session,
+                 connect_timeout: float = 3.05, read_timeout: float = 10.0,
+                 retries: int = 2, backoff: float = 0.2,
+                 breaker: Optional[CircuitBreaker] = None,
+                 sleep: Callable[[float], None] = time.sleep,
+                 latency_window: int = 256):
+        self.name = name
+        self.session = session
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._latencies: deque = deque(maxlen=latency_window)
+        self._stats = {'requests': 0, 'failures': 0, 'retries': 0, 'rejected': 0}
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request('HEAD', url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """Send a request, retrying transient failures of idempotent methods.
+
+        Raises ``CircuitOpenError`` without contacting the upstream while
+        the breaker is open. Responses with a 5xx status count as
+        failures but are still returned once retries are exhausted.
+        """
+        if not self.breaker.allow():
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise CircuitOpenError(f'{self.name} upstream circuit is open')
+
+        method = method.upper()
+        send = getattr(self.session, method.lower())
+        kwargs.setdefault('timeout', self.timeout)
+        attempts = 1 + (self.retries if method in IDEMPOTENT_METHODS else 0)
+
+        try:
+            for attempt in range(attempts):
+                if attempt:
+                    with self._lock:
+                        self._stats['retries'] += 1
+                    # Full jitter keeps recovering clients from retrying in lockstep
+                    self._sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+
+                started = time.perf_counter()
+                try:
+                    with span(f'{method} {self.name}', 'upstream', url=url, attempt=attempt):
+                        response = send(url, **kwargs)
+                except requests.RequestException as e:
+                    self._record(time.perf_counter() - started, failed=True)
+                    if attempt + 1 < attempts:
+                        logger.info("%s upstream request failed, retrying: %s", self.name, e)
+                        continue
+                    raise
+
+                failed = response.status_code >= 500
+                self._record(time.perf_counter() - started, failed=failed)
+                if failed and response.status_code in RETRY_STATUSES and attempt + 1 < attempts:
+                    # Hand the connection back before retrying
+                    response.close()
+                    continue
+                if failed:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                return response
+        except BaseException:
+            # Any way out without a response must settle the breaker, or a
+            # half-open trial would stay in flight and block every request
+            self.breaker.record_failure()
+            raise
+
+    def _record(self, elapsed: float, failed: bool) -> None:
+        upstream_request_duration.observe(elapsed, upstream=self.name, outcome='error' if failed else 'ok')
+        with self._lock:
+            self._stats['requests'] += 1
+            if failed:
+                self._stats['failures'] += 1
+            self._latencies.append(elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return request counters, recent latency (ms) and breaker state."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = dict(self._stats)
+
+        def percentile(fraction: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000, 2)
+
+        return {
+            **stats,
+            'breaker': self.breaker.state,
+            'breaker_opened': self.breaker.times_opened,
+            'latency_ms': {
+                'p50': percentile(0.50),
+                'p95': percentile(0.95),
+                'max': percentile(1.0)
+            }
+        }
+
+    def reset(self) -> None:
+        """Close the breaker and clear counters."""
+        self.breaker.reset()
+        with self._lock:
+            self._latencies.clear()
+            self._stats = dict.fromkeys(self._stats, 0)
+
+
+def _create_client(name: str, session: requests.Session) -> UpstreamClient:
+    return UpstreamClient(
+        name,
+        session,
+        connect_timeout=config.UPSTREAM_CONNECT_TIMEOUT,
+        read_timeout=config.UPSTREAM_READ_TIMEOUT,
+        retries=config.UPSTREAM_RETRIES,
+        backoff=config.UPSTREAM_RETRY_BACKOFF,
+        breaker=CircuitBreaker(config.UPSTREAM_BREAKER_THRESHOLD, config.UPSTREAM_BREAKER_RESET)
+    )
+
+
+_session = create_session(config.UPSTREAM_POOL_SIZE)
+
+# Both upstreams live on the CDN and share its connection pool, but trip
+# separately: a broken metadata document says nothing about the stream.
+metadata_client = _create_client('metadata', _session)
+stream_client = _create_client('stream', _session)
+
+UPSTREAMS = (metadata_client, stream_client)
+
+
+def upstream_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-upstream counters for the health endpoint."""
+    return {client.name: client.stats() for client in UPSTREAMS}
@@ -0,0 +1,139 @@
+"""In-process caching utilities for Radio Calico."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Flight:
+    """A load in progress for one key, shared by every caller that misses."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        self.invalidated = False
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry time-to-live.
+
+    ``get_or_load`` coalesces concurrent misses for the same key so the
+    loader runs once while other callers wait for its result. A key that
+    is invalidated while its load is in flight is not stored, so a write
+    can never be overwritten by a read that started before it.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 5.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()  # key -> (value, expires_at)
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0,
+                       'invalidations': 0, 'coalesced': 0}
+
+    def _lookup(self, key: Hashable):
+        """Return (found, value); caller must hold the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+
+        value, expires_at = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self._stats['expirations'] += 1
+            return False, None
+
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        """Insert a value and evict least recently used entries; caller holds the lock."""
+        self._entries[key] = (value, self._clock() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a cached value or ``default``."""
+        with self._lock:
+            found, value = self._lookup(key)
+            self._stats['hits' if found else 'misses'] += 1
+            return value if found else default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value."""
+        with self._lock:
+            self._store(key, value)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for ``key``, loading it once on a miss."""
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self._stats['hits'] += 1
+                return value
+
+            self._stats['misses'] += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats['coalesced'] += 1
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                leader = True
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                if flight.error is None and not flight.invalidated:
+                    self._store(key, flight.value)
+            flight.event.set()
+
+        return flight.value
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a key and discard the result of any load in flight for it."""
+        with self._lock:
+            self._entries.pop(key, None)
+            flight = self._flights.pop(key, None)
+            if flight is not None:
+                flight.invalidated = True
+            self._stats['invalidations'] += 1
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+            for flight in self._flights.values():
+                flight.invalidated = True
+            self._flights.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit, miss and eviction counters."""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hit_rate': self._stats['hits'] / lookups if lookups else 0.0,
+                **self._stats
+            }
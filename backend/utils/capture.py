@@ -0,0 +1,257 @@
+"""Sampled capture of real requests for replay.
+
+A sampled request is summarized after its response (method, path,
+query, JSON body, status and duration) and handed to a background
+writer through a bounded queue, so request threads never touch the
+disk; when the queue is full the record is dropped and counted.
+Listener fingerprints, emails and every other string in a JSON body
+(except the ``SAFE_BODY_FIELDS`` replay depends on) are replaced by
+keyed hashes (``CAPTURE_SALT``) before anything is queued: the same
+listener maps to the same anonymous id, so toggles and repeat votes
+survive, but the original cannot be recovered.
+
+Sampling is per listener where a request carries a fingerprint, so a
+captured listener's whole session is kept rather than scattered
+requests. Records are appended to ``<CAPTURE_DIR>/capture-<pid>.jsonl.gz``
+as gzip members of JSON lines, one member per batch; a file larger than
+``CAPTURE_MAX_FILE_MB`` is moved to ``.1`` and a new one started.
+``python -m benchmarks replay`` reads them back.
+"""
+
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlencode
+
+from ..config import config
+
+logger = logging.getLogger(__name__)
+
+# Request fields holding listener identities, wherever they appear
+FINGERPRINT_FIELDS = ('fingerprint', 'user_fingerprint')
+# JSON body fields kept verbatim; all other strings in a body are hashed
+SAFE_BODY_FIELDS = frozenset({'rating', 'track_id', 'track_ids', 'sample_rate'})
+# Larger bodies are captured without their content
+MAX_BODY_BYTES = 16384
+# Blueprints and endpoints that are never captured
+EXCLUDED_BLUEPRINTS = frozenset({'admin'})
+EXCLUDED_ENDPOINTS = frozenset({'static'})
+
+
+class TrafficCapture:
+    """Decides which requests are captured and writes them in the background."""
+
+    def __init__(self, sample_rate: float, directory: str, max_bytes: int, salt: str,
+                 queue_size: int = 10000, flush_interval: float = 1.0, batch_size: int = 500,
+                 random_source: Callable[[], float] = random.random):
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._key = salt.encode('utf-8')
+        self._random = random_source
+        self._queue_size = queue_size
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+        self._stop = threading.Event()
+        self._stats = {'captured': 0, 'dropped': 0, 'written': 0, 'write_errors': 0, 'rotations': 0}
+
+    @property
+    def path(self) -> str:
+        # Resolved per call: pre-fork workers each get their own file
+        return os.path.join(self.directory, f'capture-{os.getpid()}.jsonl.gz')
+
+    def _digest(self, value: str) -> str:
+        return hmac.new(self._key, value.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def anonymize(self, fingerprint: str) -> str:
+        """Stable anonymous id shaped like a browser fingerprint."""
+        return self._digest(fingerprint)[:32]
+
+    def anonymize_email(self, email: str) -> str:
+        return f'{self._digest(email.lower())[:16]}@example.com'
+
+    def sampled(self, anonymous_fingerprint: Optional[str]) -> bool:
+        """Sample by listener when there is one, so sessions stay whole."""
+        if self.sample_rate <= 0:
+            return False
+        if anonymous_fingerprint:
+            return int(anonymous_fingerprint[:8], 16) / 0x100000000 < self.sample_rate
+        return self._random() < self.sample_rate
+
+    def record(self, entry: Dict[str, Any]) -> bool:
+        """Queue a captured request; returns False if it had to be dropped."""
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+            return False
+        with self._lock:
+            self._stats['captured'] += 1
+        return True
+
+    def _ensure_writer(self) -> None:
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked: the parent's queue and writer thread did not come along
+                self._pid = os.getpid()
+                self._queue = queue.Queue(maxsize=self._queue_size)
+                self._thread = None
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='traffic-capture', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+        # Drain what is left on shutdown
+        batch = self._next_batch(wait=False)
+        while batch:
+            self._write(batch)
+            batch = self._next_batch(wait=False)
+
+    def _next_batch(self, wait: bool = True) -> List[Dict[str, Any]]:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if wait and timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if self._stop.is_set():
+                wait = False
+        return batch
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        lines = ''.join(json.dumps(entry, separators=(',', ':'), default=str) + '\n' for entry in batch)
+        path = self.path
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            if os.path.exists(path) and os.path.getsize(path) > self.max_bytes:
+                os.replace(path, path + '.1')
+                with self._lock:
+                    self._stats['rotations'] += 1
+            # Each batch is a complete gzip member, so a crash loses at most one batch
+            with open(path, 'ab') as capture_file:
+                capture_file.write(gzip.compress(lines.encode('utf-8'), compresslevel=6))
+            with self._lock:
+                self._stats['written'] += len(batch)
+        except OSError as e:
+            with self._lock:
+                self._stats['write_errors'] += 1
+            logger.warning("Could not write %s captured requests: %s", len(batch), e)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the writer after it has written everything queued."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'sample_rate': self.sample_rate,
+                'path': self.path,
+                'queued': self._queue.qsize(),
+                **self._stats
+            }
+
+
+def request_fingerprint(request: Any) -> Optional[str]:
+    """The listener fingerprint a Flask request carries, if any."""
+    view_args = request.view_args or {}
+    if view_args.get('user_fingerprint'):
+        return view_args['user_fingerprint']
+    for name in FINGERPRINT_FIELDS:
+        if request.args.get(name):
+            return request.args[name]
+    if request.is_json:
+        # Already parsed and cached by the view
+        body = request.get_json(silent=True)
+        if isinstance(body, dict) and isinstance(body.get('user_fingerprint'), str):
+            return body['user_fingerprint'] or None
+    return None
+
+
+def anonymize_body(capture: TrafficCapture, value: Any, name: Optional[str] = None) -> Any:
+    """``value`` from a JSON body with every string outside ``SAFE_BODY_FIELDS`` hashed."""
+    if name in SAFE_BODY_FIELDS:
+        return value
+    if isinstance(value, dict):
+        return {key: anonymize_body(capture, item, key) for key, item in value.items()}
+    if isinstance(value, list):
+        return [anonymize_body(capture, item, name) for item in value]
+    if isinstance(value, str) and value:
+        # Emails stay valid emails so replayed requests pass validation
+        return capture.anonymize_email(value) if name == 'email' else capture.anonymize(value)
+    return value
+
+
+def anonymize_request(capture: TrafficCapture, request: Any) -> Dict[str, Any]:
+    """Path, query and JSON body of a Flask request with identities replaced."""
+    path = request.path
+    view_args = request.view_args or {}
+    if view_args.get('user_fingerprint'):
+        path = path.replace(view_args['user_fingerprint'], capture.anonymize(view_args['user_fingerprint']))
+
+    query = [(name, capture.anonymize(value) if name in FINGERPRINT_FIELDS and value else value)
+             for name, value in request.args.items(multi=True)]
+
+    result = {'path': path, 'query': urlencode(query)}
+    if request.content_length and request.content_length > MAX_BODY_BYTES:
+        result['body_omitted'] = True
+    elif request.is_json:
+        result['body'] = anonymize_body(capture, request.get_json(silent=True))
+    return result
+
+
+def capture_request(capture: TrafficCapture, request: Any, response: Any, started_at: float,
+                    duration: float) -> bool:
+    """Record ``request`` if it is sampled; returns True if it was queued."""
+    if request.blueprint in EXCLUDED_BLUEPRINTS or request.endpoint in EXCLUDED_ENDPOINTS:
+        return False
+    fingerprint = request_fingerprint(request)
+    if not capture.sampled(capture.anonymize(fingerprint) if fingerprint else None):
+        return False
+
+    entry = {
+        'ts': round(started_at, 6),
+        'method': request.method,
+        'route': request.url_rule.rule if request.url_rule else None,
+        **anonymize_request(capture, request),
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 3),
+        'pid': os.getpid()
+    }
+    return capture.record(entry)
+
+
+traffic_capture = TrafficCapture(
+    config.CAPTURE_SAMPLE_RATE,
+    config.CAPTURE_DIR,
+    int(config.CAPTURE_MAX_FILE_MB * 1024 * 1024),
+    config.CAPTURE_SALT
+)
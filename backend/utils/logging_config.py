@@ -1,48 +1,346 @@
-"""Logging configuration for Radio Calico application."""
+"""Logging configuration for Radio Calico application.
 
+Request threads never write logs themselves: the root logger has a
+single ``QueueHandler`` that puts records on a bounded queue, and a
+``QueueListener`` thread formats them and writes the file and console.
+When the queue is full the record is dropped and counted rather than
+blocking the request. Formatting happens on the listener thread, so
+log calls should pass arguments (``logger.info("saved %s", track_id)``)
+instead of building f-strings.
+
+Before a record is queued it passes a per-logger rate limit
+(``LOG_RATE_LIMIT`` messages per second) and, below WARNING, the
+sampling fraction configured for its logger (``LOG_SAMPLING``). The
+next message a rate-limited logger gets through notes how many were
+suppressed; dropped, suppressed and sampled-out counts are reported in
+``/health`` and ``/metrics``.
+
+The log file rotates at ``LOG_MAX_FILE_MB`` and keeps
+``LOG_BACKUP_COUNT`` gzipped files. Pre-fork workers share the file, so
+rotation happens under a lock file and the other workers reopen the new
+file instead of rotating again.
+"""
+
+import gzip
 import logging
 import os
-from typing import Optional
+import queue
+import random
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Callable, Dict, Iterator, Optional
+
 from ..config import config
+from . import metrics
+from .tracing import TracedHandlerMixin
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not POSIX; the pre-fork server needs POSIX anyway
+    fcntl = None
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+log_messages_dropped = metrics.registry.counter(
+    'radio_log_messages_dropped_total', 'Log records dropped because the log queue was full.'
+)
+log_messages_filtered = metrics.registry.counter(
+    'radio_log_messages_filtered_total', 'Log records discarded by rate limiting or sampling.',
+    ('logger', 'reason')
+)
+
+
+@contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    """Exclusive lock shared by every process writing the same log."""
+    with open(path, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    # Move the file aside first so the other workers reopen a fresh one at once
+    uncompressed = dest[:-len('.gz')]
+    os.replace(source, uncompressed)
+    with open(uncompressed, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(uncompressed)
+
+
+class CompressingRotatingFileHandler(RotatingFileHandler):
+    """Size-rotated log file whose rotated copies are gzipped.
+
+    Safe to share between pre-fork workers: rollover happens under an
+    exclusive lock on ``<file>.lock``, and a worker whose file was
+    rotated by a sibling reopens the new file instead of rotating again.
+    """
+
+    def __init__(self, filename: str, max_bytes: int, backup_count: int):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        self.namer = lambda name: name + '.gz'
+        self.rotator = _gzip_rotator
+        self._lock_path = self.baseFilename + '.lock'
+
+    def _reopen_if_rotated(self) -> bool:
+        """Drop the stream if another process rotated the file under it."""
+        if self.stream is None:
+            return False
+        try:
+            rotated = os.stat(self.baseFilename).st_ino != os.fstat(self.stream.fileno()).st_ino
+        except FileNotFoundError:
+            rotated = True
+        if rotated:
+            self.stream.close()
+            self.stream = None  # reopened by the next emit
+        return rotated
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self._reopen_if_rotated()
+        super().emit(record)
+
+    def doRollover(self) -> None:
+        with _file_lock(self._lock_path):
+            # A sibling may have rotated while we waited for the lock
+            if not self._reopen_if_rotated():
+                super().doRollover()
+
+
+class SuppressionFormatter(logging.Formatter):
+    """Notes how many earlier messages the rate limit suppressed."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            message += f' ({suppressed} earlier messages from this logger suppressed)'
+        return message
+
+
+class LogRateLimiter(logging.Filter):
+    """Per-logger token bucket plus sampling of low-severity records.
+
+    Records below WARNING from a logger with a sampling fraction are kept
+    with that probability. Every logger may then emit ``rate`` records a
+    second, in bursts of up to ``rate`` (at least one); CRITICAL is never
+    limited.
+    """
+
+    def __init__(self, rate: float, sampling: Optional[Dict[str, float]] = None,
+                 random_source: Callable[[], float] = random.random,
+                 clock: Callable[[], float] = time.monotonic):
+        super().__init__()
+        self.rate = rate
+        self.sampling = dict(sampling or {})
+        self._random = random_source
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, list] = {}
+        self._pending: Dict[str, int] = {}
+        self._fractions: Dict[str, float] = {}
+        self.suppressed: Dict[str, int] = {}
+        self.sampled_out: Dict[str, int] = {}
+
+    def _fraction(self, name: str) -> float:
+        """Sampling fraction of the logger or its nearest configured ancestor."""
+        fraction = self._fractions.get(name)
+        if fraction is None:
+            fraction, candidate = 1.0, name
+            while candidate:
+                if candidate in self.sampling:
+                    fraction = self.sampling[candidate]
+                    break
+                candidate = candidate.rpartition('.')[0]
+            self._fractions[name] = fraction
+        return fraction
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        name = record.name
+        if record.levelno < logging.WARNING and self.sampling:
+            fraction = self._fraction(name)
+            if fraction < 1.0 and self._random() >= fraction:
+                with self._lock:
+                    self.sampled_out[name] = self.sampled_out.get(name, 0) + 1
+                log_messages_filtered.inc(logger=name, reason='sampled')
+                return False
+
+        if self.rate <= 0 or record.levelno >= logging.CRITICAL:
+            return True
+        now = self._clock()
+        with self._lock:
+            burst = max(self.rate, 1.0)
+            bucket = self._buckets.get(name)
+            if bucket is None:
+                bucket = self._buckets[name] = [burst, now]
+            tokens = min(burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                self._pending[name] = self._pending.get(name, 0) + 1
+                self.suppressed[name] = self.suppressed.get(name, 0) + 1
+                suppressed = True
+            else:
+                bucket[0] = tokens - 1
+                record.suppressed = self._pending.pop(name, 0)
+                suppressed = False
+        if suppressed:
+            log_messages_filtered.inc(logger=name, reason='rate_limited')
+        return not suppressed
+
+
+class DroppingQueueHandler(TracedHandlerMixin, QueueHandler):
+    """Queues records for the listener thread without ever blocking.
+
+    Records are queued as they are: message formatting and traceback
+    rendering are left to the listener thread.
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__(queue.Queue(maxsize=maxsize))
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self.listener: Optional[QueueListener] = None
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener runs in this process, so the record needs no pickling
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+            log_messages_dropped.inc()
+
+    def start(self, *handlers: logging.Handler) -> None:
+        """Start a listener thread writing queued records to ``handlers``."""
+        self.listener = DropReportingListener(self, *handlers)
+        self.listener.start()
+
+    def restart_after_fork(self) -> None:
+        """Give a forked child its own queue and listener thread."""
+        if self.listener is None:
+            return
+        handlers = self.listener.handlers
+        # The parent's listener thread did not survive the fork
+        self.queue = queue.Queue(maxsize=self.maxsize)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self.start(*handlers)
+
+    def close(self) -> None:
+        """Write out everything queued, then stop the listener."""
+        if self.listener is not None:
+            listener, self.listener = self.listener, None
+            listener.stop()
+        super().close()
+
+
+class DropReportingListener(QueueListener):
+    """Listener that logs how many records were dropped once it catches up."""
+
+    def __init__(self, source: DroppingQueueHandler, *handlers: logging.Handler):
+        super().__init__(source.queue, *handlers, respect_handler_level=True)
+        self.source = source
+        self.reported = 0
+
+    def enqueue_sentinel(self) -> None:
+        # Wait for room: a full queue must not make stop() fail
+        self.queue.put(self._sentinel)
+
+    def handle(self, record: logging.LogRecord) -> None:
+        super().handle(record)
+        dropped = self.source.dropped
+        if dropped > self.reported and self.queue.empty():
+            notice = logging.LogRecord(__name__, logging.WARNING, __file__, 0,
+                                       'Dropped %d log messages: the log queue was full',
+                                       (dropped - self.reported,), None)
+            self.reported = dropped
+            super().handle(notice)
+
+
+_queue_handler: Optional[DroppingQueueHandler] = None
+_rate_limiter: Optional[LogRateLimiter] = None
+
+
+def _restart_after_fork() -> None:
+    if _queue_handler is not None:
+        _queue_handler.restart_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def logging_stats() -> Optional[Dict[str, Any]]:
+    """Queue depth and discarded record counts, or None if not configured here."""
+    if _queue_handler is None:
+        return None
+    return {
+        'queue_size': _queue_handler.maxsize,
+        'queued': _queue_handler.queue.qsize(),
+        'dropped': _queue_handler.dropped,
+        'suppressed': dict(_rate_limiter.suppressed),
+        'sampled_out': dict(_rate_limiter.sampled_out)
+    }
 
 
 def setup_logging(log_level: Optional[str] = None, log_file: Optional[str] = None) -> None:
     """Setup application logging configuration."""
-    
+    global _queue_handler, _rate_limiter
+
     # Use config values if not provided
     if log_level is None:
         log_level = config.LOG_LEVEL
     if log_file is None:
         log_file = config.LOG_FILE
-    
+
+    # Like basicConfig, leave an already configured root logger alone
+    root = logging.getLogger()
+    if root.handlers:
+        return
+
     # Create logs directory if it doesn't exist
     log_dir = os.path.dirname(log_file)
     if log_dir and not os.path.exists(log_dir):
         os.makedirs(log_dir)
-    
-    # Configure logging format
-    log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    date_format = '%Y-%m-%d %H:%M:%S'
-    
+
     # Set logging level
     numeric_level = getattr(logging, log_level.upper(), None)
     if not isinstance(numeric_level, int):
         numeric_level = logging.INFO
-    
-    # Configure root logger
-    logging.basicConfig(
-        level=numeric_level,
-        format=log_format,
-        datefmt=date_format,
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()
-        ]
+
+    formatter = SuppressionFormatter(LOG_FORMAT, DATE_FORMAT)
+    file_handler = CompressingRotatingFileHandler(
+        log_file, int(config.LOG_MAX_FILE_MB * 1024 * 1024), config.LOG_BACKUP_COUNT
     )
-    
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    # Created after its targets: logging.shutdown() closes handlers newest
+    # first, so the queue is drained before the file is closed
+    _rate_limiter = LogRateLimiter(config.LOG_RATE_LIMIT, config.LOG_SAMPLING)
+    _queue_handler = DroppingQueueHandler(config.LOG_QUEUE_SIZE)
+    _queue_handler.addFilter(_rate_limiter)
+    _queue_handler.start(file_handler, stream_handler)
+
+    root.setLevel(numeric_level)
+    root.addHandler(_queue_handler)
+
     # Configure specific loggers
     logging.getLogger('werkzeug').setLevel(logging.WARNING)
     logging.getLogger('urllib3').setLevel(logging.WARNING)
-    
+
     logger = logging.getLogger(__name__)
-    logger.info(f"Logging configured - Level: {log_level}, File: {log_file}")
\ No newline at end of file
+    logger.info("Logging configured - Level: %s, File: %s", log_level, log_file)
@@ -0,0 +1,206 @@
+"""Memory introspection for Radio Calico: tracemalloc, GC and RSS.
+
+Snapshots are kept in this process, a bounded number at a time, and
+can be listed, inspected and diffed grouped by file or by line. Like
+``/metrics`` and the profiler, everything here describes the worker
+that answers the request, except ``process_memory`` which can read any
+sibling worker's RSS from ``/proc``.
+"""
+
+import gc
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from ..config import config
+
+logger = logging.getLogger(__name__)
+
+GROUP_BY = ('lineno', 'filename')
+
+# Allocations made by tracemalloc itself and by the import machinery
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+class SnapshotNotFound(KeyError):
+    """No retained snapshot has the requested id."""
+
+
+def _stat_dict(stat: Any) -> Dict[str, Any]:
+    frame = stat.traceback[0]
+    result = {
+        'file': frame.filename,
+        'line': frame.lineno,
+        'size_bytes': stat.size,
+        'count': stat.count
+    }
+    if hasattr(stat, 'size_diff'):
+        result['size_diff_bytes'] = stat.size_diff
+        result['count_diff'] = stat.count_diff
+    return result
+
+
+def _read_proc_status(pid: int) -> Optional[Dict[str, int]]:
+    fields = {'VmRSS': 'rss_bytes', 'VmHWM': 'peak_rss_bytes'}
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            result = {}
+            for line in status:
+                key, _, value = line.partition(':')
+                if key in fields:
+                    # Reported as "<n> kB"
+                    result[fields[key]] = int(value.split()[0]) * 1024
+            return result or None
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def process_memory(pid: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Current and peak RSS of ``pid`` (default: this process).
+
+    Reads ``/proc``; elsewhere only this process's peak RSS is known.
+    """
+    own = pid is None or pid == os.getpid()
+    pid = os.getpid() if pid is None else pid
+    memory = _read_proc_status(pid)
+    if memory is None and own:
+        try:
+            import resource
+        except ImportError:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        memory = {'peak_rss_bytes': peak if sys.platform == 'darwin' else peak * 1024}
+    if memory is None:
+        return None
+    return {'pid': pid, **memory}
+
+
+def worker_memory(pids: Iterable[int]) -> List[Dict[str, Any]]:
+    """RSS of each listed process that is still readable."""
+    return [memory for memory in (process_memory(pid) for pid in pids if pid) if memory is not None]
+
+
+def gc_stats() -> Dict[str, Any]:
+    """Collector thresholds, pending counts and per-generation totals."""
+    return {
+        'enabled': gc.isenabled(),
+        'thresholds': list(gc.get_threshold()),
+        'counts': list(gc.get_count()),
+        'generations': gc.get_stats(),
+        'uncollectable': len(gc.garbage)
+    }
+
+
+def object_histogram(limit: int = 25) -> List[Dict[str, Any]]:
+    """Most common live object types tracked by the collector."""
+    counts = Counter(type(obj).__qualname__ for obj in gc.get_objects())
+    return [{'type': name, 'count': count} for name, count in counts.most_common(limit)]
+
+
+def _describe(snapshot_id: int, entry: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'id': snapshot_id,
+        'taken_at': entry['taken_at'],
+        'total_bytes': entry['total_bytes']
+    }
+
+
+class MemoryProfiler:
+    """Starts tracemalloc on demand and keeps the latest snapshots."""
+
+    def __init__(self, frames: int = 1, max_snapshots: int = 5):
+        self.frames = frames
+        self.max_snapshots = max_snapshots
+        self._lock = threading.Lock()
+        self._snapshots: 'OrderedDict[int, Dict[str, Any]]' = OrderedDict()
+        self._ids = itertools.count(1)
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: Optional[int] = None) -> None:
+        """Start tracing allocations; already-running tracing is left alone."""
+        if tracemalloc.is_tracing():
+            return
+        tracemalloc.start(frames or self.frames)
+        logger.info("tracemalloc started with %s frames", tracemalloc.get_traceback_limit())
+
+    def stop(self) -> None:
+        """Stop tracing; retained snapshots remain available."""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("tracemalloc stopped")
+
+    def take_snapshot(self) -> Dict[str, Any]:
+        """Record a snapshot, evicting the oldest beyond ``max_snapshots``."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError('tracemalloc is not tracing')
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+        entry = {
+            'snapshot': snapshot,
+            'taken_at': time.time(),
+            'total_bytes': sum(stat.size for stat in snapshot.statistics('filename'))
+        }
+        with self._lock:
+            snapshot_id = next(self._ids)
+            self._snapshots[snapshot_id] = entry
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return _describe(snapshot_id, entry)
+
+    def _get(self, snapshot_id: int) -> Dict[str, Any]:
+        with self._lock:
+            entry = self._snapshots.get(snapshot_id)
+        if entry is None:
+            raise SnapshotNotFound(snapshot_id)
+        return entry
+
+    def snapshots(self) -> List[Dict[str, Any]]:
+        """Retained snapshots, oldest first."""
+        with self._lock:
+            return [_describe(snapshot_id, entry) for snapshot_id, entry in self._snapshots.items()]
+
+    def top(self, snapshot_id: int, group_by: str = 'lineno', limit: int = 20) -> List[Dict[str, Any]]:
+        """Largest allocation sites in a snapshot."""
+        snapshot = self._get(snapshot_id)['snapshot']
+        return [_stat_dict(stat) for stat in snapshot.statistics(group_by)[:limit]]
+
+    def diff(self, old_id: int, new_id: int, group_by: str = 'lineno',
+             limit: int = 20) -> List[Dict[str, Any]]:
+        """Allocation sites that changed most between two snapshots."""
+        old = self._get(old_id)['snapshot']
+        new = self._get(new_id)['snapshot']
+        return [_stat_dict(stat) for stat in new.compare_to(old, group_by)[:limit]]
+
+    def clear(self) -> None:
+        """Drop retained snapshots."""
+        with self._lock:
+            self._snapshots.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            'tracing': tracemalloc.is_tracing(),
+            'frames': tracemalloc.get_traceback_limit() if tracemalloc.is_tracing() else self.frames,
+            'traced_bytes': current,
+            'traced_peak_bytes': peak,
+            'overhead_bytes': tracemalloc.get_tracemalloc_memory(),
+            'snapshots': self.snapshots()
+        }
+
+
+memory_profiler = MemoryProfiler(frames=config.MEMORY_TRACE_FRAMES, max_snapshots=config.MEMORY_MAX_SNAPSHOTS)
@@ -0,0 +1,66 @@
+"""Keyset (cursor) pagination utilities for Radio Calico."""
+
+import base64
+import binascii
+import json
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from flask import Request
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(key: Sequence[Any]) -> str:
+    """Encode a sort key as an opaque, URL-safe cursor."""
+    payload = json.dumps(list(key), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> Tuple[Any, ...]:
+    """Decode a cursor produced by ``encode_cursor``.
+
+    ``types`` gives the expected type of each key component; anything
+    else raises ``InvalidCursorError``.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise InvalidCursorError(f'Malformed cursor: {e}') from e
+
+    if not isinstance(key, list) or len(key) != len(types):
+        raise InvalidCursorError('Cursor does not match this listing')
+    for value, expected in zip(key, types):
+        if not isinstance(value, expected) or isinstance(value, bool):
+            raise InvalidCursorError('Cursor does not match this listing')
+
+    return tuple(key)
+
+
+def paginate(items: List[Any], limit: int,
+             key: Callable[[Any], Sequence[Any]]) -> Tuple[List[Any], Optional[str]]:
+    """Split a ``limit + 1`` result set into a page and the next cursor.
+
+    Callers fetch one row more than ``limit``; if it is present there is
+    another page, and the cursor points after the last row returned.
+    """
+    if len(items) <= limit:
+        return items, None
+
+    page = items[:limit]
+    return page, encode_cursor(key(page[-1]))
+
+
+def get_limit_arg(request: Request, default: int, maximum: int = 100) -> int:
+    """Read the ``limit`` query parameter, clamped to ``1..maximum``."""
+    limit = request.args.get('limit', default, type=int)
+    return max(1, min(limit, maximum))
+
+
+def get_cursor_arg(request: Request, types: Sequence[type]) -> Optional[Tuple[Any, ...]]:
+    """Decode the ``after`` query parameter, if present."""
+    cursor = request.args.get('after')
+    if not cursor:
+        return None
+    return decode_cursor(cursor, types)
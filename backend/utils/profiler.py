@@ -0,0 +1,177 @@
+"""Opt-in sampling profiler with collapsed-stack (flame graph) export.
+
+A background thread wakes ``hz`` times a second, reads the stacks of
+threads that are currently serving a request via
+``sys._current_frames()`` and counts each stack. Only request threads
+are sampled, so idle accept loops and background pollers stay out of
+the profile, and sampling can be narrowed to chosen blueprints. The
+counts render as collapsed stacks (``frame;frame;frame count``), the
+input format of flamegraph.pl, speedscope and Perfetto.
+
+A thread is used rather than SIGPROF because signal handlers only run
+on the main thread, while requests are served on pool threads.
+Profiles are per process, like ``/metrics``.
+"""
+
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from ..config import config
+
+logger = logging.getLogger(__name__)
+
+MAX_DEPTH = 128
+
+# Root frame for requests handled by app-level routes
+APP_ROUTES = 'app'
+
+_DROPPED = '[dropped: too many distinct stacks]'
+
+
+def _frame_label(frame: Any) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f'{module}.{name}:{code.co_firstlineno}'.replace(';', ':')
+
+
+def collapse_stack(frame: Any, root: str, max_depth: int = MAX_DEPTH) -> str:
+    """Collapsed ``root;outer;...;inner`` stack for ``frame``."""
+    labels = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(root)
+    return ';'.join(reversed(labels))
+
+
+class SamplingProfiler:
+    """Samples the stacks of request threads at a fixed rate."""
+
+    def __init__(self, hz: int = 99, max_stacks: int = 10000,
+                 current_frames: Callable[[], Dict[int, Any]] = sys._current_frames):
+        self.hz = hz
+        self.blueprints: Optional[frozenset] = None
+        self.max_stacks = max_stacks
+        self._current_frames = current_frames
+        self._lock = threading.Lock()
+        self._active: Dict[int, str] = {}
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        self._sampling_seconds = 0.0
+        self._started_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def enter(self, blueprint: Optional[str]) -> None:
+        """Mark the calling thread as serving a request for ``blueprint``."""
+        self._active[threading.get_ident()] = blueprint or APP_ROUTES
+
+    def exit(self) -> None:
+        """Mark the calling thread as idle again."""
+        self._active.pop(threading.get_ident(), None)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, hz: Optional[int] = None, blueprints: Optional[Iterable[str]] = None) -> None:
+        """Start sampling, optionally only requests in ``blueprints``.
+
+        Restarting a running profiler applies the new settings and keeps
+        the stacks collected so far.
+        """
+        self.stop()
+        with self._lock:
+            if hz is not None:
+                self.hz = hz
+            self.blueprints = frozenset(blueprints) if blueprints else None
+            self._started_at = time.monotonic()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+        logger.info("Sampling profiler started at %s Hz%s", self.hz,
+                    f" for {', '.join(sorted(self.blueprints))}" if self.blueprints else '')
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop sampling; collected stacks are kept."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            logger.info("Sampling profiler stopped")
+        self._thread = None
+
+    def _run(self) -> None:
+        interval = 1.0 / self.hz
+        while not self._stop.wait(interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error("Profiler sample failed: %s", e)
+
+    def sample(self) -> int:
+        """Record the current stack of every profiled request thread."""
+        started = time.perf_counter()
+        me = threading.get_ident()
+        blueprints = self.blueprints
+        # Copy first: request threads add and remove themselves concurrently
+        active = dict(self._active)
+        frames = self._current_frames()
+
+        stacks = []
+        for thread_id, blueprint in active.items():
+            if thread_id == me or (blueprints is not None and blueprint not in blueprints):
+                continue
+            frame = frames.get(thread_id)
+            if frame is not None:
+                stacks.append(collapse_stack(frame, blueprint))
+        del frames
+
+        with self._lock:
+            for stack in stacks:
+                if stack not in self._stacks and len(self._stacks) >= self.max_stacks:
+                    stack = _DROPPED
+                self._stacks[stack] += 1
+            self._samples += 1
+            self._sampling_seconds += time.perf_counter() - started
+        return len(stacks)
+
+    def collapsed(self, reset: bool = False) -> str:
+        """Collected stacks in collapsed-stack format, heaviest first."""
+        with self._lock:
+            lines = [f'{stack} {count}' for stack, count in self._stacks.most_common()]
+            if reset:
+                self._reset()
+        return '\n'.join(lines) + ('\n' if lines else '')
+
+    def reset(self) -> None:
+        """Forget collected stacks."""
+        with self._lock:
+            self._reset()
+
+    def _reset(self) -> None:
+        self._stacks.clear()
+        self._samples = 0
+        self._sampling_seconds = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'running': self.running,
+                'hz': self.hz,
+                'blueprints': sorted(self.blueprints) if self.blueprints else None,
+                'samples': self._samples,
+                'stack_samples': sum(self._stacks.values()),
+                'distinct_stacks': len(self._stacks),
+                'sampling_seconds': round(self._sampling_seconds, 4),
+                'running_seconds': (round(time.monotonic() - self._started_at, 1)
+                                    if self.running and self._started_at is not None else None)
+            }
+
+
+profiler = SamplingProfiler(hz=config.PROFILER_HZ, max_stacks=config.PROFILER_MAX_STACKS)
@@ -2,6 +2,7 @@
 
 from flask import jsonify
 from typing import Any, Dict, Optional
+from .tracing import span
 
 
 def success_response(data: Any = None, message: str = "Success", status_code: int = 200):
@@ -17,21 +18,24 @@ def success_response(data: Any = None, message: str = "Success", status_code: in
         else:
             response_data['data'] = data
     
-    return jsonify(response_data), status_code
+    with span('jsonify', 'serialize'):
+        return jsonify(response_data), status_code
 
 
-def error_response(message: str, status_code: int = 400, error_code: Optional[str] = None):
-    """Create a standardized error response."""
+def error_response(message: str, status_code: int = 400, error_code: Optional[str] = None, **fields: Any):
+    """Create a standardized error response, with any ``fields`` added to the body."""
     response_data = {
         'success': False,
         'error': message,
-        'status_code': status_code
+        'status_code': status_code,
+        **fields
     }
     
     if error_code:
         response_data['error_code'] = error_code
     
-    return jsonify(response_data), status_code
+    with span('jsonify', 'serialize'):
+        return jsonify(response_data), status_code
 
 
 def validation_error_response(errors: Dict[str, str]):
@@ -39,5 +43,6 @@ def validation_error_response(errors: Dict[str, str]):
     return error_response(
         message="Validation failed",
         status_code=422,
-        error_code="VALIDATION_ERROR"
-    )[0].get_json() | {'validation_errors': errors}, 422
\ No newline at end of file
+        error_code="VALIDATION_ERROR",
+        validation_errors=errors
+    )
\ No newline at end of file
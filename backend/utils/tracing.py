@@ -0,0 +1,196 @@
+"""Sampled per-request tracing with Chrome trace-event export.
+
+A sampled request gets a ``Trace`` in a context variable; ``span()``
+blocks anywhere below it (DB statements, upstream calls, serialization,
+logging) record timed events into it. Unsampled requests pay for one
+context variable lookup per span. Finished traces are appended to
+``<TRACE_DIR>/trace-<pid>.json`` in the JSON Array trace-event format,
+which chrome://tracing, Perfetto and speedscope load directly.
+"""
+
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from ..config import config
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[Optional['Trace']] = ContextVar('radio_trace', default=None)
+
+
+def _now_us() -> float:
+    # CLOCK_MONOTONIC is shared by every process, so workers line up
+    return time.monotonic_ns() / 1000
+
+
+class Trace:
+    """Timed events recorded for one request."""
+
+    def __init__(self, name: str, **args: Any):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.args = args
+        self.pid = os.getpid()
+        self.tid = threading.get_native_id()
+        self.start = _now_us()
+        self.end: Optional[float] = None
+        self.events: List[Dict[str, Any]] = []
+
+    def add(self, name: str, category: str, start: float, end: float, args: Dict[str, Any]) -> None:
+        self.events.append({
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': start,
+            'dur': end - start,
+            'pid': self.pid,
+            'tid': threading.get_native_id(),
+            'args': args
+        })
+
+    def finish(self, **args: Any) -> None:
+        self.end = _now_us()
+        self.args.update(args)
+
+    def to_events(self) -> List[Dict[str, Any]]:
+        """The request span followed by its child spans."""
+        end = self.end if self.end is not None else _now_us()
+        root = {
+            'name': self.name,
+            'cat': 'request',
+            'ph': 'X',
+            'ts': self.start,
+            'dur': end - self.start,
+            'pid': self.pid,
+            'tid': self.tid,
+            'args': {'trace_id': self.trace_id, **self.args}
+        }
+        return [root, *self.events]
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, category: str = 'app', **args: Any) -> Iterator[None]:
+    """Time the enclosed block if the current request is being traced."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+
+    start = _now_us()
+    try:
+        yield
+    finally:
+        trace.add(name, category, start, _now_us(), args)
+
+
+def traced(name: Optional[str] = None, category: str = 'model') -> Callable:
+    """Decorator recording a span around each call of the function."""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TracedHandlerMixin:
+    """Logging handler mixin recording a span for every emitted record."""
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        with span(f'log {type(self).__name__}', 'logging', logger=record.name, level=record.levelname):
+            return super().handle(record)
+
+
+class ChromeTraceExporter:
+    """Appends traces to a per-process trace-event JSON file.
+
+    The file is a JSON array left open at the end, which trace viewers
+    accept, so each trace is a cheap append. When the file grows past
+    ``max_bytes`` it is moved to ``.1`` and a new one started.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {'exported': 0, 'export_errors': 0, 'rotations': 0}
+
+    @property
+    def path(self) -> str:
+        # Resolved per call: pre-fork workers each get their own file
+        return os.path.join(self.directory, f'trace-{os.getpid()}.json')
+
+    def export(self, trace: Trace) -> None:
+        events = ',\n'.join(json.dumps(event, separators=(',', ':'), default=str)
+                            for event in trace.to_events())
+        path = self.path
+        with self._lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                size = os.path.getsize(path) if os.path.exists(path) else 0
+                if size > self.max_bytes:
+                    os.replace(path, path + '.1')
+                    self._stats['rotations'] += 1
+                    size = 0
+                with open(path, 'a', encoding='utf-8') as trace_file:
+                    trace_file.write(('[\n' if size == 0 else ',\n') + events)
+                self._stats['exported'] += 1
+            except OSError as e:
+                self._stats['export_errors'] += 1
+                logger.warning("Could not export trace %s: %s", trace.trace_id, e)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'path': self.path, **self._stats}
+
+
+class Tracer:
+    """Decides which requests are traced and exports them."""
+
+    def __init__(self, sample_rate: float, exporter: ChromeTraceExporter,
+                 random_source: Callable[[], float] = random.random):
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+        self._random = random_source
+
+    def start(self, name: str, **args: Any) -> Optional[Token]:
+        """Begin a trace for this context if it is sampled."""
+        if self.sample_rate <= 0 or self._random() >= self.sample_rate:
+            return None
+        return _current.set(Trace(name, **args))
+
+    def finish(self, token: Optional[Token], **args: Any) -> Optional[Trace]:
+        """End the trace begun by ``start`` and export it."""
+        if token is None:
+            return None
+        trace = _current.get()
+        _current.reset(token)
+        if trace is None:
+            return None
+        trace.finish(**args)
+        self.exporter.export(trace)
+        return trace
+
+
+tracer = Tracer(
+    config.TRACE_SAMPLE_RATE,
+    ChromeTraceExporter(config.TRACE_DIR, int(config.TRACE_MAX_FILE_MB * 1024 * 1024))
+)
@@ -4,6 +4,7 @@ import re
 import logging
 from typing import Optional, Dict, Any
 from flask import Request
+from .tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -11,13 +12,14 @@ logger = logging.getLogger(__name__)
 def validate_json(request: Request) -> Optional[Dict[str, Any]]:
     """Validate and return JSON data from request."""
     try:
-        data = request.get_json()
+        with span('parse json', 'serialize'):
+            data = request.get_json()
         if not data:
             logger.warning("No JSON data provided in request")
             return None
         return data
     except Exception as e:
-        logger.error(f"Invalid JSON in request: {e}")
+        logger.error("Invalid JSON in request: %s", e)
         return None
 
 
@@ -45,6 +47,20 @@ def validate_required_fields(data: Dict[str, Any], required_fields: list) -> Opt
     return None
 
 
+def validate_track_ids(track_ids: Any, max_items: int) -> Optional[str]:
+    """Validate a list of track IDs for batch lookups."""
+    if not isinstance(track_ids, list) or not track_ids:
+        return "track_ids must be a non-empty list"
+    
+    if len(track_ids) > max_items:
+        return f"At most {max_items} track_ids may be requested at once"
+    
+    if not all(isinstance(track_id, str) and track_id.strip() for track_id in track_ids):
+        return "track_ids must be non-empty strings"
+    
+    return None
+
+
 def validate_string_length(value: str, min_length: int = 1, max_length: int = 255) -> bool:
     """Validate string length."""
     if not isinstance(value, str):
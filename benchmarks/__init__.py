@@ -0,0 +1,4 @@
+"""Benchmark suite for Radio Calico models and endpoints.
+
+Kept apart from the pytest correctness run; see ``python -m benchmarks --help``.
+"""
@@ -0,0 +1,419 @@
+"""Command line entry point: ``python -m benchmarks <seed|run|load|replay|storage|compare>``."""
+
+import argparse
+import logging
+import os
+import secrets
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from backend.config import STORAGE_PROFILES
+
+from .harness import (
+    DEFAULT_MIN_DELTA_MS, DEFAULT_THRESHOLD, compare, environment, format_comparison, load_results,
+    run_benchmarks, save_results
+)
+from .loadgen import (
+    METADATA_UPDATE_INTERVAL, ClientTarget, FakeCDN, HttpTarget, LoadGenerator, LoadProfile, Station, format_report
+)
+from .replay import Replayer, captured_latency, read_capture
+from .seed import SCALES, ensure_seeded, listener_fingerprints, resolve_spec
+from .storage import RatingWorkload, format_profiles
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(HERE, 'data')
+RESULTS_DIR = os.path.join(HERE, 'results')
+BASELINES_DIR = os.path.join(HERE, 'baselines')
+
+# Where the CDN stand-in listens when the server under load runs separately
+DEFAULT_CDN_PORT = 8765
+
+logger = logging.getLogger('benchmarks')
+
+
+def baseline_path(scale: str) -> str:
+    return os.path.join(BASELINES_DIR, f'{scale}.json')
+
+
+def _spec(args: argparse.Namespace):
+    return resolve_spec(args.scale, seed=args.seed, users=args.users, posts=args.posts,
+                        tracks=args.tracks, listeners=args.listeners, ratings=args.ratings)
+
+
+def seed_command(args: argparse.Namespace) -> int:
+    path, counts = ensure_seeded(args.data_dir, _spec(args), force=args.force)
+    print(f'{path}: {counts}')
+    return 0
+
+
+@contextmanager
+def app_over_copy(database_path: str, log_level: str) -> Iterator[Any]:
+    """The app over a throwaway copy of ``database_path``."""
+    # Benchmarks, load runs and replays write, so they get a throwaway copy
+    workdir = tempfile.mkdtemp(prefix='radio-bench-')
+    database = os.path.join(workdir, 'bench.db')
+    shutil.copyfile(database_path, database)
+
+    from backend.config import config
+    config.DATABASE_PATH = database
+    config.ADMIN_TOKEN = secrets.token_hex(16)
+
+    from backend.app import create_app
+    from backend.models import init_db
+    from backend.models.database import close_pool
+    from backend.services import event_broadcaster, stream_prober
+
+    logging.getLogger().setLevel(log_level)
+    try:
+        init_db()
+        app = create_app()
+        app.config['TESTING'] = True
+        yield app
+    finally:
+        event_broadcaster.stop()
+        stream_prober.stop()
+        close_pool()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+@contextmanager
+def seeded_app(args: argparse.Namespace, spec) -> Iterator[Tuple[Any, Dict[str, int]]]:
+    """The app over a copy of the seeded database, and its row counts."""
+    seeded_path, counts = ensure_seeded(args.data_dir, spec, force=args.reseed)
+    with app_over_copy(seeded_path, args.log_level) as app:
+        yield app, counts
+
+
+def run_command(args: argparse.Namespace) -> int:
+    spec = _spec(args)
+    from backend.config import config
+    from .suites import SUITES, BenchContext, stub_upstreams
+
+    stub_upstreams()
+    with seeded_app(args, spec) as (app, counts):
+        ctx = BenchContext(spec=spec, client=app.test_client(),
+                           admin_headers={'Authorization': f'Bearer {config.ADMIN_TOKEN}'})
+
+        def report(name, result):
+            print(f"{name:<45} {result['median_ms']:>10.4f} ms  p95 {result['p95_ms']:>10.4f} ms  "
+                  f"({result['iterations']} runs)", flush=True)
+
+        results = {}
+        for suite in args.suites:
+            benchmarks = SUITES[suite](ctx)
+            results.update(run_benchmarks(benchmarks, args.iterations, args.warmup,
+                                          name_filter=args.filter, report=report))
+
+    meta = {
+        **environment(),
+        'scale': args.scale,
+        'spec': spec.__dict__,
+        'rows': counts,
+        'iterations': args.iterations,
+        'warmup': args.warmup
+    }
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{args.scale}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    save_results(output, meta, results)
+    print(f'\nResults written to {output}')
+
+    if args.save_baseline:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        save_results(baseline_path(args.scale), meta, results)
+        print(f'Baseline saved to {baseline_path(args.scale)}')
+    return 0
+
+
+def load_command(args: argparse.Namespace) -> int:
+    spec = _spec(args)
+    profile = LoadProfile(listeners=args.concurrency, duration=args.duration, ramp=args.ramp,
+                          poll_interval=args.poll_interval, live_share=args.live_share,
+                          vote_probability=args.vote_probability, revote_probability=args.revote_probability,
+                          workers=args.workers, seed=spec.seed)
+    station = Station(spec, track_seconds=args.track_seconds)
+    fingerprints = listener_fingerprints(spec)
+    counts = None
+
+    cdn_port = args.cdn_port if args.cdn_port is not None else (DEFAULT_CDN_PORT if args.target else 0)
+    with FakeCDN(station, port=cdn_port) as cdn:
+        if args.target:
+            print(f'CDN stand-in at {cdn.base_url}; the server needs\n'
+                  f'  METADATA_URL={cdn.metadata_url} STREAM_URL={cdn.stream_url} '
+                  f'COVER_ART_URL={cdn.cover_art_url}\n', flush=True)
+            target = HttpTarget(args.target)
+            report = LoadGenerator(target, station, cdn.base_url, fingerprints, profile).run()
+        else:
+            from backend.config import config
+            config.METADATA_URL = cdn.metadata_url
+            config.STREAM_URL = cdn.stream_url
+            config.COVER_ART_URL = cdn.cover_art_url
+            with seeded_app(args, spec) as (app, counts):
+                report = LoadGenerator(ClientTarget(app), station, cdn.base_url, fingerprints, profile).run()
+        served = cdn.served()
+
+    print(format_report(report))
+
+    meta = {
+        **environment(),
+        'scale': args.scale,
+        'spec': spec.__dict__,
+        'rows': counts,
+        'target': args.target or 'in-process',
+        'profile': asdict(profile),
+        'track_seconds': args.track_seconds,
+        'summary': {key: value for key, value in report.items() if key != 'endpoints'},
+        'cdn_requests': served
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR,
+                              f"load-{args.scale}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    save_results(output, meta, report['endpoints'])
+    print(f'\nResults written to {output}')
+    return 1 if report['errors'] else 0
+
+
+def replay_command(args: argparse.Namespace) -> int:
+    entries = read_capture(args.files)
+    if args.path_prefix:
+        entries = [entry for entry in entries if entry['path'].startswith(tuple(args.path_prefix))]
+    if args.limit:
+        entries = entries[:args.limit]
+    if not entries:
+        print('No captured requests to replay', file=sys.stderr)
+        return 2
+    span = entries[-1]['ts'] - entries[0]['ts']
+    print(f'Replaying {len(entries)} requests captured over {span:.1f}s at speed {args.speed:g}', flush=True)
+
+    counts = None
+    if args.target:
+        report = Replayer(HttpTarget(args.target), entries, args.speed, args.lanes).run()
+    else:
+        from .suites import stub_upstreams
+        stub_upstreams()
+        if args.database:
+            with app_over_copy(args.database, args.log_level) as app:
+                report = Replayer(ClientTarget(app), entries, args.speed, args.lanes).run()
+        else:
+            with seeded_app(args, _spec(args)) as (app, counts):
+                report = Replayer(ClientTarget(app), entries, args.speed, args.lanes).run()
+
+    print(format_report(report))
+    captured = captured_latency(entries)
+    print('\ncaptured vs replayed p50 ms:')
+    for name, stats in captured.items():
+        replayed = report['endpoints'].get(name)
+        if replayed:
+            print(f"  {name}: {stats['p50_ms']:.3f} -> {replayed['p50_ms']:.3f}")
+    for change in report['status_changes'][:10]:
+        print(f"status changed: {change['endpoint']} {change['captured']} -> {change['replayed']} "
+              f"({change['count']}x)")
+
+    meta = {
+        **environment(),
+        'scale': None if args.target or args.database else args.scale,
+        'rows': counts,
+        'target': args.target or args.database or 'in-process',
+        'captures': args.files,
+        'speed': args.speed,
+        'lanes': args.lanes,
+        'summary': {key: value for key, value in report.items() if key != 'endpoints'},
+        'captured_latency': captured
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"replay-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    save_results(output, meta, report['endpoints'])
+    print(f'\nResults written to {output}')
+    return 0
+
+
+def storage_command(args: argparse.Namespace) -> int:
+    spec = _spec(args)
+    from backend.config import config
+    from backend.models import Rating
+
+    workload = RatingWorkload(spec, duration=args.duration, threads=args.threads, write_share=args.write_share)
+    seeded_path, counts = ensure_seeded(args.data_dir, spec, force=args.reseed)
+    original_profile = config.DB_STORAGE_PROFILE
+    reports = {}
+    try:
+        for profile in args.profiles:
+            print(f'Running {profile} for {args.duration:g}s', flush=True)
+            config.DB_STORAGE_PROFILE = profile
+            Rating.clear_cache()
+            with app_over_copy(seeded_path, args.log_level):
+                reports[profile] = workload.run(config.DATABASE_PATH)
+    finally:
+        config.DB_STORAGE_PROFILE = original_profile
+
+    print()
+    print(format_profiles(reports))
+
+    meta = {
+        **environment(),
+        'scale': args.scale,
+        'spec': spec.__dict__,
+        'rows': counts,
+        'threads': args.threads,
+        'write_share': args.write_share,
+        'duration': args.duration
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR,
+                              f"storage-{args.scale}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    save_results(output, meta, reports)
+    print(f'\nResults written to {output}')
+    return 1 if any(report['errors'] for report in reports.values()) else 0
+
+
+def compare_command(args: argparse.Namespace) -> int:
+    current = load_results(args.current)
+    baseline_file = args.baseline or baseline_path(current['meta'].get('scale', 'small'))
+    if not os.path.exists(baseline_file):
+        print(f'No baseline at {baseline_file}; create one with "run --save-baseline"', file=sys.stderr)
+        return 2
+    baseline = load_results(baseline_file)
+
+    for key in ('scale', 'spec', 'python', 'sqlite', 'machine'):
+        if baseline['meta'].get(key) != current['meta'].get(key):
+            print(f"warning: {key} differs (baseline {baseline['meta'].get(key)!r}, "
+                  f"current {current['meta'].get(key)!r})", file=sys.stderr)
+
+    rows = compare(baseline, current, args.threshold, args.min_delta_ms, args.metric)
+    print(format_comparison(rows, args.metric))
+    return 1 if any(row['status'] == 'regression' for row in rows) else 0
+
+
+def _add_spec_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small',
+                        help='preset data volume (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=None, help='random seed for the data generator')
+    for table in ('users', 'posts', 'tracks', 'listeners', 'ratings'):
+        parser.add_argument(f'--{table}', type=int, default=None, help=f'override the number of {table}')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='where seeded databases are cached')
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed = commands.add_parser('seed', help='build (or reuse) a seeded database')
+    _add_spec_arguments(seed)
+    seed.add_argument('--force', action='store_true', help='rebuild even if a cached database exists')
+
+    run = commands.add_parser('run', help='run the benchmarks and write JSON results')
+    _add_spec_arguments(run)
+    run.add_argument('--suite', dest='suites', action='append', choices=['models', 'endpoints'],
+                     help='suite to run; repeatable (default: all)')
+    run.add_argument('--filter', default=None, help='only benchmarks whose name contains this text')
+    run.add_argument('--iterations', type=int, default=200, help='timed calls per benchmark (default: %(default)s)')
+    run.add_argument('--warmup', type=int, default=10, help='untimed calls first (default: %(default)s)')
+    run.add_argument('--output', default=None, help='results file (default: benchmarks/results/<scale>-<time>.json)')
+    run.add_argument('--save-baseline', action='store_true', help='also store the results as the scale baseline')
+    run.add_argument('--reseed', action='store_true', help='rebuild the seeded database first')
+    run.add_argument('--log-level', default='WARNING', help='application log level (default: %(default)s)')
+
+    load = commands.add_parser('load', help='simulate concurrent listeners and report latency per endpoint')
+    _add_spec_arguments(load)
+    load.add_argument('--target', default=None,
+                      help='base URL of a running server (default: the app in this process)')
+    load.add_argument('--concurrency', type=int, default=100,
+                      help='simulated listeners connected at once (default: %(default)s)')
+    load.add_argument('--duration', type=float, default=60.0, help='seconds to run (default: %(default)s)')
+    load.add_argument('--ramp', type=float, default=10.0,
+                      help='seconds over which listeners join (default: %(default)s)')
+    load.add_argument('--track-seconds', type=float, default=180.0,
+                      help='length of each track on the stand-in station (default: %(default)s)')
+    load.add_argument('--poll-interval', type=float, default=METADATA_UPDATE_INTERVAL,
+                      help='metadata polling interval of non-live listeners (default: %(default)s)')
+    load.add_argument('--live-share', type=float, default=0.9,
+                      help='share of listeners on the live update stream (default: %(default)s)')
+    load.add_argument('--vote-probability', type=float, default=0.1,
+                      help='chance per track that a listener votes (default: %(default)s)')
+    load.add_argument('--revote-probability', type=float, default=0.3,
+                      help='chance that a voter clicks again (default: %(default)s)')
+    load.add_argument('--workers', type=int, default=32,
+                      help='threads running scheduled listener actions (default: %(default)s)')
+    load.add_argument('--cdn-port', type=int, default=None,
+                      help=f'CDN stand-in port (default: {DEFAULT_CDN_PORT} with --target, else any free port)')
+    load.add_argument('--output', default=None,
+                      help='results file (default: benchmarks/results/load-<scale>-<time>.json)')
+    load.add_argument('--reseed', action='store_true', help='rebuild the seeded database first')
+    load.add_argument('--log-level', default='WARNING', help='application log level (default: %(default)s)')
+
+    replay = commands.add_parser('replay', help='re-issue captured traffic against a test instance')
+    replay.add_argument('files', nargs='+', help='capture files (captures/capture-<pid>.jsonl.gz[.1])')
+    _add_spec_arguments(replay)
+    replay.add_argument('--target', default=None,
+                        help='base URL of a running server (default: the app in this process)')
+    replay.add_argument('--database', default=None,
+                        help='in-process only: replay against a copy of this database instead of seeded data')
+    replay.add_argument('--speed', type=float, default=1.0,
+                        help='time compression, e.g. 10 for ten times faster; 0 for no waiting '
+                             '(default: %(default)s)')
+    replay.add_argument('--lanes', type=int, default=16,
+                        help='concurrent lanes; each listener stays on one (default: %(default)s)')
+    replay.add_argument('--path-prefix', action='append', default=None,
+                        help='only replay paths starting with this, e.g. /api/ratings; repeatable')
+    replay.add_argument('--limit', type=int, default=None, help='replay only the first N requests')
+    replay.add_argument('--output', default=None,
+                        help='results file (default: benchmarks/results/replay-<time>.json)')
+    replay.add_argument('--reseed', action='store_true', help='rebuild the seeded database first')
+    replay.add_argument('--log-level', default='WARNING', help='application log level (default: %(default)s)')
+
+    storage = commands.add_parser('storage', help='run the rating workload under each storage profile')
+    _add_spec_arguments(storage)
+    storage.add_argument('--profile', dest='profiles', action='append', choices=list(STORAGE_PROFILES),
+                         help='profile to run; repeatable (default: all)')
+    storage.add_argument('--duration', type=float, default=10.0,
+                         help='seconds to run each profile (default: %(default)s)')
+    storage.add_argument('--threads', type=int, default=8, help='concurrent callers (default: %(default)s)')
+    storage.add_argument('--write-share', type=float, default=0.3,
+                         help='fraction of calls that vote (default: %(default)s)')
+    storage.add_argument('--output', default=None,
+                         help='results file (default: benchmarks/results/storage-<scale>-<time>.json)')
+    storage.add_argument('--reseed', action='store_true', help='rebuild the seeded database first')
+    storage.add_argument('--log-level', default='WARNING', help='application log level (default: %(default)s)')
+
+    comparison = commands.add_parser('compare', help='flag regressions against a baseline')
+    comparison.add_argument('current', help='results file to check')
+    comparison.add_argument('--baseline', default=None,
+                            help='baseline results (default: benchmarks/baselines/<scale>.json)')
+    comparison.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help='relative slowdown that counts as a regression (default: %(default)s)')
+    comparison.add_argument('--min-delta-ms', type=float, default=DEFAULT_MIN_DELTA_MS,
+                            help='ignore changes smaller than this (default: %(default)s)')
+    comparison.add_argument('--metric', default='median_ms',
+                            choices=['median_ms', 'mean_ms', 'p95_ms', 'min_ms', 'p50_ms', 'p99_ms'])
+
+    args = parser.parse_args(argv)
+    if args.command == 'run' and not args.suites:
+        args.suites = ['models', 'endpoints']
+    if args.command == 'storage' and not args.profiles:
+        args.profiles = list(STORAGE_PROFILES)
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    commands = {'seed': seed_command, 'run': run_command, 'load': load_command, 'replay': replay_command,
+                'storage': storage_command, 'compare': compare_command}
+    return commands[args.command](args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
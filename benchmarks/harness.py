@@ -0,0 +1,164 @@
+"""Timing, result files and baseline comparison for the benchmark suite."""
+
+import json
+import math
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Median changes smaller than this are noise for sub-millisecond calls
+DEFAULT_MIN_DELTA_MS = 0.02
+DEFAULT_THRESHOLD = 0.10
+
+
+@dataclass
+class Benchmark:
+    """A named operation timed by calling ``func(i)`` for i = 0, 1, 2, ..."""
+
+    name: str
+    group: str
+    func: Callable[[int], Any]
+    # Fixed iteration count for expensive operations such as full rebuilds
+    iterations: Optional[int] = None
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def measure(func: Callable[[int], Any], iterations: int, warmup: int = 5) -> Dict[str, Any]:
+    """Call ``func`` ``warmup + iterations`` times and summarize the timed calls in ms."""
+    for i in range(warmup):
+        func(i)
+
+    timings = []
+    for i in range(warmup, warmup + iterations):
+        started = time.perf_counter_ns()
+        func(i)
+        timings.append((time.perf_counter_ns() - started) / 1e6)
+
+    timings.sort()
+    mean = statistics.fmean(timings)
+    return {
+        'iterations': iterations,
+        'mean_ms': round(mean, 4),
+        'median_ms': round(statistics.median(timings), 4),
+        'p95_ms': round(percentile(timings, 0.95), 4),
+        'min_ms': round(timings[0], 4),
+        'max_ms': round(timings[-1], 4),
+        'stdev_ms': round(statistics.stdev(timings), 4) if len(timings) > 1 else 0.0,
+        'ops_per_sec': round(1000 / mean, 1) if mean else None
+    }
+
+
+def run_benchmarks(benchmarks: Iterable[Benchmark], iterations: int, warmup: int = 5,
+                   name_filter: Optional[str] = None,
+                   report: Callable[[str, Dict[str, Any]], None] = lambda name, result: None
+                   ) -> Dict[str, Dict[str, Any]]:
+    """Measure every benchmark whose name contains ``name_filter``."""
+    results = {}
+    for benchmark in benchmarks:
+        if name_filter and name_filter.lower() not in benchmark.name.lower():
+            continue
+        count = benchmark.iterations or iterations
+        result = {'group': benchmark.group, **measure(benchmark.func, count, min(warmup, count))}
+        results[benchmark.name] = result
+        report(benchmark.name, result)
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    """Where and when a result set was produced."""
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'argv': sys.argv[1:]
+    }
+
+
+def save_results(path: str, meta: Dict[str, Any], results: Dict[str, Dict[str, Any]]) -> None:
+    with open(path, 'w') as results_file:
+        json.dump({'meta': meta, 'benchmarks': results}, results_file, indent=2, sort_keys=True)
+        results_file.write('\n')
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path) as results_file:
+        return json.load(results_file)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD,
+            min_delta_ms: float = DEFAULT_MIN_DELTA_MS, metric: str = 'median_ms') -> List[Dict[str, Any]]:
+    """Classify each benchmark's change in ``metric`` against the baseline.
+
+    A benchmark regresses when it is more than ``threshold`` (a fraction)
+    and more than ``min_delta_ms`` slower than its baseline; improvements
+    are the mirror image. Benchmarks present in only one file are
+    reported as ``new`` or ``missing``.
+    """
+    old, new = baseline['benchmarks'], current['benchmarks']
+    rows = []
+    for name in sorted(set(old) | set(new)):
+        if name not in new:
+            rows.append({'name': name, 'status': 'missing', 'baseline': old[name][metric], 'current': None,
+                         'change': None})
+            continue
+        if name not in old:
+            rows.append({'name': name, 'status': 'new', 'baseline': None, 'current': new[name][metric],
+                         'change': None})
+            continue
+
+        before, after = old[name][metric], new[name][metric]
+        delta = after - before
+        change = delta / before if before else 0.0
+        if change > threshold and delta > min_delta_ms:
+            status = 'regression'
+        elif change < -threshold and -delta > min_delta_ms:
+            status = 'improvement'
+        else:
+            status = 'ok'
+        rows.append({'name': name, 'status': status, 'baseline': before, 'current': after,
+                     'change': round(change, 4)})
+    return rows
+
+
+def format_comparison(rows: List[Dict[str, Any]], metric: str = 'median_ms') -> str:
+    """Human-readable comparison table, regressions first."""
+    order = {'regression': 0, 'improvement': 1, 'missing': 2, 'new': 3, 'ok': 4}
+    width = max([len(row['name']) for row in rows] + [9])
+    lines = [f"{'benchmark':<{width}}  {'baseline':>10}  {'current':>10}  {'change':>8}  status",
+             f'{"":-<{width}}  {"":->10}  {"":->10}  {"":->8}  {"":-<11}']
+
+    def cell(value: Optional[float]) -> str:
+        return '-' if value is None else f'{value:.4f}'
+
+    for row in sorted(rows, key=lambda row: (order[row['status']], row['name'])):
+        change = '-' if row['change'] is None else f"{row['change']:+.1%}"
+        lines.append(f"{row['name']:<{width}}  {cell(row['baseline']):>10}  {cell(row['current']):>10}  "
+                     f"{change:>8}  {row['status']}")
+
+    regressions = sum(1 for row in rows if row['status'] == 'regression')
+    lines.append(f'\n{metric}: {regressions} regression(s), '
+                 f"{sum(1 for row in rows if row['status'] == 'improvement')} improvement(s)")
+    return '\n'.join(lines)
@@ -0,0 +1,692 @@
+"""Synthetic listener load for Radio Calico.
+
+Each simulated listener behaves like the player in ``frontend/js``:
+
+* Most keep the live update stream (``/api/stream/events``) open and
+  react to its ``track`` events. As in ``MetadataManager`` the stream is
+  reopened after it ends, and a listener whose stream fails
+  ``LIVE_UPDATES_MAX_FAILURES`` times in a row falls back to polling.
+* The rest poll the CDN metadata every ``metadataUpdateInterval``
+  seconds and derive the track id the way ``generateTrackId`` does.
+* On every track change a listener loads its vote and the counts
+  (``GET /api/ratings/<track_id>?fingerprint=``). Every listener hears
+  the change within a second or so, which produces the burst the
+  server sees at the top of each song.
+* Some listeners vote during the song, and some of those click again
+  later; clicking the active button removes the vote, as in
+  ``RatingManager``.
+
+Requests go either through the Flask test client (``ClientTarget``) or
+over HTTP to a running server (``HttpTarget``). ``FakeCDN`` serves the
+metadata, HLS playlist, segments and cover art on localhost with a
+track list that advances every ``track_seconds``, so the server's
+upstream requests and the listeners' polls never leave the machine.
+The tracks and fingerprints follow the seeded benchmark data, so votes
+land on rows that already exist.
+"""
+
+import codecs
+import heapq
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+import requests
+
+from backend.services import event_broadcaster
+from backend.services.events import track_id_for
+
+from .harness import percentile
+from .seed import SeedSpec, ZipfSampler, track_id
+
+logger = logging.getLogger(__name__)
+
+# Player defaults from frontend/js/modules/state.js
+METADATA_UPDATE_INTERVAL = 10.0
+LIVE_UPDATES_MAX_FAILURES = 3
+EVENTS_PATH = '/api/stream/events'
+# The server asks EventSource to wait this long before reconnecting
+EVENTS_RETRY = 5.0
+# Streams carry a keepalive every EVENTS_KEEPALIVE seconds
+EVENTS_READ_TIMEOUT = 60.0
+
+# How long a finished run waits for listener threads to notice
+SHUTDOWN_TIMEOUT = 2.0
+
+SEGMENT_SECONDS = 6
+SEGMENT_BYTES = bytes(188 * 64)
+
+RATINGS_ENDPOINT = 'GET /api/ratings/<track_id>'
+VOTE_ENDPOINT = 'POST /api/ratings'
+EVENTS_ENDPOINT = 'GET /api/stream/events'
+CDN_METADATA_ENDPOINT = 'CDN GET /metadatav2.json'
+
+
+def track_metadata(rank: int) -> Dict[str, str]:
+    """Artist and title whose player track id is ``seed.track_id(rank)``."""
+    return {'artist': f'Artist {rank // 10:06d}', 'title': f'Song {rank:07d}'}
+
+
+class Station:
+    """What is on air: a new track every ``track_seconds``.
+
+    Tracks are drawn with the seeded popularity skew, so popular tracks
+    come round most often, and never repeat back to back.
+    """
+
+    def __init__(self, spec: SeedSpec, track_seconds: float = 180.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.track_seconds = track_seconds
+        self._clock = clock
+        self._started = clock()
+        self._wall_started = time.time()
+        self._draw = ZipfSampler(spec.tracks, spec.track_skew, random.Random(spec.seed + 3))
+        self._ranks: List[int] = []
+        self._lock = threading.Lock()
+
+    def _elapsed(self) -> float:
+        return max(0.0, self._clock() - self._started)
+
+    def _rank(self, index: int) -> int:
+        with self._lock:
+            while len(self._ranks) <= index:
+                rank = self._draw()
+                while self._ranks and rank == self._ranks[-1]:
+                    rank = self._draw()
+                self._ranks.append(rank)
+            return self._ranks[index]
+
+    def index(self) -> int:
+        """Number of track changes since the station started."""
+        return int(self._elapsed() // self.track_seconds)
+
+    def current_track_id(self) -> str:
+        return track_id(self._rank(self.index()))
+
+    def metadata(self) -> Dict[str, Any]:
+        """The CDN metadata document: current track plus the five before it."""
+        index = self.index()
+        metadata = {**track_metadata(self._rank(index)), 'album': 'Load Test', 'bit_depth': 16,
+                    'sample_rate': 44100}
+        for i in range(1, 6):
+            if index - i < 0:
+                break
+            previous = track_metadata(self._rank(index - i))
+            metadata[f'prev_artist_{i}'] = previous['artist']
+            metadata[f'prev_title_{i}'] = previous['title']
+        return metadata
+
+    def playlist(self) -> str:
+        """Live HLS media playlist with the three newest complete segments."""
+        sequence = int(self._elapsed() // SEGMENT_SECONDS)
+        first = max(0, sequence - 2)
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3', f'#EXT-X-TARGETDURATION:{SEGMENT_SECONDS}',
+                 f'#EXT-X-MEDIA-SEQUENCE:{first}']
+        for number in range(first, sequence + 1):
+            started = datetime.fromtimestamp(self._wall_started + number * SEGMENT_SECONDS, timezone.utc)
+            lines += [f"#EXT-X-PROGRAM-DATE-TIME:{started.isoformat(timespec='milliseconds')}",
+                      f'#EXTINF:{SEGMENT_SECONDS:.1f},', f'segment{number}.ts']
+        return '\n'.join(lines) + '\n'
+
+
+class _CDNHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body: bool) -> None:
+        station = self.server.station
+        path = urlsplit(self.path).path
+        status, name = 200, path.rsplit('/', 1)[-1]
+        if path == '/metadatav2.json':
+            body = json.dumps(station.metadata()).encode('utf-8')
+            content_type, cache_control = 'application/json', 'max-age=5'
+        elif path == '/hls/live.m3u8':
+            body = station.playlist().encode('utf-8')
+            content_type, cache_control = 'application/vnd.apple.mpegurl', 'max-age=1'
+        elif path.startswith('/hls/') and path.endswith('.ts'):
+            body, content_type, cache_control = SEGMENT_BYTES, 'video/mp2t', 'max-age=3600'
+            name = 'segments'
+        elif path == '/cover.jpg':
+            body, content_type, cache_control = b'', 'image/jpeg', 'max-age=5'
+        else:
+            status, name = 404, 'not_found'
+            body, content_type, cache_control = b'Not Found', 'text/plain', 'no-store'
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', cache_control)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+        with self.server.lock:
+            self.server.served[name] += 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeCDN:
+    """Local stand-in for the CDN serving ``station`` over HTTP."""
+
+    def __init__(self, station: Station, host: str = '127.0.0.1', port: int = 0):
+        self.station = station
+        self._server = ThreadingHTTPServer((host, port), _CDNHandler)
+        self._server.daemon_threads = True
+        self._server.station = station
+        self._server.served = Counter()
+        self._server.lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def metadata_url(self) -> str:
+        return f'{self.base_url}/metadatav2.json'
+
+    @property
+    def stream_url(self) -> str:
+        return f'{self.base_url}/hls/live.m3u8'
+
+    @property
+    def cover_art_url(self) -> str:
+        return f'{self.base_url}/cover.jpg'
+
+    def served(self) -> Dict[str, int]:
+        """Requests answered so far, by file name."""
+        with self._server.lock:
+            return dict(self._server.served)
+
+    def start(self) -> 'FakeCDN':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-cdn', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> 'FakeCDN':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+@dataclass
+class Reply:
+    status: int
+    data: Any = None
+
+
+@dataclass
+class EventStream:
+    """An open ``text/event-stream`` response."""
+
+    status: int
+    chunks: Iterable[Any]
+    close: Callable[[], None]
+
+
+class ClientTarget:
+    """Sends requests through the Flask test client: no sockets, no server threads."""
+
+    def __init__(self, app: Any):
+        self.app = app
+        self._local = threading.local()
+
+    def _client(self) -> Any:
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        return client
+
+    def request(self, method: str, path: str, params: Optional[Dict[str, str]] = None,
+                json: Any = None) -> Reply:
+        response = self._client().open(path, method=method, query_string=params, json=json)
+        try:
+            return Reply(response.status_code, response.get_json(silent=True))
+        finally:
+            response.close()
+
+    def events(self, path: str) -> EventStream:
+        response = self._client().get(path, buffered=False)
+        return EventStream(response.status_code, response.response, response.close)
+
+    def close(self) -> None:
+        # Open streams sleep in the app until their next message
+        event_broadcaster.close_subscribers()
+
+
+class HttpTarget:
+    """Sends requests to a running server over keep-alive connections."""
+
+    def __init__(self, base_url: str, timeout: float = 10.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        # Sessions are not thread-safe; each thread keeps its own connections
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def request(self, method: str, path: str, params: Optional[Dict[str, str]] = None,
+                json: Any = None) -> Reply:
+        response = self._session().request(method, self.base_url + path, params=params, json=json,
+                                           timeout=self.timeout)
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+        return Reply(response.status_code, data)
+
+    def events(self, path: str) -> EventStream:
+        response = self._session().get(self.base_url + path, stream=True,
+                                       headers={'Accept': 'text/event-stream'},
+                                       timeout=(self.timeout, EVENTS_READ_TIMEOUT))
+        return EventStream(response.status_code, response.iter_content(chunk_size=None), response.close)
+
+    def close(self) -> None:
+        # Closing a response blocks while its thread is reading, and the
+        # server closes streams after each response; open streams are left
+        # to their daemon threads
+        pass
+
+
+def parse_sse(chunks: Iterable[Any]) -> Iterator[Tuple[str, str]]:
+    """``(event, data)`` for each message in a ``text/event-stream`` body.
+
+    Chunks may be bytes or text and may split messages anywhere;
+    comments (keepalives) and messages without data are skipped.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    for chunk in chunks:
+        buffer += decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        buffer = buffer.replace('\r\n', '\n')
+        while '\n\n' in buffer:
+            block, buffer = buffer.split('\n\n', 1)
+            event, data = 'message', []
+            for line in block.split('\n'):
+                field, _, value = line.partition(':')
+                value = value[1:] if value.startswith(' ') else value
+                if field == 'event':
+                    event = value
+                elif field == 'data':
+                    data.append(value)
+            if data:
+                yield event, '\n'.join(data)
+
+
+class LatencyRecorder:
+    """Per-endpoint latencies and outcomes of the requests sent during a run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timings: Dict[str, List[float]] = defaultdict(list)
+        self._statuses: Dict[str, Counter] = defaultdict(Counter)
+        self._events: Counter = Counter()
+        self._lag: List[float] = []
+        self.closed = False
+
+    def record(self, endpoint: str, elapsed_ms: float, status: Optional[int]) -> None:
+        """Note one request; ``status`` is None when no response arrived."""
+        with self._lock:
+            if self.closed:
+                return
+            self._timings[endpoint].append(elapsed_ms)
+            self._statuses[endpoint]['error' if status is None else str(status)] += 1
+
+    def count(self, name: str) -> None:
+        """Count a listener-side event such as a received ``track`` message."""
+        with self._lock:
+            if not self.closed:
+                self._events[name] += 1
+
+    def lag(self, lag_ms: float) -> None:
+        with self._lock:
+            if not self.closed:
+                self._lag.append(lag_ms)
+
+    def close(self) -> None:
+        """Ignore everything reported after the measured window."""
+        with self._lock:
+            self.closed = True
+
+    def report(self, duration: float) -> Dict[str, Any]:
+        """Throughput, error count and latency percentiles per endpoint."""
+        with self._lock:
+            timings = {endpoint: sorted(values) for endpoint, values in self._timings.items()}
+            statuses = {endpoint: dict(counts) for endpoint, counts in self._statuses.items()}
+            events = dict(self._events)
+            lag = sorted(self._lag)
+
+        endpoints = {}
+        for endpoint, values in sorted(timings.items()):
+            errors = sum(count for status, count in statuses[endpoint].items()
+                         if status == 'error' or int(status) >= 400)
+            endpoints[endpoint] = {
+                'requests': len(values),
+                'errors': errors,
+                'rps': round(len(values) / duration, 2) if duration else None,
+                'p50_ms': round(percentile(values, 0.50), 3),
+                'p95_ms': round(percentile(values, 0.95), 3),
+                'p99_ms': round(percentile(values, 0.99), 3),
+                'max_ms': round(values[-1], 3),
+                'statuses': statuses[endpoint]
+            }
+
+        server = [result for endpoint, result in endpoints.items() if not endpoint.startswith('CDN ')]
+        total = sum(result['requests'] for result in server)
+        return {
+            'duration_s': round(duration, 2),
+            'requests': total,
+            'errors': sum(result['errors'] for result in server),
+            'rps': round(total / duration, 2) if duration else None,
+            'endpoints': endpoints,
+            'events': events,
+            # Late listener actions mean the generator, not the server, is saturated
+            'scheduler_lag_p99_ms': round(percentile(lag, 0.99), 3) if lag else None
+        }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Human-readable table of a ``LatencyRecorder.report``."""
+    width = max([len(endpoint) for endpoint in report['endpoints']] + [8])
+    lines = [f"{'endpoint':<{width}}  {'requests':>8}  {'errors':>6}  {'rps':>8}  "
+             f"{'p50 ms':>9}  {'p95 ms':>9}  {'p99 ms':>9}",
+             f'{"":-<{width}}  {"":->8}  {"":->6}  {"":->8}  {"":->9}  {"":->9}  {"":->9}']
+    for endpoint, result in report['endpoints'].items():
+        lines.append(f"{endpoint:<{width}}  {result['requests']:>8}  {result['errors']:>6}  "
+                     f"{result['rps']:>8.2f}  {result['p50_ms']:>9.3f}  {result['p95_ms']:>9.3f}  "
+                     f"{result['p99_ms']:>9.3f}")
+    lines.append(f"\n{report['requests']} server requests in {report['duration_s']}s "
+                 f"({report['rps']} req/s), {report['errors']} error(s)")
+    if report['events']:
+        lines.append('listener events: ' + ', '.join(f'{name}={count}'
+                                                     for name, count in sorted(report['events'].items())))
+    if report['scheduler_lag_p99_ms'] is not None:
+        lines.append(f"scheduler lag p99: {report['scheduler_lag_p99_ms']} ms")
+    return '\n'.join(lines)
+
+
+class Scheduler:
+    """Runs delayed listener actions on a fixed pool of threads.
+
+    Think time is spent in a heap rather than in sleeping threads, so
+    thousands of listeners need only ``workers`` threads. How late each
+    action starts is reported to ``recorder``.
+    """
+
+    def __init__(self, workers: int, recorder: LatencyRecorder, clock: Callable[[], float] = time.monotonic):
+        self.recorder = recorder
+        self._clock = clock
+        self._heap: List[Tuple[float, int, Callable[[], None]]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='loadgen')
+        self._thread: Optional[threading.Thread] = None
+
+    def call_later(self, delay: float, func: Callable[[], None]) -> None:
+        with self._condition:
+            if self._stopped:
+                return
+            heapq.heappush(self._heap, (self._clock() + delay, next(self._sequence), func))
+            self._condition.notify()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='loadgen-scheduler', daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopped and (not self._heap or self._heap[0][0] > self._clock()):
+                    self._condition.wait(self._heap[0][0] - self._clock() if self._heap else None)
+                if self._stopped:
+                    return
+                due, _, func = heapq.heappop(self._heap)
+            self._executor.submit(self._call, due, func)
+
+    def _call(self, due: float, func: Callable[[], None]) -> None:
+        self.recorder.lag((self._clock() - due) * 1000)
+        try:
+            func()
+        except Exception:
+            logger.exception("Listener action failed")
+
+    def stop(self) -> None:
+        """Drop pending actions and wait for running ones."""
+        with self._condition:
+            self._stopped = True
+            self._heap.clear()
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+@dataclass
+class LoadProfile:
+    """How many listeners there are and how they behave."""
+
+    listeners: int = 100
+    duration: float = 60.0
+    # Listeners join evenly over this many seconds
+    ramp: float = 10.0
+    poll_interval: float = METADATA_UPDATE_INTERVAL
+    # Share of listeners whose browser keeps the live update stream open
+    live_share: float = 0.9
+    # Listeners load their vote within this many seconds of a track change
+    burst_jitter: float = 1.0
+    # Chance per track that a listener votes, and that a voter clicks again
+    vote_probability: float = 0.1
+    revote_probability: float = 0.3
+    # Threads running scheduled listener actions
+    workers: int = 32
+    seed: int = 42
+
+
+class Listener:
+    """One browser tab: a fingerprint, the track it shows and its vote."""
+
+    def __init__(self, index: int, fingerprint: str, live: bool, rng: random.Random):
+        self.index = index
+        self.fingerprint = fingerprint
+        self.live = live
+        self.rng = rng
+        self.track_id: Optional[str] = None
+        self.rating: Optional[str] = None
+        self.lock = threading.Lock()
+
+
+class LoadGenerator:
+    """Drives ``profile.listeners`` simulated listeners against ``target``."""
+
+    def __init__(self, target: Any, station: Station, cdn_url: str, fingerprints: List[str],
+                 profile: LoadProfile):
+        self.target = target
+        self.station = station
+        self.cdn = HttpTarget(cdn_url)
+        self.profile = profile
+        self.recorder = LatencyRecorder()
+        self.scheduler = Scheduler(profile.workers, self.recorder)
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+        rng = random.Random(profile.seed)
+        self.listeners = [
+            Listener(i, fingerprints[i % len(fingerprints)], rng.random() < profile.live_share,
+                     random.Random(rng.getrandbits(64)))
+            for i in range(profile.listeners)
+        ]
+
+    def run(self) -> Dict[str, Any]:
+        """Run for ``profile.duration`` seconds and return the latency report."""
+        self.scheduler.start()
+        started = time.perf_counter()
+        for listener in self.listeners:
+            offset = self.profile.ramp * listener.index / max(1, len(self.listeners))
+            self.scheduler.call_later(offset, lambda listener=listener: self._join(listener))
+
+        try:
+            self._stop.wait(self.profile.duration)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.recorder.close()
+            self._stop.set()
+            self.scheduler.stop()
+            self.target.close()
+            self.cdn.close()
+            deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+            for thread in self._threads:
+                thread.join(max(0.0, deadline - time.monotonic()))
+        return self.recorder.report(elapsed)
+
+    def _timed(self, endpoint: str, call: Callable[[], Reply]) -> Optional[Reply]:
+        started = time.perf_counter()
+        try:
+            reply = call()
+        except Exception as e:
+            self.recorder.record(endpoint, (time.perf_counter() - started) * 1000, None)
+            logger.debug("%s failed: %s", endpoint, e)
+            return None
+        self.recorder.record(endpoint, (time.perf_counter() - started) * 1000, reply.status)
+        return reply
+
+    def _join(self, listener: Listener) -> None:
+        if not listener.live:
+            self._poll(listener)
+            return
+        thread = threading.Thread(target=self._listen, args=(listener,), name=f'listener-{listener.index}',
+                                  daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def _poll(self, listener: Listener) -> None:
+        """Interval polling of the CDN metadata, like ``startIntervalPolling``."""
+        if self._stop.is_set():
+            return
+        reply = self._timed(CDN_METADATA_ENDPOINT, lambda: self.cdn.request('GET', '/metadatav2.json'))
+        if reply is not None and reply.status == 200 and reply.data:
+            self._track_changed(listener, track_id_for(reply.data))
+        self.scheduler.call_later(self.profile.poll_interval, lambda: self._poll(listener))
+
+    def _listen(self, listener: Listener) -> None:
+        """Keep a live update stream open, reconnecting like ``EventSource``."""
+        failures = 0
+        while not self._stop.is_set():
+            stream = None
+            started = time.perf_counter()
+            try:
+                stream = self.target.events(EVENTS_PATH)
+                if stream.status != 200:
+                    raise RuntimeError(f'HTTP {stream.status}')
+                chunks = iter(stream.chunks)
+                # The server writes the retry hint first; that is the stream "opening"
+                first = next(chunks, None)
+                self.recorder.record(EVENTS_ENDPOINT, (time.perf_counter() - started) * 1000, stream.status)
+                if first is None:
+                    raise RuntimeError('stream closed before it opened')
+                failures = 0
+                self.recorder.count('stream_opened')
+                for event, data in parse_sse(itertools.chain([first], chunks)):
+                    self.recorder.count(f'{event}_events')
+                    if event == 'track':
+                        self._track_changed(listener, json.loads(data)['track_id'])
+                    if self._stop.is_set():
+                        return
+                self.recorder.count('stream_ended')
+            except Exception as e:
+                if self._stop.is_set():
+                    return
+                if stream is None or stream.status != 200:
+                    self.recorder.record(EVENTS_ENDPOINT, (time.perf_counter() - started) * 1000,
+                                         None if stream is None else stream.status)
+                failures += 1
+                logger.debug("Listener %s live updates failed: %s", listener.index, e)
+            finally:
+                if stream is not None:
+                    stream.close()
+
+            if failures >= LIVE_UPDATES_MAX_FAILURES:
+                self.recorder.count('fell_back_to_polling')
+                listener.live = False
+                self.scheduler.call_later(0, lambda: self._poll(listener))
+                return
+            self._stop.wait(EVENTS_RETRY)
+
+    def _track_changed(self, listener: Listener, new_track_id: str) -> None:
+        with listener.lock:
+            if new_track_id == listener.track_id:
+                return
+            listener.track_id = new_track_id
+            listener.rating = None
+            rng = listener.rng
+            load_delay = rng.uniform(0, self.profile.burst_jitter)
+            vote = rng.random() < self.profile.vote_probability
+            vote_delay = rng.uniform(0.05, 0.9) * self.station.track_seconds
+            choice = rng.choice(('up', 'up', 'down'))
+
+        self.scheduler.call_later(load_delay, lambda: self._load_rating(listener, new_track_id))
+        if vote:
+            self.scheduler.call_later(vote_delay, lambda: self._click(listener, new_track_id, choice))
+
+    def _load_rating(self, listener: Listener, track: str) -> None:
+        """``RatingManager.loadUserRating``."""
+        reply = self._timed(RATINGS_ENDPOINT, lambda: self.target.request(
+            'GET', f"/api/ratings/{quote(track, safe='')}", params={'fingerprint': listener.fingerprint}))
+        if reply is not None and reply.status == 200 and reply.data:
+            with listener.lock:
+                if listener.track_id == track:
+                    listener.rating = reply.data.get('user_rating')
+
+    def _click(self, listener: Listener, track: str, button: str) -> None:
+        """``RatingManager.handleRating``: the active button removes the vote."""
+        with listener.lock:
+            if listener.track_id != track or self._stop.is_set():
+                return
+            rating = None if listener.rating == button else button
+            listener.rating = rating
+            revote = listener.rng.random() < self.profile.revote_probability
+            delay = listener.rng.uniform(1.0, max(1.0, 0.25 * self.station.track_seconds))
+            again = button if listener.rng.random() < 0.5 else ('down' if button == 'up' else 'up')
+
+        body = {
+            'track_id': track,
+            'rating': rating,
+            'user_fingerprint': listener.fingerprint,
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+        }
+        reply = self._timed(VOTE_ENDPOINT, lambda: self.target.request('POST', '/api/ratings', json=body))
+        if reply is not None and reply.status == 200 and reply.data:
+            with listener.lock:
+                if listener.track_id == track:
+                    listener.rating = reply.data.get('user_rating')
+        self.recorder.count('toggles' if rating is None else 'votes')
+        if revote:
+            self.scheduler.call_later(delay, lambda: self._click(listener, track, again))
@@ -0,0 +1,173 @@
+"""Replay captured traffic against a test instance.
+
+``read_capture`` loads the files written by ``backend.utils.capture``
+(gzip members of JSON lines, one file per worker) and merges them into
+one stream ordered by request start time. ``Replayer`` re-issues that
+stream through a ``loadgen`` target, keeping the captured gaps between
+requests divided by ``speed`` (0 sends as fast as the target answers).
+
+Requests run on ``lanes`` single-threaded lanes and every request of a
+listener goes to the same lane, so each listener's votes and toggles
+arrive in the captured order however fast the replay runs. With the
+same capture, speed and lane count, the target sees the same
+per-listener sequences on every run.
+"""
+
+import gzip
+import json
+import logging
+import threading
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from urllib.parse import parse_qsl
+
+from .harness import percentile
+from .loadgen import EVENTS_PATH, LatencyRecorder
+
+logger = logging.getLogger(__name__)
+
+_LISTENER_ROUTE = '/api/ratings/user/<user_fingerprint>'
+
+
+def read_capture(paths: Iterable[str]) -> List[Dict[str, Any]]:
+    """Captured requests from every file, oldest first.
+
+    A file cut short by a crash keeps the requests before the damage.
+    """
+    entries = []
+    for path in paths:
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as capture_file:
+                for line in capture_file:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        logger.warning("Skipping malformed line in %s", path)
+        except (EOFError, OSError, zlib.error) as e:
+            logger.warning("%s is truncated or damaged after %s requests: %s", path, len(entries), e)
+    entries.sort(key=lambda entry: entry['ts'])
+    return entries
+
+
+def endpoint(entry: Dict[str, Any]) -> str:
+    return f"{entry['method']} {entry.get('route') or entry['path']}"
+
+
+def listener(entry: Dict[str, Any]) -> Optional[str]:
+    """The (anonymized) listener a captured request belongs to."""
+    body = entry.get('body')
+    if isinstance(body, dict) and body.get('user_fingerprint'):
+        return body['user_fingerprint']
+    for name, value in parse_qsl(entry.get('query') or ''):
+        if name == 'fingerprint' and value:
+            return value
+    if entry.get('route') == _LISTENER_ROUTE:
+        return entry['path'].rsplit('/', 1)[-1]
+    return None
+
+
+def captured_latency(entries: Sequence[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Percentiles of the durations the production server recorded."""
+    durations: Dict[str, List[float]] = {}
+    for entry in entries:
+        durations.setdefault(endpoint(entry), []).append(entry['duration_ms'])
+    result = {}
+    for name, values in sorted(durations.items()):
+        values.sort()
+        result[name] = {
+            'requests': len(values),
+            'p50_ms': round(percentile(values, 0.50), 3),
+            'p95_ms': round(percentile(values, 0.95), 3),
+            'p99_ms': round(percentile(values, 0.99), 3)
+        }
+    return result
+
+
+class Replayer:
+    """Re-issues captured requests against ``target`` with the captured timing."""
+
+    def __init__(self, target: Any, entries: Sequence[Dict[str, Any]], speed: float = 1.0, lanes: int = 16):
+        if speed < 0:
+            raise ValueError('speed must not be negative')
+        self.target = target
+        self.entries = entries
+        self.speed = speed
+        self.recorder = LatencyRecorder()
+        self.status_changes: Counter = Counter()
+        self._lanes = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'replay-{i}') for i in range(lanes)]
+        self._next_lane = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _lane(self, entry: Dict[str, Any]) -> ThreadPoolExecutor:
+        key = listener(entry)
+        if key is None:
+            # Anonymous requests have no order to keep; spread them
+            self._next_lane = (self._next_lane + 1) % len(self._lanes)
+            return self._lanes[self._next_lane]
+        # crc32 rather than hash(): string hashes change between runs
+        return self._lanes[zlib.crc32(key.encode('utf-8')) % len(self._lanes)]
+
+    def run(self) -> Dict[str, Any]:
+        """Send every entry and return the latency report."""
+        started = time.perf_counter()
+        first = self.entries[0]['ts'] if self.entries else 0.0
+        try:
+            for entry in self.entries:
+                due = started + (entry['ts'] - first) / self.speed if self.speed else started
+                delay = due - time.perf_counter()
+                if delay > 0 and self._stop.wait(delay):
+                    break
+                self._lane(entry).submit(self._send, entry, due)
+        finally:
+            for lane in self._lanes:
+                lane.shutdown(wait=True)
+        elapsed = time.perf_counter() - started
+        self.recorder.close()
+
+        report = self.recorder.report(elapsed)
+        report['status_changes'] = [
+            {'endpoint': name, 'captured': captured, 'replayed': replayed, 'count': count}
+            for (name, captured, replayed), count in self.status_changes.most_common()
+        ]
+        return report
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _send(self, entry: Dict[str, Any], due: float) -> None:
+        if self._stop.is_set():
+            return
+        self.recorder.lag((time.perf_counter() - due) * 1000)
+        name = endpoint(entry)
+        if entry.get('body_omitted'):
+            self.recorder.count('skipped_body_omitted')
+            return
+
+        started = time.perf_counter()
+        status = None
+        try:
+            if entry['path'] == EVENTS_PATH:
+                # Live update streams never end; replay the connect and first message
+                stream = self.target.events(EVENTS_PATH)
+                try:
+                    status = stream.status
+                    if status == 200:
+                        next(iter(stream.chunks), None)
+                finally:
+                    stream.close()
+            else:
+                reply = self.target.request(entry['method'], entry['path'], params=entry.get('query') or None,
+                                            json=entry.get('body'))
+                status = reply.status
+        except Exception as e:
+            logger.debug("Replaying %s failed: %s", name, e)
+        self.recorder.record(name, (time.perf_counter() - started) * 1000, status)
+
+        if status != entry.get('status'):
+            with self._lock:
+                self.status_changes[(name, entry.get('status'), status)] += 1
+
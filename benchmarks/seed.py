@@ -0,0 +1,219 @@
+"""Deterministic benchmark databases for Radio Calico.
+
+``seed_database`` fills a fresh SQLite file through the real schema
+migrations with users, posts and ratings whose shape follows the
+traffic we see: a few tracks collect most votes, a few listeners cast
+most of them, and a few users write most posts (Zipf-distributed). The
+same spec and seed always produce the same rows, so results from two
+runs are comparable.
+"""
+
+import bisect
+import calendar
+import itertools
+import json
+import logging
+import os
+import random
+import sqlite3
+import time
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from backend.models.migrations import apply_migrations, insert_ratings
+
+logger = logging.getLogger(__name__)
+
+# Seeded timestamps end here rather than "now" so reruns are identical
+BASE_TIME = datetime(2025, 1, 1)
+HISTORY = timedelta(days=365)
+
+BATCH_SIZE = 50000
+
+_WORDS = ('lossless', 'stream', 'album', 'live', 'session', 'vinyl', 'mix', 'track', 'radio',
+          'studio', 'remaster', 'encore', 'playlist', 'acoustic', 'night', 'set')
+
+
+@dataclass(frozen=True)
+class SeedSpec:
+    """Row counts and skew for a seeded database."""
+
+    users: int
+    posts: int
+    tracks: int
+    listeners: int
+    ratings: int
+    seed: int = 42
+    # Zipf exponents: larger means a heavier head
+    track_skew: float = 1.1
+    listener_skew: float = 1.0
+    author_skew: float = 1.0
+
+    def key(self) -> str:
+        """File-name-safe identifier of this spec."""
+        return (f'u{self.users}-p{self.posts}-t{self.tracks}-l{self.listeners}-r{self.ratings}'
+                f'-s{self.seed}')
+
+
+SCALES: Dict[str, SeedSpec] = {
+    'tiny': SeedSpec(users=100, posts=300, tracks=200, listeners=500, ratings=2000),
+    'small': SeedSpec(users=1000, posts=5000, tracks=2000, listeners=10000, ratings=100000),
+    'medium': SeedSpec(users=10000, posts=50000, tracks=20000, listeners=200000, ratings=1000000),
+    'large': SeedSpec(users=100000, posts=500000, tracks=100000, listeners=2000000, ratings=10000000),
+}
+
+
+class ZipfSampler:
+    """Draws ranks ``0..n-1`` with probability proportional to ``1 / (rank + 1) ** s``."""
+
+    def __init__(self, n: int, s: float, rng: random.Random):
+        self.rng = rng
+        self._cumulative = list(itertools.accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+        self._total = self._cumulative[-1]
+
+    def __call__(self) -> int:
+        return bisect.bisect_left(self._cumulative, self.rng.random() * self._total)
+
+
+def track_id(rank: int) -> str:
+    """Track id for a popularity rank, shaped like the player's artist-title slugs."""
+    return f'artist-{rank // 10:06d}-song-{rank:07d}'
+
+
+def listener_fingerprints(spec: SeedSpec) -> List[str]:
+    """Fingerprints of every listener, most active first."""
+    rng = random.Random(spec.seed + 1)
+    return [f'{rng.getrandbits(128):032x}' for _ in range(spec.listeners)]
+
+
+def user_email(user_id: int) -> str:
+    return f'user{user_id}@example.com'
+
+
+def _moment(rng: random.Random) -> datetime:
+    return BASE_TIME - HISTORY + timedelta(seconds=rng.random() * HISTORY.total_seconds())
+
+
+def _timestamp(rng: random.Random) -> str:
+    return _moment(rng).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _batches(rows: Iterator[Tuple], size: int = BATCH_SIZE) -> Iterator[List[Tuple]]:
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _user_rows(spec: SeedSpec, rng: random.Random) -> Iterator[Tuple]:
+    for user_id in range(1, spec.users + 1):
+        yield user_id, f'Listener {user_id}', user_email(user_id), _timestamp(rng)
+
+
+def _post_rows(spec: SeedSpec, rng: random.Random) -> Iterator[Tuple]:
+    author = ZipfSampler(spec.users, spec.author_skew, rng)
+    for post_id in range(1, spec.posts + 1):
+        words = ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(5, 60)))
+        yield (post_id, f'Post {post_id}: {rng.choice(_WORDS)} {rng.choice(_WORDS)}', words,
+               author() + 1, _timestamp(rng))
+
+
+def _rating_rows(spec: SeedSpec, rng: random.Random) -> Iterator[Tuple]:
+    track = ZipfSampler(spec.tracks, spec.track_skew, rng)
+    listener = ZipfSampler(spec.listeners, spec.listener_skew, rng)
+    fingerprints = listener_fingerprints(spec)
+    # Each track has its own up/down balance
+    up_share = [rng.betavariate(4, 1.5) for _ in range(spec.tracks)]
+    while True:
+        rank = track()
+        rating = 1 if rng.random() < up_share[rank] else -1
+        rated_at = calendar.timegm(_moment(rng).timetuple())
+        yield track_id(rank), fingerprints[listener()], rating, rated_at
+
+
+def seed_database(path: str, spec: SeedSpec) -> Dict[str, Any]:
+    """Create ``path`` and fill it according to ``spec``; returns the row counts.
+
+    Ratings that repeat a (track, listener) pair are skipped, so
+    drawing continues until ``spec.ratings`` distinct votes exist or the
+    pairs run out.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+
+    started = time.perf_counter()
+    rng = random.Random(spec.seed)
+    conn = sqlite3.connect(path)
+    try:
+        apply_migrations(conn)
+        # Bulk load only: the file is thrown away if seeding fails
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+
+        conn.executemany('INSERT INTO users (id, name, email, created_at) VALUES (?, ?, ?, ?)',
+                         _user_rows(spec, rng))
+        conn.commit()
+
+        for batch in _batches(_post_rows(spec, rng)):
+            conn.executemany(
+                'INSERT INTO posts (id, title, content, user_id, created_at) VALUES (?, ?, ?, ?, ?)',
+                batch
+            )
+        conn.commit()
+
+        rows = _rating_rows(spec, rng)
+        inserted = 0
+        attempts = 0
+        max_attempts = spec.ratings * 4
+        while inserted < spec.ratings and attempts < max_attempts:
+            batch = list(itertools.islice(rows, min(BATCH_SIZE, spec.ratings - inserted)))
+            attempts += len(batch)
+            # Ignored duplicates and trigger writes don't count
+            inserted += insert_ratings(conn, batch)
+            conn.commit()
+            logger.debug("Seeded %s/%s ratings", inserted, spec.ratings)
+
+        conn.execute('ANALYZE')
+        conn.commit()
+        counts = {
+            table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+            for table in ('users', 'posts', 'ratings', 'track_rating_counts')
+        }
+    finally:
+        conn.close()
+
+    logger.info("Seeded %s in %.1fs: %s", path, time.perf_counter() - started, counts)
+    return counts
+
+
+def ensure_seeded(directory: str, spec: SeedSpec, force: bool = False) -> Tuple[str, Dict[str, Any]]:
+    """Path and row counts of a seeded database for ``spec``, reusing a cached one.
+
+    Seeding the large scale takes minutes, so databases are kept in
+    ``directory`` next to a JSON file recording the spec they were built from.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{spec.key()}.db')
+    manifest_path = path + '.json'
+
+    if not force and os.path.exists(path) and os.path.exists(manifest_path):
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest.get('spec') == asdict(spec):
+            return path, manifest['counts']
+
+    counts = seed_database(path, spec)
+    with open(manifest_path, 'w') as manifest_file:
+        json.dump({'spec': asdict(spec), 'counts': counts}, manifest_file, indent=2)
+    return path, counts
+
+
+def resolve_spec(scale: str, seed: Optional[int] = None, **overrides: Optional[int]) -> SeedSpec:
+    """Spec for a named scale with optional per-table count overrides."""
+    spec = SCALES[scale]
+    changes = {name: value for name, value in overrides.items() if value is not None}
+    if seed is not None:
+        changes['seed'] = seed
+    return replace(spec, **changes)
@@ -0,0 +1,111 @@
+"""The rating workload under each SQLite storage profile.
+
+``RatingWorkload`` calls ``Rating.save_rating`` and
+``Rating.get_track_ratings`` from several threads for a fixed time, with
+tracks and listeners drawn with the seeded skew, so votes go through the
+group-commit writer and reads through the read-only pool exactly as in
+production.
+
+Python cannot see the fsyncs SQLite makes, so ``device_flushes`` reads
+the cache flushes the kernel has sent to the disk holding the database
+(``/sys/dev/block/<dev>/stat``, Linux 5.5+). The count is for the whole
+device: other processes writing to it are included, and a database on
+tmpfs reports none.
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from backend.models import Rating
+
+from .loadgen import LatencyRecorder
+from .seed import SeedSpec, ZipfSampler, listener_fingerprints, track_id
+
+# Field of /sys/dev/block/<dev>/stat counting completed flush requests
+FLUSH_FIELD = 15
+
+
+def device_flushes(path: str) -> Optional[int]:
+    """Flush requests completed by the block device holding ``path``, if the kernel reports them."""
+    device = os.stat(path).st_dev
+    stat_path = f'/sys/dev/block/{os.major(device)}:{os.minor(device)}/stat'
+    try:
+        with open(stat_path) as stat_file:
+            fields = stat_file.read().split()
+    except OSError:
+        return None
+    return int(fields[FLUSH_FIELD]) if len(fields) > FLUSH_FIELD else None
+
+
+class RatingWorkload:
+    """Votes and rating reads from ``threads`` threads for ``duration`` seconds."""
+
+    def __init__(self, spec: SeedSpec, duration: float = 10.0, threads: int = 8, write_share: float = 0.3):
+        self.spec = spec
+        self.duration = duration
+        self.threads = threads
+        self.write_share = write_share
+        self._fingerprints = listener_fingerprints(spec)
+
+    def _run_thread(self, index: int, recorder: LatencyRecorder, deadline: float) -> None:
+        # Every thread, and every profile, draws the same sequence
+        rng = random.Random(self.spec.seed * 1000 + index)
+        track = ZipfSampler(self.spec.tracks, self.spec.track_skew, rng)
+        listener = ZipfSampler(self.spec.listeners, self.spec.listener_skew, rng)
+        while time.perf_counter() < deadline:
+            track_name, fingerprint = track_id(track()), self._fingerprints[listener()]
+            write = rng.random() < self.write_share
+            started = time.perf_counter()
+            try:
+                if write:
+                    Rating.save_rating(track_name, rng.choice(('up', 'down', None)), fingerprint)
+                else:
+                    Rating.get_track_ratings(track_name, fingerprint)
+                status = 200
+            except Exception:
+                status = None
+            recorder.record('save_rating' if write else 'get_track_ratings',
+                            (time.perf_counter() - started) * 1000, status)
+
+    def run(self, database: str) -> Dict[str, Any]:
+        """Run against the configured database; returns throughput, latency and device flushes."""
+        recorder = LatencyRecorder()
+        flushes_before = device_flushes(database)
+        started = time.perf_counter()
+        deadline = started + self.duration
+        workers = [threading.Thread(target=self._run_thread, args=(index, recorder, deadline))
+                   for index in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        recorder.close()
+        flushes_after = device_flushes(database)
+
+        report = recorder.report(elapsed)
+        writes = report['endpoints'].get('save_rating', {}).get('requests', 0)
+        flushes = flushes_after - flushes_before if flushes_before is not None and flushes_after is not None else None
+        report['device_flushes'] = flushes
+        report['flushes_per_write'] = round(flushes / writes, 3) if flushes is not None and writes else None
+        return report
+
+
+def format_profiles(reports: Dict[str, Dict[str, Any]]) -> str:
+    """One line per profile: throughput, latency and device flushes."""
+    lines = [f"{'profile':<12}  {'ops/s':>9}  {'votes/s':>9}  {'reads/s':>9}  {'vote p99':>9}  "
+             f"{'read p99':>9}  {'errors':>6}  {'flushes':>8}  {'per vote':>8}",
+             f'{"":-<12}  {"":->9}  {"":->9}  {"":->9}  {"":->9}  {"":->9}  {"":->6}  {"":->8}  {"":->8}']
+    for profile, report in reports.items():
+        votes = report['endpoints'].get('save_rating', {})
+        reads = report['endpoints'].get('get_track_ratings', {})
+        flushes = report['device_flushes']
+        per_vote = report['flushes_per_write']
+        lines.append(f"{profile:<12}  {report['rps']:>9.1f}  {votes.get('rps', 0):>9.1f}  "
+                     f"{reads.get('rps', 0):>9.1f}  {votes.get('p99_ms', 0):>9.3f}  {reads.get('p99_ms', 0):>9.3f}  "
+                     f"{report['errors']:>6}  {'n/a' if flushes is None else flushes:>8}  "
+                     f"{'n/a' if per_vote is None else per_vote:>8}")
+    return '\n'.join(lines)
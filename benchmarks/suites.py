@@ -0,0 +1,272 @@
+"""Model and endpoint benchmarks for Radio Calico.
+
+Model benchmarks call every public ``User``, ``Post`` and ``Rating``
+method directly; endpoint benchmarks send requests through the Flask
+test client, so they include routing, validation, serialization and the
+request hooks but not a network stack. Arguments are drawn with the
+same skew the data was seeded with, so popular tracks and busy
+listeners are asked about most often.
+
+The CDN is replaced by ``StubAdapter`` so stream endpoints measure this
+code, not the internet. Admin endpoints that switch process-wide
+instrumentation on or off (profiler and tracemalloc start/stop,
+snapshots) are not benchmarked because they would distort everything
+measured after them.
+"""
+
+import itertools
+import json
+import random
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Sequence
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from backend.models import Post, Rating, User
+from backend.services.upstream import _session as upstream_session
+
+from .harness import Benchmark
+from .seed import SeedSpec, ZipfSampler, listener_fingerprints, track_id, user_email
+
+# Distinct argument sets prepared per benchmark; calls cycle through them
+ARGUMENT_POOL = 1024
+
+STUB_METADATA = {
+    'artist': 'Benchmark Artist',
+    'title': 'Benchmark Song',
+    'album': 'Benchmark Album',
+    'prev_artist_1': 'Earlier Artist',
+    'prev_title_1': 'Earlier Song'
+}
+
+STUB_PLAYLIST = """#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-TARGETDURATION:6
+#EXT-X-MEDIA-SEQUENCE:100
+#EXTINF:6.0,
+segment100.ts
+#EXTINF:6.0,
+segment101.ts
+"""
+
+
+class StubAdapter(BaseAdapter):
+    """Transport adapter answering CDN requests from memory."""
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        response.encoding = 'utf-8'
+        path = urlsplit(request.url).path
+        if path.endswith('.json'):
+            body, content_type = json.dumps(STUB_METADATA), 'application/json'
+        elif path.endswith('.m3u8'):
+            body, content_type = STUB_PLAYLIST, 'application/vnd.apple.mpegurl'
+        else:
+            body, content_type = '', 'video/mp2t'
+        response._content = b'' if request.method == 'HEAD' else body.encode('utf-8')
+        response.headers = CaseInsensitiveDict({
+            'content-type': content_type,
+            'cache-control': 'max-age=5'
+        })
+        return response
+
+    def close(self):
+        pass
+
+
+def stub_upstreams() -> None:
+    """Route every CDN request of this process to ``StubAdapter``."""
+    adapter = StubAdapter()
+    upstream_session.mount('http://', adapter)
+    upstream_session.mount('https://', adapter)
+
+
+class CheckedClient:
+    """Test client wrapper that fails on error responses.
+
+    Otherwise a broken fixture would be benchmarked as a fast 4xx/5xx.
+    """
+
+    def __init__(self, client: Any):
+        self._client = client
+
+    def _checked(self, response: Any, method: str, path: str) -> Any:
+        if response.status_code >= 400:
+            raise RuntimeError(f'{method} {path} returned {response.status_code}')
+        return response
+
+    def get(self, path: str, **kwargs: Any) -> Any:
+        return self._checked(self._client.get(path, **kwargs), 'GET', path)
+
+    def post(self, path: str, **kwargs: Any) -> Any:
+        return self._checked(self._client.post(path, **kwargs), 'POST', path)
+
+
+@dataclass
+class BenchContext:
+    """Seeded data and skewed samplers shared by the benchmark definitions."""
+
+    spec: SeedSpec
+    client: Any
+    admin_headers: Dict[str, str]
+
+    def __post_init__(self):
+        self.rng = random.Random(self.spec.seed + 2)
+        self.fingerprints = listener_fingerprints(self.spec)
+        self._track = ZipfSampler(self.spec.tracks, self.spec.track_skew, self.rng)
+        self._listener = ZipfSampler(self.spec.listeners, self.spec.listener_skew, self.rng)
+        self._author = ZipfSampler(self.spec.users, self.spec.author_skew, self.rng)
+
+    def pool(self, make: Callable[[], Any]) -> List[Any]:
+        return [make() for _ in range(ARGUMENT_POOL)]
+
+    def hot_track(self) -> str:
+        return track_id(self._track())
+
+    def any_track(self) -> str:
+        return track_id(self.rng.randrange(self.spec.tracks))
+
+    def listener(self) -> str:
+        return self.fingerprints[self._listener()]
+
+    def author(self) -> int:
+        return self._author() + 1
+
+    def user_id(self) -> int:
+        return self.rng.randint(1, self.spec.users)
+
+    def post_id(self) -> int:
+        return self.rng.randint(1, self.spec.posts)
+
+    def vote(self) -> Any:
+        return self.rng.choice(('up', 'up', 'down', None))
+
+
+def _cycle(values: Sequence[Any], call: Callable[[Any], Any]) -> Callable[[int], Any]:
+    return lambda i: call(values[i % len(values)])
+
+
+def model_benchmarks(ctx: BenchContext) -> List[Benchmark]:
+    """One benchmark per public model method, plus cached/uncached and cursor variants."""
+    users = ctx.pool(ctx.user_id)
+    posts = ctx.pool(ctx.post_id)
+    authors = ctx.pool(ctx.author)
+    hot_tracks = ctx.pool(ctx.hot_track)
+    any_tracks = ctx.pool(ctx.any_track)
+    listeners = ctx.pool(ctx.listener)
+    batches = ctx.pool(lambda: [ctx.hot_track() for _ in range(50)])
+    writes = ctx.pool(lambda: (ctx.hot_track(), ctx.vote(), ctx.listener()))
+
+    # Cursors from the middle of each listing
+    middle_user = User.get_all(ctx.spec.users // 2 + 1)[-1].page_key()
+    middle_post = Post.get_all(min(ctx.spec.posts // 2 + 1, 5000))[-1].page_key()
+    run = f'{ctx.rng.getrandbits(32):08x}'
+
+    def uncached_track_ratings(args):
+        Rating.clear_cache()
+        return Rating.get_track_ratings(*args)
+
+    return [
+        Benchmark('User.create', 'model',
+                  lambda i: User.create(f'Bench {i}', f'bench-{run}-{i}@example.com')),
+        Benchmark('User.get_by_id', 'model', _cycle(users, User.get_by_id)),
+        Benchmark('User.get_by_email', 'model', _cycle(users, lambda user_id: User.get_by_email(user_email(user_id)))),
+        Benchmark('User.get_all', 'model', lambda i: User.get_all(101)),
+        Benchmark('User.get_all[cursor]', 'model', lambda i: User.get_all(101, middle_user)),
+        Benchmark('Post.create', 'model',
+                  _cycle(authors, lambda user_id: Post.create('Benchmark post', 'lossless stream', user_id))),
+        Benchmark('Post.get_by_id', 'model', _cycle(posts, Post.get_by_id)),
+        Benchmark('Post.get_all', 'model', lambda i: Post.get_all(101)),
+        Benchmark('Post.get_all[cursor]', 'model', lambda i: Post.get_all(101, middle_post)),
+        Benchmark('Post.get_by_user', 'model', _cycle(authors, lambda user_id: Post.get_by_user(user_id, 51))),
+        Benchmark('Rating.save_rating', 'model', _cycle(writes, lambda args: Rating.save_rating(*args))),
+        Benchmark('Rating.get_track_ratings[cached]', 'model',
+                  _cycle(list(zip(hot_tracks, listeners)), lambda args: Rating.get_track_ratings(*args))),
+        Benchmark('Rating.get_track_ratings[uncached]', 'model',
+                  _cycle(list(zip(any_tracks, listeners)), uncached_track_ratings)),
+        Benchmark('Rating.get_many_track_ratings', 'model',
+                  _cycle(list(zip(batches, listeners)),
+                         lambda args: Rating.get_many_track_ratings(list(dict.fromkeys(args[0])), args[1]))),
+        Benchmark('Rating.get_user_ratings', 'model',
+                  _cycle(listeners, lambda fingerprint: Rating.get_user_ratings(fingerprint, 51))),
+        Benchmark('Rating.verify_counts', 'model', lambda i: Rating.verify_counts(), iterations=3),
+        Benchmark('Rating.rebuild_counts', 'model', lambda i: Rating.rebuild_counts(), iterations=3),
+    ]
+
+
+def endpoint_benchmarks(ctx: BenchContext) -> List[Benchmark]:
+    """One benchmark per route, through the Flask test client."""
+    client = CheckedClient(ctx.client)
+    admin = ctx.admin_headers
+    users = ctx.pool(ctx.user_id)
+    posts = ctx.pool(ctx.post_id)
+    authors = ctx.pool(ctx.author)
+    hot_tracks = ctx.pool(ctx.hot_track)
+    listeners = ctx.pool(ctx.listener)
+    batches = ctx.pool(lambda: ','.join(dict.fromkeys(ctx.hot_track() for _ in range(50))))
+    writes = ctx.pool(lambda: {'track_id': ctx.hot_track(), 'rating': ctx.vote(),
+                               'user_fingerprint': ctx.listener()})
+    run = f'{ctx.rng.getrandbits(32):08x}'
+    counter = itertools.count()
+
+    def get(path: str, **kwargs) -> Callable[[Any], Any]:
+        return lambda value: client.get(path.format(value), **kwargs)
+
+    def first_event(i):
+        # Live updates never end; time the response head and first chunk
+        response = client.get('/api/stream/events', buffered=False)
+        next(iter(response.response))
+        response.close()
+
+    return [
+        Benchmark('GET /', 'endpoint', lambda i: client.get('/')),
+        Benchmark('GET /radio', 'endpoint', lambda i: client.get('/radio')),
+        # /dashboard is left out: its template is not in the tree
+        Benchmark('GET /static/<path>', 'endpoint', lambda i: client.get('/static/RadioSahooLogoTM.png')),
+        Benchmark('GET /health', 'endpoint', lambda i: client.get('/health')),
+        Benchmark('GET /metrics', 'endpoint', lambda i: client.get('/metrics')),
+        Benchmark('GET /api/users', 'endpoint', lambda i: client.get('/api/users')),
+        Benchmark('POST /api/users', 'endpoint',
+                  lambda i: client.post('/api/users', json={'name': f'Bench {i}',
+                                                            'email': f'api-{run}-{next(counter)}@example.com'})),
+        Benchmark('GET /api/users/<id>', 'endpoint', _cycle(users, get('/api/users/{}'))),
+        Benchmark('GET /api/posts', 'endpoint', lambda i: client.get('/api/posts')),
+        Benchmark('POST /api/posts', 'endpoint',
+                  _cycle(authors, lambda user_id: client.post('/api/posts', json={
+                      'title': 'Benchmark post', 'content': 'lossless stream', 'user_id': user_id}))),
+        Benchmark('GET /api/posts/<id>', 'endpoint', _cycle(posts, get('/api/posts/{}'))),
+        Benchmark('GET /api/posts/user/<id>', 'endpoint', _cycle(authors, get('/api/posts/user/{}'))),
+        Benchmark('POST /api/ratings', 'endpoint', _cycle(writes, lambda body: client.post('/api/ratings', json=body))),
+        Benchmark('GET /api/ratings/<track_id>', 'endpoint',
+                  _cycle(list(zip(hot_tracks, listeners)),
+                         lambda args: client.get(f'/api/ratings/{args[0]}', query_string={'fingerprint': args[1]}))),
+        Benchmark('GET /api/ratings/batch', 'endpoint',
+                  _cycle(batches, lambda ids: client.get('/api/ratings/batch', query_string={'track_ids': ids}))),
+        Benchmark('POST /api/ratings/batch', 'endpoint',
+                  _cycle(batches, lambda ids: client.post('/api/ratings/batch',
+                                                          json={'track_ids': ids.split(',')}))),
+        Benchmark('GET /api/ratings/user/<fingerprint>', 'endpoint',
+                  _cycle(listeners, get('/api/ratings/user/{}'))),
+        Benchmark('GET /api/stream/info', 'endpoint', lambda i: client.get('/api/stream/info')),
+        Benchmark('GET /api/stream/metadata', 'endpoint', lambda i: client.get('/api/stream/metadata')),
+        Benchmark('GET /api/stream/status', 'endpoint', lambda i: client.get('/api/stream/status')),
+        Benchmark('GET /api/stream/events', 'endpoint', first_event),
+        Benchmark('GET /api/admin/profiler', 'endpoint', lambda i: client.get('/api/admin/profiler', headers=admin)),
+        Benchmark('GET /api/admin/profiler/flamegraph', 'endpoint',
+                  lambda i: client.get('/api/admin/profiler/flamegraph', headers=admin)),
+        Benchmark('GET /api/admin/memory', 'endpoint', lambda i: client.get('/api/admin/memory', headers=admin)),
+        Benchmark('GET /api/admin/memory/objects', 'endpoint',
+                  lambda i: client.get('/api/admin/memory/objects', headers=admin), iterations=5),
+    ]
+
+
+SUITES: Dict[str, Callable[[BenchContext], List[Benchmark]]] = {
+    'models': model_benchmarks,
+    'endpoints': endpoint_benchmarks,
+}
@@ -5,16 +5,89 @@ class MetadataManager {
     constructor(state) {
         this.state = state;
         this.logger = console;
+        this.liveUpdatesFailed = false;
     }
     
     /**
-     * Start metadata polling
+     * Start receiving metadata updates
+     *
+     * Uses the server's live update stream when the browser supports it,
+     * falling back to polling the metadata URL.
      */
     startPolling() {
+        this.stopPolling();
+        
+        if (window.EventSource && !this.liveUpdatesFailed) {
+            this.connectLiveUpdates();
+        } else {
+            this.startIntervalPolling();
+        }
+    }
+    
+    /**
+     * Stop receiving metadata updates
+     */
+    stopPolling() {
+        if (this.state.eventSource) {
+            this.state.eventSource.close();
+            this.state.eventSource = null;
+            this.logger.log('Live updates disconnected');
+        }
+        
         if (this.state.metadataInterval) {
-            this.stopPolling();
+            clearInterval(this.state.metadataInterval);
+            this.state.metadataInterval = null;
+            this.logger.log('Metadata polling stopped');
         }
+    }
+    
+    /**
+     * Subscribe to track changes and vote counts pushed by the server
+     */
+    connectLiveUpdates() {
+        const source = new EventSource(this.state.config.eventsUrl);
+        let failures = 0;
+        
+        source.addEventListener('open', () => {
+            failures = 0;
+            this.logger.log('Live updates connected');
+        });
+        
+        source.addEventListener('track', (event) => {
+            const data = JSON.parse(event.data);
+            this.updateNowPlaying(data.track);
+            this.updateRecentlyPlayed(data.track);
+            this.updateAudioQuality(data.track);
+            if (data.ratings) {
+                this.state.setRatingCounts(data.track_id, data.ratings);
+            }
+        });
         
+        source.addEventListener('ratings', (event) => {
+            const data = JSON.parse(event.data);
+            this.state.setRatingCounts(data.track_id, data.ratings);
+        });
+        
+        source.addEventListener('error', () => {
+            failures += 1;
+            
+            // The browser retries on its own; give up on streams that
+            // were refused outright or keep failing
+            if (source.readyState === EventSource.CLOSED ||
+                failures >= this.state.config.liveUpdatesMaxFailures) {
+                this.logger.warn('Live updates unavailable, falling back to polling');
+                this.liveUpdatesFailed = true;
+                this.startPolling();
+            }
+        });
+        
+        this.state.eventSource = source;
+    }
+    
+    /**
+     * Poll the metadata URL on a fixed interval
+     */
+    startIntervalPolling() {
         // Load initial metadata
         this.loadMetadata();
         
@@ -26,17 +99,6 @@ class MetadataManager {
         this.logger.log('Metadata polling started');
     }
     
-    /**
-     * Stop metadata polling
-     */
-    stopPolling() {
-        if (this.state.metadataInterval) {
-            clearInterval(this.state.metadataInterval);
-            this.state.metadataInterval = null;
-            this.logger.log('Metadata polling stopped');
-        }
-    }
-    
     /**
      * Load metadata from API
      */
@@ -10,6 +10,13 @@ class RatingManager {
         this.state.addEventListener('trackChange', (data) => {
             this.handleTrackChange(data.trackId);
         });
+        
+        // Live vote counts pushed by the server
+        this.state.addEventListener('ratingCountsChange', (data) => {
+            if (data.trackId === this.state.currentTrackId) {
+                this.updateRatingCounts(data.ratings);
+            }
+        });
     }
     
     /**
@@ -110,8 +117,13 @@ class RatingManager {
             
             if (response.ok) {
                 this.logger.log('Rating saved successfully');
-                // Reload ratings to get updated counts
-                await this.loadUserRating(trackId);
+                // The response carries the updated counts
+                const data = await response.json();
+                if (trackId === this.state.currentTrackId) {
+                    this.state.setCurrentRating(data.user_rating);
+                    this.updateRatingButtons();
+                    this.updateRatingCounts(data.ratings);
+                }
             } else {
                 const errorData = await response.json();
                 this.logger.error('Failed to save rating:', errorData);
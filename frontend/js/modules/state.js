@@ -7,6 +7,7 @@ class AppState {
         this.hls = null;
         this.isPlaying = false;
         this.metadataInterval = null;
+        this.eventSource = null;
         this.currentTrackRating = null;
         this.currentTrackId = null;
         this.userFingerprint = null;
@@ -16,14 +17,17 @@ class AppState {
             streamUrl: 'https://d3d4yli4hf5bmh.cloudfront.net/hls/live.m3u8',
             metadataUrl: 'https://d3d4yli4hf5bmh.cloudfront.net/metadatav2.json',
             coverArtUrl: 'https://d3d4yli4hf5bmh.cloudfront.net/cover.jpg',
-            metadataUpdateInterval: 10000 // 10 seconds
+            eventsUrl: '/api/stream/events',
+            metadataUpdateInterval: 10000, // 10 seconds
+            liveUpdatesMaxFailures: 3
         };
         
         // Event listeners for state changes
         this.listeners = {
             playStateChange: [],
             trackChange: [],
-            ratingChange: []
+            ratingChange: [],
+            ratingCountsChange: []
         };
     }
     
@@ -88,6 +92,13 @@ class AppState {
         }
     }
     
+    /**
+     * Publish vote counts received for a track
+     */
+    setRatingCounts(trackId, ratings) {
+        this.emit('ratingCountsChange', { trackId, ratings });
+    }
+    
     /**
      * Get current state snapshot
      */
@@ -12,6 +12,15 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
 from backend.app import create_app
 from backend.models.database import init_db
+from backend.models.migrations import apply_migrations
+from backend.models.rating import Rating
+from backend.services.events import event_broadcaster
+from backend.services.metadata import metadata_cache
+from backend.services.stream_health import stream_prober
+from backend.services.upstream import UPSTREAMS
+from backend.utils.capture import traffic_capture
+from backend.utils.memory import memory_profiler
+from backend.utils.profiler import profiler
 from backend.config import Config
 
 
@@ -54,6 +63,23 @@ def runner(app):
     return app.test_cli_runner()
 
 
+class ReusableConnection:
+    """Connection wrapper whose close() is a no-op.
+    
+    Models treat close() as "return to the pool", so a single patched
+    connection must survive being closed between model calls.
+    """
+    
+    def __init__(self, conn):
+        self._conn = conn
+    
+    def close(self):
+        pass
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
 @pytest.fixture(scope='function')
 def db_connection():
     """Create a test database connection."""
@@ -61,49 +87,23 @@ def db_connection():
     db_fd, db_path = tempfile.mkstemp()
     
     try:
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
+        # Writes run on the group-commit writer's thread
+        raw_conn = sqlite3.connect(db_path, check_same_thread=False)
+        raw_conn.row_factory = sqlite3.Row
+        conn = ReusableConnection(raw_conn)
         
         # Initialize test database schema
-        cursor = conn.cursor()
-        
-        # Create tables
-        cursor.execute('''
-            CREATE TABLE users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE posts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                content TEXT,
-                user_id INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
+        apply_migrations(conn)
         
-        cursor.execute('''
-            CREATE TABLE ratings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                track_id TEXT NOT NULL,
-                rating TEXT CHECK(rating IN ('up', 'down')) NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                user_fingerprint TEXT NOT NULL,
-                UNIQUE(track_id, user_fingerprint)
-            )
-        ''')
-        
-        conn.commit()
-        yield conn
+        # Reads share the connection too, so they see uncommitted test writes
+        with patch('backend.models.database.get_db_connection', return_value=conn), \
+                patch('backend.models.database.get_read_connection', return_value=conn), \
+                patch('backend.models.rating.get_read_connection', return_value=conn), \
+                patch('backend.models.post.get_read_connection', return_value=conn):
+            yield conn
         
     finally:
-        conn.close()
+        raw_conn.close()
         os.close(db_fd)
         os.unlink(db_path)
 
@@ -160,9 +160,15 @@ def sample_metadata():
 @pytest.fixture
 def mock_requests():
     """Mock requests module for external API calls."""
-    with patch('requests.get') as mock_get, \
-         patch('requests.head') as mock_head, \
-         patch('requests.post') as mock_post:
+    mock_get, mock_head, mock_post = MagicMock(), MagicMock(), MagicMock()
+    
+    # Upstream calls go through a shared requests.Session
+    with patch('requests.get', mock_get), \
+         patch('requests.head', mock_head), \
+         patch('requests.post', mock_post), \
+         patch('requests.Session.get', mock_get), \
+         patch('requests.Session.head', mock_head), \
+         patch('requests.Session.post', mock_post):
         
         # Mock successful metadata response
         mock_response = MagicMock()
@@ -203,8 +209,22 @@ def auth_headers():
 def clean_database():
     """Clean database before each test."""
     # This fixture runs automatically before each test
-    # Add any cleanup logic here if needed
+    # Cached data must not leak between tests
+    Rating.clear_cache()
+    metadata_cache.clear()
+    event_broadcaster.clear()
+    stream_prober.clear()
+    for client in UPSTREAMS:
+        client.reset()
     yield
+    event_broadcaster.stop()
+    stream_prober.stop()
+    profiler.stop()
+    profiler.reset()
+    memory_profiler.stop()
+    memory_profiler.clear()
+    traffic_capture.sample_rate = 0.0
+    traffic_capture.stop()
     # Cleanup after test if needed
 
 
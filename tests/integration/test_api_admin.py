@@ -0,0 +1,220 @@
+"""Integration tests for admin API endpoints."""
+
+import os
+import pytest
+import threading
+from unittest.mock import patch
+
+from backend.utils.capture import traffic_capture
+from backend.utils.profiler import profiler
+
+ADMIN_HEADERS = {'Authorization': 'Bearer test-admin-token'}
+
+
+@pytest.fixture
+def admin_token():
+    """Configure the admin token for the duration of a test."""
+    with patch('backend.api.admin.config.ADMIN_TOKEN', 'test-admin-token'):
+        yield
+
+
+class TestAdminAuth:
+    """Test cases for admin endpoint access control."""
+    
+    def test_disabled_without_token(self, client):
+        """Test that admin endpoints are hidden when no token is configured."""
+        with patch('backend.api.admin.config.ADMIN_TOKEN', None):
+            response = client.get('/api/admin/profiler', headers=ADMIN_HEADERS)
+        
+        assert response.status_code == 404
+    
+    def test_wrong_token(self, client, admin_token):
+        """Test that a wrong or missing bearer token is rejected."""
+        response = client.get('/api/admin/profiler', headers={'Authorization': 'Bearer nope'})
+        assert response.status_code == 401
+        
+        response = client.get('/api/admin/profiler')
+        assert response.status_code == 401
+        assert response.get_json()['success'] is False
+
+
+class TestProfilerAPI:
+    """Test cases for the sampling profiler endpoints."""
+    
+    def test_start_and_stop(self, client, admin_token):
+        """Test starting the profiler for one blueprint and stopping it."""
+        response = client.post('/api/admin/profiler/start', headers=ADMIN_HEADERS,
+                               json={'hz': 50, 'blueprints': ['ratings']})
+        
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['running'] is True
+        assert data['hz'] == 50
+        assert data['blueprints'] == ['ratings']
+        
+        response = client.post('/api/admin/profiler/stop', headers=ADMIN_HEADERS)
+        
+        assert response.status_code == 200
+        assert response.get_json()['running'] is False
+    
+    def test_start_validation(self, client, admin_token):
+        """Test that bad sampling rates and unknown blueprints are rejected."""
+        response = client.post('/api/admin/profiler/start', headers=ADMIN_HEADERS, json={'hz': 0})
+        assert response.status_code == 400
+        
+        response = client.post('/api/admin/profiler/start', headers=ADMIN_HEADERS,
+                               json={'blueprints': ['ratings_bp']})
+        assert response.status_code == 400
+        assert 'ratings_bp' in response.get_json()['error']
+        assert profiler.running is False
+    
+    def test_flamegraph_samples_blueprint_requests(self, client, admin_token):
+        """Test that only requests in the selected blueprints are sampled."""
+        profiler.blueprints = frozenset({'ratings'})
+        in_request = threading.Event()
+        release = threading.Event()
+        
+        def slow_ratings(track_id, user_fingerprint=None):
+            in_request.set()
+            release.wait(5)
+            return {'track_id': track_id, 'ratings': {'up': 0, 'down': 0}, 'user_rating': None}
+        
+        with patch('backend.api.ratings.Rating.get_track_ratings', side_effect=slow_ratings):
+            worker = threading.Thread(target=client.get, args=('/api/ratings/profiled-track',))
+            worker.start()
+            assert in_request.wait(5)
+            profiler.sample()
+            release.set()
+            worker.join(5)
+        
+        response = client.get('/api/admin/profiler/flamegraph?reset=true', headers=ADMIN_HEADERS)
+        
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain')
+        lines = response.get_data(as_text=True).splitlines()
+        assert len(lines) == 1
+        stack, count = lines[0].rsplit(' ', 1)
+        assert count == '1'
+        assert stack.startswith('ratings;')
+        assert 'slow_ratings' in stack
+        # The admin request itself is outside the selected blueprints
+        assert 'profiler_flamegraph' not in stack
+        assert profiler.collapsed() == ''
+
+
+class TestMemoryAPI:
+    """Test cases for the memory introspection endpoints."""
+    
+    def test_memory_overview(self, client, admin_token):
+        """Test RSS, GC and tracemalloc reporting."""
+        response = client.get('/api/admin/memory', headers=ADMIN_HEADERS)
+        
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['process']['peak_rss_bytes'] > 0
+        assert data['workers'] is None
+        assert len(data['gc']['counts']) == 3
+        assert data['tracemalloc']['tracing'] is False
+    
+    def test_worker_rss(self, client, admin_token):
+        """Test that sibling workers are listed under the pre-fork server."""
+        with patch('backend.api.admin.worker_pids', return_value=[os.getpid()]):
+            response = client.get('/api/admin/memory', headers=ADMIN_HEADERS)
+        
+        workers = response.get_json()['workers']
+        assert [worker['pid'] for worker in workers] == [os.getpid()]
+    
+    def test_snapshot_requires_tracing(self, client, admin_token):
+        """Test that snapshots are refused until tracemalloc is started."""
+        response = client.post('/api/admin/memory/snapshots', headers=ADMIN_HEADERS)
+        
+        assert response.status_code == 409
+    
+    def test_snapshot_diff(self, client, admin_token):
+        """Test diffing two snapshots around an allocation."""
+        response = client.post('/api/admin/memory/tracemalloc/start', headers=ADMIN_HEADERS,
+                               json={'frames': 1})
+        assert response.get_json()['tracing'] is True
+        
+        first = client.post('/api/admin/memory/snapshots', headers=ADMIN_HEADERS)
+        assert first.status_code == 201
+        retained = [bytearray(4096) for _ in range(256)]
+        second = client.post('/api/admin/memory/snapshots', headers=ADMIN_HEADERS)
+        
+        old_id, new_id = first.get_json()['id'], second.get_json()['id']
+        response = client.get(f'/api/admin/memory/snapshots/{old_id}/diff/{new_id}?limit=5',
+                              headers=ADMIN_HEADERS)
+        
+        assert response.status_code == 200
+        stats = response.get_json()['stats']
+        assert len(stats) <= 5
+        assert stats[0]['file'] == __file__
+        assert stats[0]['size_diff_bytes'] >= 4096 * 256
+        assert len(retained) == 256
+        
+        response = client.get(f'/api/admin/memory/snapshots/{new_id}?group_by=filename',
+                              headers=ADMIN_HEADERS)
+        assert response.status_code == 200
+        assert response.get_json()['stats'][0]['size_bytes'] > 0
+    
+    def test_snapshot_errors(self, client, admin_token):
+        """Test unknown snapshots and groupings."""
+        response = client.get('/api/admin/memory/snapshots/999', headers=ADMIN_HEADERS)
+        assert response.status_code == 404
+        
+        response = client.get('/api/admin/memory/snapshots/1?group_by=traceback', headers=ADMIN_HEADERS)
+        assert response.status_code == 400
+    
+    def test_object_histogram(self, client, admin_token):
+        """Test the live object type histogram."""
+        response = client.get('/api/admin/memory/objects?limit=3', headers=ADMIN_HEADERS)
+        
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['count'] == 3
+        assert data['types'][0]['count'] >= data['types'][1]['count']
+
+
+class TestCaptureAPI:
+    """Test cases for the traffic capture endpoints."""
+    
+    def test_requires_admin(self, client):
+        """Test that capture cannot be started without the admin token."""
+        with patch('backend.api.admin.config.ADMIN_TOKEN', None):
+            response = client.post('/api/admin/capture/start', json={'sample_rate': 1})
+        
+        assert response.status_code == 404
+        assert traffic_capture.sample_rate == 0
+    
+    def test_start_validation(self, client, admin_token):
+        """Test that sample rates outside (0, 1] are rejected."""
+        for sample_rate in (0, 1.5, -0.1, 'all', True, None):
+            response = client.post('/api/admin/capture/start', headers=ADMIN_HEADERS,
+                                   json={'sample_rate': sample_rate})
+            assert response.status_code == 400
+        assert traffic_capture.sample_rate == 0
+    
+    def test_capture_anonymizes_sampled_requests(self, client, admin_token, tmp_path, mock_requests):
+        """Test that captured requests are written with anonymized listeners."""
+        from benchmarks.replay import read_capture
+        
+        with patch.object(traffic_capture, 'directory', str(tmp_path)):
+            response = client.post('/api/admin/capture/start', headers=ADMIN_HEADERS, json={'sample_rate': 1})
+            assert response.status_code == 200
+            assert response.get_json()['sample_rate'] == 1.0
+            
+            client.get('/api/ratings/capture-track?fingerprint=secret-listener')
+            client.get('/api/ratings/user/secret-listener')
+            
+            response = client.post('/api/admin/capture/stop', headers=ADMIN_HEADERS)
+            assert response.get_json()['sample_rate'] == 0
+            entries = read_capture([traffic_capture.path])
+        
+        anonymous = traffic_capture.anonymize('secret-listener')
+        assert [entry['route'] for entry in entries] == [
+            '/api/ratings/<track_id>', '/api/ratings/user/<user_fingerprint>'
+        ]
+        assert entries[0]['query'] == f'fingerprint={anonymous}'
+        assert entries[1]['path'] == f'/api/ratings/user/{anonymous}'
+        assert 'secret-listener' not in str(entries)
+        assert all(entry['status'] == 200 for entry in entries)
@@ -2,6 +2,7 @@
 
 import pytest
 import json
+from unittest.mock import patch
 
 
 class TestRatingsAPI:
@@ -62,6 +63,44 @@ class TestRatingsAPI:
         assert data['success'] is True
         assert data['rating'] == 'down'
     
+    def test_create_rating_returns_counts(self, client, auth_headers):
+        """Test that saving a rating returns the updated counts."""
+        rating_data = {
+            'track_id': 'counts-track',
+            'rating': 'up',
+            'user_fingerprint': 'counts-user-1'
+        }
+        client.post('/api/ratings', json=rating_data, headers=auth_headers)
+        
+        rating_data['user_fingerprint'] = 'counts-user-2'
+        rating_data['rating'] = 'down'
+        response = client.post('/api/ratings', json=rating_data, headers=auth_headers)
+        
+        data = response.get_json()
+        assert data['success'] is True
+        assert data['ratings'] == {'up': 1, 'down': 1}
+        assert data['user_rating'] == 'down'
+        assert data['changed'] is True
+        
+        # Re-submitting the same vote is a no-op
+        response = client.post('/api/ratings', json=rating_data, headers=auth_headers)
+        data = response.get_json()
+        assert data['changed'] is False
+        assert data['ratings'] == {'up': 1, 'down': 1}
+    
+    def test_create_rating_notifies_live_updates(self, client, auth_headers):
+        """Test that only changed votes are pushed to live update subscribers."""
+        rating_data = {
+            'track_id': 'live-track',
+            'rating': 'up',
+            'user_fingerprint': 'live-user'
+        }
+        with patch('backend.api.ratings.event_broadcaster') as broadcaster:
+            client.post('/api/ratings', json=rating_data, headers=auth_headers)
+            client.post('/api/ratings', json=rating_data, headers=auth_headers)
+        
+        broadcaster.notify_rating.assert_called_once_with('live-track')
+    
     def test_remove_rating(self, client, sample_rating_data, auth_headers):
         """Test removing a rating."""
         # Create initial rating
@@ -197,4 +236,96 @@ class TestRatingsAPI:
         assert response.status_code == 200
         data = response.get_json()
         assert data['success'] is True
-        assert len(data['ratings']) == 0
\ No newline at end of file
+        assert len(data['ratings']) == 0
+    
+    def test_batch_ratings_post(self, client, auth_headers):
+        """Test looking up several tracks in one request."""
+        client.post('/api/ratings', json={
+            'track_id': 'batch-track-1', 'rating': 'up', 'user_fingerprint': 'batch-user'
+        })
+        client.post('/api/ratings', json={
+            'track_id': 'batch-track-2', 'rating': 'down', 'user_fingerprint': 'other-user'
+        })
+        
+        response = client.post('/api/ratings/batch', json={
+            'track_ids': ['batch-track-1', 'batch-track-2', 'batch-track-3', 'batch-track-1'],
+            'user_fingerprint': 'batch-user'
+        }, headers=auth_headers)
+        
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['success'] is True
+        assert data['count'] == 3
+        tracks = data['tracks']
+        assert [track['track_id'] for track in tracks] == [
+            'batch-track-1', 'batch-track-2', 'batch-track-3'
+        ]
+        assert tracks[0]['ratings'] == {'up': 1, 'down': 0}
+        assert tracks[0]['user_rating'] == 'up'
+        assert tracks[1]['ratings'] == {'up': 0, 'down': 1}
+        assert tracks[1]['user_rating'] is None
+        assert tracks[2]['ratings'] == {'up': 0, 'down': 0}
+    
+    def test_batch_ratings_get(self, client):
+        """Test batch lookup with query parameters."""
+        client.post('/api/ratings', json={
+            'track_id': 'batch-get-track', 'rating': 'up', 'user_fingerprint': 'batch-get-user'
+        })
+        
+        response = client.get(
+            '/api/ratings/batch?track_ids=batch-get-track,batch-get-missing&fingerprint=batch-get-user'
+        )
+        
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['count'] == 2
+        assert data['tracks'][0]['user_rating'] == 'up'
+    
+    def test_batch_ratings_validation(self, client, auth_headers):
+        """Test batch lookup input validation."""
+        response = client.post('/api/ratings/batch', json={'track_ids': 'not-a-list'},
+                               headers=auth_headers)
+        assert response.status_code == 400
+        
+        response = client.get('/api/ratings/batch')
+        assert response.status_code == 400
+        
+        too_many = [f'track-{i}' for i in range(51)]
+        response = client.post('/api/ratings/batch', json={'track_ids': too_many},
+                               headers=auth_headers)
+        assert response.status_code == 400
+        assert 'At most' in response.get_json()['error']
+        
+        for fingerprint in (['a', 'b'], {'id': 'a'}, 42):
+            response = client.post('/api/ratings/batch',
+                                   json={'track_ids': ['track-1'], 'user_fingerprint': fingerprint},
+                                   headers=auth_headers)
+            assert response.status_code == 400
+            assert 'user_fingerprint' in response.get_json()['error']
+    
+    def test_get_user_ratings_cursor_pagination(self, client):
+        """Test paging through a user's rating history with cursors."""
+        fingerprint = 'paging-user'
+        for i in range(5):
+            client.post('/api/ratings', json={
+                'track_id': f'paging-track-{i}', 'rating': 'up', 'user_fingerprint': fingerprint
+            })
+        
+        seen = []
+        url = f'/api/ratings/user/{fingerprint}?limit=2'
+        while url:
+            data = client.get(url).get_json()
+            assert data['success'] is True
+            seen.extend(rating['track_id'] for rating in data['ratings'])
+            cursor = data['next_cursor']
+            url = f'/api/ratings/user/{fingerprint}?limit=2&after={cursor}' if cursor else None
+        
+        assert sorted(seen) == [f'paging-track-{i}' for i in range(5)]
+        assert len(seen) == 5
+    
+    def test_get_user_ratings_invalid_cursor(self, client):
+        """Test that a malformed cursor is rejected."""
+        response = client.get('/api/ratings/user/someone?after=garbage')
+        
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'Invalid cursor'
@@ -1,7 +1,20 @@
 """Integration tests for stream API endpoints."""
 
+import json
 import pytest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
+
+MEDIA_PLAYLIST = """#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-TARGETDURATION:6
+#EXT-X-MEDIA-SEQUENCE:100
+#EXTINF:6.0,
+segment100.ts
+#EXTINF:6.0,
+segment101.ts
+#EXTINF:6.0,
+segment102.ts
+"""
 
 
 class TestStreamAPI:
@@ -34,6 +47,18 @@ class TestStreamAPI:
         assert data['metadata']['artist'] == sample_metadata['artist']
         assert data['metadata']['title'] == sample_metadata['title']
     
+    def test_stream_metadata_cached(self, client, mock_requests, sample_metadata):
+        """Test that repeated metadata requests share one upstream fetch."""
+        mock_requests['response'].json.return_value = sample_metadata
+        mock_requests['response'].headers = {'cache-control': 'max-age=10'}
+        
+        client.get('/api/stream/metadata')
+        response = client.get('/api/stream/metadata')
+        
+        assert response.status_code == 200
+        assert response.get_json()['metadata']['title'] == sample_metadata['title']
+        assert mock_requests['get'].call_count == 1
+    
     def test_stream_metadata_request_error(self, client, mock_requests):
         """Test metadata retrieval with request error."""
         import requests
@@ -57,9 +82,55 @@ class TestStreamAPI:
         data = response.get_json()
         assert data['success'] is False
     
+    def test_stream_events(self, client, mock_requests, sample_metadata):
+        """Test that the live update stream starts with the current track."""
+        mock_requests['response'].json.return_value = sample_metadata
+        
+        response = client.get('/api/stream/events', buffered=False)
+        try:
+            assert response.status_code == 200
+            assert response.mimetype == 'text/event-stream'
+            assert response.headers['Cache-Control'] == 'no-cache'
+            
+            chunks = iter(response.response)
+            assert next(chunks).startswith(b'retry:')
+            message = next(chunks).decode()
+        finally:
+            response.close()
+        
+        assert message.startswith('event: track\n')
+        data = json.loads(message.split('data: ', 1)[1])
+        assert data['track_id'] == 'test-artist-test-song'
+        assert data['track']['album'] == sample_metadata['album']
+        assert set(data['ratings']) == {'up', 'down'}
+    
+    def test_stream_events_unsubscribes_on_close(self, client, mock_requests, sample_metadata):
+        """Test that closing the stream frees its subscription."""
+        from backend.services.events import event_broadcaster
+        mock_requests['response'].json.return_value = sample_metadata
+        
+        response = client.get('/api/stream/events', buffered=False)
+        assert event_broadcaster.subscriber_count() == 1
+        response.close()
+        
+        assert event_broadcaster.subscriber_count() == 0
+    
+    def test_stream_events_at_capacity(self, client, mock_requests):
+        """Test that streams beyond the per-worker cap are refused."""
+        from backend.services.events import event_broadcaster
+        
+        with patch.object(event_broadcaster, 'max_subscribers', 0):
+            response = client.get('/api/stream/events')
+        
+        assert response.status_code == 503
+        data = response.get_json()
+        assert data['success'] is False
+        assert event_broadcaster.subscriber_count() == 0
+    
     def test_stream_status_online(self, client, mock_requests):
         """Test stream status when stream is online."""
         mock_requests['response'].status_code = 200
+        mock_requests['response'].text = MEDIA_PLAYLIST
         mock_requests['response'].headers = {
             'content-type': 'application/vnd.apple.mpegurl',
             'server': 'nginx/1.24.0'
@@ -74,11 +145,38 @@ class TestStreamAPI:
         assert 'stream_url' in data
         assert 'content_type' in data
         assert 'server' in data
+        assert data['probe']['media_sequence'] == 100
+        assert data['probe']['playlist_ttfb_ms'] is not None
+        assert len(data['history']) == 1
+        segment_url = mock_requests['head'].call_args[0][0]
+        assert segment_url.endswith('/segment102.ts')
+    
+    def test_stream_status_served_from_snapshot(self, client, mock_requests):
+        """Test that repeated status checks do not hit the CDN."""
+        mock_requests['response'].text = MEDIA_PLAYLIST
+        
+        client.get('/api/stream/status')
+        client.get('/api/stream/status')
+        
+        assert mock_requests['get'].call_count == 1
+    
+    def test_stream_status_segment_missing(self, client, mock_requests):
+        """Test that a playlist without a fetchable segment is degraded."""
+        mock_requests['response'].text = MEDIA_PLAYLIST
+        segment_response = MagicMock(status_code=404)
+        mock_requests['head'].return_value = segment_response
+        
+        response = client.get('/api/stream/status')
+        
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['status'] == 'degraded'
+        assert data['probe']['segment_status'] == 404
     
     def test_stream_status_offline(self, client, mock_requests):
         """Test stream status when stream is offline."""
         mock_requests['response'].status_code = 404
-        mock_requests['head'].return_value = mock_requests['response']
+        mock_requests['get'].return_value = mock_requests['response']
         
         response = client.get('/api/stream/status')
         
@@ -86,11 +184,12 @@ class TestStreamAPI:
         data = response.get_json()
         assert data['success'] is False
         assert 'unavailable' in data['error']
+        assert data['probe']['playlist_status'] == 404
     
     def test_stream_status_connection_error(self, client, mock_requests):
         """Test stream status with connection error."""
         import requests
-        mock_requests['head'].side_effect = requests.ConnectionError("Connection failed")
+        mock_requests['get'].side_effect = requests.ConnectionError("Connection failed")
         
         response = client.get('/api/stream/status')
         
@@ -102,7 +201,7 @@ class TestStreamAPI:
     def test_stream_status_timeout(self, client, mock_requests):
         """Test stream status with timeout."""
         import requests
-        mock_requests['head'].side_effect = requests.Timeout("Request timeout")
+        mock_requests['get'].side_effect = requests.Timeout("Request timeout")
         
         response = client.get('/api/stream/status')
         
@@ -1,6 +1,12 @@
 """Integration tests for main application."""
 
+import json
+import sqlite3
 import pytest
+from unittest.mock import patch
+
+from backend.config import config
+from backend.models.migrations import MIGRATIONS, apply_migrations, get_schema_version, insert_ratings
 
 
 class TestMainApplication:
@@ -39,6 +45,53 @@ class TestMainApplication:
         assert data['version'] == '2.0'
         assert data['database'] == 'connected'
         assert 'stream_url' in data
+        assert data['storage']['profile'] == 'durable'
+    
+    def test_health_check_database_down(self, client):
+        """Test that a failing database check is reported."""
+        with patch('backend.app.check_database', return_value=False):
+            response = client.get('/health')
+        
+        assert response.status_code == 503
+        data = response.get_json()
+        assert data['status'] == 'degraded'
+        assert data['database'] == 'unavailable'
+    
+    def test_metrics_endpoint(self, client):
+        """Test Prometheus metrics for requests and database queries."""
+        client.get('/api/ratings/metrics-track')
+        client.get('/api/ratings/metrics-track')
+        
+        response = client.get('/metrics')
+        
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain')
+        body = response.get_data(as_text=True)
+        assert '# TYPE radio_http_request_duration_seconds histogram' in body
+        assert 'route="/api/ratings/<track_id>"' in body
+        assert 'metrics-track' not in body
+        assert 'radio_http_requests_in_flight 1' in body
+        assert 'radio_db_queries_total{operation="select"}' in body
+    
+    def test_request_tracing(self, client, tmp_path):
+        """Test that a sampled rating request exports its spans."""
+        from backend.utils.tracing import ChromeTraceExporter, Tracer
+        exporter = ChromeTraceExporter(str(tmp_path), 1024 * 1024)
+        
+        with patch('backend.app.tracer', Tracer(1.0, exporter)):
+            client.post('/api/ratings', json={
+                'track_id': 'traced-track',
+                'rating': 'up',
+                'user_fingerprint': 'traced-user'
+            })
+        
+        with open(exporter.path) as trace_file:
+            events = json.loads(trace_file.read() + ']')
+        names = {event['name'] for event in events}
+        assert events[0]['name'] == 'POST /api/ratings'
+        assert events[0]['args']['status'] == 200
+        assert {'parse json', 'Rating.save_rating', 'acquire connection', 'jsonify'} <= names
+        assert {'request', 'db', 'model', 'serialize', 'logging'} <= {event['cat'] for event in events}
     
     def test_static_files_route(self, client):
         """Test static files serving."""
@@ -132,4 +185,75 @@ class TestApplicationConfiguration:
     
     def test_csrf_disabled_in_tests(self, app):
         """Test that CSRF is disabled for testing.""" 
-        assert app.config['WTF_CSRF_ENABLED'] is False
\ No newline at end of file
+        assert app.config['WTF_CSRF_ENABLED'] is False
+
+
+class TestCLICommands:
+    """Test cases for maintenance CLI commands."""
+    
+    def test_verify_counts_consistent(self, runner):
+        """Test verifying rating counters on a consistent database."""
+        result = runner.invoke(args=['ratings', 'verify-counts'])
+        
+        assert result.exit_code == 0
+        assert 'consistent' in result.output
+    
+    def test_rebuild_counts(self, runner):
+        """Test rebuilding rating counters."""
+        result = runner.invoke(args=['ratings', 'rebuild-counts'])
+        
+        assert result.exit_code == 0
+        assert 'Rebuilt rating counters' in result.output
+    
+    def test_db_upgrade_and_version(self, runner):
+        """Test schema migration commands."""
+        result = runner.invoke(args=['db', 'upgrade'])
+        assert result.exit_code == 0
+        assert 'up to date' in result.output
+        
+        result = runner.invoke(args=['db', 'version'])
+        assert result.exit_code == 0
+        assert 'Schema version' in result.output
+    
+    def test_reshard(self, runner, tmp_path):
+        """Test copying ratings into a layout with more shards."""
+        source = str(tmp_path / 'ratings-00-of-01.db')
+        conn = sqlite3.connect(source)
+        apply_migrations(conn)
+        insert_ratings(conn, [(f'track-{n}', 'user1', 1, 1704067200) for n in range(10)])
+        conn.commit()
+        conn.close()
+        
+        with patch.object(config, 'RATINGS_SHARD_DIR', str(tmp_path)):
+            result = runner.invoke(args=['ratings', 'reshard', '--from', '1', '--to', '4'])
+            assert result.exit_code == 0
+            assert 'Copied 10 ratings' in result.output
+            
+            result = runner.invoke(args=['ratings', 'reshard', '--from', '2', '--to', '4'])
+            assert result.exit_code != 0
+            assert 'No such database' in result.output
+    
+    def test_compact(self, runner, tmp_path):
+        """Test copying text-keyed ratings into the compact tables ahead of the upgrade."""
+        path = str(tmp_path / 'radio.db')
+        conn = sqlite3.connect(path)
+        get_schema_version(conn)
+        for migration in MIGRATIONS[:3]:
+            migration.apply(conn)
+            conn.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                         (migration.version, migration.description))
+        conn.executemany('INSERT INTO ratings (track_id, rating, user_fingerprint) VALUES (?, ?, ?)',
+                         [(f'track-{n}', 'up', f'user{n}') for n in range(25)])
+        conn.commit()
+        conn.close()
+        
+        with patch.object(config, 'DATABASE_PATH', path), patch.object(config, 'RATINGS_SHARDS', 0):
+            result = runner.invoke(args=['ratings', 'compact', '--batch-size', '10', '--pause', '0'])
+            assert result.exit_code == 0
+            assert 'copied 25 ratings' in result.output
+        
+        conn = sqlite3.connect(path)
+        assert conn.execute('SELECT COUNT(*) FROM ratings_v2').fetchone()[0] == 25
+        assert apply_migrations(conn) == [4]
+        assert conn.execute('SELECT COUNT(*) FROM ratings').fetchone()[0] == 25
+        conn.close()
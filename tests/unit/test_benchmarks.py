@@ -0,0 +1,328 @@
+"""Unit tests for the benchmark data generator, regression comparison, load generator, replay and storage runs."""
+
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from benchmarks import loadgen
+from benchmarks.harness import compare, format_comparison, measure
+from benchmarks.loadgen import (
+    EventStream, FakeCDN, LatencyRecorder, LoadGenerator, LoadProfile, Reply, Station, parse_sse
+)
+from benchmarks.replay import Replayer, listener
+from benchmarks.seed import SeedSpec, ensure_seeded, listener_fingerprints, seed_database
+from benchmarks.storage import device_flushes, format_profiles
+from backend.services.events import format_event, track_id_for
+
+SPEC = SeedSpec(users=20, posts=60, tracks=50, listeners=80, ratings=400)
+
+
+def table_rows(path, table):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f'SELECT * FROM {table} ORDER BY 1').fetchall()
+    finally:
+        conn.close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class RecordingTarget:
+    """Target that answers like the ratings API and remembers each request."""
+    
+    def __init__(self, stream_status=200):
+        self.stream_status = stream_status
+        self.requests = []
+        self.streams = 0
+        self._lock = threading.Lock()
+    
+    def request(self, method, path, params=None, json=None):
+        with self._lock:
+            self.requests.append((method, path, params, json))
+        user_rating = json['rating'] if json else None
+        return Reply(200, {'success': True, 'user_rating': user_rating, 'ratings': {'up': 0, 'down': 0}})
+    
+    def events(self, path):
+        with self._lock:
+            self.streams += 1
+        if self.stream_status != 200:
+            return EventStream(self.stream_status, [], lambda: None)
+        chunks = ['retry: 5000\n\n', format_event('track', {'track_id': 'artist-000000-song-0000003'})]
+        return EventStream(200, chunks, lambda: None)
+    
+    def close(self):
+        pass
+
+
+def results(**medians):
+    return {'meta': {}, 'benchmarks': {name: {'median_ms': value} for name, value in medians.items()}}
+
+
+class TestSeedDatabase:
+    """Test cases for the seeded benchmark databases."""
+    
+    def test_seed_is_deterministic(self, tmp_path):
+        """Test that the same spec produces identical rows."""
+        first, second = str(tmp_path / 'a.db'), str(tmp_path / 'b.db')
+        
+        counts = seed_database(first, SPEC)
+        seed_database(second, SPEC)
+        
+        assert counts['users'] == 20
+        assert counts['posts'] == 60
+        assert counts['ratings'] == 400
+        for table in ('users', 'posts', 'ratings', 'track_rating_counts'):
+            assert table_rows(first, table) == table_rows(second, table)
+    
+    def test_ratings_are_skewed(self, tmp_path):
+        """Test that the most popular track collects far more votes than average."""
+        path = str(tmp_path / 'skew.db')
+        seed_database(path, SPEC)
+        
+        totals = sorted((up + down for _, up, down in table_rows(path, 'track_rating_counts')), reverse=True)
+        
+        assert totals[0] > 5 * (SPEC.ratings / SPEC.tracks)
+    
+    def test_ensure_seeded_reuses_database(self, tmp_path):
+        """Test that a cached database is reused for the same spec."""
+        path, counts = ensure_seeded(str(tmp_path), SPEC)
+        marker = sqlite3.connect(path)
+        marker.execute("INSERT INTO users (name, email) VALUES ('marker', 'marker@example.com')")
+        marker.commit()
+        marker.close()
+        
+        assert ensure_seeded(str(tmp_path), SPEC) == (path, counts)
+        assert len(table_rows(path, 'users')) == 21
+        
+        ensure_seeded(str(tmp_path), SPEC, force=True)
+        assert len(table_rows(path, 'users')) == 20
+
+
+class TestBenchmarkHarness:
+    """Test cases for timing and baseline comparison."""
+    
+    def test_measure(self):
+        """Test that warmup calls are not timed."""
+        calls = []
+        
+        result = measure(calls.append, iterations=10, warmup=3)
+        
+        assert calls == list(range(13))
+        assert result['iterations'] == 10
+        assert result['min_ms'] <= result['median_ms'] <= result['p95_ms'] <= result['max_ms']
+    
+    def test_compare_flags_regressions(self):
+        """Test regression, improvement, noise and added/removed benchmarks."""
+        baseline = results(slow=1.0, fast=1.0, noise=0.010, same=2.0, dropped=1.0)
+        current = results(slow=1.5, fast=0.5, noise=0.015, same=2.1, added=1.0)
+        
+        rows = {row['name']: row for row in compare(baseline, current, threshold=0.10, min_delta_ms=0.02)}
+        
+        assert rows['slow']['status'] == 'regression'
+        assert rows['slow']['change'] == 0.5
+        assert rows['fast']['status'] == 'improvement'
+        assert rows['noise']['status'] == 'ok'
+        assert rows['same']['status'] == 'ok'
+        assert rows['dropped']['status'] == 'missing'
+        assert rows['added']['status'] == 'new'
+        assert '1 regression(s)' in format_comparison(list(rows.values()))
+
+
+class TestLoadGenerator:
+    """Test cases for the synthetic listener load generator."""
+    
+    def test_station_metadata_matches_player_track_ids(self):
+        """Test that the stand-in metadata yields the seeded track ids and advances."""
+        clock = FakeClock()
+        station = Station(SPEC, track_seconds=10, clock=clock)
+        
+        first = station.metadata()
+        assert track_id_for(first) == station.current_track_id()
+        assert 'prev_artist_1' not in first
+        
+        clock.now = 25
+        third = station.metadata()
+        assert station.index() == 2
+        assert track_id_for(third) == station.current_track_id() != track_id_for(first)
+        assert '#EXT-X-MEDIA-SEQUENCE:2' in station.playlist()
+        assert (third['prev_artist_2'], third['prev_title_2']) == (first['artist'], first['title'])
+    
+    def test_parse_sse_across_chunks(self):
+        """Test that messages split across chunks are reassembled and comments skipped."""
+        body = ('retry: 5000\n\n: keepalive\n\n' + format_event('track', {'track_id': 'a'}) +
+                format_event('ratings', {'up': 1})).encode('utf-8')
+        chunks = [body[i:i + 7] for i in range(0, len(body), 7)]
+        
+        assert list(parse_sse(chunks)) == [('track', '{"track_id":"a"}'), ('ratings', '{"up":1}')]
+    
+    def test_recorder_report(self):
+        """Test per-endpoint percentiles, error counting and the closed window."""
+        recorder = LatencyRecorder()
+        for ms in range(1, 101):
+            recorder.record('GET /a', float(ms), 200)
+        recorder.record('GET /a', 500.0, 503)
+        recorder.record('GET /a', 1.0, None)
+        recorder.record('CDN GET /m', 1.0, 200)
+        recorder.close()
+        recorder.record('GET /a', 1.0, 200)
+        
+        report = recorder.report(duration=2.0)
+        
+        endpoint = report['endpoints']['GET /a']
+        assert endpoint['requests'] == 102
+        assert endpoint['errors'] == 2
+        assert endpoint['statuses'] == {'200': 100, '503': 1, 'error': 1}
+        assert endpoint['p50_ms'] == 50.0
+        assert endpoint['p99_ms'] == 100.0
+        assert endpoint['max_ms'] == 500.0
+        # CDN requests are reported but not counted as server load
+        assert report['requests'] == 102
+        assert report['rps'] == 51.0
+    
+    def test_polling_listeners_load_ratings_and_vote(self):
+        """Test that track changes trigger rating loads and votes shaped like the player's."""
+        station = Station(SPEC, track_seconds=0.3)
+        target = RecordingTarget()
+        profile = LoadProfile(listeners=4, duration=1.0, ramp=0.1, poll_interval=0.05, live_share=0.0,
+                              burst_jitter=0.01, vote_probability=1.0, revote_probability=0.0, workers=4)
+        fingerprints = listener_fingerprints(SPEC)
+        
+        with FakeCDN(station) as cdn:
+            report = LoadGenerator(target, station, cdn.base_url, fingerprints, profile).run()
+            assert cdn.served()['metadatav2.json'] > 0
+        
+        loads = [request for request in target.requests if request[0] == 'GET']
+        votes = [request[3] for request in target.requests if request[0] == 'POST']
+        assert len({path for _, path, _, _ in loads}) >= 2
+        assert all(path.startswith('/api/ratings/artist-') for _, path, _, _ in loads)
+        assert {params['fingerprint'] for _, _, params, _ in loads} <= set(fingerprints[:4])
+        assert votes
+        for vote in votes:
+            assert set(vote) == {'track_id', 'rating', 'user_fingerprint', 'timestamp'}
+            assert vote['rating'] in ('up', 'down')
+        assert report['endpoints']['GET /api/ratings/<track_id>']['requests'] == len(loads)
+        assert report['errors'] == 0
+    
+    def test_live_listeners_follow_track_events(self):
+        """Test that a live update track event triggers the rating burst."""
+        station = Station(SPEC, track_seconds=60)
+        target = RecordingTarget()
+        profile = LoadProfile(listeners=3, duration=0.5, ramp=0.0, live_share=1.0, burst_jitter=0.01,
+                              vote_probability=0.0)
+        
+        with FakeCDN(station) as cdn:
+            report = LoadGenerator(target, station, cdn.base_url, listener_fingerprints(SPEC), profile).run()
+        
+        assert report['events']['track_events'] == 3
+        assert [path for _, path, _, _ in target.requests] == ['/api/ratings/artist-000000-song-0000003'] * 3
+        assert report['endpoints']['GET /api/stream/events']['requests'] == 3
+    
+    def test_failing_live_updates_fall_back_to_polling(self, monkeypatch):
+        """Test that a listener polls metadata after repeated stream failures."""
+        monkeypatch.setattr(loadgen, 'EVENTS_RETRY', 0.01)
+        station = Station(SPEC, track_seconds=60)
+        target = RecordingTarget(stream_status=503)
+        profile = LoadProfile(listeners=1, duration=0.5, ramp=0.0, poll_interval=0.1, live_share=1.0,
+                              burst_jitter=0.01, vote_probability=0.0)
+        
+        with FakeCDN(station) as cdn:
+            report = LoadGenerator(target, station, cdn.base_url, listener_fingerprints(SPEC), profile).run()
+        
+        assert target.streams == loadgen.LIVE_UPDATES_MAX_FAILURES
+        assert report['events']['fell_back_to_polling'] == 1
+        assert report['endpoints']['GET /api/stream/events']['statuses'] == {'503': 3}
+        assert report['endpoints']['CDN GET /metadatav2.json']['requests'] >= 1
+        assert target.requests[0][1] == f'/api/ratings/{station.current_track_id()}'
+
+
+def vote(ts, fingerprint, rating, status=200):
+    return {'ts': ts, 'method': 'POST', 'route': '/api/ratings', 'path': '/api/ratings', 'query': '',
+            'body': {'track_id': 'track-1', 'rating': rating, 'user_fingerprint': fingerprint},
+            'status': status, 'duration_ms': 2.0}
+
+
+class TestReplay:
+    """Test cases for replaying captured traffic."""
+    
+    def test_listener_from_any_request_shape(self):
+        """Test that the listener is found in bodies, queries and paths."""
+        assert listener(vote(0, 'abc', 'up')) == 'abc'
+        assert listener({'path': '/api/ratings/t', 'query': 'fingerprint=def'}) == 'def'
+        assert listener({'route': '/api/ratings/user/<user_fingerprint>', 'path': '/api/ratings/user/ghi'}) == 'ghi'
+        assert listener({'path': '/api/health', 'query': ''}) is None
+    
+    def test_listener_order_is_kept(self):
+        """Test that each listener's requests arrive in captured order."""
+        entries = []
+        for i in range(40):
+            entries.append(vote(i * 0.001, 'listener-a', 'up' if i % 2 else 'down'))
+            entries.append(vote(i * 0.001, 'listener-b', 'down' if i % 2 else 'up'))
+        target = RecordingTarget()
+        
+        report = Replayer(target, entries, speed=0, lanes=4).run()
+        
+        assert report['endpoints']['POST /api/ratings']['requests'] == 80
+        for fingerprint in ('listener-a', 'listener-b'):
+            sent = [body['rating'] for _, _, _, body in target.requests if body['user_fingerprint'] == fingerprint]
+            assert sent == [entry['body']['rating'] for entry in entries
+                            if entry['body']['user_fingerprint'] == fingerprint]
+    
+    def test_status_changes_and_skipped_bodies(self):
+        """Test that differing statuses are reported and omitted bodies skipped."""
+        entries = [
+            vote(1.0, 'listener-a', 'up'),
+            vote(1.1, 'listener-a', 'up', status=429),
+            {**vote(1.2, 'listener-b', 'up'), 'body': None, 'body_omitted': True},
+            {'ts': 1.3, 'method': 'GET', 'route': '/api/health', 'path': '/api/health', 'query': 'a=1',
+             'status': 200, 'duration_ms': 1.0}
+        ]
+        target = RecordingTarget()
+        
+        report = Replayer(target, entries, speed=0).run()
+        
+        assert len(target.requests) == 3
+        assert target.requests[-1] == ('GET', '/api/health', 'a=1', None)
+        assert report['events']['skipped_body_omitted'] == 1
+        assert report['status_changes'] == [
+            {'endpoint': 'POST /api/ratings', 'captured': 429, 'replayed': 200, 'count': 1}
+        ]
+
+
+class TestStorageBenchmark:
+    """Test cases for the storage profile comparison."""
+    
+    def test_device_flushes(self, tmp_path):
+        """Test that flush counts are read when the kernel has them and never go backwards."""
+        path = tmp_path / 'flush.db'
+        path.write_bytes(b'')
+        before = device_flushes(str(path))
+        if before is None:
+            pytest.skip('the kernel reports no flush counts for this device')
+        with open(path, 'wb') as flushed:
+            flushed.write(b'x')
+            flushed.flush()
+            os.fsync(flushed.fileno())
+        assert device_flushes(str(path)) >= before
+    
+    def test_format_profiles(self):
+        """Test the per-profile table, with and without flush counts."""
+        recorder = LatencyRecorder()
+        recorder.record('save_rating', 2.0, 200)
+        recorder.record('get_track_ratings', 1.0, 200)
+        report = recorder.report(1.0)
+        reports = {
+            'durable': {**report, 'device_flushes': 4, 'flushes_per_write': 4.0},
+            'throughput': {**report, 'device_flushes': None, 'flushes_per_write': None}
+        }
+        
+        lines = format_profiles(reports).splitlines()
+        assert lines[2].split() == ['durable', '2.0', '1.0', '1.0', '2.000', '1.000', '0', '4', '4.0']
+        assert lines[3].split()[-2:] == ['n/a', 'n/a']
@@ -2,12 +2,24 @@
 
 import pytest
 import sqlite3
+import sys
+import threading
+import time
 from unittest.mock import patch, MagicMock
 
 from backend.models.user import User
 from backend.models.post import Post
 from backend.models.rating import Rating
-from backend.models.database import get_db_connection, init_db
+from backend.config import STORAGE_PROFILES, config
+from backend.models.database import get_db_connection, get_pool, get_storage_stats, init_db, close_pool, run_write
+from backend.models.pool import ConnectionPool, PoolTimeoutError
+from backend.models.replica import ReplicaRefresher, _try_lock
+from backend.models.shards import close_shards, get_shards, rebalance, shard_index, shard_paths
+from backend.models.migrations import (
+    MIGRATIONS, apply_migrations, backfill_compact_ratings, get_schema_version, insert_ratings,
+    prepare_compact_ratings
+)
+from backend.models.writer import GroupCommitWriter
 
 
 class TestUserModel:
@@ -93,7 +105,7 @@ class TestPostModel:
     
     def test_create_post_success(self, db_connection):
         """Test successful post creation."""
-        with patch('backend.models.post.get_db_connection', return_value=db_connection):
+        with patch('backend.models.post.get_read_connection', return_value=db_connection):
             post = Post.create('Test Title', 'Test content', 1)
             
             assert post is not None
@@ -104,7 +116,7 @@ class TestPostModel:
     
     def test_create_post_without_content(self, db_connection):
         """Test post creation without content."""
-        with patch('backend.models.post.get_db_connection', return_value=db_connection):
+        with patch('backend.models.post.get_read_connection', return_value=db_connection):
             post = Post.create('Test Title')
             
             assert post is not None
@@ -114,7 +126,7 @@ class TestPostModel:
     
     def test_get_post_by_id(self, db_connection):
         """Test retrieving post by ID."""
-        with patch('backend.models.post.get_db_connection', return_value=db_connection):
+        with patch('backend.models.post.get_read_connection', return_value=db_connection):
             # Create post
             created_post = Post.create('Test Title', 'Test content')
             
@@ -128,7 +140,7 @@ class TestPostModel:
     
     def test_get_all_posts(self, db_connection):
         """Test retrieving all posts."""
-        with patch('backend.models.post.get_db_connection', return_value=db_connection):
+        with patch('backend.models.post.get_read_connection', return_value=db_connection):
             # Create multiple posts
             Post.create('Post 1', 'Content 1')
             Post.create('Post 2', 'Content 2')
@@ -140,7 +152,7 @@ class TestPostModel:
     
     def test_get_posts_by_user(self, db_connection):
         """Test retrieving posts by user."""
-        with patch('backend.models.post.get_db_connection', return_value=db_connection):
+        with patch('backend.models.post.get_read_connection', return_value=db_connection):
             # Create posts for different users
             Post.create('User 1 Post', 'Content', 1)
             Post.create('User 2 Post', 'Content', 2)
@@ -153,9 +165,30 @@ class TestPostModel:
             for post in user_posts:
                 assert post.user_id == 1
     
+    def test_get_all_posts_pages_through_ties(self, db_connection):
+        """Test keyset pagination when posts share a created_at value."""
+        with patch('backend.models.post.get_read_connection', return_value=db_connection):
+            for i in range(5):
+                db_connection.execute(
+                    "INSERT INTO posts (title, created_at) VALUES (?, '2024-01-01 00:00:00')",
+                    (f'Post {i}',)
+                )
+            db_connection.commit()
+            
+            seen = []
+            after = None
+            while True:
+                page = Post.get_all(limit=2, after=after)
+                if not page:
+                    break
+                seen.extend(post.title for post in page)
+                after = page[-1].page_key()
+            
+            assert seen == [f'Post {i}' for i in reversed(range(5))]
+    
     def test_post_to_dict(self, db_connection):
         """Test post to dictionary conversion."""
-        with patch('backend.models.post.get_db_connection', return_value=db_connection):
+        with patch('backend.models.post.get_read_connection', return_value=db_connection):
             post = Post.create('Test Title', 'Test content', 1)
             post_dict = post.to_dict()
             
@@ -173,9 +206,12 @@ class TestRatingModel:
     def test_save_rating_new(self, db_connection):
         """Test saving a new rating."""
         with patch('backend.models.rating.get_db_connection', return_value=db_connection):
-            success = Rating.save_rating('test-track', 'up', 'user123')
+            result = Rating.save_rating('test-track', 'up', 'user123')
             
-            assert success is True
+            assert result is not None
+            assert result['changed'] is True
+            assert result['ratings'] == {'up': 1, 'down': 0}
+            assert result['user_rating'] == 'up'
     
     def test_save_rating_update_existing(self, db_connection):
         """Test updating an existing rating."""
@@ -184,9 +220,21 @@ class TestRatingModel:
             Rating.save_rating('test-track', 'up', 'user123')
             
             # Update rating
-            success = Rating.save_rating('test-track', 'down', 'user123')
+            result = Rating.save_rating('test-track', 'down', 'user123')
+            
+            assert result is not None
+            assert result['ratings'] == {'up': 0, 'down': 1}
+            assert result['user_rating'] == 'down'
+    
+    def test_save_rating_unchanged_skips_write(self, db_connection):
+        """Test that re-submitting the same rating does not rewrite the row."""
+        with patch('backend.models.rating.get_db_connection', return_value=db_connection):
+            Rating.save_rating('test-track', 'up', 'user123')
+            
+            result = Rating.save_rating('test-track', 'up', 'user123')
             
-            assert success is True
+            assert result['changed'] is False
+            assert result['ratings'] == {'up': 1, 'down': 0}
     
     def test_save_rating_remove(self, db_connection):
         """Test removing a rating."""
@@ -195,9 +243,74 @@ class TestRatingModel:
             Rating.save_rating('test-track', 'up', 'user123')
             
             # Remove rating
-            success = Rating.save_rating('test-track', None, 'user123')
+            result = Rating.save_rating('test-track', None, 'user123')
+            
+            assert result is not None
+            assert result['changed'] is True
+            assert result['ratings'] == {'up': 0, 'down': 0}
+            assert result['user_rating'] is None
+    
+    def test_track_counters_follow_writes(self, db_connection):
+        """Test that vote counters track inserts, updates and deletes."""
+        with patch('backend.models.rating.get_db_connection', return_value=db_connection):
+            Rating.save_rating('test-track', 'up', 'user1')
+            Rating.save_rating('test-track', 'up', 'user2')
+            Rating.save_rating('test-track', 'down', 'user2')
+            Rating.save_rating('test-track', None, 'user1')
+            
+            row = db_connection.execute(
+                'SELECT up_count, down_count FROM track_rating_counts WHERE track_id = ?',
+                ('test-track',)
+            ).fetchone()
+            
+            assert (row['up_count'], row['down_count']) == (0, 1)
+            assert Rating.verify_counts() == []
+    
+    def test_verify_and_rebuild_counts(self, db_connection):
+        """Test that drifted counters are reported and repaired."""
+        with patch('backend.models.rating.get_db_connection', return_value=db_connection):
+            Rating.save_rating('test-track', 'up', 'user1')
+            db_connection.execute(
+                "UPDATE track_rating_counts SET up_count = 5 WHERE track_id = 'test-track'"
+            )
+            db_connection.commit()
             
-            assert success is True
+            mismatches = Rating.verify_counts()
+            assert len(mismatches) == 1
+            assert mismatches[0]['stored']['up'] == 5
+            assert mismatches[0]['expected']['up'] == 1
+            
+            with patch('backend.models.rating.run_write', wraps=run_write) as write:
+                assert Rating.rebuild_counts() == 1
+            write.assert_called_once()
+            assert Rating.verify_counts() == []
+    
+    def test_track_ratings_cached_until_vote(self, db_connection):
+        """Test that counts are cached and invalidated by save_rating."""
+        with patch('backend.models.rating.get_db_connection', return_value=db_connection):
+            Rating.save_rating('test-track', 'up', 'user1')
+            Rating.get_track_ratings('test-track')
+            Rating.get_track_ratings('test-track')
+            assert Rating.cache_stats()['hits'] >= 1
+            
+            Rating.save_rating('test-track', 'up', 'user2')
+            ratings = Rating.get_track_ratings('test-track')
+            
+            assert ratings['ratings']['up'] == 2
+    
+    def test_get_many_track_ratings(self, db_connection):
+        """Test batch lookup of several tracks."""
+        with patch('backend.models.rating.get_db_connection', return_value=db_connection):
+            Rating.save_rating('track1', 'up', 'user1')
+            Rating.save_rating('track2', 'down', 'user2')
+            
+            results = Rating.get_many_track_ratings(['track2', 'track1', 'track3'], 'user1')
+            
+            assert [result['track_id'] for result in results] == ['track2', 'track1', 'track3']
+            assert results[0]['ratings'] == {'up': 0, 'down': 1}
+            assert results[0]['user_rating'] is None
+            assert results[1]['user_rating'] == 'up'
+            assert results[2]['ratings'] == {'up': 0, 'down': 0}
     
     def test_get_track_ratings(self, db_connection):
         """Test getting track ratings."""
@@ -244,6 +357,62 @@ class TestRatingModel:
                 assert 'track_id' in rating
                 assert 'rating' in rating
                 assert 'timestamp' in rating
+    
+    def test_get_user_ratings_pages_through_ties(self, db_connection):
+        """Test keyset pagination when a listener rated several tracks in the same second."""
+        with patch('backend.models.rating.get_db_connection', return_value=db_connection):
+            insert_ratings(db_connection, [(f'track{i}', 'user1', 1, 1704067200 + i // 3) for i in range(7)])
+            db_connection.commit()
+            
+            seen = []
+            after = None
+            while True:
+                page = Rating.get_user_ratings('user1', limit=2, after=after)
+                if not page:
+                    break
+                seen.extend(rating['track_id'] for rating in page)
+                after = Rating.rating_page_key(page[-1])
+            
+            assert seen == ['track6', 'track5', 'track4', 'track3', 'track2', 'track1', 'track0']
+            assert Rating.get_user_ratings('user1', after=('not a time', 'x')) == []
+    
+    def test_ids_interned_once_and_cached(self, db_connection):
+        """Test that track keys and fingerprints are stored once and their ids cached after commit."""
+        with patch('backend.models.rating.get_db_connection', return_value=db_connection):
+            Rating.save_rating('test-track', 'up', 'user1')
+            Rating.save_rating('test-track', 'down', 'user2')
+            Rating.save_rating('other-track', 'up', 'user1')
+            
+            assert db_connection.execute('SELECT COUNT(*) FROM tracks').fetchone()[0] == 2
+            assert db_connection.execute('SELECT COUNT(*) FROM listeners').fetchone()[0] == 2
+            assert Rating.id_cache_stats()['size'] == 4
+            
+            hits = Rating.id_cache_stats()['hits']
+            assert Rating.get_track_ratings('test-track', 'user2')['user_rating'] == 'down'
+            assert Rating.id_cache_stats()['hits'] == hits + 2
+            
+            # Unknown listeners are neither stored nor cached
+            assert Rating.get_track_ratings('test-track', 'stranger')['user_rating'] is None
+            assert Rating.save_rating('test-track', None, 'stranger')['changed'] is False
+            assert Rating.id_cache_stats()['size'] == 4
+    
+    def test_cached_ids_not_reused_after_database_recreated(self, test_config):
+        """Test that ids cached for a database are not applied to a new one at the same path."""
+        with patch('backend.models.database.config', test_config):
+            try:
+                init_db()
+                Rating.save_rating('test-track', 'up', 'user1')
+                
+                # A fresh in-memory database: its ids are handed out from 1 again
+                close_pool()
+                init_db()
+                Rating.save_rating('other-track', 'up', 'user2')
+                Rating.save_rating('test-track', 'down', 'user1')
+                
+                assert Rating.get_track_ratings('other-track')['ratings'] == {'up': 1, 'down': 0}
+                assert Rating.get_track_ratings('test-track', 'user1')['user_rating'] == 'down'
+            finally:
+                close_pool()
 
 
 class TestDatabaseModule:
@@ -264,10 +433,627 @@ class TestDatabaseModule:
             assert conn.row_factory == sqlite3.Row
             conn.close()
     
-    @patch('backend.models.database.sqlite3.connect')
+    @patch('backend.models.pool.sqlite3.connect')
     def test_db_connection_error(self, mock_connect):
         """Test database connection error handling."""
         mock_connect.side_effect = sqlite3.Error("Connection failed")
+        close_pool()
         
         with pytest.raises(sqlite3.Error):
-            get_db_connection()
\ No newline at end of file
+            get_db_connection()
+    
+    def test_get_db_connection_reuses_pooled_connection(self, test_config):
+        """Test that closing a connection returns it to the pool."""
+        with patch('backend.models.database.config', test_config):
+            conn = get_db_connection()
+            raw = conn.raw
+            conn.close()
+            
+            conn = get_db_connection()
+            assert conn.raw is raw
+            conn.close()
+    
+    def test_storage_profile_applied_and_reported(self, test_config, tmp_path):
+        """Test that changing the storage profile rebuilds the pool with its settings."""
+        with patch('backend.models.database.config', test_config), \
+                patch.object(test_config, 'DATABASE_PATH', str(tmp_path / 'profile.db')):
+            try:
+                with patch.object(test_config, 'DB_STORAGE_PROFILE', 'durable'):
+                    durable_pool = get_pool()
+                    assert get_storage_stats()['synchronous'] == 2
+                with patch.object(test_config, 'DB_STORAGE_PROFILE', 'throughput'):
+                    assert get_pool() is not durable_pool
+                    stats = get_storage_stats()
+                    assert stats['profile'] == 'throughput'
+                    assert stats['journal_mode'] == 'wal'
+                    assert stats['synchronous'] == 0
+                    assert stats['cache_size'] == STORAGE_PROFILES['throughput']['cache_size']
+            finally:
+                close_pool()
+
+
+class TestConnectionPool:
+    """Test cases for the SQLite connection pool."""
+    
+    def test_memory_database_is_shared(self):
+        """Test that pooled :memory: connections share one database."""
+        pool = ConnectionPool(':memory:', size=2)
+        try:
+            first = pool.acquire()
+            second = pool.acquire()
+            first.execute('CREATE TABLE t (x INTEGER)')
+            first.execute('INSERT INTO t VALUES (1)')
+            first.commit()
+            
+            assert second.execute('SELECT x FROM t').fetchone()[0] == 1
+            first.close()
+            second.close()
+        finally:
+            pool.close()
+    
+    def test_checkout_timeout(self):
+        """Test that an exhausted pool raises after the checkout timeout."""
+        pool = ConnectionPool(':memory:', size=1, timeout=0.05)
+        try:
+            conn = pool.acquire()
+            with pytest.raises(PoolTimeoutError):
+                pool.acquire()
+            assert pool.stats()['timeouts'] == 1
+            conn.close()
+        finally:
+            pool.close()
+    
+    def test_release_rolls_back_open_transaction(self):
+        """Test that uncommitted work is discarded on release."""
+        pool = ConnectionPool(':memory:', size=1)
+        try:
+            conn = pool.acquire()
+            conn.execute('CREATE TABLE t (x INTEGER)')
+            conn.commit()
+            conn.execute('INSERT INTO t VALUES (1)')
+            conn.close()
+            
+            conn = pool.acquire()
+            assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+            conn.close()
+        finally:
+            pool.close()
+    
+    def test_expired_connection_is_recycled(self):
+        """Test that connections older than max_age are replaced."""
+        pool = ConnectionPool(':memory:', size=1, max_age=0)
+        try:
+            conn = pool.acquire()
+            raw = conn.raw
+            conn.close()
+            
+            conn = pool.acquire()
+            assert conn.raw is not raw
+            assert pool.stats()['recycled'] == 1
+            conn.close()
+        finally:
+            pool.close()
+    
+    def test_read_only_pool_rejects_writes_and_sees_commits(self, tmp_path):
+        """Test that read-only connections cannot write but see committed writes."""
+        path = str(tmp_path / 'reads.db')
+        writer = sqlite3.connect(path)
+        writer.execute('PRAGMA journal_mode = WAL')
+        writer.execute('CREATE TABLE t (x INTEGER)')
+        writer.commit()
+        pool = ConnectionPool(path, size=1, read_only=True)
+        try:
+            conn = pool.acquire()
+            with pytest.raises(sqlite3.OperationalError, match='readonly'):
+                conn.execute('INSERT INTO t VALUES (1)')
+            
+            writer.execute('INSERT INTO t VALUES (2)')
+            writer.commit()
+            assert conn.execute('SELECT x FROM t').fetchall()[0][0] == 2
+            assert pool.stats()['read_only'] is True
+            conn.close()
+        finally:
+            pool.close()
+            writer.close()
+    
+    def test_read_only_pool_applies_pragmas_except_journal_mode(self, tmp_path):
+        """Test that read-only connections get the profile settings they are allowed to change."""
+        path = str(tmp_path / 'reads.db')
+        sqlite3.connect(path).close()
+        pool = ConnectionPool(path, size=1, read_only=True, pragmas=STORAGE_PROFILES['balanced'])
+        try:
+            conn = pool.acquire()
+            assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+            assert conn.execute('PRAGMA cache_size').fetchone()[0] == STORAGE_PROFILES['balanced']['cache_size']
+            assert conn.execute('PRAGMA temp_store').fetchone()[0] == 2
+            conn.close()
+        finally:
+            pool.close()
+
+
+class TestReadReplica:
+    """Test cases for the backup-refreshed read replica."""
+    
+    @pytest.fixture
+    def primary(self, tmp_path):
+        path = str(tmp_path / 'primary.db')
+        conn = sqlite3.connect(path)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('CREATE TABLE t (x INTEGER)')
+        conn.execute('INSERT INTO t VALUES (1)')
+        conn.commit()
+        conn.close()
+        return path
+    
+    def test_refresh_copies_primary(self, primary, tmp_path):
+        """Test that a refresh brings the replica up to date with the primary."""
+        replica = str(tmp_path / 'replica.db')
+        refresher = ReplicaRefresher(primary, replica)
+        assert refresher.age() is None
+        assert refresher.refresh() is True
+        
+        pool = ConnectionPool(replica, size=1, read_only=True)
+        try:
+            conn = pool.acquire()
+            assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 1
+            
+            writer = sqlite3.connect(primary)
+            writer.execute('INSERT INTO t VALUES (2)')
+            writer.commit()
+            writer.close()
+            assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 1
+            
+            refresher.refresh()
+            assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 2
+            conn.close()
+        finally:
+            pool.close()
+        
+        stats = refresher.stats()
+        assert stats['refreshes'] == 2
+        assert stats['age_seconds'] is not None
+    
+    def test_refresh_skipped_while_another_copy_runs(self, primary, tmp_path):
+        """Test that only one process copies the primary at a time."""
+        replica = str(tmp_path / 'replica.db')
+        refresher = ReplicaRefresher(primary, replica)
+        with _try_lock(replica + '.lock') as acquired:
+            assert acquired
+            assert refresher.refresh() is False
+        
+        assert refresher.stats()['skipped'] == 1
+        assert not (tmp_path / 'replica.db').exists()
+
+
+class TestShardedRatings:
+    """Test cases for ratings spread over hash-sharded files."""
+    
+    TRACKS = [f'artist-{n}-song-{n}' for n in range(12)]
+    
+    @pytest.fixture
+    def shard_dir(self, tmp_path):
+        directory = str(tmp_path / 'shards')
+        with patch.object(config, 'RATINGS_SHARDS', 3), patch.object(config, 'RATINGS_SHARD_DIR', directory):
+            yield directory
+            close_shards()
+    
+    def stored_tracks(self, path):
+        conn = sqlite3.connect(path)
+        try:
+            return {row[0] for row in conn.execute(
+                'SELECT tracks.key FROM ratings JOIN tracks ON tracks.id = ratings.track_id'
+            )}
+        finally:
+            conn.close()
+    
+    def test_votes_go_to_owning_shard(self, shard_dir):
+        """Test that each vote is written to, and read from, the shard its track hashes to."""
+        for track in self.TRACKS:
+            assert Rating.save_rating(track, 'up', 'user1')['ratings'] == {'up': 1, 'down': 0}
+        Rating.save_rating(self.TRACKS[0], 'down', 'user2')
+        
+        for index, path in enumerate(shard_paths(shard_dir, 3)):
+            assert self.stored_tracks(path) == {track for track in self.TRACKS if shard_index(track, 3) == index}
+        assert len(get_shards().stats()['shards']) == 3
+        
+        Rating.clear_cache()
+        result = Rating.get_track_ratings(self.TRACKS[0], 'user2')
+        assert result['ratings'] == {'up': 1, 'down': 1}
+        assert result['user_rating'] == 'down'
+        
+        many = Rating.get_many_track_ratings(self.TRACKS[:5] + ['unknown'], 'user1')
+        assert [track['track_id'] for track in many] == self.TRACKS[:5] + ['unknown']
+        assert [track['user_rating'] for track in many] == ['up'] * 5 + [None]
+        assert Rating.verify_counts() == []
+    
+    def test_user_ratings_merged_across_shards(self, shard_dir):
+        """Test that a listener's ratings from every shard come back in one ordered, paginated list."""
+        for track in self.TRACKS:
+            Rating.save_rating(track, 'up', 'user1')
+        rows = []
+        for path in shard_paths(shard_dir, 3):
+            conn = sqlite3.connect(path)
+            rows += conn.execute('''
+                SELECT datetime(ratings.rated_at, 'unixepoch'), tracks.key
+                FROM ratings JOIN tracks ON tracks.id = ratings.track_id
+            ''').fetchall()
+            conn.close()
+        expected = [track for _, track in sorted(rows, reverse=True)]
+        
+        first = Rating.get_user_ratings('user1', limit=5)
+        rest = Rating.get_user_ratings('user1', limit=50, after=Rating.rating_page_key(first[-1]))
+        assert [rating['track_id'] for rating in first + rest] == expected
+    
+    def test_rebalance_to_more_shards(self, shard_dir):
+        """Test that resharding moves every rating to its new owner and can be repeated."""
+        for track in self.TRACKS:
+            Rating.save_rating(track, 'up', 'user1')
+        close_shards()
+        
+        sources = shard_paths(shard_dir, 3)
+        targets = shard_paths(shard_dir, 5)
+        assert sum(rebalance(sources, targets)) == len(self.TRACKS)
+        assert sum(rebalance(sources, targets)) == len(self.TRACKS)
+        
+        for index, path in enumerate(targets):
+            assert self.stored_tracks(path) == {track for track in self.TRACKS if shard_index(track, 5) == index}
+        with patch.object(config, 'RATINGS_SHARDS', 5):
+            assert Rating.get_track_ratings(self.TRACKS[3])['ratings'] == {'up': 1, 'down': 0}
+            assert len(Rating.get_user_ratings('user1')) == len(self.TRACKS)
+            assert Rating.verify_counts() == []
+    
+    def test_rebalance_round_trip_keeps_removed_votes(self, shard_dir, tmp_path):
+        """Test that shard -> main -> shard doesn't resurrect votes from an earlier layout."""
+        main = str(tmp_path / 'main.db')
+        conn = sqlite3.connect(main)
+        apply_migrations(conn)
+        insert_ratings(conn, [(track, 'user1', 1, 1704067200) for track in self.TRACKS])
+        conn.commit()
+        conn.close()
+        shards = shard_paths(shard_dir, 3)
+        assert sum(rebalance([main], shards)) == len(self.TRACKS)
+        
+        # While sharded the listener removes one vote and flips another
+        Rating.save_rating(self.TRACKS[0], None, 'user1')
+        Rating.save_rating(self.TRACKS[1], 'down', 'user1')
+        close_shards()
+        
+        assert sum(rebalance(shards, [main])) == len(self.TRACKS) - 1
+        assert self.stored_tracks(main) == set(self.TRACKS[1:])
+        assert sum(rebalance([main], shards)) == len(self.TRACKS) - 1
+        
+        Rating.clear_cache()
+        assert Rating.get_track_ratings(self.TRACKS[0], 'user1')['user_rating'] is None
+        assert Rating.get_track_ratings(self.TRACKS[0])['ratings'] == {'up': 0, 'down': 0}
+        assert Rating.get_track_ratings(self.TRACKS[1])['ratings'] == {'up': 0, 'down': 1}
+        assert Rating.verify_counts() == []
+        with pytest.raises(ValueError):
+            rebalance(shards, [main, shards[0]])
+
+
+class TestGroupCommitWriter:
+    """Test cases for the single-writer group commit."""
+    
+    @pytest.fixture
+    def database(self, tmp_path):
+        path = str(tmp_path / 'writes.db')
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE t (x INTEGER UNIQUE)')
+        conn.commit()
+        conn.close()
+        return path
+    
+    def make_writer(self, database, **kwargs):
+        return GroupCommitWriter(lambda: sqlite3.connect(database, check_same_thread=False), **kwargs)
+    
+    def rows(self, database):
+        conn = sqlite3.connect(database)
+        try:
+            return sorted(row[0] for row in conn.execute('SELECT x FROM t'))
+        finally:
+            conn.close()
+    
+    def test_concurrent_writes_share_commits(self, database):
+        """Test that concurrent writers are grouped and all get their result."""
+        writer = self.make_writer(database, max_delay=0.05)
+        results = {}
+        
+        def insert(value):
+            results[value] = writer.submit(lambda conn: conn.execute('INSERT INTO t VALUES (?)', (value,)).lastrowid)
+        
+        threads = [threading.Thread(target=insert, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        writer.stop()
+        
+        assert self.rows(database) == list(range(20))
+        assert sorted(results.values()) == list(range(1, 21))
+        stats = writer.stats()
+        assert stats['jobs'] == 20
+        assert stats['batches'] < 20
+    
+    def test_failed_write_is_rolled_back_alone(self, database):
+        """Test that one failing write does not undo the rest of its group."""
+        writer = self.make_writer(database, max_delay=0.05)
+        errors = []
+        
+        def insert(value):
+            try:
+                writer.submit(lambda conn: conn.execute('INSERT INTO t VALUES (?)', (value,)))
+            except sqlite3.IntegrityError as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=insert, args=(value,)) for value in (1, 2, 2, 3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        writer.stop()
+        
+        assert self.rows(database) == [1, 2, 3]
+        assert len(errors) == 1
+        assert writer.stats()['failed_jobs'] == 1
+    
+    def test_busy_database_is_retried(self, database):
+        """Test that a write waits out another connection's write lock."""
+        writer = self.make_writer(database)
+        blocker = sqlite3.connect(database, check_same_thread=False)
+        blocker.execute('BEGIN IMMEDIATE')
+        release = threading.Timer(0.1, blocker.commit)
+        release.start()
+        try:
+            writer.submit(lambda conn: conn.execute('INSERT INTO t VALUES (1)'))
+        finally:
+            release.join()
+            blocker.close()
+            writer.stop()
+        
+        assert self.rows(database) == [1]
+        assert writer.stats()['busy_retries'] > 0
+    
+    def test_busy_timeout_fails_the_write(self, database):
+        """Test that a lock held past the busy timeout fails the write."""
+        writer = self.make_writer(database, busy_timeout=0.05)
+        blocker = sqlite3.connect(database)
+        blocker.execute('BEGIN IMMEDIATE')
+        try:
+            with pytest.raises(sqlite3.OperationalError, match='locked'):
+                writer.submit(lambda conn: conn.execute('INSERT INTO t VALUES (1)'))
+        finally:
+            blocker.rollback()
+            blocker.close()
+            writer.stop()
+        
+        assert writer.stats()['failed_batches'] == 1
+    
+    def test_stop_commits_queued_writes(self, database):
+        """Test that stopping drains writes queued before it."""
+        writer = self.make_writer(database, max_delay=0.2, batch_max=100)
+        jobs = [lambda conn, i=i: conn.execute('INSERT INTO t VALUES (?)', (i,)) for i in range(5)]
+        threads = [threading.Thread(target=writer.submit, args=(job,)) for job in jobs]
+        for thread in threads:
+            thread.start()
+        # The writer is still gathering the group when asked to stop
+        time.sleep(0.05)
+        writer.stop()
+        for thread in threads:
+            thread.join()
+        
+        assert self.rows(database) == [0, 1, 2, 3, 4]
+        
+        # A write after stopping starts a new writer thread
+        writer.submit(lambda conn: conn.execute('INSERT INTO t VALUES (5)'))
+        writer.stop()
+        assert self.rows(database) == [0, 1, 2, 3, 4, 5]
+
+
+class TestMigrations:
+    """Test cases for schema migrations."""
+    
+    def test_migrations_recorded(self, db_connection):
+        """Test that every migration is applied once and recorded."""
+        assert get_schema_version(db_connection) == MIGRATIONS[-1].version
+        assert apply_migrations(db_connection) == []
+    
+    def test_rating_indexes(self, db_connection):
+        """Test that ratings keep only the listener index next to their primary key."""
+        indexes = {
+            row['name'] for row in db_connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'ratings'"
+            )
+        }
+        
+        assert indexes == {'idx_ratings_listener_rated_at'}
+    
+    def v1_database(self, path=':memory:'):
+        """A database at schema version 3, the last with text-keyed ratings."""
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        get_schema_version(conn)
+        for migration in MIGRATIONS[:3]:
+            migration.apply(conn)
+            conn.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                         (migration.version, migration.description))
+        conn.commit()
+        return conn
+    
+    def v1_rows(self, conn):
+        return sorted(tuple(row) for row in conn.execute('''
+            SELECT track_id, user_fingerprint, CASE rating WHEN 'up' THEN 1 ELSE -1 END,
+                   CAST(strftime('%s', timestamp) AS INTEGER)
+            FROM ratings
+        '''))
+    
+    def compact_rows(self, conn):
+        return sorted(tuple(row) for row in conn.execute('''
+            SELECT tracks.key, listeners.fingerprint, ratings.rating, ratings.rated_at
+            FROM ratings
+            JOIN tracks ON tracks.id = ratings.track_id
+            JOIN listeners ON listeners.id = ratings.listener_id
+        '''))
+    
+    def test_ratings_compacted_on_upgrade(self):
+        """Test that migrating text-keyed ratings keeps every rating, timestamp and counter."""
+        conn = self.v1_database()
+        conn.executemany(
+            'INSERT INTO ratings (track_id, rating, timestamp, user_fingerprint) VALUES (?, ?, ?, ?)',
+            [(f'track{n % 4}', 'up' if n % 3 else 'down', f'2024-01-01 00:00:{n:02d}', f'user{n}')
+             for n in range(20)]
+        )
+        conn.commit()
+        expected = self.v1_rows(conn)
+        counts = conn.execute('SELECT * FROM track_rating_counts ORDER BY track_id').fetchall()
+        
+        assert apply_migrations(conn) == [4]
+        
+        assert self.compact_rows(conn) == expected
+        assert conn.execute('SELECT * FROM track_rating_counts ORDER BY track_id').fetchall() == counts
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name LIKE 'ratings_v2%'").fetchall() == []
+        conn.close()
+    
+    def test_online_compaction_mirrors_concurrent_writes(self):
+        """Test that votes cast while the backfill runs end up in the compact table."""
+        conn = self.v1_database()
+        upsert = '''
+            INSERT INTO ratings (track_id, rating, user_fingerprint) VALUES (?, ?, ?)
+            ON CONFLICT(track_id, user_fingerprint) DO UPDATE
+            SET rating = excluded.rating, timestamp = CURRENT_TIMESTAMP
+        '''
+        conn.executemany(upsert, [(f'track{n % 5}', 'up', f'user{n}') for n in range(30)])
+        conn.commit()
+        prepare_compact_ratings(conn)
+        conn.commit()
+        assert backfill_compact_ratings(conn, batch_size=10) == 10
+        conn.commit()
+        
+        # The old app keeps writing: before and after the backfill position
+        conn.execute(upsert, ('track0', 'down', 'user0'))
+        conn.execute(upsert, ('track4', 'down', 'user29'))
+        conn.execute(upsert, ('new-track', 'up', 'new-user'))
+        conn.execute("DELETE FROM ratings WHERE user_fingerprint IN ('user1', 'user25')")
+        conn.commit()
+        assert backfill_compact_ratings(conn, batch_size=10) == 10
+        conn.commit()
+        expected = self.v1_rows(conn)
+        
+        apply_migrations(conn)
+        
+        assert self.compact_rows(conn) == expected
+        with patch('backend.models.rating.get_db_connection', return_value=conn):
+            assert Rating.verify_counts() == []
+        conn.close()
+    
+    def test_compact_ratings_are_smaller(self, tmp_path):
+        """Test that the compact layout takes a fraction of the pages."""
+        path = str(tmp_path / 'size.db')
+        conn = self.v1_database(path)
+        conn.executemany(
+            'INSERT INTO ratings (track_id, rating, user_fingerprint) VALUES (?, ?, ?)',
+            [(f'artist-{n % 50}-song-title-{n % 50}', 'up', f'{n // 10:032x}') for n in range(4000)]
+        )
+        conn.commit()
+        conn.execute('VACUUM')
+        before = conn.execute('PRAGMA page_count').fetchone()[0]
+        
+        apply_migrations(conn)
+        conn.execute('VACUUM')
+        after = conn.execute('PRAGMA page_count').fetchone()[0]
+        conn.close()
+        
+        assert after * 2 < before
+    
+    def test_existing_database_is_adopted(self):
+        """Test migrating a database created before migrations existed."""
+        conn = sqlite3.connect(':memory:')
+        conn.row_factory = sqlite3.Row
+        conn.execute('''
+            CREATE TABLE ratings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                track_id TEXT NOT NULL,
+                rating TEXT CHECK(rating IN ('up', 'down')) NOT NULL,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                user_fingerprint TEXT NOT NULL,
+                UNIQUE(track_id, user_fingerprint)
+            )
+        ''')
+        conn.execute("INSERT INTO ratings (track_id, rating, user_fingerprint) VALUES ('t', 'up', 'u')")
+        conn.commit()
+        
+        applied = apply_migrations(conn)
+        
+        assert applied == [migration.version for migration in MIGRATIONS]
+        row = conn.execute("SELECT up_count FROM track_rating_counts WHERE track_id = 't'").fetchone()
+        assert row['up_count'] == 1
+        conn.close()
+
+
+class TestQueryPlans:
+    """Every request-path model query must seek an index, never scan or sort."""
+    
+    MODEL_MODULES = [
+        'backend.models.database',
+        'backend.models.user',
+        'backend.models.post',
+        'backend.models.rating',
+    ]
+    
+    def _run_model_queries(self):
+        user = User.create('Plan User', 'plan@example.com')
+        User.get_by_id(user.id)
+        User.get_by_email('plan@example.com')
+        User.get_all()
+        User.get_all(after=('2024-01-01 00:00:00', user.id))
+        
+        post = Post.create('Plan Post', 'Content', user.id)
+        Post.get_by_id(post.id)
+        Post.get_all()
+        Post.get_all(after=('2024-01-01 00:00:00', post.id))
+        Post.get_by_user(user.id)
+        Post.get_by_user(user.id, after=('2024-01-01 00:00:00', post.id))
+        
+        Rating.save_rating('plan-track', 'up', 'plan-user')
+        Rating.save_rating('plan-track', 'up', 'plan-user')
+        Rating.save_rating('plan-track', 'down', 'plan-user')
+        Rating.get_track_ratings('plan-track', 'plan-user')
+        Rating.get_many_track_ratings(['plan-track', 'other-track'], 'plan-user')
+        Rating.get_user_ratings('plan-user')
+        Rating.get_user_ratings('plan-user', after=('2024-01-01 00:00:00', 'plan-track'))
+        Rating.save_rating('plan-track', None, 'plan-user')
+    
+    def test_no_full_scans_or_temp_sorts(self, db_connection):
+        """Test query plans of all statements issued by the models."""
+        statements = []
+        db_connection.set_trace_callback(statements.append)
+        
+        patches = [
+            patch(f'{module}.{name}', return_value=db_connection)
+            for module in self.MODEL_MODULES
+            for name in ('get_db_connection', 'get_read_connection')
+            if hasattr(sys.modules[module], name)
+        ]
+        for p in patches:
+            p.start()
+        try:
+            self._run_model_queries()
+        finally:
+            for p in patches:
+                p.stop()
+            db_connection.set_trace_callback(None)
+        
+        queries = [
+            statement for statement in statements
+            if statement.lstrip().split(None, 1)[0].upper() in ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+        ]
+        assert queries
+        
+        problems = []
+        for query in queries:
+            plan = [row['detail'] for row in db_connection.execute(f'EXPLAIN QUERY PLAN {query}')]
+            for detail in plan:
+                full_scan = detail.startswith('SCAN ') and ' USING ' not in detail
+                if full_scan or 'TEMP B-TREE' in detail:
+                    problems.append(f'{detail}: {" ".join(query.split())}')
+        
+        assert problems == []
\ No newline at end of file
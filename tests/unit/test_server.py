@@ -0,0 +1,97 @@
+"""Unit tests for the pre-fork production server."""
+
+import threading
+import urllib.request
+from multiprocessing.sharedctypes import RawArray
+
+from backend.server import (PooledWSGIServer, RequestCounter, create_listen_socket, parse_args,
+                            release_request_slot, worker_stats)
+
+
+def hello_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'hello']
+
+
+def detaching_app(opened, resume):
+    """App whose ``/stream`` requests give up their slot and wait for ``resume``."""
+    def app(environ, start_response):
+        if environ['PATH_INFO'] == '/stream':
+            release_request_slot()
+            opened.release()
+            resume.wait(5)
+        return hello_app(environ, start_response)
+    return app
+
+
+class TestServeArguments:
+    """Test cases for command line parsing."""
+
+    def test_serve_arguments(self):
+        """Test the serve sub-command options."""
+        args = parse_args(['serve', '--workers', '4', '--threads', '16', '--port', '8080'])
+
+        assert args.command == 'serve'
+        assert args.workers == 4
+        assert args.threads == 16
+        assert args.port == 8080
+        assert args.host is None
+
+    def test_default_is_development_server(self):
+        """Test that no arguments keeps the development server."""
+        assert parse_args([]).command is None
+
+
+class TestPooledWSGIServer:
+    """Test cases for the worker HTTP server."""
+
+    def test_serves_on_inherited_socket(self):
+        """Test that a worker serves requests on a socket opened by the parent."""
+        sock = create_listen_socket('127.0.0.1', 0, 16)
+        port = sock.getsockname()[1]
+        counters = RawArray('Q', 2)
+        server = PooledWSGIServer('127.0.0.1', port, RequestCounter(hello_app, counters, 1),
+                                  threads=2, fd=sock.fileno())
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            bodies = [urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=5).read()
+                      for _ in range(3)]
+        finally:
+            server.shutdown()
+            thread.join(timeout=5)
+            sock.close()
+
+        assert bodies == [b'hello'] * 3
+        assert list(counters) == [0, 3]
+
+    def test_detached_requests_free_their_slot(self):
+        """Test that long-lived streams don't block ordinary requests."""
+        opened, resume = threading.Semaphore(0), threading.Event()
+        sock = create_listen_socket('127.0.0.1', 0, 16)
+        port = sock.getsockname()[1]
+        server = PooledWSGIServer('127.0.0.1', port, detaching_app(opened, resume),
+                                  threads=1, fd=sock.fileno(), detached=2)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        streams = [threading.Thread(target=urllib.request.urlopen,
+                                    args=(f'http://127.0.0.1:{port}/stream',), kwargs={'timeout': 10})
+                   for _ in range(2)]
+        try:
+            for stream in streams:
+                stream.start()
+                assert opened.acquire(timeout=5)
+            body = urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=5).read()
+        finally:
+            resume.set()
+            for stream in streams:
+                stream.join(timeout=5)
+            server.shutdown()
+            thread.join(timeout=5)
+            sock.close()
+
+        assert body == b'hello'
+
+    def test_worker_stats_outside_prefork(self):
+        """Test that the development server reports no worker stats."""
+        assert worker_stats() is None
@@ -0,0 +1,553 @@
+"""Unit tests for upstream-facing services."""
+
+import json
+import pytest
+import threading
+import time
+from email.utils import formatdate
+from unittest.mock import MagicMock
+
+import requests
+
+from backend.services.events import EventBroadcaster, SubscriberLimitError, track_id_for
+from backend.services.metadata import MetadataCache, upstream_ttl
+from backend.services.stream_health import Playlist, StreamProber
+from backend.services.upstream import CircuitBreaker, CircuitOpenError, UpstreamClient
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestUpstreamTTL:
+    """Test cases for Cache-Control/Date freshness parsing."""
+
+    def test_max_age(self):
+        """Test that max-age sets the lifetime."""
+        assert upstream_ttl({'cache-control': 'public, max-age=10'}) == 10
+
+    def test_s_maxage_preferred(self):
+        """Test that s-maxage wins over max-age for a shared cache."""
+        assert upstream_ttl({'cache-control': 'max-age=10, s-maxage=4'}) == 4
+
+    def test_age_header_subtracted(self):
+        """Test that time already spent in upstream caches is subtracted."""
+        assert upstream_ttl({'cache-control': 'max-age=10', 'age': '7'}) == 3
+
+    def test_date_header_subtracted(self):
+        """Test that the apparent age from the Date header is subtracted."""
+        now = time.time()
+        headers = {'cache-control': 'max-age=10', 'date': formatdate(now - 4, usegmt=True)}
+
+        assert upstream_ttl(headers, now=now) == pytest.approx(6, abs=1)
+
+    def test_no_cache(self):
+        """Test that no-cache responses are immediately stale."""
+        assert upstream_ttl({'cache-control': 'no-cache'}) == 0
+
+    def test_no_guidance(self):
+        """Test headers without a lifetime."""
+        assert upstream_ttl({'content-type': 'application/json'}) is None
+
+
+class TestMetadataCache:
+    """Test cases for the shared metadata cache."""
+
+    def test_fresh_hits_skip_upstream(self):
+        """Test that a fresh document is served without refetching."""
+        clock = FakeClock()
+        fetch = MagicMock(return_value=({'title': 'Song'}, {'cache-control': 'max-age=10'}))
+        cache = MetadataCache(fetch, min_ttl=1, max_ttl=30, clock=clock)
+
+        cache.get()
+        clock.now += 5
+        result = cache.get()
+
+        assert result.metadata == {'title': 'Song'}
+        assert fetch.call_count == 1
+        assert cache.stats()['hits'] == 1
+
+    def test_ttl_clamped_to_ceiling(self):
+        """Test that a long upstream lifetime is capped."""
+        clock = FakeClock()
+        fetch = MagicMock(return_value=({}, {'cache-control': 'max-age=3600'}))
+        cache = MetadataCache(fetch, min_ttl=1, max_ttl=30, clock=clock)
+
+        cache.get()
+        clock.now += 31
+        cache.get()
+
+        assert fetch.call_count == 2
+
+    def test_stale_served_on_upstream_error(self):
+        """Test stale-while-revalidate when upstream fails."""
+        clock = FakeClock()
+        fetch = MagicMock(return_value=({'title': 'Song'}, {}))
+        cache = MetadataCache(fetch, min_ttl=1, max_ttl=30, max_stale=60, clock=clock)
+        cache.get()
+
+        fetch.side_effect = requests.ConnectionError('down')
+        clock.now += 10
+        result = cache.get()
+
+        assert result.stale is True
+        assert result.metadata == {'title': 'Song'}
+        assert cache.stats()['upstream_errors'] == 1
+
+    def test_error_raised_when_too_stale(self):
+        """Test that very old copies are not served."""
+        clock = FakeClock()
+        fetch = MagicMock(return_value=({'title': 'Song'}, {}))
+        cache = MetadataCache(fetch, min_ttl=1, max_ttl=30, max_stale=60, clock=clock)
+        cache.get()
+
+        fetch.side_effect = requests.ConnectionError('down')
+        clock.now += 120
+
+        with pytest.raises(requests.ConnectionError):
+            cache.get()
+
+    def test_concurrent_misses_share_one_fetch(self):
+        """Test that simultaneous cold misses coalesce into one fetch."""
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            release.wait(timeout=5)
+            return {'title': 'Song'}, {}
+
+        cache = MetadataCache(fetch)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get())) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert len(calls) == 1
+        assert len(results) == 5
+        assert cache.stats()['coalesced'] == 4
+
+
+def make_client(session, retries=2, threshold=5, clock=None):
+    """Upstream client that never sleeps between retries."""
+    breaker = CircuitBreaker(threshold, reset_timeout=30, clock=clock or FakeClock())
+    return UpstreamClient('test', session, retries=retries, breaker=breaker, sleep=lambda seconds: None)
+
+
+def http_response(status_code):
+    response = MagicMock()
+    response.status_code = status_code
+    return response
+
+
+class TestCircuitBreaker:
+    """Test cases for the upstream circuit breaker."""
+
+    def test_opens_after_consecutive_failures(self):
+        """Test that the breaker trips at the threshold."""
+        breaker = CircuitBreaker(failure_threshold=3, clock=FakeClock())
+
+        for _ in range(2):
+            breaker.record_failure()
+        assert breaker.allow() is True
+
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.allow() is False
+
+    def test_success_resets_failure_count(self):
+        """Test that only consecutive failures count."""
+        breaker = CircuitBreaker(failure_threshold=2, clock=FakeClock())
+
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_half_open_allows_single_trial(self):
+        """Test recovery through one trial request."""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+        breaker.record_failure()
+
+        clock.now += 31
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow() is True
+        assert breaker.allow() is False
+
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_failed_trial_reopens(self):
+        """Test that a failed trial request re-opens the breaker."""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+        breaker.record_failure()
+        clock.now += 31
+        breaker.allow()
+
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.times_opened == 2
+
+
+class TestUpstreamClient:
+    """Test cases for the shared upstream HTTP client."""
+
+    def test_split_timeouts(self):
+        """Test that connect and read timeouts are passed separately."""
+        session = MagicMock()
+        session.get.return_value = http_response(200)
+        client = UpstreamClient('test', session, connect_timeout=2, read_timeout=7)
+
+        client.get('http://cdn.example.com/metadata.json')
+
+        session.get.assert_called_once_with('http://cdn.example.com/metadata.json', timeout=(2, 7))
+
+    def test_retries_transient_errors(self):
+        """Test that connection errors are retried."""
+        session = MagicMock()
+        session.get.side_effect = [requests.ConnectionError('reset'), http_response(200)]
+        client = make_client(session)
+
+        response = client.get('http://cdn.example.com/metadata.json')
+
+        assert response.status_code == 200
+        assert client.stats()['retries'] == 1
+        assert client.breaker.state == CircuitBreaker.CLOSED
+
+    def test_retries_gateway_errors(self):
+        """Test that 502-504 responses are retried and the last one returned."""
+        session = MagicMock()
+        session.head.return_value = http_response(503)
+        client = make_client(session, retries=2)
+
+        response = client.head('http://cdn.example.com/live.m3u8')
+
+        assert response.status_code == 503
+        assert session.head.call_count == 3
+        assert client.stats()['failures'] == 3
+        # Retried responses are closed; the returned one is left to the caller
+        assert response.close.call_count == 2
+
+    def test_post_not_retried(self):
+        """Test that non-idempotent requests are sent once."""
+        session = MagicMock()
+        session.post.side_effect = requests.ConnectionError('reset')
+        client = make_client(session)
+
+        with pytest.raises(requests.ConnectionError):
+            client.request('POST', 'http://cdn.example.com/')
+
+        assert session.post.call_count == 1
+
+    def test_open_circuit_fails_fast(self):
+        """Test that an open breaker rejects requests without sending them."""
+        session = MagicMock()
+        session.get.side_effect = requests.Timeout('slow')
+        client = make_client(session, retries=0, threshold=2)
+
+        for _ in range(2):
+            with pytest.raises(requests.Timeout):
+                client.get('http://cdn.example.com/metadata.json')
+        with pytest.raises(CircuitOpenError):
+            client.get('http://cdn.example.com/metadata.json')
+
+        assert session.get.call_count == 2
+        stats = client.stats()
+        assert stats['breaker'] == CircuitBreaker.OPEN
+        assert stats['rejected'] == 1
+        assert stats['latency_ms']['p50'] is not None
+
+    def test_retries_other_request_errors(self):
+        """Test that any requests error is retried, not just connection failures."""
+        session = MagicMock()
+        session.get.side_effect = [requests.exceptions.ChunkedEncodingError('cut'), http_response(200)]
+        client = make_client(session)
+
+        response = client.get('http://cdn.example.com/metadata.json')
+
+        assert response.status_code == 200
+        assert client.stats()['retries'] == 1
+
+    def test_unexpected_error_ends_half_open_trial(self):
+        """Test that a trial request failing with a non-requests error doesn't wedge the breaker."""
+        clock = FakeClock()
+        session = MagicMock()
+        client = make_client(session, retries=0, threshold=1, clock=clock)
+        client.breaker.record_failure()
+        clock.now += 31
+        session.get.side_effect = ValueError('bad header')
+
+        with pytest.raises(ValueError):
+            client.get('http://cdn.example.com/metadata.json')
+        assert client.breaker.state == CircuitBreaker.OPEN
+
+        clock.now += 31
+        session.get.side_effect = None
+        session.get.return_value = http_response(200)
+        response = client.get('http://cdn.example.com/metadata.json')
+
+        assert response.status_code == 200
+        assert client.breaker.state == CircuitBreaker.CLOSED
+
+    def test_open_circuit_serves_cached_metadata(self):
+        """Test that the metadata cache falls back to its copy when the circuit is open."""
+        clock = FakeClock()
+        session = MagicMock()
+        response = http_response(200)
+        response.json.return_value = {'title': 'Song'}
+        response.headers = {}
+        session.get.return_value = response
+        client = make_client(session, retries=0, threshold=1)
+
+        def fetch():
+            result = client.get('http://cdn.example.com/metadata.json')
+            return result.json(), result.headers
+
+        cache = MetadataCache(fetch, min_ttl=1, max_ttl=30, max_stale=60, clock=clock)
+        cache.get()
+        client.breaker.record_failure()
+        clock.now += 5
+
+        result = cache.get()
+
+        assert result.stale is True
+        assert result.metadata == {'title': 'Song'}
+        assert session.get.call_count == 1
+
+
+MASTER_PLAYLIST = """#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=1411000,CODECS="flac"
+lossless/index.m3u8
+"""
+
+
+def media_playlist(sequence, program_date_time=None):
+    lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:6', f'#EXT-X-MEDIA-SEQUENCE:{sequence}']
+    if program_date_time:
+        lines.append(f'#EXT-X-PROGRAM-DATE-TIME:{program_date_time}')
+    lines += ['#EXTINF:6.0,', f'segment{sequence}.ts']
+    return '\n'.join(lines)
+
+
+def playlist_response(text, status_code=200):
+    response = http_response(status_code)
+    response.text = text
+    response.headers = {'content-type': 'application/vnd.apple.mpegurl'}
+    return response
+
+
+class TestStreamProber:
+    """Test cases for the background stream health prober."""
+
+    def test_parse_media_playlist(self):
+        """Test that segments are resolved and the live edge timestamp read."""
+        playlist = Playlist.parse(
+            media_playlist(7, '2024-01-01T00:00:00Z'), 'https://cdn.example.com/hls/live.m3u8'
+        )
+
+        assert playlist.segments == ['https://cdn.example.com/hls/segment7.ts']
+        assert playlist.media_sequence == 7
+        assert playlist.target_duration == 6
+        assert playlist.last_segment_duration == 6
+        assert playlist.last_program_date_time.year == 2024
+
+    def test_follows_master_playlist_variant(self):
+        """Test that a master playlist is followed to its first variant."""
+        session = MagicMock()
+        session.get.side_effect = [playlist_response(MASTER_PLAYLIST), playlist_response(media_playlist(1))]
+        session.head.return_value = http_response(200)
+        prober = StreamProber(make_client(session), url='https://cdn.example.com/hls/live.m3u8')
+
+        result = prober.probe()
+
+        assert result.status == 'online'
+        assert session.get.call_args_list[1][0][0] == 'https://cdn.example.com/hls/lossless/index.m3u8'
+        assert session.head.call_args[0][0] == 'https://cdn.example.com/hls/lossless/segment1.ts'
+
+    def test_stuck_live_edge_is_degraded(self):
+        """Test that a playlist that stops advancing is reported."""
+        clock = FakeClock()
+        session = MagicMock()
+        session.get.return_value = playlist_response(media_playlist(1))
+        session.head.return_value = http_response(200)
+        prober = StreamProber(make_client(session), url='https://cdn.example.com/live.m3u8', clock=clock)
+
+        assert prober.probe().status == 'online'
+        clock.now += 30
+        result = prober.probe()
+
+        assert result.status == 'degraded'
+        assert result.segment_age == 30
+
+    def test_live_edge_lag(self):
+        """Test lag behind the playlist's program date time."""
+        session = MagicMock()
+        session.get.return_value = playlist_response(media_playlist(1, '2024-01-01T00:00:00+00:00'))
+        session.head.return_value = http_response(200)
+        prober = StreamProber(make_client(session), url='https://cdn.example.com/live.m3u8',
+                              wall_clock=lambda: 1704067200.0 + 10)
+
+        assert prober.probe().live_edge_lag == 4
+
+    def test_failed_probe_releases_connections(self):
+        """Test that error responses are closed so their connections return to the pool."""
+        session = MagicMock()
+        playlist = playlist_response('Not Found', status_code=404)
+        session.get.return_value = playlist
+        prober = StreamProber(make_client(session), url='https://cdn.example.com/live.m3u8')
+
+        assert prober.probe().status == 'offline'
+        playlist.close.assert_called_once()
+
+        master, variant = playlist_response(MASTER_PLAYLIST), playlist_response('', status_code=404)
+        session.get.side_effect = [master, variant]
+        assert prober.probe().error == 'Variant playlist HTTP 404'
+        master.close.assert_called_once()
+        variant.close.assert_called_once()
+
+    def test_history_ring_buffer(self):
+        """Test that only the most recent probes are kept."""
+        session = MagicMock()
+        session.get.side_effect = requests.ConnectionError('down')
+        prober = StreamProber(make_client(session, retries=0, threshold=100),
+                              url='https://cdn.example.com/live.m3u8', history=3)
+
+        for _ in range(5):
+            prober.probe()
+
+        history = prober.history()
+        assert len(history) == 3
+        assert {entry['status'] for entry in history} == {'offline'}
+
+
+def read_event(subscription, timeout=2):
+    """Next non-keepalive message as (event, data)."""
+    message = subscription.get(timeout=timeout)
+    assert message is not None, 'no event received'
+    lines = dict(line.split(': ', 1) for line in message.strip().split('\n'))
+    return lines['event'], json.loads(lines['data'])
+
+
+class TestEventBroadcaster:
+    """Test cases for the live update broadcaster."""
+
+    def test_track_id_matches_frontend(self):
+        """Test that track IDs follow MetadataManager.generateTrackId."""
+        assert track_id_for({'artist': 'AC/DC', 'title': 'Back In Black'}) == 'ac-dc-back-in-black'
+        assert track_id_for({}) == 'unknown-unknown'
+        assert track_id_for({'artist': 'A', 'title': '\U0001F3B5'}) == 'a---'
+
+    def test_poll_publishes_only_on_track_change(self):
+        """Test that repeated metadata for the same track is not rebroadcast."""
+        metadata = {'artist': 'Artist', 'title': 'Song'}
+        broadcaster = EventBroadcaster(lambda: metadata, lambda track_id: {'up': 0, 'down': 0})
+
+        assert broadcaster.poll() is True
+        assert broadcaster.poll() is False
+        metadata = {'artist': 'Artist', 'title': 'Next Song'}
+        assert broadcaster.poll() is True
+
+        assert broadcaster.stats()['track_events'] == 2
+        assert broadcaster.current_track_id == 'artist-next-song'
+
+    def test_subscriber_receives_compact_track_event(self):
+        """Test that subscribers get the current track with counts."""
+        metadata = {'artist': 'Artist', 'title': 'Song', 'internal_id': 42}
+        broadcaster = EventBroadcaster(lambda: metadata, lambda track_id: {'up': 3, 'down': 1},
+                                       poll_interval=0.05)
+        try:
+            subscription = broadcaster.subscribe()
+            event, data = read_event(subscription)
+        finally:
+            broadcaster.stop()
+
+        assert event == 'track'
+        assert data['track_id'] == 'artist-song'
+        assert data['track'] == {'artist': 'Artist', 'title': 'Song'}
+        assert data['ratings'] == {'up': 3, 'down': 1}
+
+    def test_rating_bursts_are_debounced(self):
+        """Test that several votes produce one counts event."""
+        counts = {'up': 0, 'down': 0}
+        broadcaster = EventBroadcaster(lambda: {'artist': 'Artist', 'title': 'Song'},
+                                       lambda track_id: dict(counts),
+                                       poll_interval=60, debounce=0.1)
+        try:
+            subscription = broadcaster.subscribe()
+            read_event(subscription)
+
+            for votes in range(1, 6):
+                counts['up'] = votes
+                broadcaster.notify_rating('artist-song')
+            event, data = read_event(subscription)
+            extra = subscription.get(timeout=0.3)
+        finally:
+            broadcaster.stop()
+
+        assert event == 'ratings'
+        assert data == {'track_id': 'artist-song', 'ratings': {'up': 5, 'down': 0}}
+        assert extra is None
+        assert broadcaster.stats()['rating_events'] == 1
+
+    def test_late_subscriber_gets_snapshot(self):
+        """Test that new subscribers start from the current state."""
+        broadcaster = EventBroadcaster(lambda: {'artist': 'Artist', 'title': 'Song'},
+                                       lambda track_id: {'up': 1, 'down': 0})
+        broadcaster.poll()
+        try:
+            subscription = broadcaster.subscribe()
+            event, data = read_event(subscription, timeout=0)
+        finally:
+            broadcaster.stop()
+
+        assert event == 'track'
+        assert data['track_id'] == 'artist-song'
+
+    def test_slow_subscriber_dropped(self):
+        """Test that a client that stops reading is disconnected."""
+        def unavailable():
+            raise requests.ConnectionError('down')
+
+        broadcaster = EventBroadcaster(unavailable, lambda track_id: {}, max_pending=1)
+        try:
+            subscription = broadcaster.subscribe()
+            broadcaster.publish('ratings', {'n': 1})
+            broadcaster.publish('ratings', {'n': 2})
+        finally:
+            broadcaster.stop()
+
+        assert subscription.closed is True
+        assert broadcaster.stats()['subscribers'] == 0
+        assert broadcaster.stats()['dropped_subscribers'] == 1
+
+    def test_subscribers_capped(self):
+        """Test that clients beyond ``max_subscribers`` are refused until one leaves."""
+        broadcaster = EventBroadcaster(lambda: {'artist': 'Artist', 'title': 'Song'},
+                                       lambda track_id: {}, poll_interval=60, max_subscribers=2)
+        try:
+            first = broadcaster.subscribe()
+            broadcaster.subscribe()
+            with pytest.raises(SubscriberLimitError):
+                broadcaster.subscribe()
+            
+            broadcaster.unsubscribe(first)
+            broadcaster.subscribe()
+        finally:
+            broadcaster.stop()
+        
+        assert broadcaster.stats()['subscribers'] == 2
+        assert broadcaster.stats()['rejected_subscribers'] == 1
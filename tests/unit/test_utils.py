@@ -1,13 +1,33 @@
 """Unit tests for utility functions."""
 
+import gzip
+import json
+import logging
+import os
+import sys
 import pytest
+import threading
+import time
 from unittest.mock import MagicMock
 
 from backend.utils.validation import (
     validate_json, validate_email, validate_rating,
-    validate_required_fields, validate_string_length, sanitize_string
+    validate_required_fields, validate_string_length, sanitize_string,
+    validate_track_ids
 )
 from backend.utils.responses import success_response, error_response
+from backend.utils.cache import TTLCache
+from backend.utils.capture import TrafficCapture, anonymize_body
+from backend.utils.logging_config import (
+    CompressingRotatingFileHandler, DroppingQueueHandler, LogRateLimiter, SuppressionFormatter
+)
+from backend.utils.metrics import Registry, sql_operation, method_label
+from backend.utils.memory import MemoryProfiler, SnapshotNotFound, process_memory
+from backend.utils.profiler import SamplingProfiler, collapse_stack
+from backend.utils.tracing import ChromeTraceExporter, Tracer, current_trace, span, traced
+from backend.utils.pagination import (
+    encode_cursor, decode_cursor, paginate, InvalidCursorError
+)
 
 
 class TestValidation:
@@ -141,6 +161,15 @@ class TestValidation:
         
         assert len(result) == 500
 
+    
+    def test_validate_track_ids(self):
+        """Test batch track ID validation."""
+        assert validate_track_ids(['a', 'b'], 5) is None
+        assert validate_track_ids([], 5) is not None
+        assert validate_track_ids('a,b', 5) is not None
+        assert validate_track_ids(['a', ''], 5) is not None
+        assert validate_track_ids(['a', 1], 5) is not None
+        assert 'At most 2' in validate_track_ids(['a', 'b', 'c'], 2)
 
 class TestResponses:
     """Test cases for response utilities."""
@@ -199,4 +228,556 @@ class TestResponses:
         assert response_data['success'] is False
         assert response_data['error'] == 'Validation failed'
         assert response_data['status_code'] == 422
-        assert response_data['error_code'] == 'VALIDATION_ERROR'
\ No newline at end of file
+        assert response_data['error_code'] == 'VALIDATION_ERROR'
+    
+    def test_error_response_with_fields(self):
+        """Test that extra fields are added to the error body."""
+        response, status_code = error_response('Stream unavailable', 502, probe={'status': 'offline'})
+        
+        assert status_code == 502
+        response_data = response.get_json()
+        assert response_data['success'] is False
+        assert response_data['probe'] == {'status': 'offline'}
+
+
+class FakeClock:
+    """Manually advanced clock for cache expiry tests."""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache:
+    """Test cases for the TTL/LRU cache."""
+    
+    def test_get_or_load_caches_value(self):
+        """Test that a loaded value is served from cache."""
+        cache = TTLCache(max_size=4, ttl=10)
+        loader = MagicMock(return_value='value')
+        
+        assert cache.get_or_load('key', loader) == 'value'
+        assert cache.get_or_load('key', loader) == 'value'
+        
+        assert loader.call_count == 1
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+    
+    def test_entries_expire_after_ttl(self):
+        """Test that entries are reloaded once their TTL passes."""
+        clock = FakeClock()
+        cache = TTLCache(max_size=4, ttl=5, clock=clock)
+        cache.set('key', 'old')
+        
+        clock.now = 6
+        
+        assert cache.get('key') is None
+        assert cache.stats()['expirations'] == 1
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted."""
+        cache = TTLCache(max_size=2, ttl=10)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.stats()['evictions'] == 1
+    
+    def test_concurrent_misses_load_once(self):
+        """Test single-flight coalescing of concurrent misses."""
+        cache = TTLCache(max_size=4, ttl=10)
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        
+        def loader():
+            calls.append(1)
+            started.set()
+            release.wait(timeout=5)
+            return 'value'
+        
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_load('key', loader)))
+            for _ in range(5)
+        ]
+        threads[0].start()
+        started.wait(timeout=5)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join(timeout=5)
+        
+        assert len(calls) == 1
+        assert results == ['value'] * 5
+        assert cache.stats()['coalesced'] == 4
+    
+    def test_invalidate_discards_in_flight_load(self):
+        """Test that a load racing an invalidation is not cached."""
+        cache = TTLCache(max_size=4, ttl=10)
+        
+        def loader():
+            cache.invalidate('key')
+            return 'stale'
+        
+        assert cache.get_or_load('key', loader) == 'stale'
+        assert cache.get('key') is None
+
+
+class TestPagination:
+    """Test cases for cursor pagination helpers."""
+    
+    def test_cursor_round_trip(self):
+        """Test that a cursor decodes to the key it was built from."""
+        cursor = encode_cursor(('2024-01-01 00:00:00', 42))
+        
+        assert decode_cursor(cursor, (str, int)) == ('2024-01-01 00:00:00', 42)
+    
+    def test_decode_rejects_garbage(self):
+        """Test that malformed or mismatched cursors are rejected."""
+        with pytest.raises(InvalidCursorError):
+            decode_cursor('not a cursor!', (str, int))
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(encode_cursor(('a', 'b')), (str, int))
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(encode_cursor(('a',)), (str, int))
+    
+    def test_paginate(self):
+        """Test splitting a limit + 1 result into a page and next cursor."""
+        page, cursor = paginate([1, 2, 3], 2, lambda item: (item,))
+        assert page == [1, 2]
+        assert decode_cursor(cursor, (int,)) == (2,)
+        
+        page, cursor = paginate([1, 2], 2, lambda item: (item,))
+        assert page == [1, 2]
+        assert cursor is None
+
+
+class TestMetrics:
+    """Test cases for the Prometheus metrics registry."""
+    
+    def test_counter_render(self):
+        """Test counter exposition with labels."""
+        registry = Registry()
+        requests_total = registry.counter('test_requests_total', 'Requests.', ('route', 'status'))
+        requests_total.inc(route='/a', status='200')
+        requests_total.inc(route='/a', status='200')
+        requests_total.inc(route='/b"x', status='500')
+        
+        output = registry.render()
+        
+        assert '# TYPE test_requests_total counter' in output
+        assert 'test_requests_total{route="/a",status="200"} 2' in output
+        assert 'test_requests_total{route="/b\\"x",status="500"} 1' in output
+    
+    def test_histogram_buckets_are_cumulative(self):
+        """Test histogram bucket, sum and count lines."""
+        registry = Registry()
+        latency = registry.histogram('test_seconds', 'Latency.', ('route',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            latency.observe(value, route='/a')
+        
+        output = registry.render()
+        
+        assert 'test_seconds_bucket{route="/a",le="0.1"} 1' in output
+        assert 'test_seconds_bucket{route="/a",le="1"} 2' in output
+        assert 'test_seconds_bucket{route="/a",le="+Inf"} 3' in output
+        assert 'test_seconds_sum{route="/a"} 5.55' in output
+        assert 'test_seconds_count{route="/a"} 3' in output
+    
+    def test_gauge_inc_dec(self):
+        """Test gauge movement."""
+        registry = Registry()
+        in_flight = registry.gauge('test_in_flight', 'In flight.')
+        in_flight.inc()
+        in_flight.inc()
+        in_flight.dec()
+        
+        assert in_flight.value() == 1
+    
+    def test_label_mismatch_rejected(self):
+        """Test that unexpected label sets are errors."""
+        registry = Registry()
+        counter = registry.counter('test_total', 'Total.', ('route',))
+        
+        with pytest.raises(ValueError):
+            counter.inc(path='/a')
+    
+    def test_bounded_label_values(self):
+        """Test that free-form inputs fold into a fixed set of label values."""
+        assert sql_operation('  SELECT 1') == 'select'
+        assert sql_operation('BEGIN IMMEDIATE') == 'other'
+        assert method_label('GET') == 'GET'
+        assert method_label('BREW') == 'OTHER'
+
+
+def load_trace_file(path):
+    """Parse an open-ended JSON Array trace file."""
+    with open(path) as trace_file:
+        return json.loads(trace_file.read() + ']')
+
+
+class TestTracing:
+    """Test cases for sampled request tracing."""
+    
+    def test_span_without_trace_is_noop(self):
+        """Test that spans outside a sampled request record nothing."""
+        with span('work'):
+            pass
+        
+        assert current_trace() is None
+    
+    def test_unsampled_request(self, tmp_path):
+        """Test that requests above the sample rate are not traced."""
+        tracer = Tracer(0.5, ChromeTraceExporter(str(tmp_path), 1024 * 1024), random_source=lambda: 0.7)
+        
+        token = tracer.start('GET /')
+        
+        assert token is None
+        assert current_trace() is None
+        assert tracer.finish(token) is None
+    
+    def test_trace_export(self, tmp_path):
+        """Test that sampled traces are appended as Chrome trace events."""
+        exporter = ChromeTraceExporter(str(tmp_path), 1024 * 1024)
+        tracer = Tracer(1.0, exporter)
+        
+        @traced('helper', 'model')
+        def helper():
+            with span('SELECT', 'db', sql='SELECT 1'):
+                pass
+        
+        for _ in range(2):
+            token = tracer.start('GET /api/ratings/<track_id>')
+            helper()
+            tracer.finish(token, status=200)
+        
+        events = load_trace_file(exporter.path)
+        
+        # Spans are recorded as they end, so a parent follows its children
+        assert [event['cat'] for event in events] == ['request', 'db', 'model'] * 2
+        root, db_span, model_span = events[:3]
+        assert root['args']['status'] == 200
+        assert root['ph'] == 'X'
+        assert root['ts'] <= model_span['ts'] <= db_span['ts']
+        assert db_span['args']['sql'] == 'SELECT 1'
+        assert current_trace() is None
+    
+    def test_trace_file_rotation(self, tmp_path):
+        """Test that a full trace file is moved aside."""
+        exporter = ChromeTraceExporter(str(tmp_path), max_bytes=10)
+        tracer = Tracer(1.0, exporter)
+        
+        for _ in range(2):
+            tracer.finish(tracer.start('GET /'))
+        
+        assert exporter.stats()['rotations'] == 1
+        assert len(load_trace_file(exporter.path)) == 1
+        assert len(load_trace_file(exporter.path + '.1')) == 1
+
+
+class TestSamplingProfiler:
+    """Test cases for the stack sampling profiler."""
+    
+    def test_collapse_stack(self):
+        """Test collapsed stacks run from the root to the innermost frame."""
+        def inner():
+            return collapse_stack(sys._getframe(), 'ratings', max_depth=2)
+        
+        def outer():
+            return inner()
+        
+        frames = outer().split(';')
+        
+        assert frames[0] == 'ratings'
+        assert 'outer' in frames[1]
+        assert 'inner' in frames[2]
+    
+    def test_samples_only_request_threads(self):
+        """Test that idle threads and other blueprints are not sampled."""
+        frame = sys._getframe()
+        profiler = SamplingProfiler(current_frames=lambda: {1: frame, 2: frame, 3: frame})
+        profiler._active = {1: 'ratings', 2: 'stream'}
+        profiler.blueprints = frozenset({'ratings'})
+        
+        assert profiler.sample() == 1
+        assert profiler.sample() == 1
+        
+        lines = profiler.collapsed().splitlines()
+        assert len(lines) == 1
+        assert lines[0].startswith('ratings;')
+        assert lines[0].endswith(' 2')
+        assert profiler.stats()['samples'] == 2
+    
+    def test_enter_and_exit(self):
+        """Test that request threads register under their blueprint."""
+        profiler = SamplingProfiler()
+        
+        profiler.enter(None)
+        assert profiler._active[threading.get_ident()] == 'app'
+        profiler.exit()
+        assert profiler._active == {}
+    
+    def test_distinct_stack_limit(self):
+        """Test that stacks beyond max_stacks are folded together."""
+        frame = sys._getframe()
+        profiler = SamplingProfiler(max_stacks=1, current_frames=lambda: {1: frame, 2: frame})
+        profiler._active = {1: 'ratings', 2: 'stream'}
+        
+        profiler.sample()
+        
+        assert profiler.stats()['distinct_stacks'] == 2
+        assert '[dropped' in profiler.collapsed(reset=True)
+        assert profiler.collapsed() == ''
+    
+    def test_background_sampling(self):
+        """Test that the background thread starts and stops."""
+        profiler = SamplingProfiler(hz=200, current_frames=lambda: {})
+        
+        profiler.start(blueprints=['stream'])
+        time.sleep(0.05)
+        profiler.stop()
+        
+        stats = profiler.stats()
+        assert stats['running'] is False
+        assert stats['blueprints'] == ['stream']
+        assert stats['samples'] > 0
+
+
+class TestMemoryProfiler:
+    """Test cases for tracemalloc snapshots."""
+    
+    def test_snapshot_retention(self):
+        """Test that only the newest snapshots are kept."""
+        profiler = MemoryProfiler(max_snapshots=2)
+        profiler.start()
+        try:
+            ids = [profiler.take_snapshot()['id'] for _ in range(3)]
+        finally:
+            profiler.stop()
+        
+        assert [snapshot['id'] for snapshot in profiler.snapshots()] == ids[1:]
+        with pytest.raises(SnapshotNotFound):
+            profiler.top(ids[0])
+        assert profiler.stats()['tracing'] is False
+    
+    def test_process_memory_unknown_pid(self):
+        """Test that unreadable processes are skipped."""
+        assert process_memory(2 ** 22 + 1) is None
+        assert process_memory()['pid'] > 0
+
+
+class TestTrafficCapture:
+    """Test cases for sampled traffic capture."""
+    
+    def make_capture(self, tmp_path, **kwargs):
+        options = {'flush_interval': 0.05, **kwargs}
+        return TrafficCapture(1.0, str(tmp_path), 1024 * 1024, 'test-salt', **options)
+    
+    def test_anonymization_is_stable_and_keyed(self, tmp_path):
+        """Test that the same listener always maps to the same id, per salt."""
+        capture = self.make_capture(tmp_path)
+        other = TrafficCapture(1.0, str(tmp_path), 1024, 'other-salt')
+        
+        anonymous = capture.anonymize('listener-1')
+        assert anonymous == capture.anonymize('listener-1')
+        assert len(anonymous) == 32 and 'listener-1' not in anonymous
+        assert anonymous != capture.anonymize('listener-2')
+        assert anonymous != other.anonymize('listener-1')
+        assert capture.anonymize_email('Ann@Example.com') == capture.anonymize_email('ann@example.com')
+    
+    def test_body_strings_hashed_except_safe_fields(self, tmp_path):
+        """Test that free-text body fields never reach a capture file."""
+        capture = self.make_capture(tmp_path)
+        body = {
+            'name': 'Ann Example', 'email': 'ann@example.com', 'user_fingerprint': 'listener-1',
+            'bio': {'text': 'Lives on Main Street', 'tags': ['private']}, 'user_id': 3,
+            'track_id': 'artist-song', 'rating': 'up', 'track_ids': ['a', 'b']
+        }
+        
+        anonymous = anonymize_body(capture, body)
+        
+        assert 'Ann' not in str(anonymous) and 'Main Street' not in str(anonymous)
+        assert 'private' not in str(anonymous)
+        assert anonymous['user_fingerprint'] == capture.anonymize('listener-1')
+        assert anonymous['email'] == capture.anonymize_email('ann@example.com')
+        assert anonymous['user_id'] == 3
+        assert {key: anonymous[key] for key in ('track_id', 'rating', 'track_ids')} == {
+            'track_id': 'artist-song', 'rating': 'up', 'track_ids': ['a', 'b']
+        }
+    
+    def test_sampling_keeps_listeners_whole(self, tmp_path):
+        """Test that a listener is either always or never sampled."""
+        capture = self.make_capture(tmp_path, random_source=lambda: 0.9)
+        capture.sample_rate = 0.5
+        listeners = [capture.anonymize(f'listener-{i}') for i in range(200)]
+        
+        first = [capture.sampled(listener) for listener in listeners]
+        assert first == [capture.sampled(listener) for listener in listeners]
+        assert 60 < sum(first) < 140
+        assert capture.sampled(None) is False
+        
+        capture.sample_rate = 0
+        assert not any(capture.sampled(listener) for listener in listeners)
+    
+    def test_written_records_read_back(self, tmp_path):
+        """Test that batches written in the background replay in order."""
+        from benchmarks.replay import read_capture
+        
+        capture = self.make_capture(tmp_path, batch_size=2)
+        for i in range(5):
+            assert capture.record({'ts': 100.0 - i, 'method': 'GET', 'path': f'/api/{i}'})
+        capture.stop()
+        
+        entries = read_capture([capture.path])
+        assert [entry['path'] for entry in entries] == [f'/api/{i}' for i in range(4, -1, -1)]
+        stats = capture.stats()
+        assert stats['captured'] == stats['written'] == 5
+        assert stats['queued'] == 0
+    
+    def test_truncated_file_keeps_complete_batches(self, tmp_path):
+        """Test that a file cut short mid-batch still yields earlier batches."""
+        from benchmarks.replay import read_capture
+        
+        capture = self.make_capture(tmp_path)
+        capture._write([{'ts': 1.0, 'path': '/a'}])
+        capture._write([{'ts': 2.0, 'path': '/b'}])
+        with open(capture.path, 'rb') as capture_file:
+            data = capture_file.read()
+        with open(capture.path, 'wb') as capture_file:
+            capture_file.write(data[:-10])
+        
+        assert [entry['path'] for entry in read_capture([capture.path])] == ['/a']
+    
+    def test_rotation(self, tmp_path):
+        """Test that an oversized file is moved aside."""
+        capture = TrafficCapture(1.0, str(tmp_path), 10, 'test-salt')
+        capture._write([{'ts': 1.0, 'path': '/a'}])
+        capture._write([{'ts': 2.0, 'path': '/b'}])
+        
+        assert capture.stats()['rotations'] == 1
+        assert (tmp_path / (os.path.basename(capture.path) + '.1')).exists()
+    
+    def test_full_queue_drops(self, tmp_path):
+        """Test that records are dropped rather than blocking when the writer lags."""
+        capture = self.make_capture(tmp_path, queue_size=1)
+        capture._ensure_writer = lambda: None
+        
+        assert capture.record({'ts': 1.0}) is True
+        assert capture.record({'ts': 2.0}) is False
+        assert capture.stats()['dropped'] == 1
+
+
+def log_record(name='backend.models.rating', level=logging.INFO, msg='Rating %s', args=('saved',)):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+class ListHandler(logging.Handler):
+    """Handler that keeps the messages it is given."""
+    
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+    
+    def emit(self, record):
+        self.messages.append(self.format(record))
+
+
+class TestLogging:
+    """Test cases for the queued, rate-limited logging pipeline."""
+    
+    def test_rate_limit_per_logger(self):
+        """Test that a noisy logger is limited and later reports what it suppressed."""
+        clock = FakeClock()
+        limiter = LogRateLimiter(2, clock=clock)
+        
+        assert [limiter.filter(log_record()) for _ in range(4)] == [True, True, False, False]
+        assert limiter.filter(log_record(name='backend.api.ratings')) is True
+        assert limiter.filter(log_record(level=logging.CRITICAL)) is True
+        
+        clock.now = 1.0
+        record = log_record()
+        assert limiter.filter(record) is True
+        assert record.suppressed == 2
+        assert limiter.suppressed == {'backend.models.rating': 2}
+        formatted = SuppressionFormatter('%(message)s').format(record)
+        assert formatted == 'Rating saved (2 earlier messages from this logger suppressed)'
+    
+    def test_sampling_by_logger_prefix(self):
+        """Test that sampling applies to child loggers and only below WARNING."""
+        values = iter([0.05, 0.5, 0.5])
+        limiter = LogRateLimiter(0, {'backend.models': 0.1}, random_source=lambda: next(values))
+        
+        assert limiter.filter(log_record()) is True
+        assert limiter.filter(log_record()) is False
+        assert limiter.filter(log_record(level=logging.WARNING)) is True
+        assert limiter.filter(log_record(name='backend.api.ratings')) is True
+        assert limiter.sampled_out == {'backend.models.rating': 1}
+    
+    def test_full_queue_drops_and_listener_reports(self):
+        """Test that a full queue never blocks and the drop count is logged."""
+        handler = DroppingQueueHandler(maxsize=2)
+        for i in range(5):
+            handler.handle(log_record(args=(i,)))
+        assert handler.dropped == 3
+        
+        target = ListHandler()
+        target.setFormatter(logging.Formatter('%(message)s'))
+        handler.start(target)
+        handler.close()
+        
+        assert target.messages == [
+            'Rating 0', 'Rating 1', 'Dropped 3 log messages: the log queue was full'
+        ]
+    
+    def test_formatting_happens_on_listener(self):
+        """Test that records reach the queue with their arguments unformatted."""
+        handler = DroppingQueueHandler(maxsize=10)
+        handler.handle(log_record())
+        
+        record = handler.queue.get_nowait()
+        assert record.msg == 'Rating %s' and record.args == ('saved',)
+    
+    def test_rotation_compresses(self, tmp_path):
+        """Test that rotated files are gzipped and old ones shifted."""
+        path = str(tmp_path / 'radio.log')
+        handler = CompressingRotatingFileHandler(path, max_bytes=100, backup_count=2)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        try:
+            for i in range(6):
+                handler.emit(log_record(msg='x' * 60 + ' %s', args=(i,)))
+        finally:
+            handler.close()
+        
+        assert sorted(os.listdir(tmp_path)) == ['radio.log', 'radio.log.1.gz', 'radio.log.2.gz', 'radio.log.lock']
+        with gzip.open(path + '.1.gz', 'rt') as rotated:
+            assert rotated.read().endswith(' 4\n')
+    
+    def test_reopens_file_rotated_by_sibling(self, tmp_path):
+        """Test that a handler follows a rotation done by another process."""
+        path = str(tmp_path / 'radio.log')
+        first = CompressingRotatingFileHandler(path, max_bytes=10 ** 6, backup_count=2)
+        second = CompressingRotatingFileHandler(path, max_bytes=10 ** 6, backup_count=2)
+        try:
+            first.emit(log_record(args=(1,)))
+            second.emit(log_record(args=(2,)))
+            first.doRollover()
+            # Both decided to rotate; the second finds it already done
+            second.doRollover()
+            second.emit(log_record(args=(3,)))
+            first.emit(log_record(args=(4,)))
+        finally:
+            first.close()
+            second.close()
+        
+        with open(path) as current:
+            assert current.read().splitlines() == ['Rating 3', 'Rating 4']
+        assert not os.path.exists(path + '.2.gz')